@@ -49,6 +49,13 @@ def _extract_order_ids_from_response(response_data: list[Any] | None) -> list[st
 
 async def _process_order_items(db: Any, notification_service: Any, results: JsonDict) -> None:
     """Process pending order items for delivery."""
+    from core.idempotency import (
+        WORKER_DELIVER_GOODS,
+        IdempotencyInProgressError,
+        delivery_is_final,
+        get_idempotency_ledger,
+        run_idempotent,
+    )
     from core.routers.workers import _deliver_items_for_order
 
     # Get order_ids that are NOT from discount channel
@@ -80,11 +87,26 @@ async def _process_order_items(db: Any, notification_service: Any, results: Json
     order_ids = list(set(_extract_order_ids_from_response(open_items.data)))
     results["order_items"]["processed"] = len(order_ids)
 
+    ledger = get_idempotency_ledger(db)
     for oid in order_ids:
         try:
-            res = await _deliver_items_for_order(db, notification_service, oid, only_instant=False)
+            # Shares the /deliver-goods claim: an order QStash is delivering right
+            # now is skipped. The order still has open items, so any recorded
+            # outcome is stale (replay=False).
+            res = await run_idempotent(
+                ledger,
+                WORKER_DELIVER_GOODS,
+                str(oid),
+                lambda oid=oid: _deliver_items_for_order(
+                    db, notification_service, oid, only_instant=False
+                ),
+                is_final=delivery_is_final,
+                replay=False,
+            )
             if res.get("delivered", 0) > 0:
                 results["order_items"]["delivered"] += res["delivered"]
+        except IdempotencyInProgressError:
+            results["order_items"]["in_progress"] = results["order_items"].get("in_progress", 0) + 1
         except Exception:
             logger.exception("auto_alloc: Failed to deliver order %s", oid)
 
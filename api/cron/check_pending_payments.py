@@ -22,6 +22,7 @@ from fastapi.responses import JSONResponse
 from starlette.responses import Response
 
 from core.logging import get_logger
+from core.orders.list_cache import invalidate_orders_lists_for
 from core.services.database import get_database_async
 
 logger = get_logger(__name__)
@@ -172,7 +173,10 @@ async def _process_premium_order(order_id: str) -> None:
 async def process_paid_order(db: Any, order_id: str, order_data: dict[str, Any]) -> None:
     """Process a paid order - update status and schedule delivery."""
     try:
-        await db.client.table("orders").update({"status": "paid"}).eq("id", order_id).execute()
+        result = (
+            await db.client.table("orders").update({"status": "paid"}).eq("id", order_id).execute()
+        )
+        await invalidate_orders_lists_for(result.data)
         logger.info(f"Order {order_id} marked as paid via polling")
 
         if order_data.get("source_channel") == "discount":
@@ -198,12 +202,13 @@ async def _process_invoice_state(
         return True
 
     if state in ["cancelled", "failed"]:
-        await (
+        result = await (
             db.client.table("orders")
             .update({"status": "cancelled", "notes": f"Payment {state}"})
             .eq("id", order_id_str)
             .execute()
         )
+        await invalidate_orders_lists_for(result.data)
         logger.info(f"Order {order_id_str} marked as cancelled (invoice {state})")
 
     return False
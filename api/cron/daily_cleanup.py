@@ -6,10 +6,13 @@ Tasks:
 2. Clear old chat history (older than 30 days)
 3. Clean up expired promo codes
 4. Release stuck stock reservations
+5. Reconcile user_analytics_summary drift (batched, resumable)
+6. Drop expired idempotency ledger rows
 """
 
 import os
 import sys
+import time
 from datetime import UTC, datetime, timedelta
 from pathlib import Path
 from typing import Any
@@ -30,6 +33,11 @@ CRON_SECRET = os.environ.get("CRON_SECRET", "")
 # ASGI app (only export app to Vercel, avoid 'handler' symbol)
 app = FastAPI()
 
+# Analytics reconcile: rows per RPC call and wall-clock budget per cron run
+ANALYTICS_RECONCILE_BATCH = 1000
+ANALYTICS_RECONCILE_BUDGET_SECS = 25
+ANALYTICS_RECONCILE_CURSOR_KEY = "cron:analytics_reconcile:cursor"
+
 
 async def _fix_inconsistent_order_statuses(db: Any, now: datetime) -> int:
     """Fix orders with inconsistent statuses.
@@ -79,7 +87,9 @@ async def _fix_inconsistent_order_statuses(db: Any, now: datetime) -> int:
 
         # BATCH UPDATE: Update all qualifying orders at once
         if orders_to_fix:
-            await (
+            from core.orders.list_cache import invalidate_orders_lists_for
+
+            fixed = await (
                 db.client.table("orders")
                 .update(
                     {"status": "delivered", "delivered_at": now.isoformat()},
@@ -88,6 +98,7 @@ async def _fix_inconsistent_order_statuses(db: Any, now: datetime) -> int:
                 .eq("status", "partial")
                 .execute()
             )
+            await invalidate_orders_lists_for(fixed.data)
 
         return len(orders_to_fix)
 
@@ -99,6 +110,61 @@ async def _fix_inconsistent_order_statuses(db: Any, now: datetime) -> int:
         return 0
 
 
+async def _reconcile_user_analytics(db: Any) -> int:
+    """Recompute user_analytics_summary in id-ordered batches within a time budget.
+
+    Triggers keep the summary current; this only repairs drift (manual SQL,
+    missed triggers). If the budget runs out, the last processed id is kept
+    in Redis and the next run continues from there.
+    """
+    redis = None
+    cursor: str | None = None
+    try:
+        from core.db import get_redis
+
+        redis = get_redis()
+        cursor = await redis.get(ANALYTICS_RECONCILE_CURSOR_KEY) or None
+    except Exception:
+        redis = None
+
+    processed_total = 0
+    deadline = time.monotonic() + ANALYTICS_RECONCILE_BUDGET_SECS
+    try:
+        while time.monotonic() < deadline:
+            processed, cursor = await db.reconcile_user_analytics_batch(
+                cursor, ANALYTICS_RECONCILE_BATCH
+            )
+            processed_total += processed
+            if processed < ANALYTICS_RECONCILE_BATCH:
+                cursor = None  # Full pass complete
+                break
+    except Exception as e:
+        import logging
+
+        logging.warning(f"Error reconciling user analytics: {e}")
+
+    if redis is not None:
+        try:
+            if cursor:
+                await redis.set(ANALYTICS_RECONCILE_CURSOR_KEY, cursor, ex=7 * 86400)
+            else:
+                await redis.delete(ANALYTICS_RECONCILE_CURSOR_KEY)
+        except Exception:
+            pass
+    return processed_total
+
+
+async def _reconcile_product_stats(db: Any) -> int:
+    """Recompute product_stats counters (triggers keep them current; this repairs drift)."""
+    try:
+        return await db.reconcile_product_stats()
+    except Exception as e:
+        import logging
+
+        logging.warning(f"Error reconciling product stats: {e}")
+        return 0
+
+
 @app.get("/api/cron/daily_cleanup")
 async def daily_cleanup_entrypoint(request: Request) -> Response:
     """Vercel Cron entrypoint for daily cleanup tasks."""
@@ -159,6 +225,34 @@ async def daily_cleanup_entrypoint(request: Request) -> Response:
         fixed_orders = await _fix_inconsistent_order_statuses(db, now)
         results["tasks"]["fixed_order_statuses"] = fixed_orders
 
+        # 6. Repair user analytics summary drift
+        results["tasks"]["reconciled_user_analytics"] = await _reconcile_user_analytics(db)
+
+        # 7. Repair product rating/sales counters drift
+        results["tasks"]["reconciled_product_stats"] = await _reconcile_product_stats(db)
+
+        # 8. Drop expired idempotency ledger rows (DB fallback; Redis keys expire by TTL)
+        expired_claims = (
+            await db.client.table("idempotency_ledger")
+            .delete()
+            .lt("expires_at", now.isoformat())
+            .execute()
+        )
+        results["tasks"]["expired_idempotency_claims"] = len(expired_claims.data or [])
+
+        # 9. Drop processed outbox events (failed ones are kept for manual replay)
+        from core.orders.outbox import DONE_RETENTION_DAYS
+
+        outbox_cutoff = now - timedelta(days=DONE_RETENTION_DAYS)
+        processed_events = (
+            await db.client.table("outbox_events")
+            .delete()
+            .eq("status", "done")
+            .lt("processed_at", outbox_cutoff.isoformat())
+            .execute()
+        )
+        results["tasks"]["deleted_outbox_events"] = len(processed_events.data or [])
+
         results["success"] = True
 
     except Exception as e:
@@ -441,12 +441,16 @@ async def deliver_discount_order(db: Any, order_id: str, order_data: dict[str, A
 
         # Only mark order as delivered if ALL items were successfully delivered
         if all_delivered:
-            await (
+            delivered = await (
                 db.client.table("orders")
                 .update({"status": "delivered", "delivered_at": datetime.now(UTC).isoformat()})
                 .eq("id", order_id)
                 .execute()
             )
+
+            from core.orders.list_cache import invalidate_orders_lists_for
+
+            await invalidate_orders_lists_for(delivered.data)
             logger.info(f"Discount order {order_id} delivered successfully via cron fallback")
             return True
 
@@ -5,10 +5,19 @@ Tasks:
 1. Send notifications to users who haven't been active for 7+ days
 2. Remind about items in wishlist
 3. Notify about expiring subscriptions
+
+Cohorts are processed in pages with concurrent, rate-limited sends and a
+resumable cursor (see "Cohort engine" below).
 """
 
+import asyncio
+import html
+import json
 import os
 import sys
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
 from pathlib import Path
 from typing import Any, cast
@@ -34,169 +43,286 @@ BOT_USERNAME = "pvndora_ai_bot"
 app = FastAPI()
 
 
-async def _send_telegram_message(telegram_id: int | str, message: str) -> bool:
-    """Send a message via Telegram Bot API."""
-    import httpx
+# ==================== Cohort engine ====================
+# Each task walks its cohort in id order (keyset pages), renders messages
+# through a per-run cache, sends a page concurrently under the bot's shared
+# rate limit and writes bookkeeping for the page in one UPDATE. If the time
+# budget runs out, the last processed id is kept in Redis and the next run
+# continues from there.
+#
+# A pass is anchored to the time it started: cohort windows are computed
+# from that anchor (stored with the cursor), not from the current run's
+# clock, so a resumed pass walks the same cohort and skips nobody.
+# Chats that answer 403 get users.bot_blocked_at (as broadcasts do) and
+# drop out of later cohorts.
 
-    try:
-        async with httpx.AsyncClient() as client:
-            await client.post(
-                f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage",
-                json={"chat_id": telegram_id, "text": message, "parse_mode": "HTML"},
-                timeout=10,
-            )
-        return True
-    except Exception as e:
-        logger.error(f"Failed to send to {telegram_id}: {e}", exc_info=True)
-        return False
+PAGE_SIZE = 200
+# Vercel cron limit is 60s; leave room for bookkeeping and the response
+RUN_BUDGET_SECS = 45
+CURSOR_KEY_PREFIX = "cron:reengagement:cursor:"
+CURSOR_TTL_SECS = 7 * 86400
 
 
-async def _process_inactive_users(db: Any, now: datetime) -> int:
-    """Send re-engagement messages to inactive users."""
-    from core.i18n import get_text
-
-    inactive_cutoff = now - timedelta(days=7)
-    max_inactive = now - timedelta(days=14)
-    reengagement_cutoff = now - timedelta(days=3)
-
-    inactive_users = (
-        await db.client.table("users")
-        .select("id,telegram_id,language_code,first_name,last_reengagement_at")
-        .lt("last_activity_at", inactive_cutoff.isoformat())
-        .gt("last_activity_at", max_inactive.isoformat())
-        .eq("do_not_disturb", False)
-        .eq("is_banned", False)
-        .limit(50)
-        .execute()
-    )
+@dataclass(slots=True)
+class _RunContext:
+    """State shared by the cohort tasks of one run."""
 
-    sent_count = 0
-    for user_raw in inactive_users.data or []:
-        if not isinstance(user_raw, dict):
-            continue
-        user = cast(dict[str, Any], user_raw)
+    db: Any
+    now: datetime
+    sender: Any  # TelegramBulkSender
+    renderer: "_Renderer"
+    redis: Any
+    deadline: float
 
-        # Skip if recently contacted
-        if _was_recently_contacted(user.get("last_reengagement_at"), reengagement_cutoff):
-            continue
 
-        lang = user.get("language_code", "en")
-        name = user.get("first_name", "")
-        message = get_text("reengagement_message", lang, name=name)
+class _Renderer:
+    """Renders each (key, language, params) combination once per run."""
 
-        if await _send_telegram_message(user["telegram_id"], message):
-            await (
-                db.client.table("users")
-                .update({"last_reengagement_at": now.isoformat()})
-                .eq("id", user["id"])
-                .execute()
-            )
-            sent_count += 1
+    def __init__(self) -> None:
+        self._cache: dict[tuple[str, str, tuple[tuple[str, Any], ...]], str] = {}
 
-    return sent_count
+    def render(self, key: str, lang: str | None, **params: Any) -> str:
+        from core.i18n import detect_language, get_text
 
+        lang = detect_language(lang)
+        cache_key = (key, lang, tuple(sorted(params.items())))
+        text = self._cache.get(cache_key)
+        if text is None:
+            text = self._cache[cache_key] = get_text(key, lang, **params)
+        return text
 
-def _was_recently_contacted(last_reengagement: str | None, cutoff: datetime) -> bool:
-    """Check if user was contacted within the cutoff period."""
-    if not last_reengagement:
-        return False
+
+async def _load_cursor(redis: Any, task: str) -> tuple[str, datetime] | None:
+    """(last processed id, pass anchor) of an unfinished pass."""
+    if redis is None:
+        return None
     try:
-        last_dt = datetime.fromisoformat(last_reengagement)
-        return last_dt > cutoff
-    except (ValueError, AttributeError):
-        return False
+        raw = await redis.get(f"{CURSOR_KEY_PREFIX}{task}")
+        if not raw:
+            return None
+        state = json.loads(raw)
+        return str(state["cursor"]), datetime.fromisoformat(state["anchor"])
+    except Exception:
+        return None
+
+
+async def _save_cursor(redis: Any, task: str, cursor: str | None, anchor: datetime) -> None:
+    if redis is None:
+        return
+    try:
+        if cursor:
+            state = json.dumps({"cursor": cursor, "anchor": anchor.isoformat()})
+            await redis.set(f"{CURSOR_KEY_PREFIX}{task}", state, ex=CURSOR_TTL_SECS)
+        else:
+            await redis.delete(f"{CURSOR_KEY_PREFIX}{task}")
+    except Exception as e:
+        logger.warning(f"reengagement: failed to save cursor for {task}: {e}")
 
 
-async def _process_wishlist_reminders(db: Any, now: datetime) -> int:
-    """Send reminders for old wishlist items."""
-    from core.i18n import get_text
-
-    wishlist_cutoff = now - timedelta(days=3)
-    wishlist_items = (
-        await db.client.table("wishlist")
-        .select("id,user_id,product_name,users(telegram_id,language_code)")
-        .eq("reminded", False)
-        .lt("created_at", wishlist_cutoff.isoformat())
-        .limit(50)
-        .execute()
+async def _mark_blocked(ctx: _RunContext) -> None:
+    """Persist bot_blocked_at for chats that answered 403 so far."""
+    blocked = list(ctx.sender.blocked)
+    if not blocked:
+        return
+    ctx.sender.blocked.difference_update(blocked)
+    try:
+        await (
+            ctx.db.client.table("users")
+            .update({"bot_blocked_at": ctx.now.isoformat()})
+            .in_("telegram_id", blocked)
+            .execute()
+        )
+    except Exception as e:
+        logger.warning(f"reengagement: failed to mark {len(blocked)} blocked users: {e}")
+
+
+async def _run_cohort(
+    ctx: _RunContext,
+    task: str,
+    fetch_page: Callable[[str | None, datetime], Awaitable[list[dict[str, Any]]]],
+    deliver_page: Callable[[list[dict[str, Any]]], Awaitable[int]],
+) -> int:
+    """Walk a cohort page by page until it is exhausted or the budget runs out.
+
+    fetch_page(cursor, anchor) must derive its time window from anchor.
+    """
+    state = await _load_cursor(ctx.redis, task)
+    cursor, anchor = state if state else (None, ctx.now)
+    sent_total = 0
+    while time.monotonic() < ctx.deadline:
+        rows = await fetch_page(cursor, anchor)
+        if rows:
+            sent_total += await deliver_page(rows)
+            await _mark_blocked(ctx)
+            cursor = str(rows[-1]["id"])
+        if len(rows) < PAGE_SIZE:
+            cursor = None  # Full pass complete
+            break
+    await _save_cursor(ctx.redis, task, cursor, anchor)
+    return sent_total
+
+
+def _page_query(query: Any, cursor: str | None) -> Any:
+    if cursor:
+        query = query.gt("id", cursor)
+    return query.order("id").limit(PAGE_SIZE)
+
+
+def _dict_rows(data: Any) -> list[dict[str, Any]]:
+    return [cast(dict[str, Any], row) for row in data or [] if isinstance(row, dict)]
+
+
+def _reachable(user: Any) -> bool:
+    """Embedded users row with a chat id that has not blocked the bot."""
+    return (
+        isinstance(user, dict) and bool(user.get("telegram_id")) and not user.get("bot_blocked_at")
     )
 
-    wishlist_sent = 0
-    for item_raw in wishlist_items.data or []:
-        if not isinstance(item_raw, dict):
-            continue
-        item = cast(dict[str, Any], item_raw)
-        user_data = item.get("users")
-        if not isinstance(user_data, dict):
-            continue
 
-        lang = user_data.get("language_code", "en")
-        message = get_text("wishlist_reminder", lang, product=item.get("product_name", ""))
+# ==================== Tasks ====================
+
 
-        if await _send_telegram_message(user_data["telegram_id"], message):
+async def _process_inactive_users(ctx: _RunContext) -> int:
+    """Send re-engagement messages to inactive users."""
+
+    async def fetch_page(cursor: str | None, anchor: datetime) -> list[dict[str, Any]]:
+        inactive_cutoff = anchor - timedelta(days=7)
+        max_inactive = anchor - timedelta(days=14)
+        reengagement_cutoff = anchor - timedelta(days=3)
+        query = (
+            ctx.db.client.table("users")
+            .select("id,telegram_id,language_code,first_name")
+            .lt("last_activity_at", inactive_cutoff.isoformat())
+            .gt("last_activity_at", max_inactive.isoformat())
+            .eq("do_not_disturb", False)
+            .eq("is_banned", False)
+            .is_("bot_blocked_at", "null")
+            # Skip users contacted recently
+            .or_(
+                f"last_reengagement_at.is.null,last_reengagement_at.lt.{reengagement_cutoff.isoformat()}"
+            )
+        )
+        return _dict_rows((await _page_query(query, cursor).execute()).data)
+
+    async def deliver_page(users: list[dict[str, Any]]) -> int:
+        users = [u for u in users if u.get("telegram_id")]
+        results = await ctx.sender.send_many(
+            [
+                (
+                    u["telegram_id"],
+                    ctx.renderer.render(
+                        "reengagement_message",
+                        u.get("language_code"),
+                        name=html.escape(u.get("first_name") or ""),
+                    ),
+                )
+                for u in users
+            ]
+        )
+        sent_ids = [u["id"] for u, ok in zip(users, results, strict=True) if ok]
+        if sent_ids:
             await (
-                db.client.table("wishlist")
-                .update({"reminded": True})
-                .eq("id", item["id"])
+                ctx.db.client.table("users")
+                .update({"last_reengagement_at": ctx.now.isoformat()})
+                .in_("id", sent_ids)
                 .execute()
             )
-            wishlist_sent += 1
+        return len(sent_ids)
 
-    return wishlist_sent
+    return await _run_cohort(ctx, "inactive_users", fetch_page, deliver_page)
 
 
-async def _process_expiring_subscriptions(db: Any, now: datetime) -> int:
-    """Notify users about expiring subscriptions."""
-    from core.i18n import get_text
-
-    expiry_window_start = now + timedelta(days=2)
-    expiry_window_end = now + timedelta(days=4)
+async def _process_wishlist_reminders(ctx: _RunContext) -> int:
+    """Send reminders for old wishlist items."""
 
-    expiring_items = (
-        await db.client.table("order_items")
-        .select(
-            "id,order_id,expires_at,products(name),orders(user_telegram_id,users(language_code))",
+    async def fetch_page(cursor: str | None, anchor: datetime) -> list[dict[str, Any]]:
+        wishlist_cutoff = anchor - timedelta(days=3)
+        query = (
+            ctx.db.client.table("wishlist")
+            .select("id,user_id,product_name,users(telegram_id,language_code,bot_blocked_at)")
+            .eq("reminded", False)
+            .lt("created_at", wishlist_cutoff.isoformat())
         )
-        .eq("status", "delivered")
-        .gte("expires_at", expiry_window_start.isoformat())
-        .lte("expires_at", expiry_window_end.isoformat())
-        .limit(50)
-        .execute()
-    )
+        return _dict_rows((await _page_query(query, cursor).execute()).data)
+
+    async def deliver_page(items: list[dict[str, Any]]) -> int:
+        items = [i for i in items if _reachable(i.get("users"))]
+        results = await ctx.sender.send_many(
+            [
+                (
+                    i["users"]["telegram_id"],
+                    ctx.renderer.render(
+                        "wishlist_reminder",
+                        i["users"].get("language_code"),
+                        product=i.get("product_name", ""),
+                    ),
+                )
+                for i in items
+            ]
+        )
+        sent_ids = [i["id"] for i, ok in zip(items, results, strict=True) if ok]
+        if sent_ids:
+            await (
+                ctx.db.client.table("wishlist")
+                .update({"reminded": True})
+                .in_("id", sent_ids)
+                .execute()
+            )
+        return len(sent_ids)
+
+    return await _run_cohort(ctx, "wishlist", fetch_page, deliver_page)
+
 
-    expiry_sent = 0
+async def _process_expiring_subscriptions(ctx: _RunContext) -> int:
+    """Notify users about expiring subscriptions (one message per user per run)."""
     notified_users: set[Any] = set()
 
-    for item_raw in expiring_items.data or []:
-        if not isinstance(item_raw, dict):
-            continue
-        item = cast(dict[str, Any], item_raw)
-
-        order_data = item.get("orders")
-        product_data = item.get("products")
-        if not isinstance(order_data, dict) or not isinstance(product_data, dict):
-            continue
-
-        telegram_id = order_data.get("user_telegram_id")
-        if not telegram_id or telegram_id in notified_users:
-            continue
-
-        days_left = _calculate_days_left(item.get("expires_at"), now)
-        user_data = order_data.get("users", {})
-        lang = user_data.get("language_code", "en") if isinstance(user_data, dict) else "en"
-
-        message = get_text(
-            "subscription_expiring",
-            lang,
-            product=product_data.get("name", ""),
-            days=days_left,
+    async def fetch_page(cursor: str | None, anchor: datetime) -> list[dict[str, Any]]:
+        expiry_window_start = anchor + timedelta(days=2)
+        expiry_window_end = anchor + timedelta(days=4)
+        query = (
+            ctx.db.client.table("order_items")
+            .select(
+                "id,order_id,expires_at,products(name),"
+                "orders(user_telegram_id,users(language_code,bot_blocked_at))",
+            )
+            .eq("status", "delivered")
+            .gte("expires_at", expiry_window_start.isoformat())
+            .lte("expires_at", expiry_window_end.isoformat())
         )
-
-        if await _send_telegram_message(telegram_id, message):
-            expiry_sent += 1
+        return _dict_rows((await _page_query(query, cursor).execute()).data)
+
+    async def deliver_page(items: list[dict[str, Any]]) -> int:
+        messages: list[tuple[Any, str]] = []
+        for item in items:
+            order_data = item.get("orders")
+            product_data = item.get("products")
+            if not isinstance(order_data, dict) or not isinstance(product_data, dict):
+                continue
+
+            telegram_id = order_data.get("user_telegram_id")
+            if not telegram_id or telegram_id in notified_users:
+                continue
             notified_users.add(telegram_id)
 
-    return expiry_sent
+            user_data = order_data.get("users")
+            if isinstance(user_data, dict) and user_data.get("bot_blocked_at"):
+                continue
+            lang = user_data.get("language_code") if isinstance(user_data, dict) else None
+            messages.append(
+                (
+                    telegram_id,
+                    ctx.renderer.render(
+                        "subscription_expiring",
+                        lang,
+                        product=product_data.get("name", ""),
+                        days=_calculate_days_left(item.get("expires_at"), ctx.now),
+                    ),
+                )
+            )
+        return sum(await ctx.sender.send_many(messages))
+
+    return await _run_cohort(ctx, "expiring", fetch_page, deliver_page)
 
 
 def _calculate_days_left(expires_at_str: str | None, now: datetime) -> int:
@@ -218,26 +344,39 @@ async def reengagement_entrypoint(request: Request) -> Response:
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
 
     from core.services.database import get_database_async
+    from core.services.telegram_messaging import TelegramBulkSender
 
     db = await get_database_async()
     now = datetime.now(UTC)
+    deadline = time.monotonic() + RUN_BUDGET_SECS
     results: dict[str, Any] = {"timestamp": now.isoformat(), "tasks": {}, "success": True}
 
+    redis = None
     try:
-        # 1. Inactive users
-        results["tasks"]["reengagement_sent"] = await _process_inactive_users(db, now)
-
-        # 2. Wishlist reminders
-        results["tasks"]["wishlist_reminders_sent"] = await _process_wishlist_reminders(db, now)
-
-        # 3. Expiring subscriptions
-        results["tasks"]["expiry_notifications_sent"] = await _process_expiring_subscriptions(
-            db,
-            now,
+        from core.db import get_redis
+
+        redis = get_redis()
+    except Exception:
+        logger.warning("reengagement: Redis unavailable, cursors will not persist")
+
+    renderer = _Renderer()
+    task_names = ("reengagement_sent", "wishlist_reminders_sent", "expiry_notifications_sent")
+    async with TelegramBulkSender(TELEGRAM_TOKEN) as sender:
+        # The three cohorts share the sender (and the bot's rate limit)
+        ctx = _RunContext(db, now, sender, renderer, redis, deadline)
+        outcomes = await asyncio.gather(
+            _process_inactive_users(ctx),
+            _process_wishlist_reminders(ctx),
+            _process_expiring_subscriptions(ctx),
+            return_exceptions=True,
         )
 
-    except Exception as e:
-        results["success"] = False
-        results["error"] = str(e)
+    for name, outcome in zip(task_names, outcomes, strict=True):
+        if isinstance(outcome, BaseException):
+            logger.error(f"reengagement: {name} failed: {outcome}", exc_info=outcome)
+            results["success"] = False
+            results.setdefault("errors", {})[name] = str(outcome)
+        else:
+            results["tasks"][name] = outcome
 
     return JSONResponse(results)
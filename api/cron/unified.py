@@ -4,7 +4,8 @@ Schedule: */5 * * * * (every 5 minutes).
 Tasks:
 1. Expire pending orders (payment timeout)
 2. Auto-allocate stock for paid orders
-3. Update exchange rates (hourly check)
+3. Drain the transactional outbox (payment side effects)
+4. Update exchange rates (hourly check)
 """
 
 import os
@@ -32,58 +33,35 @@ CRON_SECRET = os.environ.get("CRON_SECRET", "")
 app = FastAPI()
 
 
-async def _cancel_single_order(db: Any, order: Any) -> bool:
-    """Cancel a single expired/stale order. Returns True on success."""
-    try:
-        if order.stock_item_id:
-            await (
-                db.client.table("stock_items")
-                .update({"status": "available", "reserved_at": None})
-                .eq("id", order.stock_item_id)
-                .eq("status", "reserved")
-                .execute()
-            )
-
-        await (
-            db.client.table("orders")
-            .update({"status": "cancelled"})
-            .eq("id", order.id)
-            .eq("status", "pending")
-            .execute()
-        )
-        return True
-    except Exception:
-        logger.exception(f"Failed to cancel order {order.id}")
-        return False
-
-
 async def _expire_orders_task(db: Any, results: dict[str, Any]) -> None:
-    """Task 1: Expire pending orders."""
-    expired_orders = await db.orders_domain.get_pending_expired()
-    cancelled_count = 0
+    """Task 1: Expire pending orders (set-based, releases reserved stock)."""
+    from core.orders.expiry import expire_pending_orders
 
-    for order in expired_orders:
-        if await _cancel_single_order(db, order):
-            cancelled_count += 1
-            logger.info(f"Expired order {order.id}")
-
-    stale_orders = await db.orders_domain.get_pending_stale(minutes=15)
-    for order in stale_orders:
-        if await _cancel_single_order(db, order):
-            cancelled_count += 1
-            logger.info(f"Cancelled stale order {order.id}")
-
-    results["tasks"]["expired_orders"] = cancelled_count
+    expired = await expire_pending_orders(db)
+    results["tasks"]["expired_orders"] = expired["expired"] + expired["stale"]
 
 
 async def _auto_allocate_task(db: Any, results: dict[str, Any]) -> None:
-    """Task 2: Auto-allocate stock for paid orders."""
-    from core.services.domains.delivery import DeliveryService
+    """Task 2: Auto-allocate stock for paid orders.
+
+    Runs the shared delivery routine under the /deliver-goods idempotency
+    claim, so it can overlap with QStash deliveries of the same orders.
+    """
+    from core.idempotency import (
+        WORKER_DELIVER_GOODS,
+        IdempotencyInProgressError,
+        delivery_is_final,
+        get_idempotency_ledger,
+        run_idempotent,
+    )
+    from core.routers.deps import get_notification_service
+    from core.routers.workers import _deliver_items_for_order
 
-    delivery_service = DeliveryService(db)
+    notification_service = get_notification_service()
+    ledger = get_idempotency_ledger(db)
     paid_orders = (
         await db.client.table("orders")
-        .select("*")
+        .select("id")
         .eq("status", "paid")
         .is_("delivered_at", "null")
         .execute()
@@ -93,22 +71,36 @@ async def _auto_allocate_task(db: Any, results: dict[str, Any]) -> None:
     for order_data_raw in paid_orders.data or []:
         if not isinstance(order_data_raw, dict):
             continue
-        order_data = cast(dict[str, Any], order_data_raw)
-        order_id = order_data.get("id")
-
-        if order_data.get("status") != "paid":
-            continue
+        order_id = str(cast(dict[str, Any], order_data_raw).get("id"))
 
         try:
-            if await delivery_service.deliver_order(order_id):
+            res = await run_idempotent(
+                ledger,
+                WORKER_DELIVER_GOODS,
+                order_id,
+                lambda order_id=order_id: _deliver_items_for_order(
+                    db, notification_service, order_id, only_instant=False
+                ),
+                is_final=delivery_is_final,
+            )
+            if res.get("delivered", 0) > 0 and not res.get("idempotent_replay"):
                 allocated_count += 1
                 logger.info(f"Delivered order {order_id}")
+        except IdempotencyInProgressError:
+            logger.info(f"Order {order_id} is being delivered by a worker, skipping")
         except Exception:
             logger.exception(f"Failed to deliver order {order_id}")
 
     results["tasks"]["auto_allocated"] = allocated_count
 
 
+async def _drain_outbox_task(db: Any, results: dict[str, Any]) -> None:
+    """Task 3: Run outbox side effects a drain request did not pick up."""
+    from core.orders.outbox import drain_outbox
+
+    results["tasks"]["outbox"] = await drain_outbox(db)
+
+
 @app.get("/api/cron/unified")
 async def unified_cron_entrypoint(request: Request) -> Response:
     """Unified cron entrypoint - runs all critical tasks."""
@@ -136,7 +128,14 @@ async def unified_cron_entrypoint(request: Request) -> Response:
         results["tasks"]["auto_alloc_error"] = str(e)
         logger.exception("Auto-alloc task failed")
 
-    # Task 3: Exchange rates handled by separate cron
+    # Task 3: Outbox fallback (payment side effects)
+    try:
+        await _drain_outbox_task(db, results)
+    except Exception as e:
+        results["tasks"]["outbox_error"] = str(e)
+        logger.exception("Outbox drain task failed")
+
+    # Task 4: Exchange rates handled by separate cron
     results["tasks"]["exchange_rates_updated"] = "handled_by_separate_cron"
 
     results["success"] = True
@@ -57,7 +57,7 @@ try:
     from aiogram import Bot, Dispatcher
     from aiogram.client.default import DefaultBotProperties
     from aiogram.enums import ParseMode
-    from aiogram.fsm.storage.memory import MemoryStorage
+    from aiogram.fsm.storage.base import BaseStorage
     from aiogram.types import Update
     from fastapi import BackgroundTasks, FastAPI, Request
     from fastapi.middleware.cors import CORSMiddleware
@@ -69,6 +69,7 @@ try:
         ChannelSubscriptionMiddleware as DiscountChannelSubscriptionMiddleware,
     )
     from core.bot.discount import DiscountAuthMiddleware, TermsAcceptanceMiddleware, discount_router
+    from core.bot.fsm_storage import create_fsm_storage
     from core.bot.handlers import router as bot_router
     from core.bot.middlewares import (
         ActivityMiddleware,
@@ -94,6 +95,7 @@ try:
     from core.routers.admin.tickets import router as admin_tickets_router
     from core.routers.admin.users import router as admin_users_router
     from core.routers.admin.withdrawals import router as admin_withdrawals_router
+    from core.queue_backends import start_queue_backend, stop_queue_backend
     from core.routers.deps import shutdown_services
 
     # WebApp router - single unified router from __init__.py
@@ -134,6 +136,14 @@ class BotState:
     discount_dp: Dispatcher | None = None
     admin_bot: Bot | None = None
     admin_dp: Dispatcher | None = None
+    fsm_storage: BaseStorage | None = None
+
+
+def get_fsm_storage() -> BaseStorage:
+    """Get shared FSM storage (Upstash Redis, keyed per bot/chat/user)."""
+    if BotState.fsm_storage is None:
+        BotState.fsm_storage = create_fsm_storage()
+    return BotState.fsm_storage
 
 
 def get_bot() -> Bot | None:
@@ -149,7 +159,7 @@ def get_bot() -> Bot | None:
 def get_dispatcher() -> Dispatcher:
     """Get or create dispatcher instance."""
     if BotState.dp is None:
-        BotState.dp = Dispatcher()
+        BotState.dp = Dispatcher(storage=get_fsm_storage())
 
         # Register middlewares (order matters!)
         # Auth first, then subscription check, then language/activity
@@ -184,6 +194,12 @@ async def lifespan(_fastapi_app: FastAPI) -> Any:
         logger.error("Failed to initialize database: %s", err, exc_info=True)
         # Continue anyway - some endpoints may work without DB
 
+    # Queue backend (QUEUE_BACKEND=local|redis dispatch to this app in-process)
+    try:
+        await start_queue_backend(_fastapi_app)
+    except Exception as err:
+        logger.error("Failed to start queue backend: %s", err, exc_info=True)
+
     # Check Aikido Zen status (already initialized at module level)
     if AIKIDO_ZEN_AVAILABLE:
         logger.info("Aikido Zen Runtime Protection: ACTIVE")
@@ -204,6 +220,11 @@ async def lifespan(_fastapi_app: FastAPI) -> Any:
     yield
 
     # Shutdown
+    try:
+        await stop_queue_backend()
+    except Exception as err:
+        logger.warning("Failed to stop queue backend: %s", err, exc_info=True)
+
     try:
         await shutdown_services()
     except Exception as err:
@@ -220,6 +241,8 @@ async def lifespan(_fastapi_app: FastAPI) -> Any:
         await BotState.discount_bot.session.close()
     if BotState.admin_bot:
         await BotState.admin_bot.session.close()
+    if BotState.fsm_storage:
+        await BotState.fsm_storage.close()
 
 
 app = FastAPI(
@@ -258,7 +281,7 @@ except Exception as e:
 # Adds CSP, HSTS, X-Frame-Options, and other security headers
 app.add_middleware(SecurityHeadersMiddleware)
 
-# Rate Limiting Middleware - protects auth endpoints from brute force
+# Rate Limiting Middleware - per-route policies for auth, webapp, AI chat and webhooks
 # Uses Redis if available, falls back to in-memory cache
 try:
     from core.db import get_redis
@@ -405,7 +428,7 @@ def get_discount_bot() -> Bot | None:
 def get_discount_dispatcher() -> Dispatcher | None:
     """Get or create discount dispatcher instance."""
     if BotState.discount_dp is None and DISCOUNT_BOT_TOKEN:
-        BotState.discount_dp = Dispatcher()
+        BotState.discount_dp = Dispatcher(storage=get_fsm_storage())
 
         # Register middlewares (order matters!)
         BotState.discount_dp.message.middleware(DiscountAuthMiddleware())
@@ -514,7 +537,7 @@ def get_admin_bot() -> Bot | None:
 def get_admin_dispatcher() -> Dispatcher | None:
     """Get or create admin dispatcher instance."""
     if BotState.admin_dp is None and ADMIN_BOT_TOKEN:
-        BotState.admin_dp = Dispatcher(storage=MemoryStorage())
+        BotState.admin_dp = Dispatcher(storage=get_fsm_storage())
 
         # Register middleware - only admin auth required
         BotState.admin_dp.message.middleware(AdminAuthMiddleware())
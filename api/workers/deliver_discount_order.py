@@ -19,35 +19,31 @@ from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import JSONResponse
 
 from core.logging import get_logger
+from core.queue import QStashRoute
 
 logger = get_logger(__name__)
 
 app = FastAPI()
+# Ack redeliveries of already processed messages without re-running the worker
+app.router.route_class = QStashRoute
 
-QSTASH_CURRENT_SIGNING_KEY = os.environ.get("QSTASH_CURRENT_SIGNING_KEY", "")
-QSTASH_NEXT_SIGNING_KEY = os.environ.get("QSTASH_NEXT_SIGNING_KEY", "")
 TELEGRAM_TOKEN = os.environ.get("TELEGRAM_TOKEN", "")
 DISCOUNT_BOT_TOKEN = os.environ.get("DISCOUNT_BOT_TOKEN", TELEGRAM_TOKEN)
 
 
 def verify_qstash_signature(request: Request, body: bytes) -> bool:
-    """Verify QStash request signature."""
-    import hashlib
-    import hmac
+    """Verify QStash request signature (JWT, shared long-lived verifier)."""
+    from core.queue import QStashSignatureError, get_qstash_verifier, qstash_url_variants
 
-    signature = request.headers.get("Upstash-Signature", "")
-    if not signature:
+    try:
+        get_qstash_verifier().verify(
+            body, request.headers.get("Upstash-Signature", ""), qstash_url_variants(request)
+        )
+        return True
+    except QStashSignatureError as e:
+        logger.warning(f"QStash signature verification failed: {e}")
         return False
 
-    for key in [QSTASH_CURRENT_SIGNING_KEY, QSTASH_NEXT_SIGNING_KEY]:
-        if not key:
-            continue
-        expected = hmac.new(key.encode(), body, hashlib.sha256).hexdigest()
-        if hmac.compare_digest(signature, expected):
-            return True
-
-    return bool(not QSTASH_CURRENT_SIGNING_KEY and not QSTASH_NEXT_SIGNING_KEY)
-
 
 async def send_telegram_message(chat_id: int, text: str, token: str | None = None) -> bool:
     """Send a message via Telegram Bot API."""
@@ -108,13 +104,17 @@ async def _mark_order_delivered(
         .eq("id", order_item_id)
         .execute()
     )
-    await (
+    order_result = await (
         db.client.table("orders")
         .update({"status": "delivered", "delivered_at": now_iso})
         .eq("id", order_id)
         .execute()
     )
 
+    from core.orders.list_cache import invalidate_orders_lists_for
+
+    await invalidate_orders_lists_for(order_result.data)
+
 
 async def _get_user_info(db: Any, telegram_id: int) -> tuple[str | None, str]:
     """Get user_id and language. Returns (user_id, lang)."""
@@ -276,43 +276,25 @@ async def _send_loyal_promo_if_eligible(
         return False
 
 
-@app.post("/api/workers/deliver-discount-order")
-async def deliver_discount_order(request: Request) -> JSONResponse:
-    """Deliver a discount order after delay."""
-    body = await request.body()
-    if not verify_qstash_signature(request, body):
-        raise HTTPException(status_code=401, detail="Invalid signature")
-
-    try:
-        import json
-
-        payload = json.loads(body)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid JSON")
-
-    order_id = payload.get("order_id")
-    order_item_id = payload.get("order_item_id")
-    telegram_id = payload.get("telegram_id")
-    stock_item_id = payload.get("stock_item_id")
-
-    if not all([order_id, order_item_id, telegram_id, stock_item_id]):
-        return JSONResponse({"error": "Missing required fields"}, status_code=400)
-
-    from core.services.database import get_database_async
-
-    db = await get_database_async()
-
+async def _deliver(
+    db: Any,
+    order_id: str,
+    order_item_id: str,
+    telegram_id: int,
+    stock_item_id: str,
+) -> dict[str, Any]:
+    """Deliver the item and send follow-up messages. Errors are returned as {"error": ...}."""
     # 1. Validate order
     order_status = await _validate_order(db, order_id)
     if not order_status:
-        return JSONResponse({"error": "Order not found"}, status_code=404)
+        return {"error": "Order not found", "status_code": 404}
     if order_status != "paid":
-        return JSONResponse({"error": f"Order status is {order_status}, not paid", "skipped": True})
+        return {"error": f"Order status is {order_status}, not paid", "skipped": True}
 
     # 2. Get stock item
     stock_info = await _get_stock_item(db, stock_item_id)
     if not stock_info:
-        return JSONResponse({"error": "Stock item not found"}, status_code=404)
+        return {"error": "Stock item not found", "status_code": 404}
     content, product_name = stock_info
 
     # 3. Mark as delivered
@@ -337,11 +319,58 @@ async def deliver_discount_order(request: Request) -> JSONResponse:
     if purchase_count >= 3 and user_id:
         await _send_loyal_promo_if_eligible(user_id, telegram_id, lang, purchase_count)
 
-    return JSONResponse(
-        {
-            "success": True,
-            "order_id": order_id,
-            "telegram_id": telegram_id,
-            "delivered_at": datetime.now(UTC).isoformat(),
-        },
+    return {
+        "success": True,
+        "order_id": order_id,
+        "telegram_id": telegram_id,
+        "delivered_at": datetime.now(UTC).isoformat(),
+    }
+
+
+@app.post("/api/workers/deliver-discount-order")
+async def deliver_discount_order(request: Request) -> JSONResponse:
+    """Deliver a discount order after delay."""
+    body = await request.body()
+    if not verify_qstash_signature(request, body):
+        raise HTTPException(status_code=401, detail="Invalid signature")
+
+    try:
+        import json
+
+        payload = json.loads(body)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid JSON")
+
+    order_id = payload.get("order_id")
+    order_item_id = payload.get("order_item_id")
+    telegram_id = payload.get("telegram_id")
+    stock_item_id = payload.get("stock_item_id")
+
+    if not all([order_id, order_item_id, telegram_id, stock_item_id]):
+        return JSONResponse({"error": "Missing required fields"}, status_code=400)
+
+    from core.idempotency import (
+        WORKER_DISCOUNT_DELIVERY,
+        IdempotencyInProgressError,
+        get_idempotency_ledger,
+        run_idempotent,
+        success_is_final,
     )
+    from core.services.database import get_database_async
+
+    db = await get_database_async()
+
+    # One delivery (and one set of messages) per order item, even if redelivered
+    try:
+        result = await run_idempotent(
+            get_idempotency_ledger(db),
+            WORKER_DISCOUNT_DELIVERY,
+            str(order_item_id),
+            lambda: _deliver(db, order_id, order_item_id, telegram_id, stock_item_id),
+            is_final=success_is_final,
+        )
+    except IdempotencyInProgressError:
+        raise HTTPException(status_code=409, detail="Delivery already in progress")
+
+    status_code = result.pop("status_code", 200)
+    return JSONResponse(result, status_code=status_code)
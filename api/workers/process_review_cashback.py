@@ -20,35 +20,31 @@ DictStrAny = dict[str, Any]
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import JSONResponse
 
+from core.queue import QStashRoute
 from core.services.models import User
 
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
+# Ack redeliveries of already processed messages without re-running the worker
+app.router.route_class = QStashRoute
 
-QSTASH_CURRENT_SIGNING_KEY = os.environ.get("QSTASH_CURRENT_SIGNING_KEY", "")
-QSTASH_NEXT_SIGNING_KEY = os.environ.get("QSTASH_NEXT_SIGNING_KEY", "")
 TELEGRAM_TOKEN = os.environ.get("TELEGRAM_TOKEN", "")
 
 
 def verify_qstash_signature(request: Request, body: bytes) -> bool:
-    """Verify QStash request signature."""
-    import hashlib
-    import hmac
+    """Verify QStash request signature (JWT, shared long-lived verifier)."""
+    from core.queue import QStashSignatureError, get_qstash_verifier, qstash_url_variants
 
-    signature = request.headers.get("Upstash-Signature", "")
-    if not signature:
+    try:
+        get_qstash_verifier().verify(
+            body, request.headers.get("Upstash-Signature", ""), qstash_url_variants(request)
+        )
+        return True
+    except QStashSignatureError as e:
+        logger.warning(f"QStash signature verification failed: {e}")
         return False
 
-    for key in [QSTASH_CURRENT_SIGNING_KEY, QSTASH_NEXT_SIGNING_KEY]:
-        if not key:
-            continue
-        expected = hmac.new(key.encode(), body, hashlib.sha256).hexdigest()
-        if hmac.compare_digest(signature, expected):
-            return True
-
-    return bool(not QSTASH_CURRENT_SIGNING_KEY and not QSTASH_NEXT_SIGNING_KEY)
-
 
 async def _get_review(db: Any, order_id: str) -> dict[str, Any] | None:
     """Get review by order_id. Returns None if not found or already processed."""
@@ -191,47 +187,31 @@ async def _send_cashback_notification(
         logger.warning(f"Failed to send cashback notification: {e}")
 
 
-@app.post("/api/workers/process-review-cashback")
-async def process_review_cashback(request: Request) -> JSONResponse:
-    """Process 5% cashback for review."""
-    body = await request.body()
-    if not verify_qstash_signature(request, body):
-        raise HTTPException(status_code=401, detail="Invalid signature")
-
-    try:
-        payload = json.loads(body)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid JSON")
-
-    order_id = payload.get("order_id")
-    user_telegram_id = payload.get("user_telegram_id")
-    order_amount = payload.get("order_amount")
-
-    if not order_id:
-        return JSONResponse({"error": "order_id required"}, status_code=400)
-
-    from core.services.database import get_database_async
-
-    db = await get_database_async()
-
+async def _process_cashback(
+    db: Any,
+    order_id: str,
+    user_telegram_id: Any,
+    order_amount: Any,
+) -> dict[str, Any]:
+    """Validate, credit and notify. Errors are returned as {"error": ...}."""
     # 1. Get and validate review
     review = await _get_review(db, order_id)
     if not review:
-        return JSONResponse({"error": "Review not found for order"}, status_code=404)
+        return {"error": "Review not found for order"}
     if review.get("cashback_given"):
-        return JSONResponse({"skipped": True, "reason": "Cashback already processed"})
+        return {"skipped": True, "reason": "Cashback already processed"}
 
     # 2. Get user
     db_user = await db.get_user_by_telegram_id(user_telegram_id) if user_telegram_id else None
     if not db_user:
         db_user = await _get_user_from_order(db, order_id)
     if not db_user:
-        return JSONResponse({"error": "User not found"}, status_code=404)
+        return {"error": "User not found"}
 
     # 3. Get order amounts
     order_data = await _get_order_amounts(db, order_id)
     if not order_data:
-        return JSONResponse({"error": "Order not found"}, status_code=404)
+        return {"error": "Order not found"}
 
     # 4. Calculate cashback
     balance_currency = getattr(db_user, "balance_currency", "USD") or "USD"
@@ -263,4 +243,49 @@ async def process_review_cashback(request: Request) -> JSONResponse:
     logger.info(
         f"Cashback processed: user={db_user.telegram_id}, amount={cashback_amount} {balance_currency}",
     )
-    return JSONResponse({"success": True, "cashback": cashback_amount, "new_balance": new_balance})
+    return {"success": True, "cashback": cashback_amount, "new_balance": new_balance}
+
+
+@app.post("/api/workers/process-review-cashback")
+async def process_review_cashback(request: Request) -> JSONResponse:
+    """Process 5% cashback for review."""
+    body = await request.body()
+    if not verify_qstash_signature(request, body):
+        raise HTTPException(status_code=401, detail="Invalid signature")
+
+    try:
+        payload = json.loads(body)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid JSON")
+
+    order_id = payload.get("order_id")
+    user_telegram_id = payload.get("user_telegram_id")
+    order_amount = payload.get("order_amount")
+
+    if not order_id:
+        return JSONResponse({"error": "order_id required"}, status_code=400)
+
+    from core.idempotency import (
+        WORKER_REVIEW_CASHBACK,
+        IdempotencyInProgressError,
+        get_idempotency_ledger,
+        run_idempotent,
+        success_is_final,
+    )
+    from core.services.database import get_database_async
+
+    db = await get_database_async()
+
+    # Same ledger key as the /api/workers router - a cashback is credited once
+    try:
+        result = await run_idempotent(
+            get_idempotency_ledger(db),
+            WORKER_REVIEW_CASHBACK,
+            str(order_id),
+            lambda: _process_cashback(db, order_id, user_telegram_id, order_amount),
+            is_final=success_is_final,
+        )
+    except IdempotencyInProgressError:
+        raise HTTPException(status_code=409, detail="Cashback already in progress")
+
+    return JSONResponse(result, status_code=404 if "error" in result else 200)
@@ -198,7 +198,15 @@ def format_product_catalog(
         price_val = currency_service.get_anchor_price(p, currency)
         price_str = currency_service.format_price(price_val, currency)
 
-        entry = f"• {name} | {price_str} | ID: {pid}"
+        entry = f"• {name} | {price_str}"
+        # Social proof (precomputed counters on the product row)
+        rating_count = getattr(p, "rating_count", 0) or 0
+        if rating_count:
+            entry += f" | ★{getattr(p, 'rating_avg', 0):.1f} ({rating_count})"
+        sales_count = getattr(p, "sales_count", 0) or 0
+        if sales_count:
+            entry += f" | sold: {sales_count}"
+        entry += f" | ID: {pid}"
 
         if stock > 0:
             in_stock.append(f"✓ {entry}")
@@ -13,6 +13,9 @@ from .base import get_db, get_user_context
 
 logger = get_logger(__name__)
 
+# Products returned by search_products (hybrid search, best first)
+SEARCH_RESULTS_LIMIT = 10
+
 
 @tool
 async def get_catalog() -> dict[str, Any]:
@@ -81,8 +84,8 @@ async def get_catalog() -> dict[str, Any]:
 
 @tool
 async def search_products(query: str) -> dict[str, Any]:
-    """Search products by name or description.
-    Use when user asks about specific products.
+    """Search products by name, description or described need.
+    Use when user asks about specific products or what fits a task.
     Prices are automatically converted to user's currency.
 
     Args:
@@ -95,10 +98,11 @@ async def search_products(query: str) -> dict[str, Any]:
     try:
         from core.db import get_redis
         from core.services.currency import get_currency_service
+        from core.services.domains import CatalogService
 
         db = get_db()
         ctx = get_user_context()
-        products = await db.search_products(query)
+        products = await CatalogService(db).search(query, limit=SEARCH_RESULTS_LIMIT)
 
         redis = get_redis()
         currency_service = get_currency_service(redis)
@@ -63,83 +63,27 @@ async def _validate_and_prepare_cart_items(
 ) -> tuple[Decimal, Decimal, Decimal, list[dict[str, Any]]]:
     """Validate cart items, calculate totals using Decimal, handle stock deficits.
     Calculates both USD total and Fiat total (using Anchor Prices).
-    """
-    total_amount_usd = Decimal(0)
-    total_original_usd = Decimal(0)
-    total_fiat_amount = Decimal(0)
-    prepared_items = []
-
-    for item in cart_items:
-        product = await db.get_product_by_id(item.product_id)
-        if not product:
-            msg = f"Product {item.product_id} not found"
-            raise ValueError(msg)
-
-        # Check instant availability
-        instant_q = item.instant_quantity
-        if instant_q > 0:
-            available_stock = await db.get_available_stock_count(item.product_id)
-            if available_stock < instant_q:
-                logger.warning(
-                    f"Stock changed for {product.name}. Requested {instant_q}, available {available_stock}",
-                )
-                # Convert deficit to prepaid
-                deficit = instant_q - available_stock
-                item.instant_quantity = max(0, available_stock)
-                item.prepaid_quantity += max(0, deficit)
-
-        # --- Pricing Logic ---
-
-        # 1. USD Calculations (Base)
-        product_price_usd = to_decimal(product.price)
-        original_price_usd = multiply(product_price_usd, item.quantity)
-
-        # 2. Fiat Calculations (Anchor)
-        # This uses prices['RUB'] if available, else converts from USD
-        anchor_price = curr_service.get_anchor_price(product, target_curr)
-        product_price_fiat = to_decimal(anchor_price)
-        original_price_fiat = multiply(product_price_fiat, item.quantity)
-
-        # Apply discounts
-        discount_percent = item.discount_percent
-        if cart.promo_code and cart.promo_discount_percent > 0:
-            discount_percent = max(discount_percent, cart.promo_discount_percent)
-        if partner_discount > 0:
-            discount_percent = max(discount_percent, partner_discount)
-
-        discount_percent = max(0, min(100, discount_percent))
-
-        # Calculate multiplier: (1 - discount/100)
-        discount_multiplier = subtract(
-            Decimal(1),
-            divide(to_decimal(discount_percent), Decimal(100)),
-        )
-
-        # Final prices
-        final_price_usd = round_money(multiply(original_price_usd, discount_multiplier))
-        final_price_fiat = round_money(multiply(original_price_fiat, discount_multiplier))
-
-        # For integer currencies, round fiat amount to int
-        if target_curr in ["RUB", "UAH", "TRY", "INR"]:
-            final_price_fiat = round_money(final_price_fiat, to_int=True)
 
-        total_amount_usd += final_price_usd
-        total_original_usd += original_price_usd
-        total_fiat_amount += final_price_fiat
+    Same pricing as WebApp checkout (core.cart.pricing), one query for the whole cart.
+    """
+    from core.cart.pricing import CartProductNotFoundError, load_cart_products, price_cart
 
-        prepared_items.append(
-            {
-                "product_id": item.product_id,
-                "product_name": product.name,
-                "quantity": item.quantity,
-                "instant_quantity": item.instant_quantity,
-                "prepaid_quantity": item.prepaid_quantity,
-                "amount": final_price_usd,  # Store USD amount in order_items for consistency
-                "original_price": original_price_usd,
-                "discount_percent": discount_percent,
-            },
+    products = await load_cart_products(db, [item.product_id for item in cart_items])
+    promo_discount = (
+        cart.promo_discount_percent if cart.promo_code and cart.promo_discount_percent > 0 else 0
+    )
+    try:
+        pricing = price_cart(
+            cart_items,
+            products,
+            promo_discount=promo_discount,
+            partner_discount=partner_discount,
+            target_currency=target_curr,
+            currency_service=curr_service,
         )
-    return total_amount_usd, total_original_usd, total_fiat_amount, prepared_items
+    except CartProductNotFoundError as e:
+        raise ValueError(str(e)) from e
+    return pricing.total_usd, pricing.original_usd, pricing.total_fiat, pricing.lines
 
 
 # Helper: Process external payment (reduces cognitive complexity)
@@ -194,6 +138,10 @@ async def _process_external_payment(
                 .execute()
             )
 
+            from core.orders.list_cache import invalidate_orders_list
+
+            await invalidate_orders_list(str(ctx.user_id))
+
         # Apply promo code and clear cart
         if cart.promo_code:
             await db.use_promo_code(cart.promo_code)
@@ -298,6 +246,10 @@ async def _create_order_with_currency_snapshot(
         msg = "Failed to create order items. Please try again."
         raise ValueError(msg)
 
+    from core.orders.list_cache import invalidate_orders_list
+
+    await invalidate_orders_list(str(user_id))
+
     return order, order_id
 
 
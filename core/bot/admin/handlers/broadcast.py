@@ -122,8 +122,12 @@ async def queue_broadcast_batches(
     recipients: list[dict[str, Any]],
     target_bot: str,
 ) -> tuple[int, list[int]]:
-    """Queue broadcast batches to QStash (reduces cognitive complexity)."""
-    from core.queue import WorkerEndpoints, publish_to_worker
+    """Queue broadcast batches to QStash (reduces cognitive complexity).
+
+    All batches go out through the QStash batch API (a few HTTP requests
+    for any audience size).
+    """
+    from core.queue import QStashMessage, WorkerEndpoints, publish_batch
 
     user_batches = []
     qstash_batch_size = 80
@@ -132,42 +136,36 @@ async def queue_broadcast_batches(
         user_ids = [str(u["id"]) for u in batch]
         user_batches.append(user_ids)
 
-    queued_count = 0
-    failed_queues = []
-
     logger.info("Broadcast %s: Queueing %s batches to QStash...", broadcast_id, len(user_batches))
 
-    for batch_idx, user_ids in enumerate(user_batches):
-        try:
-            qstash_result = await publish_to_worker(
-                endpoint=WorkerEndpoints.SEND_BROADCAST,
-                body={
-                    "broadcast_id": broadcast_id,
-                    "user_ids": user_ids,
-                    "target_bot": target_bot,
-                },
-                retries=2,
-                deduplication_id=f"broadcast_{broadcast_id}_batch_{batch_idx}",
-            )
-            if qstash_result.get("queued"):
-                queued_count += 1
-                logger.info(
-                    "Broadcast %s: Batch %s queued, msg_id=%s",
-                    broadcast_id,
-                    batch_idx + 1,
-                    qstash_result.get("message_id"),
-                )
-            else:
-                failed_queues.append(batch_idx + 1)
-                logger.error(
-                    "Broadcast %s: Batch %s FAILED: %s",
-                    broadcast_id,
-                    batch_idx + 1,
-                    qstash_result.get("error"),
-                )
-        except Exception:
+    messages = [
+        QStashMessage(
+            endpoint=WorkerEndpoints.SEND_BROADCAST,
+            body={
+                "broadcast_id": broadcast_id,
+                "user_ids": user_ids,
+                "target_bot": target_bot,
+            },
+            retries=2,
+            deduplication_id=f"broadcast_{broadcast_id}_batch_{batch_idx}",
+        )
+        for batch_idx, user_ids in enumerate(user_batches)
+    ]
+    results = await publish_batch(messages)
+
+    queued_count = 0
+    failed_queues = []
+    for batch_idx, qstash_result in enumerate(results):
+        if qstash_result.get("queued"):
+            queued_count += 1
+        else:
             failed_queues.append(batch_idx + 1)
-            logger.exception("Broadcast %s: Batch %s EXCEPTION", broadcast_id, batch_idx + 1)
+            logger.error(
+                "Broadcast %s: Batch %s FAILED: %s",
+                broadcast_id,
+                batch_idx + 1,
+                qstash_result.get("error"),
+            )
 
     logger.info(
         "Broadcast %s: %s/%s batches queued successfully",
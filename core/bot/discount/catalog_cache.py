@@ -0,0 +1,184 @@
+"""Shared discount catalog snapshot.
+
+One read-only snapshot of the discount catalog per instance, rebuilt at most
+once per CATALOG_TTL_SECS (single-flight). Each rebuild gets a new version.
+The snapshot carries precomputed indexes, so browsing costs no DB queries
+once it is warm:
+- category -> products
+- sorted short-ID index (UUID hex without dashes), searched with bisect
+  because callback data only carries the first 8 chars of an id
+
+Insurance options shown on product cards are cached per product in a
+bounded LRU that is dropped together with the snapshot it belongs to.
+"""
+
+import asyncio
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from core.logging import get_logger
+
+if TYPE_CHECKING:
+    from core.services.database import Database
+    from core.services.domains.insurance import InsuranceOption
+
+logger = get_logger(__name__)
+
+# How long a snapshot is served before the next access rebuilds it
+CATALOG_TTL_SECS = 60
+
+# Max products with cached insurance options per snapshot
+MAX_INSURANCE_ENTRIES = 500
+
+_PRODUCT_COLUMNS = "id, name, description, discount_price, categories, status, stock_count"
+
+
+def _normalize_id(value: str) -> str:
+    return value.lower().replace("-", "")
+
+
+def _find_prefix(sorted_keys: list[str], prefix: str) -> int | None:
+    """Index of the first key starting with prefix (O(log n)), or None."""
+    if not prefix:
+        return None
+    pos = bisect_left(sorted_keys, prefix)
+    if pos < len(sorted_keys) and sorted_keys[pos].startswith(prefix):
+        return pos
+    return None
+
+
+@dataclass(slots=True)
+class CatalogSnapshot:
+    """Read-only view of active discount products with lookup indexes."""
+
+    version: int
+    loaded_at: float
+    products: list[dict[str, Any]]
+    by_category: dict[str, list[dict[str, Any]]]
+    categories: list[str]  # Sorted
+    short_ids: list[str]  # Sorted normalized ids
+    by_short_id: dict[str, dict[str, Any]]
+    insurance: OrderedDict[str, list["InsuranceOption"]] = field(default_factory=OrderedDict)
+
+    @classmethod
+    def build(cls, version: int, products: list[dict[str, Any]]) -> "CatalogSnapshot":
+        by_category: dict[str, list[dict[str, Any]]] = {}
+        by_short_id: dict[str, dict[str, Any]] = {}
+        for p in products:
+            p["available_count"] = p.get("stock_count", 0) or 0
+            by_short_id[_normalize_id(str(p["id"]))] = p
+            for cat in p.get("categories") or []:
+                if cat:
+                    by_category.setdefault(str(cat), []).append(p)
+        return cls(
+            version=version,
+            loaded_at=time.monotonic(),
+            products=products,
+            by_category=by_category,
+            categories=sorted(by_category),
+            short_ids=sorted(by_short_id),
+            by_short_id=by_short_id,
+        )
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() - self.loaded_at > CATALOG_TTL_SECS
+
+    def find_product(self, short_id: str) -> dict[str, Any] | None:
+        """Find product by id prefix (callback data carries the first 8 chars)."""
+        pos = _find_prefix(self.short_ids, _normalize_id(short_id))
+        return None if pos is None else self.by_short_id[self.short_ids[pos]]
+
+    def resolve_category(self, category: str | None) -> str | None:
+        """Resolve a (possibly truncated) category from callback data to its full name."""
+        if not category or category == "all":
+            return None
+        if category in self.by_category:
+            return category
+        pos = _find_prefix(self.categories, category)
+        return None if pos is None else self.categories[pos]
+
+    def products_for(self, category: str | None) -> list[dict[str, Any]]:
+        """Products of a category ("all"/None = whole catalog)."""
+        if not category or category == "all":
+            return self.products
+        resolved = self.resolve_category(category)
+        return self.by_category.get(resolved, []) if resolved else []
+
+
+_snapshot: CatalogSnapshot | None = None
+_version = 0
+_lock: asyncio.Lock | None = None  # Lazy: created inside the running loop
+
+
+def _get_lock() -> asyncio.Lock:
+    global _lock
+    if _lock is None:
+        _lock = asyncio.Lock()
+    return _lock
+
+
+async def _load_products(db: "Database") -> list[dict[str, Any]]:
+    """Load active discount products (products_with_stock_summary, single query)."""
+    result = (
+        await db.client.table("products_with_stock_summary")
+        .select(_PRODUCT_COLUMNS)
+        .eq("status", "active")
+        .not_.is_("discount_price", "null")
+        .execute()
+    )
+    return [p for p in result.data or [] if isinstance(p, dict)]
+
+
+async def get_catalog_snapshot(db: "Database") -> CatalogSnapshot:
+    """Return the current snapshot, rebuilding it if missing or expired.
+
+    Concurrent callers share one rebuild. If a rebuild fails, the previous
+    snapshot keeps being served (and retried on the next access).
+    """
+    global _snapshot, _version
+    snapshot = _snapshot
+    if snapshot is not None and not snapshot.expired:
+        return snapshot
+
+    async with _get_lock():
+        snapshot = _snapshot
+        if snapshot is not None and not snapshot.expired:
+            return snapshot
+        try:
+            products = await _load_products(db)
+        except Exception:
+            logger.exception("Failed to load discount catalog")
+            if snapshot is not None:
+                return snapshot
+            return CatalogSnapshot.build(_version, [])
+        _version += 1
+        _snapshot = CatalogSnapshot.build(_version, products)
+        logger.debug(f"Discount catalog snapshot v{_version}: {len(products)} products")
+        return _snapshot
+
+
+def invalidate_catalog() -> None:
+    """Drop the snapshot (next access reloads)."""
+    global _snapshot
+    _snapshot = None
+
+
+async def get_insurance_options(db: "Database", product_id: str) -> list["InsuranceOption"]:
+    """Insurance options for a product, cached for the lifetime of the snapshot."""
+    from core.services.domains import InsuranceService
+
+    snapshot = await get_catalog_snapshot(db)
+    cached = snapshot.insurance.get(product_id)
+    if cached is not None:
+        snapshot.insurance.move_to_end(product_id)
+        return cached
+
+    options = await InsuranceService(db.client).get_options_for_product(product_id)
+    snapshot.insurance[product_id] = options
+    while len(snapshot.insurance) > MAX_INSURANCE_ENTRIES:
+        snapshot.insurance.popitem(last=False)
+    return options
@@ -1,6 +1,6 @@
 """Discount bot catalog handlers."""
 
-from typing import TYPE_CHECKING, Any, cast
+from typing import TYPE_CHECKING, Any
 
 from aiogram import F, Router
 
@@ -9,18 +9,15 @@ if TYPE_CHECKING:
 from aiogram.enums import ParseMode
 from aiogram.types import CallbackQuery, Message
 
+from core.bot.discount.catalog_cache import get_catalog_snapshot, get_insurance_options
 from core.bot.discount.keyboards import get_product_card_keyboard, get_products_keyboard
 from core.logging import get_logger
 from core.services.database import User, get_database
-from core.services.domains import InsuranceService
 
 logger = get_logger(__name__)
 
 router = Router(name="discount_catalog")
 
-# Cache for pagination
-_products_cache: dict[str, Any] = {}
-
 
 async def get_user_currency_info(db_user: User) -> tuple[str, float]:
     """Get user currency and exchange rate."""
@@ -53,97 +50,39 @@ async def get_user_currency_info(db_user: User) -> tuple[str, float]:
 
 
 async def get_unique_categories(db: "Database") -> list[dict[str, str]]:
-    """Extract unique categories from products with discount_price.
-
-    Uses products_with_stock_summary VIEW for consistency with other queries.
-    """
-    try:
-        result = (
-            await db.client.table("products_with_stock_summary")
-            .select("categories")
-            .eq("status", "active")
-            .not_.is_("discount_price", "null")
-            .execute()
-        )
-
-        # Extract unique categories from all products
-        all_categories = set()
-        for product in result.data or []:
-            cats = product.get("categories") or []
-            for cat in cats:
-                if cat:
-                    all_categories.add(cat)
-
-        # Sort and return as list of dicts for compatibility
-        sorted_categories: list[str] = sorted([str(cat) for cat in all_categories if cat])
-        return [{"id": cat, "name": cat} for cat in sorted_categories]
-    except Exception:
-        logger.exception("Failed to get categories")
-        return []
+    """Unique categories of discount products (from the shared catalog snapshot)."""
+    snapshot = await get_catalog_snapshot(db)
+    return [{"id": cat, "name": cat} for cat in snapshot.categories]
 
 
 async def get_all_discount_products(db: "Database") -> list[dict[str, Any]]:
     """Get all products with discount_price.
 
-    Uses products_with_stock_summary VIEW to eliminate N+1 queries.
-    Single query returns products with aggregated stock counts.
+    Served from the shared catalog snapshot (products_with_stock_summary VIEW,
+    reloaded at most once per CATALOG_TTL_SECS). Returned dicts are shared -
+    do not mutate them.
     """
-    try:
-        # Use VIEW for aggregated stock data (no N+1!)
-        result = (
-            await db.client.table("products_with_stock_summary")
-            .select("id, name, description, discount_price, categories, status, stock_count")
-            .eq("status", "active")
-            .not_.is_("discount_price", "null")
-            .execute()
-        )
-
-        products = result.data or []
-
-        # Map stock_count to available_count for compatibility
-        result_list: list[dict[str, Any]] = []
-        for p in products:
-            if isinstance(p, dict):
-                p["available_count"] = p.get("stock_count", 0) or 0
-                result_list.append(p)
-
-        return result_list
-    except Exception:
-        logger.exception("Failed to get products")
-        return []
+    snapshot = await get_catalog_snapshot(db)
+    return snapshot.products
 
 
 async def get_products_by_category(db, category_name: str | None = None) -> list:
-    """Get products with discount_price, optionally filtered by category."""
-    products = await get_all_discount_products(db)
-
-    if category_name and category_name != "all":
-        # Filter by category (categories is an array field)
-        products = [p for p in products if category_name in (p.get("categories") or [])]
+    """Get products with discount_price, optionally filtered by category.
 
-    return products
+    Category may be truncated (callback data carries only 8 chars).
+    """
+    snapshot = await get_catalog_snapshot(db)
+    return snapshot.products_for(category_name)
 
 
 async def get_product_by_id(db: "Database", product_id: str) -> dict[str, Any] | None:
-    """Get single product by short ID (first 8 chars of UUID)."""
-    try:
-        # Get all discount products and filter by prefix
-        # Note: .ilike() doesn't work with UUID fields in Supabase PostgREST
-        all_products = await get_all_discount_products(db)
-
-        # Filter by UUID prefix (first 8 chars)
-        product = None
-        for p in all_products:
-            if str(p["id"]).startswith(product_id.lower()) or str(p["id"]).startswith(
-                product_id.upper(),
-            ):
-                product = cast(dict[str, Any], p)
-                break
+    """Get single product by short ID (first 8 chars of UUID).
 
-        return product
-    except Exception:
-        logger.exception("Failed to get product")
-        return None
+    Binary search over the snapshot's sorted id index - no DB query.
+    Note: .ilike() doesn't work with UUID fields in Supabase PostgREST.
+    """
+    snapshot = await get_catalog_snapshot(db)
+    return snapshot.find_product(product_id)
 
 
 @router.message(F.text.in_(["🛒 Каталог", "🛒 Catalog"]))
@@ -163,10 +102,6 @@ async def msg_catalog(message: Message, db_user: User) -> None:
         await message.answer(text)
         return
 
-    # Cache for pagination
-    cache_key = f"{db_user.telegram_id}:all"
-    _products_cache[cache_key] = products
-
     text = (
         ("🛒 <b>Каталог товаров:</b>\n\n🟢 — в наличии\n🟡 — предзаказ")
         if lang == "ru"
@@ -198,10 +133,6 @@ async def cb_catalog(callback: CallbackQuery, db_user: User) -> None:
 
     products = await get_all_discount_products(db)
 
-    # Cache for pagination
-    cache_key = f"{db_user.telegram_id}:all"
-    _products_cache[cache_key] = products
-
     text = (
         ("🛒 <b>Каталог товаров:</b>\n\n🟢 — в наличии\n🟡 — предзаказ")
         if lang == "ru"
@@ -235,15 +166,8 @@ async def cb_products_page(callback: CallbackQuery, db_user: User) -> None:
     page = int(parts[2])
     category_id = parts[3] if len(parts) > 3 else None
 
-    # Get from cache
-    cache_key = f"{db_user.telegram_id}:{category_id}"
-    products = _products_cache.get(cache_key, [])
-
-    if not products:
-        # Reload
-        db = get_database()
-        products = await get_products_by_category(db, category_id if category_id != "all" else None)
-        _products_cache[cache_key] = products
+    # Shared snapshot - no per-user cache, no DB query once warm
+    products = await get_products_by_category(get_database(), category_id)
 
     text = (
         ("🛒 <b>Товары:</b>\n\n🟢 — в наличии\n🟡 — предзаказ")
@@ -319,8 +243,7 @@ async def cb_product_selected(callback: CallbackQuery, db_user: User) -> None:
         )
         return
 
-    insurance_service = InsuranceService(db.client)
-    insurance_options = await insurance_service.get_options_for_product(product["id"])
+    insurance_options = await get_insurance_options(db, product["id"])
 
     name = product.get("name", "Product")
     description = product.get("description", "")
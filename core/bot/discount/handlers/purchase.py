@@ -17,6 +17,7 @@ if TYPE_CHECKING:
 from aiogram.enums import ParseMode
 from aiogram.types import CallbackQuery, Message
 
+from core.bot.discount.catalog_cache import get_catalog_snapshot
 from core.bot.discount.keyboards import (
     get_order_detail_keyboard,
     get_orders_keyboard,
@@ -26,6 +27,7 @@ from core.i18n import get_text
 
 # Removed unused imports: InsuranceService, DiscountOrderService
 from core.logging import get_logger
+from core.orders.list_cache import invalidate_orders_list
 from core.services.database import User, get_database
 
 from .catalog import get_user_currency_info
@@ -140,27 +142,28 @@ async def create_crystalpay_payment(
 
 
 async def get_product_by_short_id(db: "Database", short_id: str) -> dict[str, Any] | None:
-    """Get product by short ID (first 8 chars of UUID)."""
+    """Get product by short ID (first 8 chars of UUID).
+
+    The short ID is resolved through the shared catalog snapshot index, then
+    the full row is read fresh by primary key (prices must not be stale at
+    purchase time).
+    """
     try:
-        # Get all active products with discount_price (ilike doesn't work with UUID)
+        snapshot = await get_catalog_snapshot(db)
+        cached = snapshot.find_product(short_id)
+        if not cached:
+            return None
+
         result = (
             await db.client.table("products")
             .select("*")
+            .eq("id", cached["id"])
             .eq("status", "active")
             .not_.is_("discount_price", "null")
+            .limit(1)
             .execute()
         )
-
-        # Filter by UUID prefix (first 8 chars, case-insensitive)
-        products = result.data or []
-        short_id_lower = short_id.lower().replace("-", "")
-
-        for p in products:
-            product_uuid_str = str(p["id"]).lower().replace("-", "")
-            if product_uuid_str.startswith(short_id_lower):
-                return cast(DictStrAny, p)
-
-        return None
+        return cast(DictStrAny, result.data[0]) if result.data else None
     except Exception:
         logger.exception("Failed to get product by short ID")
         return None
@@ -278,6 +281,7 @@ async def _create_discount_order(
         .execute()
     )
 
+    await invalidate_orders_list(user_uuid)
     return order_id
 
 
@@ -435,6 +439,7 @@ async def cb_buy_product(callback: CallbackQuery, db_user: User) -> None:
             .eq("id", order_id)
             .execute()
         )
+        await invalidate_orders_list(user_uuid)
 
         # Format price in user's currency for display
         (
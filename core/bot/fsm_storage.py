@@ -0,0 +1,195 @@
+"""Upstash Redis FSM Storage for aiogram.
+
+Vercel routes consecutive updates of one chat to different instances, so
+FSM state must live in Redis, not in process memory.
+
+Layout: one hash per chat (RedisKeys.FSM) with fields
+- v: version token (random, rewritten on every write)
+- state: current state ("" = no state)
+- data: JSON-encoded FSM data
+
+Each instance keeps a bounded read cache of records. Reads send the cached
+version to a small Lua script that returns only "unchanged" when it still
+matches, so a cache hit costs one tiny round-trip and no payload transfer.
+Writes are one pipelined MULTI/EXEC (HGET v, HSET, EXPIRE) and update the
+cache in place when no other instance wrote in between.
+"""
+
+import json
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from core.db import TTL, RedisKeys, get_redis
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Max cached chats per instance (LRU-evicted beyond this)
+MAX_CACHED_RECORDS = 5000
+
+# Local entries older than this are dropped. Must stay below TTL.FSM so a
+# re-created record can never collide with a stale cached version.
+LOCAL_CACHE_TTL_SECS = 600
+
+# Returns 1 if the stored version equals ARGV[1], otherwise [v, state, data]
+# (empty array if the record does not exist).
+_READ_IF_CHANGED_SCRIPT = """
+local v = redis.call('HGET', KEYS[1], 'v')
+if v and v == ARGV[1] then return 1 end
+if not v then return {} end
+return redis.call('HMGET', KEYS[1], 'v', 'state', 'data')
+"""
+
+
+@dataclass(slots=True)
+class _Record:
+    version: str
+    state: str | None
+    data: dict[str, Any]
+    cached_at: float
+
+
+def build_fsm_key(key: StorageKey) -> str:
+    """Build Redis key for a chat's FSM record (bot_id keeps bots apart)."""
+    parts = [str(key.bot_id), str(key.chat_id), str(key.user_id)]
+    if key.thread_id:
+        parts.append(str(key.thread_id))
+    if key.business_connection_id:
+        parts.append(key.business_connection_id)
+    if key.destiny != "default":
+        parts.append(key.destiny)
+    return f"{RedisKeys.FSM}{':'.join(parts)}"
+
+
+class UpstashStorage(BaseStorage):
+    """aiogram FSM storage over the Upstash REST client."""
+
+    def __init__(self, redis: Any, ttl: int = TTL.FSM) -> None:
+        self.redis = redis
+        self.ttl = ttl
+        self._cache: OrderedDict[str, _Record] = OrderedDict()
+
+    # ==================== Local cache ====================
+
+    def _cached(self, redis_key: str) -> _Record | None:
+        record = self._cache.get(redis_key)
+        if record is None:
+            return None
+        if time.monotonic() - record.cached_at > LOCAL_CACHE_TTL_SECS:
+            del self._cache[redis_key]
+            return None
+        self._cache.move_to_end(redis_key)
+        return record
+
+    def _remember(self, redis_key: str, record: _Record) -> None:
+        self._cache[redis_key] = record
+        self._cache.move_to_end(redis_key)
+        while len(self._cache) > MAX_CACHED_RECORDS:
+            self._cache.popitem(last=False)
+
+    # ==================== Redis I/O ====================
+
+    async def _load(self, key: StorageKey) -> _Record:
+        """Load record, validating the local copy by version (one round-trip)."""
+        redis_key = build_fsm_key(key)
+        cached = self._cached(redis_key)
+        result = await self.redis.eval(
+            _READ_IF_CHANGED_SCRIPT,
+            keys=[redis_key],
+            args=[cached.version if cached else ""],
+        )
+        if result == 1 and cached is not None:
+            return cached
+
+        if not result:
+            record = _Record("", None, {}, time.monotonic())
+        else:
+            version, state, raw_data = [*result, None, None, None][:3]
+            try:
+                data = json.loads(raw_data) if raw_data else {}
+            except (TypeError, ValueError):
+                logger.warning(f"Corrupted FSM data in {redis_key}, resetting")
+                data = {}
+            record = _Record(str(version or ""), state or None, data, time.monotonic())
+        self._remember(redis_key, record)
+        return record
+
+    async def _write(self, key: StorageKey, fields: dict[str, str]) -> tuple[str, str]:
+        """Write fields with a new version token in one MULTI/EXEC round-trip.
+
+        Returns:
+            (previous version, new version)
+        """
+        redis_key = build_fsm_key(key)
+        version = uuid.uuid4().hex
+        tx = self.redis.multi()
+        tx.hget(redis_key, "v")
+        tx.hset(redis_key, values={**fields, "v": version})
+        tx.expire(redis_key, self.ttl)
+        previous, _, _ = await tx.exec()
+        return str(previous or ""), version
+
+    async def _write_through(
+        self, key: StorageKey, fields: dict[str, str], state: str | None, data: dict[str, Any]
+    ) -> None:
+        """Write one field and update the local copy.
+
+        The other half of the record (state or data) comes from the local
+        cache, so the local copy is kept only if nobody else wrote in between
+        (previous version equals the cached one); otherwise it is dropped.
+        """
+        redis_key = build_fsm_key(key)
+        cached = self._cached(redis_key)
+        previous, version = await self._write(key, fields)
+        if cached is not None and previous == cached.version:
+            self._remember(redis_key, _Record(version, state, data, time.monotonic()))
+        else:
+            self._cache.pop(redis_key, None)
+
+    # ==================== BaseStorage API ====================
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        new_state = state.state if isinstance(state, State) else state
+        cached = self._cached(build_fsm_key(key))
+        data = cached.data if cached else {}
+        await self._write_through(key, {"state": new_state or ""}, new_state, data)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return (await self._load(key)).state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        new_data = dict(data)
+        cached = self._cached(build_fsm_key(key))
+        state = cached.state if cached else None
+        await self._write_through(key, {"data": json.dumps(new_data)}, state, new_data)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        return dict((await self._load(key)).data)
+
+    async def close(self) -> None:
+        self._cache.clear()
+
+
+def create_fsm_storage() -> BaseStorage:
+    """Create Upstash-backed FSM storage, falling back to in-memory storage.
+
+    Falls back when Redis is not configured or only the lightweight REST
+    fallback client (no EVAL/MULTI support) is available.
+    """
+    try:
+        redis = get_redis()
+    except (ValueError, ImportError) as e:
+        logger.warning(f"FSM storage: Redis unavailable ({e}), using MemoryStorage")
+        return MemoryStorage()
+    if not hasattr(redis, "multi") or not hasattr(redis, "eval"):
+        logger.warning("FSM storage: Redis client lacks EVAL/MULTI, using MemoryStorage")
+        return MemoryStorage()
+    return UpstashStorage(redis)
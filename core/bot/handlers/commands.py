@@ -14,6 +14,7 @@ from core.bot.keyboards import get_product_keyboard
 from core.i18n import get_text
 from core.logging import get_logger
 from core.services.database import User, get_database
+from core.services.domains.referral import invalidate_referral_chain_dashboards
 
 if TYPE_CHECKING:
     from core.services.database import Database
@@ -52,6 +53,7 @@ async def _process_referral_from_start(message: Message, db_user: User, db: "Dat
                     .eq("id", db_user.id)
                     .execute()
                 )
+                await invalidate_referral_chain_dashboards(db, str(db_user.id))
         except Exception as e:
             logger.warning("Failed to process referral: %s", e, exc_info=True)
 
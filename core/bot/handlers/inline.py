@@ -16,11 +16,15 @@ from aiogram.types import (
 from core.bot.handlers.helpers import WEBAPP_URL
 from core.logging import get_logger
 from core.services.database import User, get_database
+from core.services.product_index import get_product_index
 
 logger = get_logger(__name__)
 
 router = Router()
 
+# Telegram accepts up to 50 inline results
+MAX_INLINE_RESULTS = 20
+
 
 @router.inline_query()
 async def handle_inline_query(query: InlineQuery, db_user: User, bot: Bot) -> None:
@@ -88,9 +92,13 @@ async def handle_inline_query(query: InlineQuery, db_user: User, bot: Bot) -> No
         # Search products to share
         try:
             db = get_database()
-            products = await db.search_products(query_text)
+            # Autocomplete from the in-memory index; DB full-text search covers descriptions
+            index = await get_product_index(db)
+            products = index.search(query_text, limit=MAX_INLINE_RESULTS)
+            if not products:
+                products = await db.search_products(query_text)
 
-            for product in products:
+            for product in products[:MAX_INLINE_RESULTS]:
                 # Use SHA256 for ID generation (MD5 is cryptographically insecure)
                 result_id = hashlib.sha256(f"{product.id}:{user_telegram_id}".encode()).hexdigest()[
                     :16
@@ -8,7 +8,7 @@ from typing import Any
 from core.services.money import divide, multiply, round_money, subtract, to_decimal
 
 
-@dataclass
+@dataclass(slots=True)
 class CartItem:
     """Single item in the cart."""
 
@@ -67,7 +67,7 @@ class CartItem:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class Cart:
     """Shopping cart containing multiple items."""
 
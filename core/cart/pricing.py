@@ -0,0 +1,165 @@
+"""Cart pricing engine.
+
+Checkout used to fetch each product and then COUNT its stock_items (two
+round-trips per distinct item), and the cart view fetched the products again.
+
+- load_cart_products: one .in_() query on products_with_stock_summary for
+  every product in the cart (prices and live stock_count together).
+- split_instant_prepaid / price_cart: pure functions over the loaded rows,
+  shared by the cart view, webapp checkout and the agent's checkout_cart tool.
+"""
+
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any
+
+from core.logging import get_logger
+from core.services.money import divide, multiply, round_money, subtract, to_decimal
+
+logger = get_logger(__name__)
+
+# Columns needed for pricing and display (products_with_stock_summary)
+CART_PRODUCT_COLUMNS = (
+    "id, name, price, msrp, status, stock_count, fulfillment_time_hours, image_url"
+)
+
+# Currencies displayed and charged in whole units
+INTEGER_CURRENCIES = frozenset({"RUB", "UAH", "TRY", "INR"})
+
+
+class CartProductNotFoundError(LookupError):
+    """A cart item references a product that no longer exists."""
+
+    def __init__(self, product_id: str) -> None:
+        super().__init__(f"Product {product_id} not found")
+        self.product_id = product_id
+
+
+@dataclass(slots=True)
+class CartPricing:
+    """Checkout totals and order lines for a cart."""
+
+    total_usd: Decimal = Decimal(0)
+    original_usd: Decimal = Decimal(0)
+    total_fiat: Decimal = Decimal(0)
+    lines: list[dict[str, Any]] = field(default_factory=list)
+
+
+# ==================== Loading ====================
+
+
+async def load_cart_products(db: Any, product_ids: list[str]) -> dict[str, dict[str, Any]]:
+    """Load products with live stock counts for all ids in one query."""
+    unique_ids = list(dict.fromkeys(product_ids))
+    if not unique_ids:
+        return {}
+    result = (
+        await db.client.table("products_with_stock_summary")
+        .select(CART_PRODUCT_COLUMNS)
+        .in_("id", unique_ids)
+        .execute()
+    )
+    return {row["id"]: row for row in result.data or []}
+
+
+# ==================== Pure pricing ====================
+
+
+def split_instant_prepaid(item: Any, stock_count: int) -> tuple[int, int]:
+    """Instant/prepaid split of a cart item against current stock.
+
+    Instant units that are no longer in stock move to prepaid.
+    """
+    instant = item.instant_quantity
+    prepaid = item.prepaid_quantity
+    available = max(0, int(stock_count or 0))
+    if instant > available:
+        prepaid += instant - available
+        instant = available
+    return instant, prepaid
+
+
+def effective_discount(item_discount: int, promo_discount: int, partner_discount: int) -> int:
+    """Best of item, cart promo and partner discounts, clamped to 0-100."""
+    return max(0, min(100, max(item_discount, promo_discount, partner_discount)))
+
+
+def _discounted_total(unit_price: Decimal, multiplier: Decimal, quantity: int, *, to_int: bool):
+    """Round the discounted unit price, then multiply by quantity."""
+    unit = round_money(multiply(unit_price, multiplier))
+    if to_int:
+        unit = round_money(unit, to_int=True)
+    return round_money(multiply(unit, quantity))
+
+
+def price_cart(
+    items: list[Any],
+    products: dict[str, dict[str, Any]],
+    *,
+    promo_discount: int,
+    partner_discount: int,
+    target_currency: str,
+    currency_service: Any,
+) -> CartPricing:
+    """Price cart items for checkout (no I/O).
+
+    Args:
+        items: CartItem objects
+        products: Rows from load_cart_products
+        promo_discount: Cart-wide promo percent (0 if none)
+        partner_discount: Referrer's partner discount percent (0 if none)
+        target_currency: Currency the order is charged in
+        currency_service: Provides anchor prices for target_currency
+
+    Raises:
+        CartProductNotFoundError: An item's product is missing
+
+    """
+    pricing = CartPricing()
+    to_int = target_currency in INTEGER_CURRENCIES
+
+    for item in items:
+        product = products.get(item.product_id)
+        if product is None:
+            raise CartProductNotFoundError(item.product_id)
+
+        instant, prepaid = split_instant_prepaid(item, product.get("stock_count", 0))
+        if instant != item.instant_quantity:
+            logger.warning(
+                f"Stock changed for {product.get('name')}. "
+                f"Requested {item.instant_quantity}, available {instant}"
+            )
+
+        price_usd = to_decimal(product.get("price") or 0)
+        msrp_usd = to_decimal(product["msrp"]) if product.get("msrp") else price_usd
+        original_usd = multiply(msrp_usd, item.quantity)
+        price_fiat = to_decimal(currency_service.get_anchor_price(product, target_currency))
+
+        discount = effective_discount(
+            int(item.discount_percent) if item.discount_percent else 0,
+            promo_discount,
+            partner_discount,
+        )
+        multiplier = subtract(Decimal(1), divide(to_decimal(discount), Decimal(100)))
+
+        amount_usd = _discounted_total(price_usd, multiplier, item.quantity, to_int=False)
+        amount_fiat = _discounted_total(price_fiat, multiplier, item.quantity, to_int=to_int)
+
+        pricing.total_usd += amount_usd
+        pricing.original_usd += original_usd
+        pricing.total_fiat += amount_fiat
+        pricing.lines.append(
+            {
+                "product_id": item.product_id,
+                "product_name": product.get("name") or item.product_name,
+                "quantity": item.quantity,
+                "instant_quantity": instant,
+                "prepaid_quantity": prepaid,
+                "amount": amount_usd,
+                "original_price": original_usd,
+                "discount_percent": discount,
+                "fulfillment_time_hours": product.get("fulfillment_time_hours") or 24,
+            }
+        )
+
+    return pricing
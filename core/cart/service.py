@@ -1,4 +1,13 @@
-"""Cart manager service using Redis storage."""
+"""Cart manager service using Redis storage.
+
+Carts are Redis hashes (layout in storage.py). Mutations are one atomic
+round-trip each and return the updated cart:
+- add_item: MULTI/EXEC with HINCRBY on the quantity field + HGETALL
+- update_item_quantity / promo changes: small Lua scripts (they depend on
+  the current fields, e.g. "only if the item is in the cart")
+
+Concurrent taps from the Mini App therefore cannot overwrite each other.
+"""
 
 import json
 import logging
@@ -8,14 +17,76 @@ from typing import TYPE_CHECKING, Any
 
 from core.services.money import to_decimal
 
-from .models import Cart, CartItem
-from .storage import TTL, RedisKeys, get_redis
+from .models import Cart
+from .storage import (
+    ADDED_AT,
+    DISCOUNT,
+    NAME,
+    PRICE,
+    QUANTITY,
+    STOCK,
+    TTL,
+    RedisKeys,
+    cart_from_fields,
+    cart_to_fields,
+    get_redis,
+    item_field,
+)
 
 if TYPE_CHECKING:
     from upstash_redis.asyncio import Redis
 
 logger = logging.getLogger(__name__)
 
+# Set (ARGV[2] > 0) or remove an item that is already in the cart.
+# ARGV: product_id, quantity, available_stock, now, ttl
+# Returns the cart fields, or {} if the cart is gone or has no items left.
+_SET_QUANTITY_SCRIPT = """
+local pid = ARGV[1]
+if redis.call('HEXISTS', KEYS[1], 'q:' .. pid) == 1 then
+  if tonumber(ARGV[2]) > 0 then
+    redis.call('HSET', KEYS[1], 'q:' .. pid, ARGV[2], 's:' .. pid, ARGV[3], 'updated_at', ARGV[4])
+  else
+    redis.call('HDEL', KEYS[1], 'q:' .. pid, 's:' .. pid, 'n:' .. pid, 'a:' .. pid,
+      'p:' .. pid, 'd:' .. pid)
+    redis.call('HSET', KEYS[1], 'updated_at', ARGV[4])
+  end
+  redis.call('EXPIRE', KEYS[1], ARGV[5])
+end
+local fields = redis.call('HGETALL', KEYS[1])
+for i = 1, #fields, 2 do
+  if string.sub(fields[i], 1, 2) == 'q:' then return fields end
+end
+if #fields > 0 then redis.call('DEL', KEYS[1]) end
+return {}
+"""
+
+# Set promo fields. ARGV: promo_code, cart_percent, product_id ("" = none),
+# item_percent, reset_item_discounts ("1"/"0"), now, ttl
+# Returns the cart fields, {} if there is no cart, 0 if product_id is not in it.
+_SET_PROMO_SCRIPT = """
+local fields = redis.call('HGETALL', KEYS[1])
+if #fields == 0 then return {} end
+local pid = ARGV[3]
+if pid ~= '' and redis.call('HEXISTS', KEYS[1], 'q:' .. pid) == 0 then return 0 end
+if ARGV[5] == '1' then
+  for i = 1, #fields, 2 do
+    if string.sub(fields[i], 1, 2) == 'q:' then
+      redis.call('HSET', KEYS[1], 'd:' .. string.sub(fields[i], 3), '0')
+    end
+  end
+end
+if pid ~= '' then redis.call('HSET', KEYS[1], 'd:' .. pid, ARGV[4]) end
+redis.call('HSET', KEYS[1], 'promo_code', ARGV[1], 'promo_discount_percent', ARGV[2],
+  'updated_at', ARGV[6])
+redis.call('EXPIRE', KEYS[1], ARGV[7])
+return redis.call('HGETALL', KEYS[1])
+"""
+
+
+def _now() -> str:
+    return datetime.now(UTC).isoformat()
+
 
 class CartManager:
     """Manages shopping carts in Redis.
@@ -42,34 +113,68 @@ class CartManager:
                 )
         return self._redis
 
-    async def get_cart(self, user_telegram_id: int) -> Cart | None:
-        """Get user's cart from Redis."""
+    async def _to_cart(self, user_telegram_id: int, raw: Any) -> Cart | None:
+        """Parse cart fields. Corrupted data is cleared and treated as no cart."""
         try:
-            key = RedisKeys.cart_key(user_telegram_id)
-            data = await self.redis.get(key)
+            return cart_from_fields(user_telegram_id, raw)
+        except (ValueError, TypeError, ArithmeticError) as e:
+            logger.warning(f"Corrupted cart data for user {user_telegram_id}: {e}")
+            await self.redis.delete(RedisKeys.cart_key(user_telegram_id))
+            return None
 
-            if not data:
-                return None
+    async def _migrate_legacy_cart(self, user_telegram_id: int) -> Cart | None:
+        """Move a cart stored as a JSON string (cart:{id}, before hashes) to its hash.
 
-            try:
-                return Cart.from_dict(json.loads(data))
-            except (json.JSONDecodeError, KeyError, TypeError) as e:
-                # Corrupted data - clear it and return None
-                logger.warning(f"Corrupted cart data for user {user_telegram_id}: {e}")
-                await self.redis.delete(key)
-                return None
+        One-time per cart: the legacy key is deleted once migrated, so later
+        reads of an empty cart cost a single extra GET.
+        """
+        legacy_key = RedisKeys.legacy_cart_key(user_telegram_id)
+        data = await self.redis.get(legacy_key)
+        if not data:
+            return None
+        try:
+            cart = Cart.from_dict(json.loads(data))
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError, ArithmeticError) as e:
+            logger.warning(f"Corrupted legacy cart data for user {user_telegram_id}: {e}")
+            await self.redis.delete(legacy_key)
+            return None
+
+        key = RedisKeys.cart_key(user_telegram_id)
+        tx = self.redis.multi()
+        if cart.items:
+            tx.hset(key, values=cart_to_fields(cart))
+            tx.expire(key, TTL.CART)
+        tx.delete(legacy_key)
+        await tx.exec()
+        return cart if cart.items else None
+
+    async def get_cart(self, user_telegram_id: int) -> Cart | None:
+        """Get user's cart from Redis (one HGETALL)."""
+        try:
+            raw = await self.redis.hgetall(RedisKeys.cart_key(user_telegram_id))
+            if not raw:
+                return await self._migrate_legacy_cart(user_telegram_id)
+            return await self._to_cart(user_telegram_id, raw)
         except Exception as e:
             logger.exception("Failed to get cart from Redis")
             msg = f"Cart service unavailable: {e!s}"
             raise ValueError(msg)
 
     async def save_cart(self, cart: Cart) -> bool:
-        """Save cart to Redis with TTL."""
+        """Replace the whole cart in Redis with TTL (one MULTI/EXEC round-trip).
+
+        Last writer wins; item and promo changes use the atomic methods below.
+        """
         try:
             key = RedisKeys.cart_key(cart.user_telegram_id)
-            cart.updated_at = datetime.now(UTC).isoformat()
+            cart.updated_at = _now()
 
-            await self.redis.set(key, json.dumps(cart.to_dict()), ex=TTL.CART)
+            tx = self.redis.multi()
+            tx.delete(key)
+            if cart.items:
+                tx.hset(key, values=cart_to_fields(cart))
+                tx.expire(key, TTL.CART)
+            await tx.exec()
             return True
         except Exception as e:
             logger.exception("Failed to save cart to Redis")
@@ -111,58 +216,39 @@ class CartManager:
             msg = "discount_percent must be between 0 and 100"
             raise ValueError(msg)
 
-        cart = await self.get_cart(user_telegram_id)
-        if cart is None:
-            cart = Cart(user_telegram_id=user_telegram_id, items=[])
-
-        # Calculate split
-        instant_qty = min(quantity, available_stock)
-        prepaid_qty = max(0, quantity - available_stock)
-
-        # Check if product already in cart
-        existing_item = next((item for item in cart.items if item.product_id == product_id), None)
-
-        if existing_item:
-            # Update existing item
-            existing_item.quantity += quantity
-            existing_item.instant_quantity = min(existing_item.quantity, available_stock)
-            existing_item.prepaid_quantity = max(0, existing_item.quantity - available_stock)
-            existing_item.discount_percent = to_decimal(discount_percent)
-            existing_item.unit_price = to_decimal(unit_price)
-        else:
-            # Add new item
-            item = CartItem(
-                product_id=product_id,
-                product_name=product_name,
-                quantity=quantity,
-                instant_quantity=instant_qty,
-                prepaid_quantity=prepaid_qty,
-                unit_price=to_decimal(unit_price),
-                discount_percent=to_decimal(discount_percent),
+        key = RedisKeys.cart_key(user_telegram_id)
+        now = _now()
+        try:
+            # Single atomic round-trip: quantity via HINCRBY, split recomputed on read
+            # from the latest available_stock, name/added_at kept from the first add
+            tx = self.redis.multi()
+            tx.hsetnx(key, "created_at", now)
+            tx.hsetnx(key, item_field(NAME, product_id), product_name)
+            tx.hsetnx(key, item_field(ADDED_AT, product_id), now)
+            tx.hincrby(key, item_field(QUANTITY, product_id), quantity)
+            tx.hset(
+                key,
+                values={
+                    item_field(STOCK, product_id): available_stock,
+                    item_field(PRICE, product_id): str(to_decimal(unit_price)),
+                    item_field(DISCOUNT, product_id): str(to_decimal(discount_percent)),
+                    "updated_at": now,
+                },
             )
-            cart.items.append(item)
+            tx.expire(key, TTL.CART)
+            tx.hgetall(key)
+            results = await tx.exec()
+        except Exception as e:
+            logger.exception("Failed to add item to cart in Redis")
+            msg = f"Cart service unavailable: {e!s}"
+            raise ValueError(msg)
 
-        await self.save_cart(cart)
+        cart = await self._to_cart(user_telegram_id, results[-1])
+        if cart is None:
+            msg = "Cart service unavailable: item was not stored"
+            raise ValueError(msg)
         return cart
 
-    def _update_cart_item_quantity(
-        self,
-        cart: Cart,
-        product_id: str,
-        new_quantity: int,
-        available_stock: int,
-    ) -> None:
-        """Update item quantity in cart (reduces cognitive complexity)."""
-        if new_quantity <= 0:
-            cart.items = [item for item in cart.items if item.product_id != product_id]
-        else:
-            for item in cart.items:
-                if item.product_id == product_id:
-                    item.quantity = new_quantity
-                    item.instant_quantity = min(new_quantity, available_stock)
-                    item.prepaid_quantity = max(0, new_quantity - available_stock)
-                    break
-
     async def update_item_quantity(
         self,
         user_telegram_id: int,
@@ -179,18 +265,12 @@ class CartManager:
             raise ValueError(msg)
 
         try:
-            cart = await self.get_cart(user_telegram_id)
-            if cart is None:
-                return None
-
-            self._update_cart_item_quantity(cart, product_id, new_quantity, available_stock)
-
-            if cart.items:
-                await self.save_cart(cart)
-            else:
-                await self.clear_cart(user_telegram_id)
-
-            return cart
+            raw = await self.redis.eval(
+                _SET_QUANTITY_SCRIPT,
+                keys=[RedisKeys.cart_key(user_telegram_id)],
+                args=[product_id, str(new_quantity), str(available_stock), _now(), str(TTL.CART)],
+            )
+            return await self._to_cart(user_telegram_id, raw) if raw else None
         except ValueError:
             raise
         except Exception as e:
@@ -222,58 +302,65 @@ class CartManager:
             Updated cart or None if cart is empty
 
         """
-        cart = await self.get_cart(user_telegram_id)
-        if cart is None:
-            return None
-
         if product_id:
-            # Product-specific promo: apply discount to matching items only
-            found = False
-            for item in cart.items:
-                if item.product_id == product_id:
-                    item.discount_percent = to_decimal(discount_percent)
-                    found = True
-
-            if not found:
-                msg = f"Product {product_id} not found in cart"
-                raise ValueError(msg)
-
-            # Store promo code info for reference (item-level)
-            cart.promo_code = promo_code
-            cart.promo_discount_percent = to_decimal(
-                0,
-            )  # Cart-level discount = 0 for product-specific
-        else:
-            # Cart-wide promo: apply discount to entire cart
-            # Remove any item-level discounts from previous product-specific promos
-            for item in cart.items:
-                item.discount_percent = to_decimal(0)
-
-            cart.promo_code = promo_code
-            cart.promo_discount_percent = to_decimal(discount_percent)
-
-        await self.save_cart(cart)
-        return cart
+            # Product-specific promo: discount on the matching item only,
+            # cart-level discount = 0 (code stored for reference)
+            return await self._set_promo(
+                user_telegram_id,
+                promo_code,
+                cart_percent=0,
+                product_id=product_id,
+                item_percent=discount_percent,
+                reset_item_discounts=False,
+            )
+        # Cart-wide promo: remove item-level discounts from previous product-specific promos
+        return await self._set_promo(
+            user_telegram_id, promo_code, cart_percent=discount_percent, reset_item_discounts=True
+        )
 
     async def remove_promo_code(self, user_telegram_id: int) -> Cart | None:
         """Remove promo code from cart.
 
         Removes both cart-level and item-level discounts.
         """
-        cart = await self.get_cart(user_telegram_id)
-        if cart is None:
-            return None
-
-        # Remove cart-level promo
-        cart.promo_code = None
-        cart.promo_discount_percent = to_decimal(0)
+        return await self._set_promo(
+            user_telegram_id, None, cart_percent=0, reset_item_discounts=True
+        )
 
-        # Remove item-level discounts (from product-specific promos)
-        for item in cart.items:
-            item.discount_percent = to_decimal(0)
+    async def _set_promo(
+        self,
+        user_telegram_id: int,
+        promo_code: str | None,
+        *,
+        cart_percent: float,
+        reset_item_discounts: bool,
+        product_id: str | None = None,
+        item_percent: float = 0,
+    ) -> Cart | None:
+        """Write promo fields atomically (one Lua call)."""
+        try:
+            raw = await self.redis.eval(
+                _SET_PROMO_SCRIPT,
+                keys=[RedisKeys.cart_key(user_telegram_id)],
+                args=[
+                    promo_code or "",
+                    str(to_decimal(cart_percent)),
+                    product_id or "",
+                    str(to_decimal(item_percent)),
+                    "1" if reset_item_discounts else "0",
+                    _now(),
+                    str(TTL.CART),
+                ],
+            )
+        except Exception as e:
+            logger.exception("Failed to update cart promo in Redis")
+            msg = f"Cart service unavailable: {e!s}"
+            raise ValueError(msg)
 
-        await self.save_cart(cart)
-        return cart
+        if raw == 0:
+            msg = f"Product {product_id} not found in cart"
+            raise ValueError(msg)
+        return await self._to_cart(user_telegram_id, raw) if raw else None
 
     async def clear_cart(self, user_telegram_id: int) -> bool:
         """Clear user's cart."""
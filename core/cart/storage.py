@@ -1,5 +1,119 @@
-"""Redis access for cart."""
+"""Redis access for cart.
+
+Layout: one hash per cart (RedisKeys.cart_key) so every mutation is a
+single atomic round-trip (HINCRBY/HSET in MULTI/EXEC or a Lua script)
+instead of GET -> modify JSON -> SET.
+
+Meta fields: promo_code ("" = none), promo_discount_percent, created_at,
+updated_at. Per item, keyed by product_id:
+- q:{id} quantity (HINCRBY target; presence marks the item as in the cart)
+- s:{id} available stock at the last change (instant/prepaid split)
+- n:{id} product name, a:{id} added_at (HSETNX, kept from the first add)
+- p:{id} unit price, d:{id} item-level discount percent
+"""
+
+from collections.abc import Mapping
+from decimal import Decimal
+from typing import Any
 
 from core.db import TTL, RedisKeys, get_redis
+from core.services.money import to_decimal
+
+from .models import Cart, CartItem
+
+__all__ = [
+    "TTL",
+    "RedisKeys",
+    "cart_from_fields",
+    "cart_to_fields",
+    "get_redis",
+    "item_field",
+]
+
+QUANTITY = "q:"
+STOCK = "s:"
+NAME = "n:"
+ADDED_AT = "a:"
+PRICE = "p:"
+DISCOUNT = "d:"
+
+ITEM_PREFIXES = (QUANTITY, STOCK, NAME, ADDED_AT, PRICE, DISCOUNT)
+
+
+def item_field(prefix: str, product_id: str) -> str:
+    """Hash field of one item attribute."""
+    return f"{prefix}{product_id}"
+
+
+def _as_fields(raw: Any) -> dict[str, str]:
+    """HGETALL reply (dict from the client, flat list from EVAL) as a dict."""
+    if isinstance(raw, Mapping):
+        return {str(k): str(v) for k, v in raw.items()}
+    if isinstance(raw, list | tuple):
+        return {str(raw[i]): str(raw[i + 1]) for i in range(0, len(raw) - 1, 2)}
+    return {}
+
+
+def cart_from_fields(user_telegram_id: int, raw: Any) -> Cart | None:
+    """Build Cart from hash fields. None if the cart has no items.
+
+    Raises:
+        ValueError: Corrupted field values
+
+    """
+    fields = _as_fields(raw)
+    items: list[CartItem] = []
+    for field_name, value in fields.items():
+        if not field_name.startswith(QUANTITY):
+            continue
+        product_id = field_name[len(QUANTITY) :]
+        quantity = int(value)
+        if quantity <= 0:
+            continue
+        stock = int(fields.get(item_field(STOCK, product_id), quantity))
+        instant = max(0, min(quantity, stock))
+        items.append(
+            CartItem(
+                product_id=product_id,
+                product_name=fields.get(item_field(NAME, product_id), ""),
+                quantity=quantity,
+                instant_quantity=instant,
+                prepaid_quantity=quantity - instant,
+                unit_price=to_decimal(fields.get(item_field(PRICE, product_id), "0")),
+                discount_percent=to_decimal(fields.get(item_field(DISCOUNT, product_id), "0")),
+                added_at=fields.get(item_field(ADDED_AT, product_id), ""),
+            )
+        )
+    if not items:
+        return None
+
+    items.sort(key=lambda item: (item.added_at, item.product_id))
+    return Cart(
+        user_telegram_id=user_telegram_id,
+        items=items,
+        promo_code=fields.get("promo_code") or None,
+        promo_discount_percent=to_decimal(fields.get("promo_discount_percent", "0")),
+        created_at=fields.get("created_at", ""),
+        updated_at=fields.get("updated_at", ""),
+    )
+
 
-__all__ = ["TTL", "RedisKeys", "get_redis"]
+def cart_to_fields(cart: Cart) -> dict[str, str]:
+    """Full hash representation of a cart (for whole-cart writes)."""
+    fields = {
+        "promo_code": cart.promo_code or "",
+        "promo_discount_percent": str(cart.promo_discount_percent),
+        "created_at": cart.created_at,
+        "updated_at": cart.updated_at,
+    }
+    for item in cart.items:
+        pid = item.product_id
+        # Stock that reproduces the stored split: all instant if nothing is prepaid
+        stock = item.instant_quantity if item.prepaid_quantity > 0 else item.quantity
+        fields[item_field(QUANTITY, pid)] = str(item.quantity)
+        fields[item_field(STOCK, pid)] = str(stock)
+        fields[item_field(NAME, pid)] = item.product_name
+        fields[item_field(ADDED_AT, pid)] = item.added_at
+        fields[item_field(PRICE, pid)] = str(item.unit_price)
+        fields[item_field(DISCOUNT, pid)] = str(to_decimal(item.discount_percent or Decimal(0)))
+    return fields
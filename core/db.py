@@ -134,7 +134,12 @@ except ImportError:
             return int(result) if result else 0
 
         async def xadd(
-            self, stream_key: str, entry_id: str, fields: dict[str, str]
+            self,
+            stream_key: str,
+            entry_id: str,
+            fields: dict[str, str],
+            maxlen: int | None = None,
+            approximate_trim: bool = True,
         ) -> str:
             """Add entry to Redis Stream (XADD command).
 
@@ -142,18 +147,25 @@ except ImportError:
                 stream_key: Stream key name
                 entry_id: Entry ID ("*" for auto-generate)
                 fields: Dictionary of field-value pairs
+                maxlen: Trim stream to this many entries (optional)
+                approximate_trim: Use "~" (approximate) trimming when maxlen is set
 
             Returns:
                 Entry ID
 
-            Note: Signature matches upstash-redis library: xadd(name, id, data)
+            Note: Signature matches upstash-redis library: xadd(name, id, data, maxlen=...)
             """
-            # Upstash REST API: POST /xadd/{stream_key}/{id} with fields as body
-            # Format: {"field1": "value1", "field2": "value2"}
-            resp = await self.client.post(
-                f"/xadd/{stream_key}/{entry_id}",
-                json=fields,
-            )
+            # Upstash REST API: POST / with the raw command as a JSON array
+            command: list[str] = ["XADD", stream_key]
+            if maxlen is not None:
+                command.append("MAXLEN")
+                if approximate_trim:
+                    command.append("~")
+                command.append(str(maxlen))
+            command.append(entry_id)
+            for field, value in fields.items():
+                command.extend([field, value])
+            resp = await self.client.post("/", json=command)
             resp.raise_for_status()
             result = resp.json().get("result", "")
             return str(result) if result else entry_id
@@ -187,20 +199,36 @@ except ImportError:
             resp = await self.client.get(url)
             resp.raise_for_status()
             result = resp.json().get("result", [])
+            return self._parse_stream_entries(result if isinstance(result, list) else [])
 
-            # Parse result: [[entry_id, [field1, value1, ...]], ...]
-            parsed: list[tuple[str, dict[str, str]]] = []
-            if isinstance(result, list):
-                for entry in result:
-                    if isinstance(entry, list) and len(entry) >= 2:
-                        entry_id = str(entry[0])
-                        fields_list = entry[1] if isinstance(entry[1], list) else []
-                        fields_dict: dict[str, str] = {}
-                        # Convert [field1, value1, field2, value2, ...] to dict
-                        for i in range(0, len(fields_list) - 1, 2):
-                            fields_dict[str(fields_list[i])] = str(fields_list[i + 1])
-                        parsed.append((entry_id, fields_dict))
-            return parsed
+        async def xrevrange(
+            self,
+            stream_key: str,
+            end: str = "+",
+            start: str = "-",
+            count: int | None = None,
+        ) -> list[tuple[str, dict[str, str]]]:
+            """Read entries from Redis Stream in reverse order using XREVRANGE.
+
+            Args:
+                stream_key: Stream key name
+                end: End entry ID (use "+" for latest)
+                start: Start entry ID (use "-" for earliest)
+                count: Maximum number of entries to return (newest first)
+
+            Returns:
+                List of (entry_id, {field: value, ...}) tuples, newest first
+
+            Note: Signature matches upstash-redis library: xrevrange(key, end, start, count)
+            """
+            url = f"/xrevrange/{stream_key}/{end}/{start}"
+            if count is not None:
+                url += f"/COUNT/{count}"
+
+            resp = await self.client.get(url)
+            resp.raise_for_status()
+            result = resp.json().get("result", [])
+            return self._parse_stream_entries(result if isinstance(result, list) else [])
 
         async def xread(
             self,
@@ -359,11 +387,17 @@ class RedisKeys:
     """Redis key prefixes for different data types."""
 
     # Cart storage
-    CART = "cart:"  # cart:{user_telegram_id}
+    CART = "cart:h:"  # cart:h:{user_telegram_id} - hash per cart (see core/cart/storage.py)
+    CART_LEGACY = "cart:"  # cart:{user_telegram_id} - JSON string, migrated on first read
+
+    # FSM storage (aiogram) - state and data coalesced into one hash per chat
+    FSM = "fsm:"  # fsm:{bot_id}:{chat_id}:{user_id}[:{thread_id}][:{destiny}]
 
-    # FSM storage (aiogram)
-    FSM_STATE = "fsm:state:"  # fsm:state:{user_id}:{chat_id}
-    FSM_DATA = "fsm:data:"  # fsm:data:{user_id}:{chat_id}
+    # Partner dashboard (referrals, analytics, earnings) - invalidated on referral bonus
+    PARTNER_DASHBOARD = "partner:dashboard:"  # partner:dashboard:{user_id}
+
+    # WebApp orders list pages - hash per user, invalidated on order status change
+    ORDERS_LIST = "orders:list:"  # orders:list:{user_id}
 
     # Leaderboard
     LEADERBOARD_SAVINGS = "leaderboard:savings"  # Sorted set
@@ -381,6 +415,14 @@ class RedisKeys:
     def cart_key(user_telegram_id: int) -> str:
         return f"{RedisKeys.CART}{user_telegram_id}"
 
+    @staticmethod
+    def legacy_cart_key(user_telegram_id: int) -> str:
+        return f"{RedisKeys.CART_LEGACY}{user_telegram_id}"
+
+    @staticmethod
+    def orders_list_key(user_id: str) -> str:
+        return f"{RedisKeys.ORDERS_LIST}{user_id}"
+
     @staticmethod
     def notification_key(user_id: int, notification_type: str) -> str:
         return f"{RedisKeys.USER_NOTIFICATION}{user_id}:{notification_type}"
@@ -393,4 +435,7 @@ class TTL:
     CART = 86400  # 24 hours
     CURRENCY_CACHE = 3600  # 1 hour
     TEMP_DATA = 900  # 15 minutes
+    FSM = 172800  # 48 hours (abandoned multi-step flows expire)
+    PARTNER_DASHBOARD = 300  # 5 minutes (explicitly invalidated on referral bonus)
+    ORDERS_LIST = 30  # 30 seconds (explicitly invalidated on order status change)
     RATE_LIMIT_REENGAGEMENT = 259200  # 72 hours
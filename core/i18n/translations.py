@@ -1,6 +1,8 @@
 """Internationalization System."""
 
 import json
+import marshal
+import string
 from pathlib import Path
 from typing import Any
 
@@ -68,37 +70,171 @@ def _load_translations(lang: str) -> dict[str, Any]:
         return {}
 
 
-def _get_nested_value(translations: dict[str, Any], key: str) -> Any:
-    """Get nested value from translations using dot notation (reduces cognitive complexity)."""
-    if "." not in key:
-        return translations.get(key)
+# ==================== Compiled catalogs ====================
+# get_text is called dozens of times per rendered message/keyboard, so each
+# language is compiled once into a flat "a.b.c" -> string map with English
+# already merged in, and each template string is parsed once.
 
-    keys = key.split(".")
-    current_val: Any = translations
+# Optional prebuilt artifact (scripts/compile_locales.py)
+COMPILED_CATALOG_FILE = "compiled.marshal"
+_COMPILED_FORMAT_VERSION = 1
+
+# Max distinct template strings kept parsed (catalog strings + code defaults)
+MAX_TEMPLATES = 8192
+
+_catalogs: dict[str, dict[str, str]] = {}
+_templates: dict[str, "_Template"] = {}
+_artifact_checked = False
+
+
+def _flatten(
+    tree: dict[str, Any], prefix: str = "", out: dict[str, str] | None = None
+) -> dict[str, str]:
+    """Flatten nested translations to dotted keys (string leaves only)."""
+    if out is None:
+        out = {}
+    for k, v in tree.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            _flatten(v, f"{key}.", out)
+        elif isinstance(v, str):
+            out[key] = v
+    return out
+
+
+def _compile_language(lang: str) -> dict[str, str]:
+    """Flat catalog for a language with English fallback pre-merged."""
+    english = _flatten(_load_translations(DEFAULT_LANGUAGE))
+    if lang == DEFAULT_LANGUAGE:
+        return english
+    return {**english, **_flatten(_load_translations(lang))}
+
+
+def _source_fingerprint(locales_path: Path) -> list[tuple[str, int, int]]:
+    """(file, size, mtime_ns) of every locale JSON - invalidates stale artifacts."""
+    fingerprint = []
+    for lang in sorted(SUPPORTED_LANGUAGES):
+        file_path = locales_path / f"{lang}.json"
+        if file_path.exists():
+            st = file_path.stat()
+            fingerprint.append((lang, st.st_size, st.st_mtime_ns))
+    return fingerprint
+
+
+def compile_catalogs() -> dict[str, dict[str, str]]:
+    """Compile flat catalogs for all supported languages."""
+    return {lang: _compile_language(lang) for lang in SUPPORTED_LANGUAGES}
+
+
+def write_compiled_catalogs(path: Path | None = None) -> Path:
+    """Write the compiled catalogs artifact (deploy step). Returns its path."""
+    locales_path = _get_locales_path()
+    target = path or locales_path / COMPILED_CATALOG_FILE
+    payload = {
+        "version": _COMPILED_FORMAT_VERSION,
+        "fingerprint": _source_fingerprint(locales_path),
+        "catalogs": compile_catalogs(),
+    }
+    target.write_bytes(marshal.dumps(payload))
+    return target
+
+
+def _load_compiled_artifact() -> None:
+    """Load the prebuilt artifact once, if present and built from the current JSON files."""
+    global _artifact_checked
+    _artifact_checked = True
+    locales_path = _get_locales_path()
+    artifact = locales_path / COMPILED_CATALOG_FILE
+    if not artifact.exists():
+        return
     try:
-        for k in keys:
-            current_val = current_val[k]
-        return current_val
-    except (KeyError, TypeError):
-        return None
+        # loads(bytes): marshal.load on a file object reads in small chunks
+        payload = marshal.loads(artifact.read_bytes())
+        fingerprint = [tuple(x) for x in payload.get("fingerprint", [])]
+        if payload.get("version") != _COMPILED_FORMAT_VERSION:
+            return
+        if fingerprint != _source_fingerprint(locales_path):
+            return
+        _catalogs.update(payload["catalogs"])
+    except Exception:
+        # Broken artifact - compile from JSON instead
+        return
 
 
-def _get_text_with_fallback(key: str, lang: str, default: str | None) -> str:
-    """Get text with English fallback (reduces cognitive complexity)."""
-    translations = _load_translations(lang)
-    text = _get_nested_value(translations, key)
+def _get_catalog(lang: str) -> dict[str, str]:
+    catalog = _catalogs.get(lang)
+    if catalog is None:
+        if not _artifact_checked:
+            _load_compiled_artifact()
+            catalog = _catalogs.get(lang)
+        if catalog is None:
+            catalog = _catalogs[lang] = _compile_language(lang)
+    return catalog
 
-    if text is None and lang != DEFAULT_LANGUAGE:
-        eng_translations = _load_translations(DEFAULT_LANGUAGE)
-        text = _get_nested_value(eng_translations, key)
 
-    if text is None:
-        return default if default is not None else key
+class _Template:
+    """Parsed str.format template: literal/field parts, rendered without re-parsing.
 
-    if not isinstance(text, str):
-        return default if default is not None else key
+    Templates with positional, attribute/index or nested fields keep using
+    str.format (same behaviour, just not precompiled).
+    """
 
-    return text
+    __slots__ = ("parts", "simple", "text")
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.parts: tuple[tuple[str, str | None, str | None, str], ...] = ()
+        self.simple = True
+        try:
+            parts = tuple(_FORMATTER.parse(text))
+        except ValueError:
+            # Malformed braces: str.format raises ValueError -> text returned as is
+            self.simple = False
+            return
+        for _literal, field, spec, _conv in parts:
+            if field is None:
+                continue
+            if not field.isidentifier() or (spec and "{" in spec):
+                self.simple = False
+                return
+        self.parts = tuple(
+            (literal, field, conv, spec or "") for literal, field, spec, conv in parts
+        )
+
+    def render(self, kwargs: dict[str, Any]) -> str:
+        if not self.simple:
+            return self.text.format(**kwargs)
+        out = []
+        for literal, field, conv, spec in self.parts:
+            out.append(literal)
+            if field is None:
+                continue
+            value = kwargs[field]
+            if conv == "r":
+                value = repr(value)
+            elif conv == "a":
+                value = ascii(value)
+            elif conv == "s":
+                value = str(value)
+            out.append(format(value, spec))
+        return "".join(out)
+
+
+_FORMATTER = string.Formatter()
+
+
+def _get_template(text: str) -> _Template:
+    template = _templates.get(text)
+    if template is None:
+        if len(_templates) >= MAX_TEMPLATES:
+            _templates.clear()
+        template = _templates[text] = _Template(text)
+    return template
+
+
+def _normalize_language(lang: str | None) -> str:
+    lang = lang.split("-")[0].lower() if lang else DEFAULT_LANGUAGE
+    return lang if lang in SUPPORTED_LANGUAGES else DEFAULT_LANGUAGE
 
 
 def get_text(
@@ -116,16 +252,13 @@ def get_text(
         Translated string or key/default if not found
 
     """
-    lang = lang.split("-")[0].lower() if lang else DEFAULT_LANGUAGE
-
-    if lang not in SUPPORTED_LANGUAGES:
-        lang = DEFAULT_LANGUAGE
-
-    text = _get_text_with_fallback(key, lang, default)
+    text = _get_catalog(_normalize_language(lang)).get(key)
+    if text is None:
+        text = default if default is not None else key
 
     if kwargs:
         try:
-            return text.format(**kwargs)
+            return _get_template(text).render(kwargs)
         except (KeyError, ValueError, AttributeError):
             return text
 
@@ -134,10 +267,7 @@ def get_text(
 
 def get_all_texts(lang: str = DEFAULT_LANGUAGE) -> dict[str, Any]:
     """Get all translations for a language."""
-    lang = lang.split("-")[0].lower() if lang else DEFAULT_LANGUAGE
-    if lang not in SUPPORTED_LANGUAGES:
-        lang = DEFAULT_LANGUAGE
-    return _load_translations(lang)
+    return _load_translations(_normalize_language(lang))
 
 
 def detect_language(language_code: str | None) -> str:
@@ -162,5 +292,8 @@ def detect_language(language_code: str | None) -> str:
 
 def reload_translations() -> None:
     """Clear translation cache and reload."""
-    global _translations
+    global _translations, _artifact_checked
     _translations = {}
+    _catalogs.clear()
+    _templates.clear()
+    _artifact_checked = False
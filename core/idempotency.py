@@ -0,0 +1,341 @@
+"""Idempotency Ledger for Workers and Crons.
+
+QStash redelivers messages, and the unified/auto_alloc crons retry the same
+business operations (delivery, referral bonuses, cashback). Without a shared
+record every duplicate re-reads and re-validates order state in Supabase.
+
+Ledger entries are keyed by (worker, business key):
+- claim: SET NX with a lease. Concurrent duplicates see "running" and back
+  off; a crashed holder's lease simply expires.
+- complete: the final outcome replaces the claim and is cached for
+  RESULT_TTL_SECS, so later duplicates return it without touching the DB.
+- release: non-final outcomes and errors drop the claim so the next
+  attempt runs again.
+
+Redis (Upstash) is the primary store; the idempotency_ledger table (RPC
+claim_idempotency_key) is used when Redis is not configured or fails.
+"""
+
+import json
+import uuid
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any
+
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+LEDGER_KEY_PREFIX = "idem:"
+DEFAULT_LEASE_SECS = 120
+RESULT_TTL_SECS = 86400
+
+STATUS_ACQUIRED = "acquired"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+
+# Delete the claim only if it still holds our token
+_RELEASE_SCRIPT = """
+local v = redis.call('GET', KEYS[1])
+if v and string.find(v, ARGV[1], 1, true) then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+
+# Replace the claim with the final result only if it still holds our token
+_COMPLETE_SCRIPT = """
+local v = redis.call('GET', KEYS[1])
+if v and cjson.decode(v)['t'] == ARGV[1] then
+    return redis.call('SET', KEYS[1], ARGV[2], 'EX', tonumber(ARGV[3]))
+end
+return 0
+"""
+
+# Delete the entry only if it holds a final result (never someone's live claim)
+_DROP_DONE_SCRIPT = """
+local v = redis.call('GET', KEYS[1])
+if v and cjson.decode(v)['s'] == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+
+
+class IdempotencyInProgressError(Exception):
+    """Another invocation currently holds the claim for this key."""
+
+
+@dataclass(slots=True)
+class Claim:
+    """Outcome of a claim attempt."""
+
+    status: str  # acquired | running | done
+    token: str = ""
+    result: dict[str, Any] | None = None
+
+
+class IdempotencyLedger:
+    """Claim/complete/release ledger over Redis with a DB fallback."""
+
+    def __init__(self, redis: Any = None, db: Any = None) -> None:
+        self.redis = redis
+        self.db = db
+
+    @staticmethod
+    def _key(worker: str, key: str) -> str:
+        return f"{LEDGER_KEY_PREFIX}{worker}:{key}"
+
+    # ==================== Redis ====================
+
+    async def _claim_redis(self, worker: str, key: str, lease: int) -> Claim:
+        redis_key = self._key(worker, key)
+        token = uuid.uuid4().hex
+        claim_value = json.dumps({"s": STATUS_RUNNING, "t": token})
+        if await self.redis.set(redis_key, claim_value, ex=lease, nx=True):
+            return Claim(STATUS_ACQUIRED, token)
+
+        raw = await self.redis.get(redis_key)
+        if raw is None:
+            # Expired between SET and GET - try once more
+            if await self.redis.set(redis_key, claim_value, ex=lease, nx=True):
+                return Claim(STATUS_ACQUIRED, token)
+            return Claim(STATUS_RUNNING)
+        entry = json.loads(raw)
+        if entry.get("s") == STATUS_DONE:
+            return Claim(STATUS_DONE, result=entry.get("r") or {})
+        return Claim(STATUS_RUNNING)
+
+    async def _complete_redis(
+        self, worker: str, key: str, token: str, payload: str, ttl: int
+    ) -> bool:
+        redis_key = self._key(worker, key)
+        if hasattr(self.redis, "eval"):
+            stored = await self.redis.eval(
+                _COMPLETE_SCRIPT, keys=[redis_key], args=[token, payload, str(ttl)]
+            )
+            return bool(stored)
+        raw = await self.redis.get(redis_key)
+        if raw and json.loads(raw).get("t") == token:
+            await self.redis.set(redis_key, payload, ex=ttl)
+            return True
+        return False
+
+    async def _release_redis(self, worker: str, key: str, token: str) -> None:
+        redis_key = self._key(worker, key)
+        if hasattr(self.redis, "eval"):
+            await self.redis.eval(_RELEASE_SCRIPT, keys=[redis_key], args=[token])
+            return
+        raw = await self.redis.get(redis_key)
+        if raw and json.loads(raw).get("t") == token:
+            await self.redis.delete(redis_key)
+
+    async def _drop_done_redis(self, worker: str, key: str) -> None:
+        redis_key = self._key(worker, key)
+        if hasattr(self.redis, "eval"):
+            await self.redis.eval(_DROP_DONE_SCRIPT, keys=[redis_key], args=[STATUS_DONE])
+            return
+        raw = await self.redis.get(redis_key)
+        if raw and json.loads(raw).get("s") == STATUS_DONE:
+            await self.redis.delete(redis_key)
+
+    # ==================== DB fallback ====================
+
+    async def _claim_db(self, worker: str, key: str, lease: int) -> Claim:
+        token = uuid.uuid4().hex
+        result = await self.db.client.rpc(
+            "claim_idempotency_key",
+            {"p_worker": worker, "p_key": key, "p_token": token, "p_lease_secs": lease},
+        ).execute()
+        row = result.data[0] if isinstance(result.data, list) and result.data else {}
+        status = row.get("status") or STATUS_RUNNING
+        if status == STATUS_ACQUIRED:
+            return Claim(STATUS_ACQUIRED, token)
+        if status == STATUS_DONE:
+            return Claim(STATUS_DONE, result=row.get("result") or {})
+        return Claim(STATUS_RUNNING)
+
+    # ==================== Public API ====================
+
+    async def claim(self, worker: str, key: str, lease: int = DEFAULT_LEASE_SECS) -> Claim:
+        """Try to claim (worker, key) for `lease` seconds."""
+        if self.redis is not None:
+            try:
+                return await self._claim_redis(worker, key, lease)
+            except Exception as e:
+                logger.warning(f"Idempotency: Redis claim failed ({e}), using DB ledger")
+        if self.db is not None:
+            return await self._claim_db(worker, key, lease)
+        # No ledger available - behave as before (always run)
+        return Claim(STATUS_ACQUIRED)
+
+    async def complete(
+        self, worker: str, key: str, token: str, result: dict[str, Any], ttl: int = RESULT_TTL_SECS
+    ) -> None:
+        """Store the final outcome for duplicates to reuse.
+
+        Only while our claim is still held: if the lease expired and another
+        invocation re-claimed the key, its entry is left alone.
+        """
+        payload = {"s": STATUS_DONE, "t": token, "r": result}
+        if self.redis is not None:
+            try:
+                if await self._complete_redis(
+                    worker, key, token, json.dumps(payload, default=str), ttl
+                ):
+                    return
+                # Not our claim in Redis (lease lost, or claimed via the DB ledger)
+                logger.info(f"Idempotency: claim for {worker}:{key} not held in Redis")
+            except Exception as e:
+                logger.warning(f"Idempotency: Redis complete failed ({e}), using DB ledger")
+        if self.db is not None:
+            await self.db.client.rpc(
+                "complete_idempotency_key",
+                {
+                    "p_worker": worker,
+                    "p_key": key,
+                    "p_token": token,
+                    "p_result": json.loads(json.dumps(result, default=str)),
+                    "p_ttl_secs": ttl,
+                },
+            ).execute()
+
+    async def release(self, worker: str, key: str, token: str) -> None:
+        """Drop our claim so the next attempt runs again."""
+        if not token:
+            return
+        try:
+            if self.redis is not None:
+                await self._release_redis(worker, key, token)
+                return
+            if self.db is not None:
+                await (
+                    self.db.client.table("idempotency_ledger")
+                    .delete()
+                    .eq("worker", worker)
+                    .eq("key", key)
+                    .eq("token", token)
+                    .execute()
+                )
+        except Exception as e:
+            # Lease expiry frees the key anyway
+            logger.warning(f"Idempotency: release failed for {worker}:{key}: {e}")
+
+    async def drop_done(self, worker: str, key: str) -> None:
+        """Forget a recorded outcome that the caller knows is stale."""
+        if self.redis is not None:
+            try:
+                await self._drop_done_redis(worker, key)
+                return
+            except Exception as e:
+                logger.warning(f"Idempotency: Redis drop failed ({e}), using DB ledger")
+        if self.db is not None:
+            await (
+                self.db.client.table("idempotency_ledger")
+                .delete()
+                .eq("worker", worker)
+                .eq("key", key)
+                .eq("status", STATUS_DONE)
+                .execute()
+            )
+
+
+def _always_final(result: dict[str, Any]) -> bool:
+    return True
+
+
+async def run_idempotent(
+    ledger: IdempotencyLedger,
+    worker: str,
+    key: str,
+    fn: Callable[[], Awaitable[dict[str, Any]]],
+    *,
+    is_final: Callable[[dict[str, Any]], bool] = _always_final,
+    lease: int = DEFAULT_LEASE_SECS,
+    ttl: int = RESULT_TTL_SECS,
+    replay: bool = True,
+) -> dict[str, Any]:
+    """Run fn at most once per (worker, key) and reuse its final outcome.
+
+    Args:
+        ledger: Ledger to use (see get_idempotency_ledger)
+        worker: Worker/operation name
+        key: Business key (order id, review id, ...)
+        fn: The operation
+        is_final: Whether an outcome may be cached. Non-final outcomes
+            (e.g. items still waiting for stock) release the claim.
+        lease: Claim lease in seconds (must exceed fn's worst-case runtime)
+        ttl: How long a final outcome is kept
+        replay: Return a recorded outcome. Callers that already know the
+            outcome is stale (e.g. a cron that found pending items) pass
+            False to drop it and run under a fresh claim instead.
+
+    Returns:
+        fn's result, or the cached result with "idempotent_replay": True
+
+    Raises:
+        IdempotencyInProgressError: Another invocation holds the claim
+    """
+    claim = await ledger.claim(worker, key, lease)
+    if claim.status == STATUS_DONE and not replay:
+        await ledger.drop_done(worker, key)
+        claim = await ledger.claim(worker, key, lease)
+    if claim.status == STATUS_DONE:
+        logger.info(f"Idempotency: {worker}:{key} already done, returning cached result")
+        return {**(claim.result or {}), "idempotent_replay": True}
+    if claim.status == STATUS_RUNNING:
+        raise IdempotencyInProgressError(f"{worker}:{key} is already running")
+
+    try:
+        result = await fn()
+    except BaseException:
+        await ledger.release(worker, key, claim.token)
+        raise
+
+    try:
+        if is_final(result):
+            await ledger.complete(worker, key, claim.token, result, ttl)
+        else:
+            await ledger.release(worker, key, claim.token)
+    except Exception as e:
+        logger.warning(f"Idempotency: failed to record {worker}:{key}: {e}")
+    return result
+
+
+_ledger: IdempotencyLedger | None = None
+
+
+def get_idempotency_ledger(db: Any = None) -> IdempotencyLedger:
+    """Get the process-wide ledger (Redis if configured, DB fallback)."""
+    global _ledger
+    if _ledger is None:
+        redis = None
+        try:
+            from core.db import get_redis
+
+            redis = get_redis()
+        except (ValueError, ImportError) as e:
+            logger.warning(f"Idempotency: Redis unavailable ({e}), using DB ledger")
+        _ledger = IdempotencyLedger(redis=redis, db=db)
+    elif _ledger.db is None and db is not None:
+        _ledger.db = db
+    return _ledger
+
+
+# ==================== Worker keys and finality rules ====================
+
+WORKER_DELIVER_GOODS = "deliver-goods"
+WORKER_CALCULATE_REFERRAL = "calculate-referral"
+WORKER_REVIEW_CASHBACK = "review-cashback"
+WORKER_DISCOUNT_DELIVERY = "discount-delivery"
+
+# Validation notes that may change later (payment or order row not committed yet)
+_RETRYABLE_DELIVERY_NOTES = {"payment_not_confirmed", "not_found"}
+
+
+def delivery_is_final(result: dict[str, Any]) -> bool:
+    """A delivery outcome is final once nothing is waiting for stock."""
+    if result.get("note") in _RETRYABLE_DELIVERY_NOTES:
+        return False
+    return int(result.get("waiting") or 0) == 0
+
+
+def success_is_final(result: dict[str, Any]) -> bool:
+    """Cache only outcomes without an error (errors may be transient)."""
+    return "error" not in result and result.get("success", True) is not False
@@ -1,24 +1,97 @@
 """Rate Limiting Middleware for FastAPI.
 
 Provides rate limiting using Upstash Redis.
+
+Counting is done with fixed windows on atomic INCRBY + EXPIRE (one pipelined
+round-trip). Each instance leases a small batch of tokens per Redis call and
+serves them from an in-process cache, so most allowed requests never touch
+Redis. Blocked identities are cached locally until the window resets, so
+abusive clients are rejected without any network I/O at all.
 """
 
+import hashlib
 import time
+from collections import OrderedDict
 from collections.abc import Callable
+from dataclasses import dataclass
 from typing import Any
 
-from fastapi import HTTPException, Request, Response, status
+from fastapi import Request, Response, status
+from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 
 from core.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Upper bound for locally cached buckets (LRU-evicted beyond this)
+MAX_LOCAL_BUCKETS = 10_000
+
+RATE_LIMIT_KEY_PREFIX = "rate_limit:"
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimitPolicy:
+    """Rate limit policy for a group of routes.
+
+    Attributes:
+        name: Policy name (part of the Redis key)
+        prefixes: URL path prefixes covered by this policy
+        limit: Max requests per window per identity
+        window: Window length in seconds
+        lease: Tokens reserved per Redis round-trip and served locally.
+            1 = exact global counting (every request hits Redis).
+        per_user: Identify clients by auth header (falls back to IP)
+        per_path: Count each path separately
+        ip_limit: Per-IP cap on top of per-user buckets. The auth header is
+            not verified here, so a client rotating it would otherwise get a
+            fresh bucket on every request.
+    """
+
+    name: str
+    prefixes: tuple[str, ...]
+    limit: int
+    window: int = 60
+    lease: int = 1
+    per_user: bool = False
+    per_path: bool = False
+    ip_limit: int | None = None
+
+    def matches(self, path: str) -> bool:
+        return path.startswith(self.prefixes)
+
+
+# Ordered most specific first - first match wins
+DEFAULT_POLICIES: tuple[RateLimitPolicy, ...] = (
+    # Brute-force protection: exact counting per IP and endpoint
+    RateLimitPolicy("auth", ("/api/auth",), limit=30, per_path=True),
+    # LLM calls are expensive - tight per-user budget
+    # IP caps leave room for several users behind one NAT
+    RateLimitPolicy(
+        "ai_chat", ("/api/webapp/ai/chat",), limit=20, lease=2, per_user=True, ip_limit=100
+    ),
+    RateLimitPolicy("webapp", ("/api/webapp",), limit=120, lease=10, per_user=True, ip_limit=600),
+    # Telegram / payment gateway callbacks (few source IPs, high volume)
+    RateLimitPolicy("webhook", ("/webhook", "/api/webhook"), limit=1200, lease=50),
+)
+
+
+@dataclass(slots=True)
+class _Bucket:
+    """Locally cached state of one identity's current window."""
+
+    window: int
+    tokens: int  # Leased tokens not yet spent on this instance
+    total: int  # Window counter as last reported by Redis
+    blocked: bool = False
+
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
     """Rate limiting middleware using Upstash Redis.
 
-    Limits requests per IP address per endpoint.
+    Applies per-route policies (see DEFAULT_POLICIES) keyed by client IP or,
+    for per-user policies, by a hash of the auth header (plus a per-IP cap).
+    Adds X-RateLimit-* headers to every rate-limited response.
     """
 
     def __init__(
@@ -26,91 +99,147 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         app: Any,
         requests_per_minute: int = 30,
         redis_client: Any = None,
+        policies: tuple[RateLimitPolicy, ...] | None = None,
     ) -> None:
         super().__init__(app)
         self.requests_per_minute = requests_per_minute
+        # The lightweight REST fallback client has no pipeline(): use in-memory counters
+        if redis_client is not None and not hasattr(redis_client, "pipeline"):
+            logger.info("Redis client has no pipeline support, rate limiting in-memory")
+            redis_client = None
         self.redis_client = redis_client
-        self._cache: dict[str, list[float]] = {}  # Fallback in-memory cache
-
-    async def dispatch(self, request: Request, call_next: Callable[..., Any]) -> Response:
-        # Only rate limit auth endpoints
-        if not request.url.path.startswith("/api/auth"):
-            return await call_next(request)  # type: ignore[no-any-return]
-
-        # Get client IP
+        if policies is None:
+            policies = tuple(
+                RateLimitPolicy(p.name, p.prefixes, requests_per_minute, per_path=p.per_path)
+                if p.name == "auth"
+                else p
+                for p in DEFAULT_POLICIES
+            )
+        self.policies = policies
+        # Per-IP counterpart of each capped per-user policy
+        self._ip_caps = {
+            p.name: RateLimitPolicy(f"{p.name}_ip", p.prefixes, p.ip_limit, p.window, p.lease)
+            for p in policies
+            if p.per_user and p.ip_limit
+        }
+        self._buckets: OrderedDict[str, _Bucket] = OrderedDict()
+        self._counters: OrderedDict[str, int] = OrderedDict()  # Fallback in-memory counters
+
+    def _match_policy(self, path: str) -> RateLimitPolicy | None:
+        for policy in self.policies:
+            if policy.matches(path):
+                return policy
+        return None
+
+    @staticmethod
+    def _client_ip(request: Request) -> str:
         client_ip = request.client.host if request.client else "unknown"
         if forwarded_for := request.headers.get("X-Forwarded-For"):
             # Use first IP from X-Forwarded-For (original client)
             client_ip = forwarded_for.split(",")[0].strip()
+        return client_ip
+
+    def _identity(self, request: Request, policy: RateLimitPolicy) -> str:
+        """Build rate limit identity (without verifying auth - that's the route's job)."""
+        identity = ""
+        if policy.per_user:
+            auth = request.headers.get("Authorization") or request.headers.get("X-Init-Data")
+            if auth:
+                identity = "u:" + hashlib.blake2b(auth.encode(), digest_size=8).hexdigest()
+        if not identity:
+            identity = f"ip:{self._client_ip(request)}"
+        if policy.per_path:
+            identity = f"{identity}:{request.url.path}"
+        return identity
 
-        # Create rate limit key
-        key = f"rate_limit:{client_ip}:{request.url.path}"
+    async def dispatch(self, request: Request, call_next: Callable[..., Any]) -> Response:
+        policy = self._match_policy(request.url.path)
+        if policy is None:
+            return await call_next(request)  # type: ignore[no-any-return]
 
-        # Check rate limit
-        if await self._is_rate_limited(key):
-            logger.warning(f"Rate limit exceeded for {client_ip} on {request.url.path}")
-            raise HTTPException(
+        identity = self._identity(request, policy)
+        ip_cap = self._ip_caps.get(policy.name)
+        if ip_cap is not None:
+            ip_identity = f"ip:{self._client_ip(request)}"
+            allowed, remaining, reset_after = await self._acquire(ip_cap, ip_identity)
+            if not allowed:
+                policy, identity = ip_cap, ip_identity
+        if ip_cap is None or allowed:
+            allowed, remaining, reset_after = await self._acquire(policy, identity)
+        headers = {
+            "X-RateLimit-Limit": str(policy.limit),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(reset_after),
+        }
+
+        if not allowed:
+            logger.warning(f"Rate limit exceeded ({policy.name}) for {identity}")
+            return JSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Too many requests. Please try again later.",
-                headers={"Retry-After": "60"},
+                content={"detail": "Too many requests. Please try again later."},
+                headers={**headers, "Retry-After": str(reset_after)},
             )
 
-        # Record request
-        await self._record_request(key)
-
-        return await call_next(request)  # type: ignore[no-any-return]
-
-    async def _is_rate_limited(self, key: str) -> bool:
-        """Check if key is rate limited."""
-        if self.redis_client:
-            try:
-                # Use Redis for distributed rate limiting
-                current = await self.redis_client.get(key)
-                if current:
-                    count = int(current)
-                    return count >= self.requests_per_minute
-                return False
-            except Exception as e:
-                logger.warning(f"Redis rate limit check failed: {e}, falling back to in-memory")
-                # Fallback to in-memory
-
-        # In-memory fallback
-        now = time.time()
-        if key not in self._cache:
-            return False
-
-        # Clean old entries (older than 1 minute)
-        self._cache[key] = [t for t in self._cache[key] if now - t < 60]
+        response: Response = await call_next(request)
+        response.headers.update(headers)
+        return response
 
-        return len(self._cache[key]) >= self.requests_per_minute
+    async def _acquire(self, policy: RateLimitPolicy, identity: str) -> tuple[bool, int, int]:
+        """Take one token for identity.
 
-    async def _record_request(self, key: str) -> None:
-        """Record a request for rate limiting."""
+        Returns:
+            (allowed, remaining, seconds until window reset)
+        """
         now = time.time()
-
+        window = int(now // policy.window)
+        reset_after = max(1, int((window + 1) * policy.window - now))
+        key = f"{RATE_LIMIT_KEY_PREFIX}{policy.name}:{identity}:{window}"
+
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            self._buckets.move_to_end(key)
+            if bucket.blocked:
+                return False, 0, reset_after
+            if bucket.tokens > 0:
+                # Served from local lease - no Redis round-trip
+                bucket.tokens -= 1
+                return True, max(0, policy.limit - bucket.total + bucket.tokens), reset_after
+
+        total = await self._incr(key, policy.lease, policy.window)
+        # Tokens of this lease that still fit under the limit
+        granted = min(policy.lease, policy.limit - (total - policy.lease))
+        if granted <= 0:
+            self._store_bucket(key, _Bucket(window, 0, total, blocked=True))
+            return False, 0, reset_after
+
+        bucket = _Bucket(window, granted - 1, total)
+        self._store_bucket(key, bucket)
+        return True, max(0, policy.limit - total + bucket.tokens), reset_after
+
+    def _store_bucket(self, key: str, bucket: _Bucket) -> None:
+        self._buckets[key] = bucket
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > MAX_LOCAL_BUCKETS:
+            self._buckets.popitem(last=False)
+
+    async def _incr(self, key: str, amount: int, window: int) -> int:
+        """Atomically add amount to window counter and return the new total."""
         if self.redis_client:
             try:
-                # Use Redis with expiration
-                # Check if key exists to determine if we need to set expiration
-                current = await self.redis_client.get(key)
-                if current is None:
-                    # First request - set with expiration
-                    await self.redis_client.setex(key, 60, "1")
-                else:
-                    # Increment existing counter
-                    # Upstash REST API doesn't support INCR directly, so we read-increment-write
-                    count = int(current) + 1
-                    await self.redis_client.setex(key, 60, str(count))
-                return
+                # INCRBY is atomic; EXPIRE in the same pipeline (single round-trip)
+                pipe = self.redis_client.pipeline()
+                pipe.incrby(key, amount)
+                pipe.expire(key, window + 1)
+                total, _ = await pipe.exec()
+                return int(total)
             except Exception as e:
-                logger.warning(f"Redis rate limit record failed: {e}, falling back to in-memory")
+                logger.warning(f"Redis rate limit failed: {e}, falling back to in-memory")
                 # Fallback to in-memory
 
-        # In-memory fallback
-        if key not in self._cache:
-            self._cache[key] = []
-
-        self._cache[key].append(now)
-
-        # Clean old entries
-        self._cache[key] = [t for t in self._cache[key] if now - t < 60]
+        # In-memory fallback (per instance, same window keys)
+        total = self._counters.get(key, 0) + amount
+        self._counters[key] = total
+        self._counters.move_to_end(key)
+        while len(self._counters) > MAX_LOCAL_BUCKETS:
+            self._counters.popitem(last=False)
+        return total
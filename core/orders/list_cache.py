@@ -0,0 +1,111 @@
+"""WebApp Orders List Cache.
+
+The Mini App polls GET /orders after every payment. Rendered pages are
+cached per user in one Redis hash (RedisKeys.orders_list_key) for
+TTL.ORDERS_LIST and dropped as a whole whenever one of the user's orders
+changes status (core.realtime.emit_order_status_change deletes the hash in
+the same pipeline as the realtime event), a new order is created, or any
+other write touches a listed field (payment_url, delivery, refund, reviews):
+those paths call invalidate_orders_list / invalidate_orders_lists_for.
+
+Each page is stored as two fields: its ETag and the encoded body, so an
+If-None-Match poll only reads the short ETag field.
+"""
+
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Any
+
+from core.db import TTL, RedisKeys, get_redis
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Telegram ID -> user UUID (immutable), so cached polls skip the users lookup
+MAX_CACHED_USER_IDS = 10000
+_user_ids: OrderedDict[int, str] = OrderedDict()
+
+
+def remember_user_id(telegram_id: int, user_id: str) -> None:
+    _user_ids[telegram_id] = user_id
+    _user_ids.move_to_end(telegram_id)
+    while len(_user_ids) > MAX_CACHED_USER_IDS:
+        _user_ids.popitem(last=False)
+
+
+def known_user_id(telegram_id: int) -> str | None:
+    return _user_ids.get(telegram_id)
+
+
+def page_key(status: str | None, limit: int, cursor: str | None, offset: int) -> str:
+    """Hash field suffix identifying one page of the list."""
+    position = f"c{cursor}" if cursor else f"o{offset}"
+    return f"{status or ''}|{limit}|{position}"
+
+
+def compute_etag(body: bytes) -> str:
+    """Strong ETag of an encoded response body."""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+async def get_cached_etag(user_id: str, page: str) -> str | None:
+    """Cached ETag of a page (None on miss or Redis error)."""
+    try:
+        value = await get_redis().hget(RedisKeys.orders_list_key(user_id), f"e:{page}")
+        return str(value) if value else None
+    except Exception as e:
+        logger.debug(f"Orders list cache read failed: {e}")
+        return None
+
+
+async def get_cached_page(user_id: str, page: str) -> tuple[str, bytes] | None:
+    """Cached (etag, body) of a page (None on miss or Redis error)."""
+    try:
+        etag, body = await get_redis().hmget(
+            RedisKeys.orders_list_key(user_id), f"e:{page}", f"b:{page}"
+        )
+        if not etag or body is None:
+            return None
+        return str(etag), str(body).encode("utf-8")
+    except Exception as e:
+        logger.debug(f"Orders list cache read failed: {e}")
+        return None
+
+
+async def cache_page(user_id: str, page: str, etag: str, body: bytes) -> None:
+    """Cache a rendered page (best-effort).
+
+    EXPIRE NX: the TTL starts with the first cached page, so later pages do
+    not extend the life of earlier ones.
+    """
+    try:
+        key = RedisKeys.orders_list_key(user_id)
+        pipe = get_redis().pipeline()
+        pipe.hset(key, values={f"e:{page}": etag, f"b:{page}": body.decode("utf-8")})
+        pipe.expire(key, TTL.ORDERS_LIST, nx=True)
+        await pipe.exec()
+    except Exception as e:
+        logger.debug(f"Orders list cache write failed: {e}")
+
+
+async def invalidate_orders_list(user_id: str) -> None:
+    """Drop a user's cached order pages (best-effort)."""
+    if not user_id:
+        return
+    try:
+        await get_redis().delete(RedisKeys.orders_list_key(user_id))
+    except Exception as e:
+        logger.warning(f"Failed to invalidate orders list cache: {e}")
+
+
+async def invalidate_orders_lists_for(rows: Any) -> None:
+    """Drop cached order pages of the owners of written order rows.
+
+    rows: result.data of an orders insert/update (each row carries user_id).
+    """
+    user_ids = {
+        str(row["user_id"]) for row in rows or [] if isinstance(row, dict) and row.get("user_id")
+    }
+    if user_ids:
+        await asyncio.gather(*(invalidate_orders_list(user_id) for user_id in user_ids))
@@ -0,0 +1,262 @@
+"""Transactional Outbox Drainer.
+
+confirm_order_payment (see status_service) changes order state and writes
+outbox_events rows in the same transaction. This module executes those side
+effects outside the webhook request:
+
+- claim_outbox_events hands out a batch (FOR UPDATE SKIP LOCKED with a
+  lease), so the QStash worker and the cron fallback can run concurrently.
+- Handlers run concurrently; finished rows are marked done with one update.
+- Failed rows go back to pending with backoff and end up 'failed' after
+  MAX_ATTEMPTS (visible in the table for manual replay).
+
+Handlers must be idempotent: a crashed drainer's rows are re-delivered
+after the lease expires.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+TOPIC_USER_NOTIFICATION = "payment.user_notification"
+TOPIC_ADMIN_ALERT = "payment.admin_alert"
+TOPIC_ORDER_EXPENSES = "order.expenses"
+TOPIC_REALTIME_ORDER_STATUS = "realtime.order_status"
+
+BATCH_SIZE = 100
+MAX_BATCHES = 10  # Per drain call (QStash/cron time budget)
+LEASE_SECS = 60
+MAX_ATTEMPTS = 5
+HANDLER_CONCURRENCY = 10
+RETRY_BASE_SECS = 30
+DONE_RETENTION_DAYS = 7
+
+OutboxHandler = Callable[[Any, dict[str, Any]], Awaitable[None]]
+
+
+# =============================================================================
+# Handlers
+# =============================================================================
+
+
+async def _notify_user(db: Any, payload: dict[str, Any]) -> None:
+    """Payment confirmation message to the buyer."""
+    telegram_id = payload.get("telegram_id")
+    if not telegram_id:
+        return
+
+    from core.routers.deps import get_notification_service
+
+    await get_notification_service().send_payment_confirmed(
+        telegram_id=int(telegram_id),
+        order_id=payload["order_id"],
+        amount=float(payload.get("amount") or 0),
+        currency=payload.get("currency") or "RUB",
+        status=payload.get("status") or "paid",
+        _has_instant_items=bool(payload.get("has_instant", True)),
+        _preorder_count=int(payload.get("preorder_count") or 0),
+    )
+
+
+def _display_amount(payload: dict[str, Any], currency: str) -> float:
+    """Amount for the admin alert (reduces cognitive complexity)."""
+    fiat_amount = payload.get("fiat_amount")
+    if fiat_amount is not None:
+        return float(fiat_amount)
+
+    amount = float(payload.get("amount") or 0)
+    if currency == "RUB" and amount < 10:
+        # Likely USD amount, convert roughly (best-effort)
+        from core.db import get_redis
+        from core.services.currency import get_currency_service
+
+        try:
+            return get_currency_service(get_redis()).convert_price(amount, currency)
+        except Exception:
+            pass  # Keep USD amount if conversion fails
+    return amount
+
+
+async def _alert_admins(db: Any, payload: dict[str, Any]) -> None:
+    """New paid order alert for admins."""
+    from core.services.admin_alerts import get_admin_alert_service
+
+    currency = payload.get("currency") or "RUB"
+    amount = _display_amount(payload, currency)
+
+    names = [str(name) for name in payload.get("products") or []]
+    product_display = ", ".join(names[:2]) if names else "Unknown"
+    if len(names) > 2:
+        product_display += f" +{len(names) - 2}"
+
+    await get_admin_alert_service().alert_new_order(
+        order_id=payload["order_id"],
+        amount=amount,
+        currency=currency,
+        user_telegram_id=int(payload.get("telegram_id") or 0),
+        username=payload.get("username"),
+        product_name=product_display,
+        quantity=int(payload.get("quantity") or 0),
+    )
+
+
+async def _create_expenses(db: Any, payload: dict[str, Any]) -> None:
+    """order_expenses row for accounting (calculate_order_expenses upserts)."""
+    order_id = payload["order_id"]
+    await db.client.rpc("calculate_order_expenses", {"p_order_id": order_id}).execute()
+
+    from core.realtime import emit_admin_accounting_update
+
+    await emit_admin_accounting_update("order_expenses_created", order_id=order_id)
+
+
+async def _emit_order_status(db: Any, payload: dict[str, Any]) -> None:
+    """Realtime order status + balance refresh for the buyer's WebApp."""
+    from core.realtime import emit_order_status_change, emit_profile_update
+
+    user_id = payload.get("user_id") or ""
+    status = payload.get("status") or ""
+    await emit_order_status_change(
+        payload["order_id"], user_id, status, status in ("delivered", "partial")
+    )
+    if user_id:
+        await emit_profile_update(user_id, {"balance_updated": True})
+
+
+_HANDLERS: dict[str, OutboxHandler] = {
+    TOPIC_USER_NOTIFICATION: _notify_user,
+    TOPIC_ADMIN_ALERT: _alert_admins,
+    TOPIC_ORDER_EXPENSES: _create_expenses,
+    TOPIC_REALTIME_ORDER_STATUS: _emit_order_status,
+}
+
+
+# =============================================================================
+# Drainer
+# =============================================================================
+
+
+async def _run_event(
+    db: Any, event: dict[str, Any], semaphore: asyncio.Semaphore
+) -> Exception | None:
+    """Run one event's handler. Returns the error, if any."""
+    handler = _HANDLERS.get(event.get("topic", ""))
+    if handler is None:
+        return LookupError(f"No outbox handler for topic {event.get('topic')!r}")
+    async with semaphore:
+        try:
+            await handler(db, event.get("payload") or {})
+            return None
+        except Exception as e:
+            return e
+
+
+async def _mark_failed(db: Any, event: dict[str, Any], error: Exception) -> bool:
+    """Schedule a retry with backoff, or give up. Returns True if given up."""
+    attempts = int(event.get("attempts") or 1)
+    give_up = attempts >= MAX_ATTEMPTS
+    update: dict[str, Any] = {"last_error": str(error)[:500], "locked_until": None}
+    if give_up:
+        update["status"] = "failed"
+    else:
+        delay = RETRY_BASE_SECS * (2 ** (attempts - 1))
+        update["status"] = "pending"
+        update["available_at"] = (datetime.now(UTC) + timedelta(seconds=delay)).isoformat()
+    await db.client.table("outbox_events").update(update).eq("id", event["id"]).execute()
+    return give_up
+
+
+async def _drain_batch(db: Any, events: list[dict[str, Any]]) -> tuple[int, int, int]:
+    """Execute a claimed batch. Returns (done, retrying, failed)."""
+    semaphore = asyncio.Semaphore(HANDLER_CONCURRENCY)
+    errors = await asyncio.gather(*(_run_event(db, event, semaphore) for event in events))
+
+    done_ids = [event["id"] for event, error in zip(events, errors, strict=True) if error is None]
+    if done_ids:
+        await (
+            db.client.table("outbox_events")
+            .update(
+                {
+                    "status": "done",
+                    "processed_at": datetime.now(UTC).isoformat(),
+                    "locked_until": None,
+                }
+            )
+            .in_("id", done_ids)
+            .execute()
+        )
+
+    retrying = failed = 0
+    for event, error in zip(events, errors, strict=True):
+        if error is None:
+            continue
+        logger.warning(
+            f"Outbox: {event.get('topic')} for {event.get('aggregate_id')} failed "
+            f"(attempt {event.get('attempts')}): {error}"
+        )
+        try:
+            if await _mark_failed(db, event, error):
+                failed += 1
+            else:
+                retrying += 1
+        except Exception as e:
+            # Lease expiry re-delivers the row anyway
+            logger.warning(f"Outbox: failed to record error for event {event.get('id')}: {e}")
+    return len(done_ids), retrying, failed
+
+
+async def drain_outbox(
+    db: Any, batch_size: int = BATCH_SIZE, max_batches: int = MAX_BATCHES
+) -> dict[str, int]:
+    """Drain due outbox events in batches.
+
+    Returns:
+        Counters: done, retrying, failed
+
+    """
+    totals = {"done": 0, "retrying": 0, "failed": 0}
+    for _ in range(max_batches):
+        result = await db.client.rpc(
+            "claim_outbox_events", {"p_limit": batch_size, "p_lease_secs": LEASE_SECS}
+        ).execute()
+        events = [row for row in result.data or [] if isinstance(row, dict)]
+        if not events:
+            break
+
+        done, retrying, failed = await _drain_batch(db, events)
+        totals["done"] += done
+        totals["retrying"] += retrying
+        totals["failed"] += failed
+
+        if len(events) < batch_size:
+            break
+
+    if any(totals.values()):
+        logger.info(
+            f"Outbox drained: done={totals['done']}, retrying={totals['retrying']}, "
+            f"failed={totals['failed']}"
+        )
+    return totals
+
+
+async def request_outbox_drain(key: str) -> None:
+    """Ask a worker to drain the outbox soon (best-effort).
+
+    The unified cron drains whatever a lost request leaves behind.
+    """
+    try:
+        from core.queue import WorkerEndpoints, publish_to_worker
+
+        await publish_to_worker(
+            endpoint=WorkerEndpoints.DRAIN_OUTBOX,
+            body={"key": key},
+            retries=2,
+            deduplication_id=f"outbox-{key}",
+        )
+    except Exception as e:
+        logger.warning(f"Outbox: failed to request drain for {key}: {e}")
@@ -146,28 +146,23 @@ def build_item_payload(
     return payload
 
 
+_ORDER_DATE_FIELDS = (
+    "created_at",
+    "delivered_at",
+    "expires_at",
+    "fulfillment_deadline",
+    "warranty_until",
+)
+
+
 # Helper: Format datetime fields (reduces cognitive complexity)
 def _format_order_dates(order: Any) -> dict[str, Any]:
-    """Format all datetime fields from order."""
-    return {
-        "created_at": order.created_at.isoformat() if order.created_at else None,
-        "delivered_at": (
-            order.delivered_at.isoformat()
-            if hasattr(order, "delivered_at") and order.delivered_at
-            else None
-        ),
-        "expires_at": order.expires_at.isoformat() if order.expires_at else None,
-        "fulfillment_deadline": (
-            order.fulfillment_deadline.isoformat()
-            if hasattr(order, "fulfillment_deadline") and order.fulfillment_deadline
-            else None
-        ),
-        "warranty_until": (
-            order.warranty_until.isoformat()
-            if hasattr(order, "warranty_until") and order.warranty_until
-            else None
-        ),
-    }
+    """Format all datetime fields from order (None when missing)."""
+    dates: dict[str, Any] = {}
+    for name in _ORDER_DATE_FIELDS:
+        value = getattr(order, name, None)
+        dates[name] = value.isoformat() if value else None
+    return dates
 
 
 # Helper: Add minor units (kopecks/cents) to payload (reduces cognitive complexity)
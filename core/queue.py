@@ -9,15 +9,25 @@ Used for critical operations that must be guaranteed to execute:
 """
 
 import asyncio
+import base64
+import hashlib
+import hmac
+import json
 import os
+from collections import OrderedDict
+from collections.abc import Callable, Coroutine, Iterable
+from dataclasses import dataclass
 from functools import wraps
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, cast
 
-from fastapi import HTTPException, Request
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
 
 from core.logging import get_logger
 
 if TYPE_CHECKING:
+    import httpx
     from qstash import QStash
 
 logger = get_logger(__name__)
@@ -30,6 +40,8 @@ QSTASH_CURRENT_SIGNING_KEY = os.environ.get("QSTASH_CURRENT_SIGNING_KEY", "")
 QSTASH_NEXT_SIGNING_KEY = os.environ.get("QSTASH_NEXT_SIGNING_KEY", "")
 WEBAPP_URL = os.environ.get("WEBAPP_URL", "")
 BASE_URL = os.environ.get("BASE_URL", "")
+# qstash | local | redis (see core/queue_backends.py)
+QUEUE_BACKEND = os.environ.get("QUEUE_BACKEND", "qstash").lower()
 
 
 # Singleton QStash client
@@ -39,7 +51,8 @@ _qstash_client: "QStash | None" = None
 def get_qstash() -> Any:
     """Get QStash client (singleton).
 
-    Returns QStash client for publishing messages to worker endpoints.
+    Returns the sync QStash SDK client. Publishing goes through the async
+    REST client below (publish_to_worker / publish_batch).
     """
     global _qstash_client
 
@@ -78,6 +91,172 @@ def get_base_url() -> str:
     return "http://localhost:8000"
 
 
+# ==================== Async publisher ====================
+
+# QStash accepts up to 100 messages per /v2/batch request
+QSTASH_BATCH_SIZE = 100
+# Parallel single publishes when a batch request fails
+PUBLISH_CONCURRENCY = 10
+# Upstash-Retries: Free tier allows 3, stay conservative
+MAX_RETRIES = 2
+
+_http_client: "httpx.AsyncClient | None" = None
+
+
+def get_qstash_http_client() -> "httpx.AsyncClient":
+    """Pooled async HTTP client for the QStash REST API (singleton)."""
+    global _http_client
+    if _http_client is None:
+        if not QSTASH_TOKEN:
+            msg = "QSTASH_TOKEN must be set"
+            raise ValueError(msg)
+
+        import httpx
+
+        _http_client = httpx.AsyncClient(
+            base_url=QSTASH_URL.rstrip("/"),
+            headers={"Authorization": f"Bearer {QSTASH_TOKEN}"},
+            timeout=httpx.Timeout(15.0, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=PUBLISH_CONCURRENCY * 2,
+                max_keepalive_connections=PUBLISH_CONCURRENCY,
+            ),
+        )
+    return _http_client
+
+
+async def close_qstash_http_client() -> None:
+    """Close the pooled QStash HTTP client (app shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        try:
+            await _http_client.aclose()
+        finally:
+            _http_client = None
+
+
+@dataclass(slots=True)
+class QStashMessage:
+    """One message for publish_batch."""
+
+    endpoint: str
+    body: dict[str, Any]
+    retries: int = 0
+    delay: int | None = None
+    deduplication_id: str | None = None
+    queue: str | None = None
+
+    def headers(self) -> dict[str, str]:
+        headers = {
+            "Content-Type": "application/json",
+            "Upstash-Retries": str(min(self.retries, MAX_RETRIES)),
+        }
+        if self.delay:
+            headers["Upstash-Delay"] = f"{self.delay}s"
+        if self.deduplication_id:
+            headers["Upstash-Deduplication-Id"] = self.deduplication_id
+        return headers
+
+    def destination(self) -> str:
+        return f"{get_base_url()}{self.endpoint}"
+
+
+def _publish_result(item: Any) -> dict[str, Any]:
+    """Normalize one QStash response item to {"message_id", "queued"[, "error"]}."""
+    if isinstance(item, dict) and item.get("messageId"):
+        return {"message_id": item["messageId"], "queued": True}
+    error = item.get("error") if isinstance(item, dict) else None
+    return {"message_id": None, "queued": False, "error": error or str(item)}
+
+
+async def _publish_one(message: QStashMessage) -> dict[str, Any]:
+    """Publish (or enqueue) a single message. Raises on HTTP errors."""
+    client = get_qstash_http_client()
+    if message.queue:
+        path = f"/v2/enqueue/{message.queue}/{message.destination()}"
+    else:
+        path = f"/v2/publish/{message.destination()}"
+    resp = await client.post(path, content=json.dumps(message.body), headers=message.headers())
+    resp.raise_for_status()
+    return _publish_result(resp.json())
+
+
+async def _publish_chunk(messages: list[QStashMessage]) -> list[dict[str, Any]]:
+    """Publish up to QSTASH_BATCH_SIZE messages in one /v2/batch request."""
+    payload = []
+    for m in messages:
+        item: dict[str, Any] = {
+            "destination": m.destination(),
+            "headers": m.headers(),
+            "body": json.dumps(m.body),
+        }
+        if m.queue:
+            item["queue"] = m.queue
+        payload.append(item)
+
+    resp = await get_qstash_http_client().post("/v2/batch", json=payload)
+    resp.raise_for_status()
+    data = resp.json()
+    if not isinstance(data, list) or len(data) != len(messages):
+        msg = f"Unexpected /v2/batch response: {str(data)[:200]}"
+        raise ValueError(msg)
+    return [_publish_result(item) for item in data]
+
+
+async def _publish_each(messages: list[QStashMessage]) -> list[dict[str, Any]]:
+    """Fallback: publish messages one by one with bounded concurrency."""
+    semaphore = asyncio.Semaphore(PUBLISH_CONCURRENCY)
+
+    async def publish(message: QStashMessage) -> dict[str, Any]:
+        async with semaphore:
+            try:
+                return await _publish_one(message)
+            except Exception as e:
+                return {"message_id": None, "queued": False, "error": str(e)}
+
+    return list(await asyncio.gather(*(publish(m) for m in messages)))
+
+
+async def publish_batch(messages: list[QStashMessage]) -> list[dict[str, Any]]:
+    """Publish many messages through the configured queue backend.
+
+    See _qstash_publish_batch for the QStash behaviour; other backends
+    (QUEUE_BACKEND=local|redis) return results in the same shape.
+    """
+    if QUEUE_BACKEND != "qstash":
+        from core.queue_backends import get_queue_backend
+
+        return await get_queue_backend().publish(messages)
+    return await _qstash_publish_batch(messages)
+
+
+async def _qstash_publish_batch(messages: list[QStashMessage]) -> list[dict[str, Any]]:
+    """Publish many messages with as few HTTP requests as possible.
+
+    Messages are sent in /v2/batch requests of QSTASH_BATCH_SIZE. If a batch
+    request fails as a whole, its messages are published individually
+    (PUBLISH_CONCURRENCY at a time). Deduplication IDs make such a retry
+    safe if the failed batch was in fact accepted.
+
+    Returns:
+        One {"message_id", "queued"[, "error"]} dict per message, in order.
+        Never raises.
+
+    """
+    results: list[dict[str, Any]] = []
+    for i in range(0, len(messages), QSTASH_BATCH_SIZE):
+        chunk = messages[i : i + QSTASH_BATCH_SIZE]
+        try:
+            results.extend(await _publish_chunk(chunk))
+        except Exception as e:
+            logger.warning(
+                f"QStash batch publish failed ({type(e).__name__}: {e}), "
+                f"publishing {len(chunk)} messages individually"
+            )
+            results.extend(await _publish_each(chunk))
+    return results
+
+
 async def publish_to_worker(
     endpoint: str,
     body: dict[str, Any],
@@ -90,7 +269,9 @@ async def publish_to_worker(
     Args:
         endpoint: Worker endpoint path (e.g., "/api/workers/deliver-goods")
         body: JSON body to send to the worker
-        retries: Number of retry attempts on failure (default: 3)
+        retries: Number of retry attempts on failure (default 0, capped at 2).
+            Only pass retries for idempotent workers (deliver-goods, referral):
+            a redelivery re-runs the whole handler.
         delay: Delay in seconds before processing (optional)
         deduplication_id: ID to prevent duplicate processing (optional)
 
@@ -101,33 +282,15 @@ async def publish_to_worker(
         await publish_to_worker(
             endpoint="/api/workers/deliver-goods",
             body={"order_id": "123", "user_id": "456"},
-            retries=3
+            retries=2
         )
 
     """
-    qstash = get_qstash()
-    base_url = get_base_url()
-    url = f"{base_url}{endpoint}"
-
-    # Build headers
-    headers = {}
-    if deduplication_id:
-        headers["Upstash-Deduplication-Id"] = deduplication_id
-
-    # Cap retries at 2 for Free tier safety (limit is 3, but be conservative)
-    safe_retries = min(retries, 2)
-
+    message = QStashMessage(endpoint, body, retries, delay, deduplication_id)
     try:
-        # Wrap sync QStash call in asyncio.to_thread for async execution
-        result = await asyncio.to_thread(
-            qstash.message.publish_json,
-            url=url,
-            body=body,
-            retries=safe_retries,
-            delay=f"{delay}s" if delay else None,
-            headers=headers if headers else None,
-        )
-        return {"message_id": result.message_id, "queued": True}
+        if QUEUE_BACKEND != "qstash":
+            return (await publish_batch([message]))[0]
+        return await _publish_one(message)
     except Exception as e:
         # Log error but don't raise - let caller handle fallback
         logger.exception("QStash publish failed")
@@ -152,24 +315,137 @@ async def publish_to_queue(
         QStash enqueue response
 
     """
-    qstash = get_qstash()
-    base_url = get_base_url()
-    url = f"{base_url}{endpoint}"
+    message = QStashMessage(endpoint, body, deduplication_id=deduplication_id, queue=queue_name)
+    if QUEUE_BACKEND != "qstash":
+        result = (await publish_batch([message]))[0]
+    else:
+        result = await _publish_one(message)
+    return {"message_id": result["message_id"]}
+
+
+# Message IDs remembered per instance after a successful delivery
+MAX_COMPLETED_MESSAGE_IDS = 10_000
+
+
+class QStashSignatureError(Exception):
+    """QStash signature is missing, expired or does not match."""
+
+
+class QStashVerifier:
+    """Long-lived QStash signature verifier.
+
+    Decodes the JWT once (current key, then next key only if the signature
+    itself did not match), hashes the body once and accepts the request if
+    the `sub` claim equals any of the given URL variants.
+
+    Also remembers message IDs of successfully processed deliveries (bounded
+    LRU), so redeliveries of already handled messages can be acknowledged
+    without running the worker again.
+    """
+
+    def __init__(
+        self,
+        current_signing_key: str,
+        next_signing_key: str = "",
+        clock_tolerance: int = 0,
+        max_completed: int = MAX_COMPLETED_MESSAGE_IDS,
+    ) -> None:
+        self._keys = tuple(k for k in (current_signing_key, next_signing_key) if k)
+        self._clock_tolerance = clock_tolerance
+        self._max_completed = max_completed
+        self._completed: OrderedDict[str, None] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._keys)
+
+    def _decode(self, signature: str) -> dict[str, Any]:
+        import jwt
+
+        for key in self._keys:
+            try:
+                return cast(
+                    dict[str, Any],
+                    jwt.decode(
+                        signature,
+                        key,
+                        algorithms=["HS256"],
+                        issuer="Upstash",
+                        leeway=self._clock_tolerance,
+                        options={"require": ["iss", "sub", "exp", "nbf"]},
+                    ),
+                )
+            except jwt.InvalidSignatureError:
+                continue  # Signed with the other key (rotation)
+            except jwt.PyJWTError as e:
+                raise QStashSignatureError(f"Invalid signature: {type(e).__name__}") from e
+        raise QStashSignatureError("Signature does not match any signing key")
+
+    def verify(self, body: bytes, signature: str, urls: Iterable[str]) -> dict[str, Any]:
+        """Verify signature against the body and any accepted URL variant.
+
+        Returns:
+            Decoded JWT claims (empty dict if verification is disabled)
+
+        Raises:
+            QStashSignatureError: If the signature is invalid
+        """
+        if not self.enabled:
+            return {}
+        if not signature:
+            raise QStashSignatureError("Missing signature")
+
+        claims = self._decode(signature)
+        accepted = {u for u in urls if u}
+        if accepted and claims.get("sub") not in accepted:
+            raise QStashSignatureError(f"Invalid subject: {claims.get('sub')}")
+
+        body_hash = base64.urlsafe_b64encode(hashlib.sha256(body).digest()).decode().rstrip("=")
+        if not hmac.compare_digest(str(claims.get("body", "")).rstrip("="), body_hash):
+            raise QStashSignatureError("Body hash mismatch")
+        return claims
+
+    # ==================== Completed deliveries ====================
 
-    # Wrap sync QStash call in asyncio.to_thread for async execution
-    result = await asyncio.to_thread(
-        qstash.message.enqueue_json,
-        queue=queue_name,
-        url=url,
-        body=body,
-        deduplication_id=deduplication_id,
-    )
+    def is_completed(self, message_id: str | None) -> bool:
+        return bool(message_id) and message_id in self._completed
 
-    return {"message_id": result.message_id}
+    def mark_completed(self, message_id: str | None) -> None:
+        if not message_id:
+            return
+        self._completed[message_id] = None
+        self._completed.move_to_end(message_id)
+        while len(self._completed) > self._max_completed:
+            self._completed.popitem(last=False)
+
+
+_verifier: QStashVerifier | None = None
+
+
+def get_qstash_verifier() -> QStashVerifier:
+    """Get the process-wide QStash verifier (singleton)."""
+    global _verifier
+    if _verifier is None:
+        _verifier = QStashVerifier(QSTASH_CURRENT_SIGNING_KEY, QSTASH_NEXT_SIGNING_KEY)
+    return _verifier
+
+
+def qstash_url_variants(request: Request) -> list[str]:
+    """URLs a QStash message for this request may have been signed for.
+
+    Vercel may rewrite the URL, so accept the original URL, the URL without
+    query params and the production URL (WEBAPP_URL) with the same path.
+    """
+    url = str(request.url)
+    variants = [url, url.split("?")[0]]
+    if WEBAPP_URL:
+        host = WEBAPP_URL.replace("https://", "").replace("http://", "").rstrip("/")
+        variants.append(f"https://{host}{request.url.path}")
+    return variants
 
 
 def verify_qstash_signature(body: bytes, signature: str, url: str = "") -> bool:
-    """Verify QStash webhook signature using QStash Receiver.
+    """Verify QStash webhook signature.
 
     Args:
         body: Raw request body bytes
@@ -180,36 +456,20 @@ def verify_qstash_signature(body: bytes, signature: str, url: str = "") -> bool:
         True if signature is valid
 
     """
-    if not QSTASH_CURRENT_SIGNING_KEY:
+    verifier = get_qstash_verifier()
+    if not verifier.enabled:
         # Skip verification in development
         logger.warning("QStash: No signing key configured, skipping verification")
         return True
 
+    # QStash JWT signature includes URL without query parameters
+    url_for_verification = url.split("?")[0]
     try:
-        from qstash import Receiver
-
-        receiver = Receiver(
-            current_signing_key=QSTASH_CURRENT_SIGNING_KEY,
-            next_signing_key=QSTASH_NEXT_SIGNING_KEY or "",
-        )
-
-        # QStash JWT signature includes URL without query parameters
-        # Remove query params before verification
-        url_for_verification = url.split("?")[0]
-
-        # Verify signature (QStash uses JWT which includes URL)
-        receiver.verify(
-            body=body.decode("utf-8") if isinstance(body, bytes) else body,
-            signature=signature,
-            url=url_for_verification,
-        )
+        verifier.verify(body, signature, [url, url_for_verification])
         return True
-    except Exception:
+    except QStashSignatureError as e:
         # Log error without exposing cryptographic secrets
-        logger.exception(
-            f"QStash signature verification failed "
-            f"[url={url}, has_key={bool(QSTASH_CURRENT_SIGNING_KEY)}, has_sig={bool(signature)}]",
-        )
+        logger.warning(f"QStash signature verification failed [url={url}]: {e}")
         return False
 
 
@@ -227,49 +487,50 @@ async def verify_qstash_request(request: Request) -> dict[str, Any]:
     """
     signature = request.headers.get("Upstash-Signature", "")
     body = await request.body()
+    verifier = get_qstash_verifier()
 
-    # Build full URL for verification (QStash JWT includes URL)
-    # IMPORTANT: Vercel may change URL format, so we try multiple variants
-    url = str(request.url)
+    if not verifier.enabled:
+        logger.warning("QStash: No signing key configured, skipping verification")
+    else:
+        # One JWT decode and one body hash, matched against all URL variants
+        try:
+            verifier.verify(body, signature, qstash_url_variants(request))
+        except QStashSignatureError:
+            logger.exception(f"QStash verification FAILED. Original URL: {request.url}")
+            raise HTTPException(status_code=401, detail="Invalid QStash signature")
 
-    logger.info(f"QStash verify: url={url}, has_signature={bool(signature)}, body_len={len(body)}")
+    try:
+        data = json.loads(body) if body else {}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    return data if isinstance(data, dict) else {}
 
-    # Try verification with original URL first
-    if verify_qstash_signature(body, signature, url):
-        import json
 
-        data = json.loads(body)
-        if isinstance(data, dict):
-            return data
-        return {}
+class QStashRoute(APIRoute):
+    """Route class for QStash worker endpoints.
 
-    # Try without query params (QStash may not include them)
-    url_no_query = url.split("?")[0]
-    if url_no_query != url and verify_qstash_signature(body, signature, url_no_query):
-        logger.info("QStash verified with URL without query params")
-        import json
+    Redeliveries of a message this instance already processed successfully
+    (same Upstash-Message-Id) are acknowledged with 200 before the handler
+    runs. A message ID is recorded only after a 2xx response, so retries of
+    failed deliveries still execute.
+    """
 
-        data = json.loads(body)
-        if isinstance(data, dict):
-            return data
-        return {}
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
 
-    # Try with production URL (WEBAPP_URL)
-    if WEBAPP_URL:
-        path = request.url.path
-        prod_url = f"https://{WEBAPP_URL.replace('https://', '').replace('http://', '')}{path}"
-        if verify_qstash_signature(body, signature, prod_url):
-            logger.info(f"QStash verified with production URL: {prod_url}")
-            import json
-
-            data = json.loads(body)
-            if isinstance(data, dict):
-                return data
-            return {}
+        async def route_handler(request: Request) -> Response:
+            message_id = request.headers.get("Upstash-Message-Id")
+            verifier = get_qstash_verifier()
+            if verifier.is_completed(message_id):
+                logger.info(f"QStash redelivery of completed message {message_id}, skipping")
+                return JSONResponse({"success": True, "duplicate": True})
+
+            response = await handler(request)
+            if 200 <= response.status_code < 300:
+                verifier.mark_completed(message_id)
+            return response
 
-    # All verification attempts failed
-    logger.error(f"QStash verification FAILED for all URL variants. Original URL: {url}")
-    raise HTTPException(status_code=401, detail="Invalid QStash signature")
+        return route_handler
 
 
 def qstash_protected(func: Any) -> Any:
@@ -310,3 +571,4 @@ class WorkerEndpoints:
     PROCESS_REFUND = "/api/workers/process-refund"
     PROCESS_REPLACEMENT = "/api/workers/process-replacement"
     PROCESS_REVIEW_CASHBACK = "/api/workers/process-review-cashback"
+    DRAIN_OUTBOX = "/api/workers/drain-outbox"
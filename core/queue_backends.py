@@ -0,0 +1,427 @@
+"""Queue Backends - where publish_to_worker / publish_to_queue send jobs.
+
+Selected with QUEUE_BACKEND:
+- "qstash" (default): hosted QStash, workers are called over HTTPS.
+- "local": in-process asyncio runner (delays, retries, deduplication IDs,
+  bounded concurrency). For local development, load tests and single-box
+  deployments.
+- "redis": jobs are pushed to a Redis list and consumed by runners started
+  in the app lifespan (QUEUE_REDIS_CONSUMER=1) on any instance.
+
+Local and Redis runners call the same worker routes (WorkerEndpoints) as
+QStash does: in-process through ASGI when the app is registered
+(start_queue_backend), over HTTP to get_base_url() otherwise. Requests are
+signed with QSTASH_CURRENT_SIGNING_KEY the way QStash signs them, so
+signature checks and QStashRoute behave exactly as in production.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from core.logging import get_logger
+from core.queue import (
+    MAX_RETRIES,
+    QSTASH_CURRENT_SIGNING_KEY,
+    QUEUE_BACKEND,
+    QStashMessage,
+    get_base_url,
+)
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = get_logger(__name__)
+
+QUEUE_CONCURRENCY = int(os.environ.get("QUEUE_CONCURRENCY", "8"))
+QUEUE_REDIS_CONSUMER = os.environ.get("QUEUE_REDIS_CONSUMER", "") == "1"
+
+BACKEND_QSTASH = "qstash"
+BACKEND_LOCAL = "local"
+BACKEND_REDIS = "redis"
+
+# Same window QStash uses for Upstash-Deduplication-Id
+DEDUP_WINDOW_SECS = 600
+MAX_DEDUP_IDS = 50_000
+# Backoff between attempts: min(RETRY_BASE_SECS * 2^attempt, RETRY_MAX_SECS)
+RETRY_BASE_SECS = 1.0
+RETRY_MAX_SECS = 60.0
+# Worker call timeout (Vercel function limit)
+DISPATCH_TIMEOUT_SECS = 60.0
+
+# Redis keys
+REDIS_READY_KEY = "queue:jobs"
+REDIS_DELAYED_KEY = "queue:delayed"
+REDIS_DEDUP_PREFIX = "queue:dedup:"
+REDIS_POLL_INTERVAL_SECS = 0.5
+
+
+@dataclass(slots=True)
+class Job:
+    """A queued worker call."""
+
+    endpoint: str
+    body: dict[str, Any]
+    retries: int = 0
+    queue: str | None = None
+    message_id: str = field(default_factory=lambda: f"msg_local_{uuid.uuid4().hex}")
+    attempt: int = 0
+
+    @classmethod
+    def from_message(cls, message: QStashMessage) -> "Job":
+        return cls(
+            endpoint=message.endpoint,
+            body=message.body,
+            retries=min(message.retries, MAX_RETRIES),
+            queue=message.queue,
+        )
+
+
+# ==================== Dispatch ====================
+
+
+def _sign(body: bytes, url: str) -> str:
+    """QStash-style JWT for a request (empty if signing is not configured)."""
+    if not QSTASH_CURRENT_SIGNING_KEY:
+        return ""
+    import jwt
+
+    now = int(time.time())
+    claims = {
+        "iss": "Upstash",
+        "sub": url,
+        "iat": now,
+        "nbf": now,
+        "exp": now + 300,
+        "jti": uuid.uuid4().hex,
+        "body": base64.urlsafe_b64encode(hashlib.sha256(body).digest()).decode().rstrip("="),
+    }
+    return jwt.encode(claims, QSTASH_CURRENT_SIGNING_KEY, algorithm="HS256")
+
+
+class WorkerDispatcher:
+    """Calls worker routes like QStash does (signed POST with message headers)."""
+
+    def __init__(self) -> None:
+        self._app: Any = None
+        self._client: httpx.AsyncClient | None = None
+
+    def set_app(self, app: Any) -> None:
+        """Dispatch in-process to this ASGI app instead of over HTTP."""
+        self._app = app
+        self._client = None
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        if self._client is None:
+            import httpx
+
+            transport = httpx.ASGITransport(app=self._app) if self._app is not None else None
+            self._client = httpx.AsyncClient(
+                base_url=get_base_url(),
+                transport=transport,
+                timeout=DISPATCH_TIMEOUT_SECS,
+            )
+        return self._client
+
+    async def dispatch(self, job: Job) -> bool:
+        """Call the worker once. Returns True on a 2xx response."""
+        body = json.dumps(job.body).encode()
+        url = f"{get_base_url()}{job.endpoint}"
+        headers = {
+            "Content-Type": "application/json",
+            "Upstash-Message-Id": job.message_id,
+            "Upstash-Retried": str(job.attempt),
+        }
+        signature = _sign(body, url)
+        if signature:
+            headers["Upstash-Signature"] = signature
+        try:
+            resp = await self.client.post(job.endpoint, content=body, headers=headers)
+        except Exception as e:
+            logger.warning(f"Queue: {job.endpoint} ({job.message_id}) failed: {e}")
+            return False
+        if resp.status_code >= 300:
+            logger.warning(
+                f"Queue: {job.endpoint} ({job.message_id}) returned {resp.status_code}"
+            )
+            return False
+        return True
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def _retry_delay(attempt: int) -> float:
+    return min(RETRY_BASE_SECS * (2**attempt), RETRY_MAX_SECS)
+
+
+class _DedupWindow:
+    """Deduplication IDs seen in the last DEDUP_WINDOW_SECS (bounded)."""
+
+    def __init__(self) -> None:
+        self._seen: OrderedDict[str, float] = OrderedDict()
+
+    def add(self, dedup_id: str | None) -> bool:
+        """Remember the ID. Returns False if it was seen within the window."""
+        if not dedup_id:
+            return True
+        now = time.monotonic()
+        while self._seen:
+            oldest_id, seen_at = next(iter(self._seen.items()))
+            if now - seen_at < DEDUP_WINDOW_SECS and len(self._seen) < MAX_DEDUP_IDS:
+                break
+            self._seen.pop(oldest_id)
+        if dedup_id in self._seen:
+            return False
+        self._seen[dedup_id] = now
+        return True
+
+
+# ==================== Backends ====================
+
+
+class QueueBackend(ABC):
+    """Base backend: publishes messages, optionally runs consumers."""
+
+    name = ""
+
+    @abstractmethod
+    async def publish(self, messages: list[QStashMessage]) -> list[dict[str, Any]]:
+        """Publish messages, one result dict per message (same order)."""
+
+    async def start(self) -> None:  # noqa: B027 - optional hook, no-op by default
+        """Start consumers (app startup)."""
+
+    async def stop(self) -> None:  # noqa: B027 - optional hook, no-op by default
+        """Stop consumers (app shutdown)."""
+
+
+class QStashBackend(QueueBackend):
+    """Hosted QStash (batch API)."""
+
+    name = BACKEND_QSTASH
+
+    async def publish(self, messages: list[QStashMessage]) -> list[dict[str, Any]]:
+        from core.queue import _qstash_publish_batch
+
+        return await _qstash_publish_batch(messages)
+
+
+class _RunnerBase(QueueBackend):
+    """Shared job execution: concurrency limit, per-queue ordering, retries."""
+
+    def __init__(self, concurrency: int = QUEUE_CONCURRENCY) -> None:
+        self.dispatcher = WorkerDispatcher()
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        # QStash queues deliver one message at a time (parallelism 1)
+        self._queue_locks: dict[str, asyncio.Lock] = {}
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    def _spawn(self, coro: Any) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _execute(self, job: Job) -> bool:
+        """Run one attempt. Returns True when the job is finished (success or out of retries)."""
+        lock = self._queue_locks.setdefault(job.queue, asyncio.Lock()) if job.queue else None
+        async with self._semaphore:
+            if lock is not None:
+                async with lock:
+                    ok = await self.dispatcher.dispatch(job)
+            else:
+                ok = await self.dispatcher.dispatch(job)
+        if ok:
+            return True
+        if job.attempt >= job.retries:
+            logger.error(
+                f"Queue: {job.endpoint} ({job.message_id}) failed after {job.attempt + 1} attempts"
+            )
+            return True
+        return False
+
+    async def stop(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.dispatcher.aclose()
+
+
+class LocalBackend(_RunnerBase):
+    """In-process asyncio runner."""
+
+    name = BACKEND_LOCAL
+
+    def __init__(self, concurrency: int = QUEUE_CONCURRENCY) -> None:
+        super().__init__(concurrency)
+        self._dedup = _DedupWindow()
+
+    async def _run(self, job: Job, delay: float) -> None:
+        while True:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if await self._execute(job):
+                return
+            delay = _retry_delay(job.attempt)
+            job.attempt += 1
+
+    async def publish(self, messages: list[QStashMessage]) -> list[dict[str, Any]]:
+        results: list[dict[str, Any]] = []
+        for message in messages:
+            if not self._dedup.add(message.deduplication_id):
+                results.append({"message_id": None, "queued": True, "deduplicated": True})
+                continue
+            job = Job.from_message(message)
+            self._spawn(self._run(job, float(message.delay or 0)))
+            results.append({"message_id": job.message_id, "queued": True})
+        return results
+
+    async def drain(self) -> None:
+        """Wait until all scheduled jobs (including retries) are finished."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+
+class RedisListBackend(_RunnerBase):
+    """Jobs in a Redis list (delayed ones in a sorted set), consumed by polling runners."""
+
+    name = BACKEND_REDIS
+
+    def __init__(self, redis: Any, concurrency: int = QUEUE_CONCURRENCY) -> None:
+        super().__init__(concurrency)
+        self.redis = redis
+        self._consumer: asyncio.Task[None] | None = None
+        # Jobs popped but not finished - the consumer stops popping at the limit
+        self._inflight = asyncio.Semaphore(max(1, concurrency))
+
+    async def _push(self, job: Job, delay: float) -> None:
+        payload = json.dumps(asdict(job))
+        if delay > 0:
+            await self.redis.zadd(REDIS_DELAYED_KEY, {payload: time.time() + delay})
+        else:
+            await self.redis.lpush(REDIS_READY_KEY, payload)
+
+    async def publish(self, messages: list[QStashMessage]) -> list[dict[str, Any]]:
+        results: list[dict[str, Any]] = []
+        for message in messages:
+            if message.deduplication_id and not await self.redis.set(
+                f"{REDIS_DEDUP_PREFIX}{message.deduplication_id}",
+                "1",
+                ex=DEDUP_WINDOW_SECS,
+                nx=True,
+            ):
+                results.append({"message_id": None, "queued": True, "deduplicated": True})
+                continue
+            job = Job.from_message(message)
+            try:
+                await self._push(job, float(message.delay or 0))
+                results.append({"message_id": job.message_id, "queued": True})
+            except Exception as e:
+                logger.exception("Queue: Redis push failed")
+                results.append({"message_id": None, "queued": False, "error": str(e)})
+        return results
+
+    async def _promote_delayed(self) -> None:
+        """Move due delayed jobs to the ready list (ZREM guards against double moves)."""
+        due = await self.redis.zrangebyscore(REDIS_DELAYED_KEY, 0, time.time())
+        for payload in due or []:
+            if await self.redis.zrem(REDIS_DELAYED_KEY, payload):
+                await self.redis.lpush(REDIS_READY_KEY, payload)
+
+    async def _handle(self, job: Job) -> None:
+        try:
+            if not await self._execute(job):
+                delay = _retry_delay(job.attempt)
+                job.attempt += 1
+                await self._push(job, delay)
+        except Exception:
+            logger.exception(f"Queue: job {job.message_id} crashed")
+        finally:
+            self._inflight.release()
+
+    async def _consume(self) -> None:
+        while True:
+            await self._inflight.acquire()
+            try:
+                await self._promote_delayed()
+                payload = await self.redis.rpop(REDIS_READY_KEY)
+            except asyncio.CancelledError:
+                self._inflight.release()
+                raise
+            except Exception:
+                self._inflight.release()
+                logger.exception("Queue: Redis consumer error")
+                await asyncio.sleep(REDIS_POLL_INTERVAL_SECS * 4)
+                continue
+            if payload is None:
+                self._inflight.release()
+                await asyncio.sleep(REDIS_POLL_INTERVAL_SECS)
+                continue
+            try:
+                job = Job(**json.loads(payload))
+            except (TypeError, ValueError):
+                self._inflight.release()
+                logger.exception(f"Queue: dropping malformed job {str(payload)[:200]}")
+                continue
+            self._spawn(self._handle(job))
+
+    async def start(self) -> None:
+        if QUEUE_REDIS_CONSUMER and self._consumer is None:
+            self._consumer = asyncio.create_task(self._consume())
+            logger.info(f"Queue: Redis consumer started (concurrency={QUEUE_CONCURRENCY})")
+
+    async def stop(self) -> None:
+        if self._consumer is not None:
+            self._consumer.cancel()
+            await asyncio.gather(self._consumer, return_exceptions=True)
+            self._consumer = None
+        await super().stop()
+
+
+_backend: QueueBackend | None = None
+
+
+def get_queue_backend() -> QueueBackend:
+    """Get the configured queue backend (singleton)."""
+    global _backend
+    if _backend is None:
+        if QUEUE_BACKEND == BACKEND_LOCAL:
+            _backend = LocalBackend()
+        elif QUEUE_BACKEND == BACKEND_REDIS:
+            from core.db import get_redis
+
+            _backend = RedisListBackend(get_redis())
+        else:
+            if QUEUE_BACKEND != BACKEND_QSTASH:
+                logger.warning(f"Unknown QUEUE_BACKEND={QUEUE_BACKEND!r}, using QStash")
+            _backend = QStashBackend()
+    return _backend
+
+
+async def start_queue_backend(app: Any) -> None:
+    """Register the app for in-process dispatch and start consumers."""
+    backend = get_queue_backend()
+    if isinstance(backend, _RunnerBase):
+        backend.dispatcher.set_app(app)
+    await backend.start()
+    logger.info(f"Queue backend: {backend.name}")
+
+
+async def stop_queue_backend() -> None:
+    """Stop consumers and pending local jobs."""
+    global _backend
+    if _backend is not None:
+        await _backend.stop()
+        _backend = None
@@ -10,7 +10,7 @@ compatibility with Upstash REST API and history/replay support.
 import json
 from typing import Any
 
-from core.db import get_redis
+from core.db import RedisKeys, get_redis
 from core.logging import get_logger
 
 logger = get_logger(__name__)
@@ -24,6 +24,32 @@ _STREAM_PREFIX_ADMIN_ORDERS = "stream:realtime:admin:orders"
 _STREAM_PREFIX_ADMIN_ACCOUNTING = "stream:realtime:admin:accounting"
 _STREAM_PREFIX_LEADERBOARD = "stream:realtime:leaderboard"
 
+# Stream retention (approximate MAXLEN, trimmed on every XADD).
+# Clients only replay the tail on connect, so older entries are never read back.
+# Approximate trimming ("~") lets Redis drop whole macro-nodes, keeping XADD O(1).
+STREAM_MAXLEN_USER = 100  # Per-user profile/orders streams
+STREAM_MAXLEN_BROADCAST = 1000  # Admin and leaderboard streams (shared by all clients)
+# Events per pipeline exec in bulk emits (keeps each Upstash request body small)
+PIPELINE_CHUNK_SIZE = 500
+
+
+async def _xadd(stream_key: str, payload: dict[str, Any], maxlen: int) -> str:
+    """Append event to a stream with bounded retention.
+
+    Args:
+        stream_key: Stream key name
+        payload: Event payload (serialized into the "data" field)
+        maxlen: Approximate maximum number of entries kept in the stream
+
+    Returns:
+        Entry ID assigned by Redis
+    """
+    redis = get_redis()
+    entry_id = await redis.xadd(
+        stream_key, "*", {"data": json.dumps(payload)}, maxlen=maxlen, approximate_trim=True
+    )
+    return str(entry_id)
+
 
 async def emit_profile_update(user_id: str, data: dict[str, Any]) -> None:
     """Emit profile.updated event for a user.
@@ -33,14 +59,13 @@ async def emit_profile_update(user_id: str, data: dict[str, Any]) -> None:
         data: Profile data (balance, turnover, etc.)
     """
     try:
-        redis = get_redis()
         stream_key = f"{_STREAM_PREFIX_PROFILE}{user_id}"
         payload = {
             "event": "profile.updated",
             "user_id": user_id,
             "data": data,
         }
-        await redis.xadd(stream_key, "*", {"data": json.dumps(payload)})
+        await _xadd(stream_key, payload, STREAM_MAXLEN_USER)
         logger.debug(f"Emitted profile.updated for user {user_id}")
     except Exception as e:
         logger.warning(f"Failed to emit profile.updated: {e}", exc_info=True)
@@ -51,6 +76,8 @@ async def emit_order_status_change(
 ) -> None:
     """Emit order.status.changed event.
 
+    Also drops the user's cached WebApp orders list (same round-trip).
+
     Args:
         order_id: Order UUID
         user_id: User UUID
@@ -58,8 +85,7 @@ async def emit_order_status_change(
         items_delivered: Whether items were delivered
     """
     try:
-        redis = get_redis()
-        stream_key = f"stream:realtime:orders:{user_id}"
+        stream_key = f"{_STREAM_PREFIX_ORDERS}{user_id}"
         payload = {
             "event": "order.status.changed",
             "order_id": order_id,
@@ -67,7 +93,16 @@ async def emit_order_status_change(
             "status": status,
             "items_delivered": items_delivered,
         }
-        entry_id = await redis.xadd(stream_key, "*", {"data": json.dumps(payload)})
+        pipe = get_redis().pipeline()
+        pipe.xadd(
+            stream_key,
+            "*",
+            {"data": json.dumps(payload)},
+            maxlen=STREAM_MAXLEN_USER,
+            approximate_trim=True,
+        )
+        pipe.delete(RedisKeys.orders_list_key(user_id))
+        entry_id, _ = await pipe.exec()
         logger.info(
             f"Emitted order.status.changed: order={order_id}, user={user_id}, status={status}, stream={stream_key}, entry_id={entry_id}"
         )
@@ -75,6 +110,80 @@ async def emit_order_status_change(
         logger.warning(f"Failed to emit order.status.changed: {e}", exc_info=True)
 
 
+async def emit_order_status_changes(changes: list[tuple[str, str, str]]) -> int:
+    """Emit order.status.changed for many orders, PIPELINE_CHUNK_SIZE events per round-trip.
+
+    Used by bulk operations (order expiry) instead of one XADD per order.
+    Also drops the affected users' cached WebApp orders lists.
+
+    Args:
+        changes: (order_id, user_id, status) tuples
+
+    Returns:
+        Number of events emitted
+    """
+    changes = [change for change in changes if change[1]]
+    emitted = 0
+    for start in range(0, len(changes), PIPELINE_CHUNK_SIZE):
+        emitted += await _emit_order_status_chunk(changes[start : start + PIPELINE_CHUNK_SIZE])
+    if emitted:
+        logger.info(f"Emitted order.status.changed for {emitted} orders")
+    return emitted
+
+
+async def _emit_order_status_chunk(changes: list[tuple[str, str, str]]) -> int:
+    """Emit one chunk in a single pipelined exec (reduces cognitive complexity)."""
+    try:
+        pipe = get_redis().pipeline()
+        for user_id in dict.fromkeys(change[1] for change in changes):
+            pipe.delete(RedisKeys.orders_list_key(user_id))
+        for order_id, user_id, status in changes:
+            payload = {
+                "event": "order.status.changed",
+                "order_id": order_id,
+                "user_id": user_id,
+                "status": status,
+                "items_delivered": False,
+            }
+            pipe.xadd(
+                f"{_STREAM_PREFIX_ORDERS}{user_id}",
+                "*",
+                {"data": json.dumps(payload)},
+                maxlen=STREAM_MAXLEN_USER,
+                approximate_trim=True,
+            )
+        await pipe.exec()
+        return len(changes)
+    except Exception as e:
+        logger.warning(f"Failed to emit order.status.changed batch: {e}", exc_info=True)
+        return 0
+    try:
+        pipe = get_redis().pipeline()
+        for user_id in dict.fromkeys(change[1] for change in changes):
+            pipe.delete(RedisKeys.orders_list_key(user_id))
+        for order_id, user_id, status in changes:
+            payload = {
+                "event": "order.status.changed",
+                "order_id": order_id,
+                "user_id": user_id,
+                "status": status,
+                "items_delivered": False,
+            }
+            pipe.xadd(
+                f"{_STREAM_PREFIX_ORDERS}{user_id}",
+                "*",
+                {"data": json.dumps(payload)},
+                maxlen=STREAM_MAXLEN_USER,
+                approximate_trim=True,
+            )
+        await pipe.exec()
+        logger.info(f"Emitted order.status.changed for {len(changes)} orders")
+        return len(changes)
+    except Exception as e:
+        logger.warning(f"Failed to emit order.status.changed batch: {e}", exc_info=True)
+        return 0
+
+
 async def emit_admin_withdrawal_update(
     withdrawal_id: str, status: str, user_id: str | None = None
 ) -> None:
@@ -86,7 +195,6 @@ async def emit_admin_withdrawal_update(
         user_id: User UUID (optional, for user-specific updates)
     """
     try:
-        redis = get_redis()
         # Broadcast to all admins
         stream_key = _STREAM_PREFIX_ADMIN_WITHDRAWALS
         payload = {
@@ -95,12 +203,12 @@ async def emit_admin_withdrawal_update(
             "status": status,
             "user_id": user_id,
         }
-        await redis.xadd(stream_key, "*", {"data": json.dumps(payload)})
+        await _xadd(stream_key, payload, STREAM_MAXLEN_BROADCAST)
 
         # Also send to user if provided
         if user_id:
-            user_stream_key = f"stream:realtime:profile:{user_id}"
-            await redis.xadd(user_stream_key, "*", {"data": json.dumps(payload)})
+            user_stream_key = f"{_STREAM_PREFIX_PROFILE}{user_id}"
+            await _xadd(user_stream_key, payload, STREAM_MAXLEN_USER)
 
         logger.debug(f"Emitted admin.withdrawal.updated for withdrawal {withdrawal_id}")
     except Exception as e:
@@ -116,7 +224,6 @@ async def emit_admin_order_created(order_id: str, user_id: str, total_amount: fl
         total_amount: Order total amount
     """
     try:
-        redis = get_redis()
         stream_key = _STREAM_PREFIX_ADMIN_ORDERS
         payload = {
             "event": "admin.order.created",
@@ -124,7 +231,7 @@ async def emit_admin_order_created(order_id: str, user_id: str, total_amount: fl
             "user_id": user_id,
             "total_amount": total_amount,
         }
-        await redis.xadd(stream_key, "*", {"data": json.dumps(payload)})
+        await _xadd(stream_key, payload, STREAM_MAXLEN_BROADCAST)
         logger.debug(f"Emitted admin.order.created for order {order_id}")
     except Exception as e:
         logger.warning(f"Failed to emit admin.order.created: {e}", exc_info=True)
@@ -138,14 +245,13 @@ async def emit_leaderboard_update(user_id: str, new_rank: int | None = None) ->
         new_rank: New rank position (optional)
     """
     try:
-        redis = get_redis()
         stream_key = _STREAM_PREFIX_LEADERBOARD
         payload = {
             "event": "leaderboard.updated",
             "user_id": user_id,
             "new_rank": new_rank,
         }
-        await redis.xadd(stream_key, "*", {"data": json.dumps(payload)})
+        await _xadd(stream_key, payload, STREAM_MAXLEN_BROADCAST)
         logger.debug(f"Emitted leaderboard.updated for user {user_id}")
     except Exception as e:
         logger.warning(f"Failed to emit leaderboard.updated: {e}", exc_info=True)
@@ -162,7 +268,6 @@ async def emit_admin_accounting_update(
         expense_id: Expense UUID (optional)
     """
     try:
-        redis = get_redis()
         stream_key = _STREAM_PREFIX_ADMIN_ACCOUNTING
         payload = {
             "event": "admin.accounting.updated",
@@ -170,7 +275,7 @@ async def emit_admin_accounting_update(
             "order_id": order_id,
             "expense_id": expense_id,
         }
-        await redis.xadd(stream_key, "*", {"data": json.dumps(payload)})
+        await _xadd(stream_key, payload, STREAM_MAXLEN_BROADCAST)
         logger.debug(f"Emitted admin.accounting.updated: {change_type}")
     except Exception as e:
         logger.warning(f"Failed to emit admin.accounting.updated: {e}", exc_info=True)
@@ -4,9 +4,9 @@ Order and FAQ management endpoints.
 All methods use async/await with supabase-py v2 (no asyncio.to_thread).
 """
 
-from typing import Any
+from typing import Annotated, Any
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 
 from core.auth import verify_admin
@@ -15,6 +15,7 @@ from core.routers.deps import get_payment_service
 from core.services.database import get_database
 
 from .models import CreateFAQRequest
+from .pagination import apply_keyset, page_result
 
 logger = get_logger(__name__)
 router = APIRouter(tags=["admin-orders"])
@@ -65,34 +66,36 @@ def _format_order_for_admin(order: dict[str, Any]) -> dict[str, Any]:
 @router.get("/orders")
 async def admin_get_orders(
     status: str | None = None,
-    limit: int = 50,
-    offset: int = 0,
+    limit: Annotated[int, Query(ge=1, le=200)] = 50,
+    offset: Annotated[int, Query(ge=0, description="Deprecated: use cursor")] = 0,
+    cursor: Annotated[str | None, Query(description="next_cursor from previous page")] = None,
     admin: Any = Depends(verify_admin),
 ) -> dict[str, Any]:
-    """Get all orders with optional filtering - formatted for admin panel."""
+    """Get all orders with optional filtering - formatted for admin panel.
+
+    Keyset-paginated on (created_at, id); pass next_cursor back as cursor.
+    """
     db = get_database()
 
-    query = (
-        db.client.table("orders")
-        .select(
-            "id, status, amount, fiat_amount, fiat_currency, payment_method, payment_gateway, created_at, source_channel, "
-            "users(telegram_id, username, first_name), "
-            "order_items(product_id, quantity, products(name))",
-        )
-        .order("created_at", desc=True)
-        .range(offset, offset + limit - 1)
+    query = db.client.table("orders").select(
+        "id, status, amount, fiat_amount, fiat_currency, payment_method, payment_gateway, created_at, source_channel, "
+        "users(telegram_id, username, first_name), "
+        "order_items(product_id, quantity, products(name))",
     )
 
     if status:
         query = query.eq("status", status)
 
-    result = await query.execute()
-    orders_data = result.data if result.data else []
+    query = apply_keyset(query, "created_at", "id", cursor, desc=True)
+    if offset and not cursor:
+        query = query.offset(offset)
+    result = await query.limit(limit + 1).execute()
+    orders_data, next_cursor = page_result(result.data or [], limit, "created_at", "id")
 
     # Format orders for admin panel (matching mock data structure)
     formatted_orders = [_format_order_for_admin(order) for order in orders_data]
 
-    return {"orders": formatted_orders}
+    return {"orders": formatted_orders, "next_cursor": next_cursor}
 
 
 @router.post("/orders/{order_id}/check-payment")
@@ -209,6 +212,9 @@ async def admin_force_order_status(
     if not result.data:
         raise HTTPException(status_code=500, detail="Failed to update order status")
 
+    from core.orders.list_cache import invalidate_orders_lists_for
+
+    await invalidate_orders_lists_for(result.data)
     logger.warning("Admin force status change completed")
 
     return {
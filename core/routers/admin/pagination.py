@@ -0,0 +1,94 @@
+"""Keyset Pagination Helpers for Admin List Endpoints.
+
+Offset pagination (`.range(offset, ...)`) makes Postgres compute and discard
+every skipped row, which gets slower with depth - especially on aggregate
+views like users_extended_analytics. Keyset pagination filters on the last
+seen (sort_key, id) instead, so every page costs the same.
+
+Cursor format: urlsafe base64 of JSON [sort_value, id]. Sort columns are
+ordered NULLS LAST with the id column as tie-breaker.
+"""
+
+import base64
+import json
+from typing import Any, Literal
+
+from fastapi import HTTPException
+
+CountMode = Literal["estimated", "planned", "exact", "none"]
+
+
+def encode_cursor(sort_value: Any, row_id: Any) -> str:
+    """Encode (sort_value, id) of the last row into an opaque cursor."""
+    raw = json.dumps([sort_value, str(row_id)], separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[Any, str]:
+    """Decode cursor into (sort_value, id). Raises 400 on malformed input."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return sort_value, str(row_id)
+
+
+def _quote(value: Any) -> str:
+    """Quote a value for a PostgREST logic tree (timestamps contain ':' and '+')."""
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+
+def apply_keyset(
+    query: Any,
+    sort_col: str,
+    id_col: str,
+    cursor: str | None,
+    desc: bool = True,
+) -> Any:
+    """Apply ordering and, if a cursor is given, the keyset filter.
+
+    Args:
+        query: Supabase query builder (after filters)
+        sort_col: Column to sort by
+        id_col: Unique tie-breaker column (usually the primary key)
+        cursor: Cursor from the previous page (None = first page)
+        desc: Sort direction
+    """
+    query = query.order(sort_col, desc=desc, nullsfirst=False).order(id_col, desc=desc)
+    if not cursor:
+        return query
+
+    sort_value, row_id = decode_cursor(cursor)
+    cmp = "lt" if desc else "gt"
+    if sort_value is None:
+        # Already inside the NULLS LAST tail
+        return query.filter(sort_col, "is", "null").filter(id_col, cmp, row_id)
+
+    value, rid = _quote(sort_value), _quote(row_id)
+    return query.or_(
+        f"{sort_col}.{cmp}.{value},"
+        f"and({sort_col}.eq.{value},{id_col}.{cmp}.{rid}),"
+        f"{sort_col}.is.null"
+    )
+
+
+def page_result(
+    rows: list[dict[str, Any]], limit: int, sort_col: str, id_col: str
+) -> tuple[list[dict[str, Any]], str | None]:
+    """Trim the extra look-ahead row and build the next cursor.
+
+    Queries should request limit + 1 rows; the extra row only signals that
+    another page exists.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    last = page[-1]
+    return page, encode_cursor(last.get(sort_col), last.get(id_col))
+
+
+def count_option(count: CountMode) -> str | None:
+    """Map count mode to PostgREST `count=` option (None = don't count)."""
+    return None if count == "none" else count
@@ -10,6 +10,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 
 from core.auth import verify_admin
 from core.logging import get_logger, sanitize_id_for_logging
+from core.routers.admin.pagination import apply_keyset, page_result
 from core.services.database import get_database
 
 logger = get_logger(__name__)
@@ -46,7 +47,8 @@ async def get_tickets(
         str, Query(description="Filter by status: open, approved, rejected, closed, all")
     ] = "open",
     limit: Annotated[int, Query(ge=1, le=200)] = 50,
-    offset: Annotated[int, Query(ge=0)] = 0,
+    offset: Annotated[int, Query(ge=0, description="Deprecated: use cursor")] = 0,
+    cursor: Annotated[str | None, Query(description="next_cursor from previous page")] = None,
     admin: Any = Depends(verify_admin),
 ) -> dict[str, Any]:
     """Get support tickets with optional status filter. Includes item credentials for admin verification."""
@@ -54,25 +56,25 @@ async def get_tickets(
 
     try:
         # Join with order_items to get credentials (delivery_content) for verification
-        query = (
-            db.client.table("tickets")
-            .select(
-                "*, users(username, first_name, telegram_id), order_items(delivery_content, products(name))",
-            )
-            .order("created_at", desc=True)
-            .limit(limit)
-            .offset(offset)
+        query = db.client.table("tickets").select(
+            "*, users(username, first_name, telegram_id), order_items(delivery_content, products(name))",
         )
 
         if status and status != "all":
             query = query.eq("status", status)
 
-        result = await query.execute()
+        query = apply_keyset(query, "created_at", "id", cursor, desc=True)
+        if offset and not cursor:
+            query = query.offset(offset)
+        result = await query.limit(limit + 1).execute()
+        rows, next_cursor = page_result(result.data or [], limit, "created_at", "id")
 
-        tickets = [_format_ticket_data(t) for t in (result.data or [])]
+        tickets = [_format_ticket_data(t) for t in rows]
 
-        return {"tickets": tickets, "count": len(tickets)}
+        return {"tickets": tickets, "count": len(tickets), "next_cursor": next_cursor}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("Error fetching tickets")
         raise HTTPException(status_code=500, detail=str(e))
@@ -12,6 +12,7 @@ from pydantic import BaseModel as PydanticBaseModel
 from core.auth import verify_admin
 from core.logging import get_logger
 from core.routers.admin.models import UpdateBalanceRequest, UpdateWarningsRequest
+from core.routers.admin.pagination import CountMode, apply_keyset, count_option, page_result
 from core.services.database import get_database
 from core.services.money import to_float
 
@@ -204,46 +205,39 @@ router = APIRouter(tags=["admin-users"])
 
 @router.get("/users")
 async def admin_get_users(
-    limit: int = 50, offset: int = 0, admin: Any = Depends(verify_admin)
+    limit: Annotated[int, Query(ge=1, le=200)] = 50,
+    offset: Annotated[int, Query(ge=0, description="Deprecated: use cursor")] = 0,
+    cursor: Annotated[str | None, Query(description="next_cursor from previous page")] = None,
+    admin: Any = Depends(verify_admin),
 ) -> dict[str, Any]:
-    """Get users for admin panel - uses users_extended_analytics VIEW to avoid N+1 queries."""
+    """Get users for admin panel - reads users_extended_analytics (pre-aggregated summary).
+
+    Keyset-paginated on (created_at, id); pass next_cursor back as cursor.
+    """
     db = get_database()
 
     try:
-        # Use VIEW that pre-aggregates orders count and total spent
-        # This eliminates N+1 queries (was: 1 query per user for orders)
-        result = (
-            await db.client.table("users_extended_analytics")
-            .select(
-                "id, telegram_id, username, first_name, balance, is_admin, "
-                "total_referral_earnings, created_at, orders_count, total_spent",
-            )
-            .order("created_at", desc=True)
-            .range(offset, offset + limit - 1)
-            .execute()
+        # VIEW joins users with the maintained user_analytics_summary table
+        # (no per-request aggregation, no extra query for user fields)
+        query = db.user_analytics_query(
+            "id, telegram_id, username, first_name, balance, balance_currency, is_admin, "
+            "is_banned, is_partner, partner_mode, total_referral_earnings, created_at, "
+            "orders_count, total_spent",
         )
-
-        # Get additional user fields not in VIEW (is_banned, is_partner, partner_mode, balance_currency)
-        user_ids = [u["id"] for u in (result.data or [])]
-        extra_fields = {}
-        if user_ids:
-            extra_result = (
-                await db.client.table("users")
-                .select("id, is_banned, is_partner, partner_mode, balance_currency")
-                .in_("id", user_ids)
-                .execute()
-            )
-            extra_fields = {u["id"]: u for u in (extra_result.data or [])}
+        query = apply_keyset(query, "created_at", "id", cursor, desc=True)
+        if offset and not cursor:
+            query = query.offset(offset)
+        result = await query.limit(limit + 1).execute()
+        rows, next_cursor = page_result(result.data or [], limit, "created_at", "id")
 
         users = []
-        for u in result.data or []:
+        for u in rows:
             user_id = u.get("id")
-            extra = extra_fields.get(user_id, {})
 
             # Determine role - VIP takes precedence for display, but keep is_admin flag
             # A user can be BOTH admin and VIP (partner)
             is_admin = u.get("is_admin", False)
-            is_partner = extra.get("is_partner", False)
+            is_partner = u.get("is_partner", False)
 
             # Role priority: VIP > ADMIN > USER
             # This ensures VIP partners appear in the partners list even if they're also admins
@@ -261,18 +255,20 @@ async def admin_get_users(
                     "username": u.get("username") or u.get("first_name") or "Unknown",
                     "role": role,
                     "balance": to_float(u.get("balance", 0)),
-                    "balance_currency": extra.get("balance_currency") or "RUB",
+                    "balance_currency": u.get("balance_currency") or "RUB",
                     "total_spent": to_float(u.get("total_spent", 0)),
                     "orders_count": u.get("orders_count", 0),
-                    "is_banned": extra.get("is_banned", False),
-                    "is_partner": extra.get("is_partner", False),
-                    "partner_mode": extra.get("partner_mode") or "commission",
+                    "is_banned": u.get("is_banned", False),
+                    "is_partner": is_partner,
+                    "partner_mode": u.get("partner_mode") or "commission",
                     "total_referral_earnings": to_float(u.get("total_referral_earnings", 0)),
                     "created_at": u.get("created_at"),
                 },
             )
 
-        return {"users": users}
+        return {"users": users, "next_cursor": next_cursor}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to get users: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to load users")
@@ -282,8 +278,13 @@ async def admin_get_users(
 async def admin_get_users_crm(
     sort_by: str = "total_orders",
     sort_order: str = "desc",
-    limit: int = 50,
-    offset: int = 0,
+    limit: Annotated[int, Query(ge=1, le=200)] = 50,
+    offset: Annotated[int, Query(ge=0, description="Deprecated: use cursor")] = 0,
+    *,
+    cursor: Annotated[str | None, Query(description="next_cursor from previous page")] = None,
+    count: Annotated[
+        CountMode, Query(description="Total count mode: estimated (default), planned, exact, none")
+    ] = "estimated",
     search: Annotated[
         str | None, Query(description="Search by username, first_name, or telegram_id")
     ] = None,
@@ -291,12 +292,18 @@ async def admin_get_users_crm(
     filter_partner: Annotated[bool | None, Query(description="Filter by partner status")] = None,
     admin: Any = Depends(verify_admin),
 ) -> dict[str, Any]:
-    """Get all users with extended analytics (orders, refunds, tickets, etc.)."""
+    """Get all users with extended analytics (orders, refunds, tickets, etc.).
+
+    Keyset-paginated on (sort_by, user_id): pass next_cursor back as cursor.
+    The total is computed only for the first page, in the same round-trip;
+    it is a planner estimate unless count=exact is requested.
+    """
     db = get_database()
 
     try:
-        # Build query
-        query = db.client.table("users_extended_analytics").select("*")
+        # Count only on the first page - later pages reuse the client's total
+        count_method = count_option(count) if not cursor else None
+        query = db.user_analytics_query("*", count=count_method)
 
         # Apply search filter
         query = _apply_search_filter(query, search)
@@ -307,23 +314,27 @@ async def admin_get_users_crm(
         # Validate sort_by
         validated_sort_by = _validate_sort_by(sort_by)
 
-        # Execute query with sorting and pagination
-        result = (
-            await query.order(validated_sort_by, desc=(sort_order == "desc"))
-            .range(offset, offset + limit - 1)
-            .execute()
+        # Keyset pagination: (sort_by, user_id), fetch one extra row to detect next page
+        query = apply_keyset(
+            query, validated_sort_by, "user_id", cursor, desc=(sort_order == "desc")
         )
+        if offset and not cursor:
+            query = query.offset(offset)
+        result = await query.limit(limit + 1).execute()
+        rows, next_cursor = page_result(result.data or [], limit, validated_sort_by, "user_id")
 
-        # Get total count with same filters
-        count_query = db.client.table("users_extended_analytics").select("user_id", count="exact")
-        count_query = _apply_search_filter(count_query, search)
-        count_query = _apply_filters(count_query, filter_banned, filter_partner)
-
-        count_result = await count_query.execute()
+        users = [_format_user_crm_data(u) for u in rows]
 
-        users = [_format_user_crm_data(u) for u in (result.data or [])]
-
-        return {"users": users, "total": count_result.count or 0, "limit": limit, "offset": offset}
+        return {
+            "users": users,
+            "total": result.count,
+            "count_mode": count if count_method else None,
+            "limit": limit,
+            "offset": offset,
+            "next_cursor": next_cursor,
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to query users_extended_analytics: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to load users.")
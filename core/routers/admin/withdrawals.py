@@ -16,6 +16,7 @@ from core.routers.deps import get_notification_service
 from core.services.database import get_database
 
 from .models import ProcessWithdrawalRequest
+from .pagination import apply_keyset, page_result
 
 logger = get_logger(__name__)
 
@@ -74,30 +75,29 @@ async def get_withdrawals(
         str, Query(description="Filter by status: pending, processing, completed, rejected, all")
     ] = "pending",
     limit: Annotated[int, Query(ge=1, le=200)] = 50,
-    offset: Annotated[int, Query(ge=0)] = 0,
+    offset: Annotated[int, Query(ge=0, description="Deprecated: use cursor")] = 0,
+    cursor: Annotated[str | None, Query(description="next_cursor from previous page")] = None,
     admin: Any = Depends(verify_admin),
 ) -> dict[str, Any]:
     """Get withdrawal requests with optional status filter."""
     db = get_database()
 
     try:
-        query = (
-            db.client.table("withdrawal_requests")
-            .select(
-                "*, users!withdrawal_requests_user_id_fkey(username, first_name, telegram_id, balance)",
-            )
-            .order("created_at", desc=True)
-            .limit(limit)
-            .offset(offset)
+        query = db.client.table("withdrawal_requests").select(
+            "*, users!withdrawal_requests_user_id_fkey(username, first_name, telegram_id, balance)",
         )
 
         if status and status != "all":
             query = query.eq("status", status)
 
-        result = await query.execute()
+        query = apply_keyset(query, "created_at", "id", cursor, desc=True)
+        if offset and not cursor:
+            query = query.offset(offset)
+        result = await query.limit(limit + 1).execute()
+        rows, next_cursor = page_result(result.data or [], limit, "created_at", "id")
 
         withdrawals = []
-        for w in result.data or []:
+        for w in rows:
             user_data = w.pop("users", {}) or {}
             withdrawals.append(
                 {
@@ -109,8 +109,10 @@ async def get_withdrawals(
                 },
             )
 
-        return {"withdrawals": withdrawals, "count": len(withdrawals)}
+        return {"withdrawals": withdrawals, "count": len(withdrawals), "next_cursor": next_cursor}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("Error fetching withdrawals")
         raise HTTPException(status_code=500, detail=str(e))
@@ -126,3 +126,7 @@ async def shutdown_services() -> None:
             await _payment_service.aclose()
         finally:
             _payment_service = None
+
+    from core.queue import close_qstash_http_client
+
+    await close_qstash_http_client()
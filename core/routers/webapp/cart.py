@@ -7,11 +7,14 @@ Response format:
 - Frontend uses USD for calculations, display for UI
 """
 
+from decimal import Decimal
 from typing import TYPE_CHECKING, Any
 
 from fastapi import APIRouter, Depends, HTTPException
+from starlette.responses import Response
 
 from core.auth import verify_telegram_auth
+from core.cart.pricing import load_cart_products, split_instant_prepaid
 
 if TYPE_CHECKING:
     from core.cart.models import Cart
@@ -22,6 +25,7 @@ from core.logging import get_logger
 from core.services.currency_response import CurrencyFormatter
 from core.services.database import get_database
 from core.services.money import to_float
+from core.utils.fast_json import FastJSONResponse
 
 from .models import AddToCartRequest, ApplyPromoRequest, UpdateCartItemRequest
 
@@ -127,14 +131,23 @@ async def _format_cart_response(
             "exchange_rate": formatter.exchange_rate,
         }
 
-    # OPTIMIZATION: Batch fetch all products in one query instead of N+1
-    product_ids = [item.product_id for item in cart.items]
-    products_result = await db.client.table("products").select("*").in_("id", product_ids).execute()
-    products_map = {p["id"]: p for p in (products_result.data or [])}
-    products = [products_map.get(item.product_id) for item in cart.items]
+    # Products and live stock for the whole cart in one query
+    products_map = await load_cart_products(db, [item.product_id for item in cart.items])
 
     items_with_details = []
-    for item, product in zip(cart.items, products, strict=False):
+    instant_total_usd = Decimal(0)
+    prepaid_total_usd = Decimal(0)
+    for item in cart.items:
+        product = products_map.get(item.product_id)
+        # Same instant/prepaid split checkout will apply
+        instant_quantity, prepaid_quantity = (
+            split_instant_prepaid(item, product.get("stock_count", 0))
+            if product
+            else (item.instant_quantity, item.prepaid_quantity)
+        )
+        instant_total_usd += item.final_price * instant_quantity
+        prepaid_total_usd += item.final_price * prepaid_quantity
+
         unit_price_usd = to_float(item.unit_price)
         final_price_usd = to_float(item.final_price)
         total_price_usd = to_float(item.total_price)
@@ -151,8 +164,8 @@ async def _format_cart_response(
                 "product_name": product.get("name") if product else "Unknown",
                 "image_url": product.get("image_url") if product else None,
                 "quantity": item.quantity,
-                "instant_quantity": item.instant_quantity,
-                "prepaid_quantity": item.prepaid_quantity,
+                "instant_quantity": instant_quantity,
+                "prepaid_quantity": prepaid_quantity,
                 "discount_percent": item.discount_percent,
                 # USD values (for calculations)
                 "unit_price_usd": unit_price_usd,
@@ -209,8 +222,8 @@ async def _format_cart_response(
         # USD values (for calculations)
         "total_usd": to_float(cart.total),
         "subtotal_usd": to_float(cart.subtotal),
-        "instant_total_usd": to_float(cart.instant_total),
-        "prepaid_total_usd": to_float(cart.prepaid_total),
+        "instant_total_usd": to_float(instant_total_usd),
+        "prepaid_total_usd": to_float(prepaid_total_usd),
         "original_total_usd": original_total_usd,
         # Display values (for UI) - using anchor prices from items!
         "total": total_display,
@@ -244,7 +257,7 @@ def _ensure_product_orderable(product: Any) -> str:
 
 
 @router.get("/cart")
-async def get_webapp_cart(user: Any = Depends(verify_telegram_auth)) -> dict[str, Any]:
+async def get_webapp_cart(user: Any = Depends(verify_telegram_auth)) -> Response:
     """Get user's shopping cart with currency conversion."""
     from core.cart import get_cart_manager
 
@@ -252,16 +265,18 @@ async def get_webapp_cart(user: Any = Depends(verify_telegram_auth)) -> dict[str
         cart_manager = get_cart_manager()
         cart = await cart_manager.get_cart(user.id)
         if not cart:
-            return {
-                "items": [],
-                "total": 0,
-                "total_usd": 0,
-                "currency": "USD",
-                "exchange_rate": 1.0,
-            }
+            return FastJSONResponse(
+                {
+                    "items": [],
+                    "total": 0,
+                    "total_usd": 0,
+                    "currency": "USD",
+                    "exchange_rate": 1.0,
+                }
+            )
         db = get_database()
 
-        return await _format_cart_response(cart, db, user.id)
+        return FastJSONResponse(await _format_cart_response(cart, db, user.id))
     except HTTPException:
         raise
     except Exception as e:
@@ -286,7 +301,7 @@ async def add_to_cart(
 
     cart_manager = get_cart_manager()
     try:
-        await cart_manager.add_item(
+        cart = await cart_manager.add_item(
             user_telegram_id=user.id,
             product_id=request.product_id,
             product_name=product.name,
@@ -301,7 +316,6 @@ async def add_to_cart(
         logger.error(f"Failed to add to cart: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to add item to cart")
 
-    cart = await cart_manager.get_cart(user.id)
     if not cart:
         return {"items": [], "total": 0, "total_usd": 0, "currency": "USD", "exchange_rate": 1.0}
     return await _format_cart_response(cart, db, user.id)
@@ -324,7 +338,7 @@ async def update_cart_item(
 
     cart_manager = get_cart_manager()
     try:
-        await cart_manager.update_item_quantity(
+        cart = await cart_manager.update_item_quantity(
             user_telegram_id=user.id,
             product_id=request.product_id,
             new_quantity=request.quantity,
@@ -336,7 +350,6 @@ async def update_cart_item(
         logger.error(f"Failed to update cart item: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to update cart item")
 
-    cart = await cart_manager.get_cart(user.id)
     if not cart:
         return {"items": [], "total": 0, "total_usd": 0, "currency": "USD", "exchange_rate": 1.0}
     return await _format_cart_response(cart, db, user.id)
@@ -351,7 +364,7 @@ async def remove_cart_item(
 
     cart_manager = get_cart_manager()
     try:
-        await cart_manager.remove_item(user.id, product_id)
+        cart = await cart_manager.remove_item(user.id, product_id)
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
@@ -359,7 +372,6 @@ async def remove_cart_item(
         raise HTTPException(status_code=500, detail="Failed to remove cart item")
 
     db = get_database()
-    cart = await cart_manager.get_cart(user.id)
     if not cart:
         return {"items": [], "total": 0, "total_usd": 0, "currency": "USD", "exchange_rate": 1.0}
     return await _format_cart_response(cart, db, user.id)
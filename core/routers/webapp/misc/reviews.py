@@ -261,6 +261,10 @@ async def _create_review_record(
     if not result.data or len(result.data) == 0:
         raise HTTPException(status_code=500, detail="Ошибка при создании отзыва")
 
+    # The orders list marks reviewed items
+    from core.orders.list_cache import invalidate_orders_list
+
+    await invalidate_orders_list(str(db_user.id))
     return result.data[0]["id"]
 
 
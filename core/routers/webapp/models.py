@@ -89,6 +89,7 @@ class OrdersListResponse(BaseModel):
     orders: list[dict[str, Any]]  # Use dict to match APIOrder structure from frontend
     count: int
     currency: str
+    next_cursor: str | None = None  # Keyset cursor for the next page (None = last page)
 
 
 class PaymentMethod(BaseModel):
@@ -4,11 +4,14 @@ Order history, status, and payment method endpoints.
 All methods use async/await with supabase-py v2 (no asyncio.to_thread).
 """
 
+import base64
 import logging
 from datetime import datetime, timedelta
 from typing import TYPE_CHECKING, Annotated, Any, cast
+from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from starlette.responses import Response
 
 from core.auth import verify_telegram_auth
 
@@ -16,6 +19,15 @@ if TYPE_CHECKING:
     from core.services.database import Database
     from core.utils.validators import TelegramUser
 from core.errors import ERROR_FAILED_TO_FETCH_ORDERS, ERROR_ORDER_NOT_FOUND, ERROR_USER_NOT_FOUND
+from core.orders.list_cache import (
+    cache_page,
+    compute_etag,
+    get_cached_etag,
+    get_cached_page,
+    known_user_id,
+    page_key,
+    remember_user_id,
+)
 from core.routers.webapp.models import (
     OrdersListResponse,
     OrderStatusResponse,
@@ -23,6 +35,8 @@ from core.routers.webapp.models import (
     PaymentMethodsResponse,
 )
 from core.services.database import get_database
+from core.utils.fast_json import dumps
+from core.utils.http_cache import etag_matches, not_modified
 
 logger = logging.getLogger(__name__)
 
@@ -55,30 +69,17 @@ def _get_user_currency() -> str:
     return "RUB"
 
 
-async def _load_reviews_for_orders(db: "Database", order_ids: list[str]) -> dict[str, set[str]]:
-    """Load reviews for multiple orders in one query (reduces N+1)."""
+def _reviews_by_order(rows: list[Any]) -> dict[str, set[str]]:
+    """Reviewed product IDs per order from the embedded reviews(product_id)."""
     reviews_by_order: dict[str, set[str]] = {}
-    if not order_ids:
-        return reviews_by_order
-
-    try:
-        all_reviews = (
-            await db.client.table("reviews")
-            .select("order_id, product_id")
-            .in_("order_id", order_ids)
-            .execute()
-        )
-
-        for review in all_reviews.data or []:
-            order_id = review.get("order_id")
-            product_id = review.get("product_id")
-            if order_id not in reviews_by_order:
-                reviews_by_order[order_id] = set()  # type: set[str]
-            if product_id and isinstance(product_id, str):
-                reviews_by_order[order_id].add(product_id)
-    except Exception as e:
-        logger.warning("Failed to load reviews for orders: %s", type(e).__name__)
-
+    for row in rows:
+        if not isinstance(row, dict) or not row.get("id"):
+            continue
+        reviews_by_order[str(row["id"])] = {
+            str(review["product_id"])
+            for review in row.get("reviews") or []
+            if review.get("product_id")
+        }
     return reviews_by_order
 
 
@@ -268,27 +269,13 @@ def _calculate_estimated_delivery(
     return None
 
 
-def _extract_order_ids(result_data: list[Any]) -> list[str]:
-    """Extract order IDs from query result data."""
-    order_ids: list[str] = []
-    for row in result_data:
-        if isinstance(row, dict):
-            row_id = row.get("id")
-            if row_id:
-                order_ids.append(str(row_id))
-    return order_ids
-
-
-async def _process_orders_result(
-    db: "Database", result_data: list[Any]
-) -> list[dict[str, Any]]:
+def _process_orders_result(result_data: list[Any]) -> list[dict[str, Any]]:
     """Process orders result data and build order dicts."""
     if not result_data:
         return []
 
-    # OPTIMIZATION: Fix N+1 query problem - load all reviews for all orders in one query
-    order_ids = _extract_order_ids(result_data)
-    reviews_by_order = await _load_reviews_for_orders(db, order_ids)
+    # Reviews come embedded in the orders query (no extra round-trip)
+    reviews_by_order = _reviews_by_order(result_data)
 
     orders = []
     for row in result_data:
@@ -312,6 +299,51 @@ async def _process_orders_result(
     return orders
 
 
+# Compact projection for the list: only what _build_order_dict/_build_order_item read.
+# Reviews are embedded so has_review needs no separate query.
+_ORDERS_LIST_SELECT = (
+    "id, amount, original_price, discount_percent, status, order_type, created_at, "
+    "expires_at, fulfillment_deadline, delivered_at, warranty_until, "
+    "payment_url, payment_id, payment_gateway, "
+    "order_items(id, product_id, quantity, price, status, fulfillment_type, "
+    "delivery_content, delivery_instructions, expires_at, delivered_at, created_at, "
+    "product:products(id, name)), "
+    "reviews(product_id)"
+)
+
+_ORDERS_LIST_CACHE_CONTROL = "private, no-cache"
+
+
+def _encode_cursor(row: dict[str, Any]) -> str:
+    """Opaque keyset cursor pointing after this row (created_at, id)."""
+    raw = f"{row['created_at']}|{row['id']}".encode()
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[str, str]:
+    """Decode a keyset cursor into (created_at, id).
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, order_id = raw.split("|", 1)
+        datetime.fromisoformat(created_at)
+        UUID(order_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+    return created_at, order_id
+
+
+def _orders_list_response(body: bytes, etag: str, if_none_match: str | None) -> Response:
+    """200 with the encoded page, or 304 if the client already has it."""
+    headers = {"ETag": etag, "Cache-Control": _ORDERS_LIST_CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return not_modified(headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 def _build_order_dict(
     row: dict[str, Any],
     items: list[dict[str, Any]],
@@ -549,70 +581,101 @@ async def verify_order_payment(
     return {"status": order["status"], "verified": False, "message": "Unknown gateway"}
 
 
-@crud_router.get("/orders")
+async def _resolve_user_id(db: "Database", telegram_id: int) -> str:
+    """User UUID for a Telegram ID (in-process memo, then DB)."""
+    user_id = known_user_id(telegram_id)
+    if user_id:
+        return user_id
+    db_user = await db.get_user_by_telegram_id(telegram_id)
+    if not db_user:
+        raise HTTPException(status_code=404, detail=ERROR_USER_NOT_FOUND)
+    user_id = str(db_user.id)
+    remember_user_id(telegram_id, user_id)
+    return user_id
+
+
+@crud_router.get("/orders", response_model=OrdersListResponse)
 async def get_webapp_orders(
     user=Depends(verify_telegram_auth),
     status: Annotated[str | None, Query()] = None,
     limit: Annotated[int, Query(ge=1, le=100)] = 20,
     offset: Annotated[int, Query(ge=0)] = 0,
-) -> OrdersListResponse:
-    """Get user's order history with filtering."""
-    from core.db import get_redis
-    from core.services.currency import get_currency_service
+    *,
+    cursor: Annotated[str | None, Query()] = None,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    """Get user's order history with filtering.
+
+    Pagination: pass next_cursor from the previous page as cursor (keyset on
+    created_at, id); offset is still accepted for older clients. Pages are
+    cached per user (core.orders.list_cache) and carry an ETag, so an
+    unchanged poll with If-None-Match gets 304 without touching Supabase.
+    """
+    from core.logging import sanitize_id_for_logging
 
     db = get_database()
-    redis = get_redis()
-    get_currency_service(redis)
-
-    db_user = await db.get_user_by_telegram_id(user.id)
-
-    if not db_user:
-        raise HTTPException(status_code=404, detail=ERROR_USER_NOT_FOUND)
+    user_id = await _resolve_user_id(db, user.id)
+    page = page_key(status, limit, cursor, offset)
+
+    # Fast path: ETag-only check, then full cached page
+    if if_none_match:
+        cached_etag = await get_cached_etag(user_id, page)
+        if cached_etag and etag_matches(if_none_match, cached_etag):
+            return _orders_list_response(b"", cached_etag, if_none_match)
+    cached = await get_cached_page(user_id, page)
+    if cached:
+        etag, body = cached
+        return _orders_list_response(body, etag, if_none_match)
 
     # Build query
-    query = (
-        db.client.table("orders")
-        .select("*, order_items(*, product:products(*))")
-        .eq("user_id", db_user.id)
-    )
+    query = db.client.table("orders").select(_ORDERS_LIST_SELECT).eq("user_id", user_id)
 
     if status:
         query = query.eq("status", status)
 
-    query = query.order("created_at", desc=True).range(offset, offset + limit - 1)
+    if cursor:
+        created_at, last_id = _decode_cursor(cursor)
+        query = query.or_(
+            f'created_at.lt."{created_at}",'
+            f'and(created_at.eq."{created_at}",id.lt.{last_id})'
+        )
+
+    query = query.order("created_at", desc=True).order("id", desc=True)
+    query = query.limit(limit) if cursor else query.range(offset, offset + limit - 1)
 
     try:
         result = await query.execute()
     except Exception as e:
-        from core.logging import sanitize_id_for_logging
-
         logger.error(
             "Failed to fetch orders for user %s: %s",
-            sanitize_id_for_logging(str(db_user.id)),
+            sanitize_id_for_logging(user_id),
             type(e).__name__,
             exc_info=True,
         )
         raise HTTPException(status_code=500, detail=ERROR_FAILED_TO_FETCH_ORDERS)
 
-    user_currency = _get_user_currency()
-
-    if not result.data:
-        from core.logging import sanitize_id_for_logging
-
-        logger.info("No orders found for user %s", sanitize_id_for_logging(str(db_user.id)))
-        return OrdersListResponse(orders=[], count=0, currency=user_currency)
-
-    orders = await _process_orders_result(db, result.data)
-
-    from core.logging import sanitize_id_for_logging
+    rows = result.data or []
+    orders = _process_orders_result(rows)
+    next_cursor = _encode_cursor(rows[-1]) if len(rows) == limit else None
 
     logger.info(
         "Returning %d orders for user %s",
         len(orders),
-        sanitize_id_for_logging(str(db_user.id)),
+        sanitize_id_for_logging(user_id),
     )
 
-    return OrdersListResponse(orders=orders, count=len(orders), currency=user_currency)
+    # Plain dicts encoded directly (no response model validation pass over every order)
+    body = dumps(
+        {
+            "orders": orders,
+            "count": len(orders),
+            "currency": _get_user_currency(),
+            "next_cursor": next_cursor,
+        }
+    )
+    etag = compute_etag(body)
+    await cache_page(user_id, page, etag, body)
+    return _orders_list_response(body, etag, if_none_match)
 
 
 @crud_router.get("/payments/methods")
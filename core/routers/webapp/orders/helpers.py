@@ -236,74 +236,6 @@ def determine_target_currency(
     return GATEWAY_CURRENCY.get(payment_gateway or "", "RUB")
 
 
-async def _check_and_adjust_stock(db: Any, item: Any, product: Any) -> None:
-    """Check instant availability and adjust quantities if needed."""
-    instant_q = item.instant_quantity
-    if instant_q > 0:
-        available_stock = await db.get_available_stock_count(item.product_id)
-        if available_stock < instant_q:
-            logger.warning(
-                "Stock changed for %s. Requested %s, available %s",
-                product.name,
-                instant_q,
-                available_stock,
-            )
-            deficit = instant_q - available_stock
-            item.instant_quantity = max(0, available_stock)
-            item.prepaid_quantity += max(0, deficit)
-
-
-def _calculate_product_prices(product, item_quantity: int) -> tuple[Decimal, Decimal]:
-    """Calculate MSRP and product price in USD."""
-    product_msrp_usd = (
-        to_decimal(product.msrp)
-        if hasattr(product, "msrp") and product.msrp
-        else to_decimal(product.price)
-    )
-    original_price_usd = multiply(product_msrp_usd, item_quantity)
-    product_price_usd = to_decimal(product.price)
-    return original_price_usd, product_price_usd
-
-
-def _calculate_discount_percent(
-    item_discount: int,
-    cart_promo_discount: int,
-    partner_discount: int,
-) -> int:
-    """Calculate effective discount percent from all sources."""
-    discount_percent = item_discount
-    if cart_promo_discount > 0:
-        discount_percent = max(discount_percent, cart_promo_discount)
-    if partner_discount > 0:
-        discount_percent = max(discount_percent, partner_discount)
-    return max(0, min(100, discount_percent))
-
-
-def _calculate_final_prices(
-    product_price_usd: Decimal,
-    product_price_fiat: Decimal,
-    discount_percent: int,
-    quantity: int,
-    target_currency: str,
-) -> tuple[Decimal, Decimal]:
-    """Calculate final prices per unit and totals after discount."""
-    discount_multiplier = subtract(
-        Decimal(1),
-        divide(to_decimal(discount_percent), Decimal(100)),
-    )
-
-    final_price_per_unit_usd = round_money(multiply(product_price_usd, discount_multiplier))
-    final_price_per_unit_fiat = round_money(multiply(product_price_fiat, discount_multiplier))
-
-    if target_currency in ["RUB", "UAH", "TRY", "INR"]:
-        final_price_per_unit_fiat = round_money(final_price_per_unit_fiat, to_int=True)
-
-    final_price_total_usd = round_money(multiply(final_price_per_unit_usd, quantity))
-    final_price_total_fiat = round_money(multiply(final_price_per_unit_fiat, quantity))
-
-    return final_price_total_usd, final_price_total_fiat
-
-
 async def validate_and_prepare_cart_items(
     db: "Database",
     cart_items: list["CartItem"],
@@ -314,61 +246,28 @@ async def validate_and_prepare_cart_items(
 ) -> tuple[Decimal, Decimal, Decimal, list[dict[str, Any]]]:
     """Validate cart items, calculate totals using Decimal, handle stock deficits.
     Calculates both USD total and Fiat total (using Anchor Prices).
-    """
-    total_amount_usd = Decimal(0)
-    total_original_usd = Decimal(0)
-    total_fiat_amount = Decimal(0)
-    prepared_items = []
-
-    for item in cart_items:
-        product = await db.get_product_by_id(item.product_id)
-        if not product:
-            raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
-
-        await _check_and_adjust_stock(db, item, product)
 
-        original_price_usd, product_price_usd = _calculate_product_prices(product, item.quantity)
-
-        anchor_price = currency_service.get_anchor_price(product, target_currency)
-        product_price_fiat = to_decimal(anchor_price)
-
-        cart_promo_discount = (
-            cart.promo_discount_percent
-            if cart.promo_code and cart.promo_discount_percent > 0
-            else 0
-        )
-        discount_percent = _calculate_discount_percent(
-            int(item.discount_percent) if item.discount_percent else 0,
-            cart_promo_discount,
-            partner_discount,
-        )
-
-        final_price_total_usd, final_price_total_fiat = _calculate_final_prices(
-            product_price_usd,
-            product_price_fiat,
-            discount_percent,
-            item.quantity,
-            target_currency,
-        )
+    Products and stock counts for the whole cart are loaded in one query
+    (see core.cart.pricing).
+    """
+    from core.cart.pricing import CartProductNotFoundError, load_cart_products, price_cart
 
-        total_amount_usd += final_price_total_usd
-        total_original_usd += original_price_usd
-        total_fiat_amount += final_price_total_fiat
-
-        prepared_items.append(
-            {
-                "product_id": item.product_id,
-                "product_name": product.name,
-                "quantity": item.quantity,
-                "instant_quantity": item.instant_quantity,
-                "prepaid_quantity": item.prepaid_quantity,
-                "amount": final_price_total_usd,
-                "original_price": original_price_usd,
-                "discount_percent": discount_percent,
-                "fulfillment_time_hours": getattr(product, "fulfillment_time_hours", None) or 24,
-            },
+    products = await load_cart_products(db, [item.product_id for item in cart_items])
+    cart_promo_discount = (
+        cart.promo_discount_percent if cart.promo_code and cart.promo_discount_percent > 0 else 0
+    )
+    try:
+        pricing = price_cart(
+            cart_items,
+            products,
+            promo_discount=cart_promo_discount,
+            partner_discount=partner_discount,
+            target_currency=target_currency,
+            currency_service=currency_service,
         )
-    return total_amount_usd, total_original_usd, total_fiat_amount, prepared_items
+    except CartProductNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return pricing.total_usd, pricing.original_usd, pricing.total_fiat, pricing.lines
 
 
 async def _check_redis_cooldown(user_id: int) -> tuple[Any, bool]:
@@ -529,6 +428,10 @@ async def create_order_with_items(
             detail="Failed to create order items. Please try again.",
         )
 
+    from core.orders.list_cache import invalidate_orders_list
+
+    await invalidate_orders_list(str(db_user.id))
+
     # Emit realtime event for admin panel (new order created)
     try:
         from core.realtime import emit_admin_order_created
@@ -602,7 +505,11 @@ async def process_external_payment(
         logger.exception(f"[DEBUG-HYP-D] create_payment_wrapper Exception: error_type={error_type}")
         with contextlib.suppress(Exception):
             await db.client.table("order_items").delete().eq("order_id", order_id).execute()
-        await db.client.table("orders").delete().eq("id", order_id).execute()
+        deleted = await db.client.table("orders").delete().eq("id", order_id).execute()
+
+        from core.orders.list_cache import invalidate_orders_lists_for
+
+        await invalidate_orders_lists_for(deleted.data)
         logger.exception("Payment creation failed")
         raise HTTPException(
             status_code=502,
@@ -621,7 +528,13 @@ async def save_payment_info(
         update_payload = {"payment_url": payment_url}
         if invoice_id:
             update_payload["payment_id"] = str(invoice_id)
-        await db.client.table("orders").update(update_payload).eq("id", order_id).execute()
+        result = (
+            await db.client.table("orders").update(update_payload).eq("id", order_id).execute()
+        )
+
+        from core.orders.list_cache import invalidate_orders_lists_for
+
+        await invalidate_orders_lists_for(result.data)
     except Exception as e:
         logger.warning(f"Failed to save payment info for order {order_id}: {e}")
 
@@ -13,6 +13,7 @@ from fastapi import APIRouter, Depends, Header, HTTPException
 
 from core.auth import verify_telegram_auth
 from core.errors import ERROR_ORDER_NOT_FOUND, ERROR_PRODUCT_NOT_FOUND, ERROR_USER_NOT_FOUND
+from core.orders.list_cache import invalidate_orders_list
 from core.payments import validate_gateway_config
 from core.routers.deps import get_payment_service
 from core.routers.webapp.models import ConfirmPaymentRequest, CreateOrderRequest, OrderResponse
@@ -549,6 +550,7 @@ async def confirm_manual_payment(
         .eq("id", request.order_id)
         .execute()
     )
+    await invalidate_orders_list(str(db_user.id))
 
     return {
         "success": True,
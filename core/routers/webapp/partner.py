@@ -4,6 +4,7 @@ Partner dashboard and application endpoints.
 All methods use async/await with supabase-py v2 (no asyncio.to_thread).
 """
 
+import asyncio
 from collections import defaultdict
 from datetime import UTC, datetime, timedelta
 from typing import TYPE_CHECKING, Any, cast
@@ -18,6 +19,7 @@ if TYPE_CHECKING:
     from core.utils.validators import TelegramUser
 from core.logging import get_logger
 from core.services.database import get_database
+from core.services.domains.referral import cache_partner_dashboard, get_cached_partner_dashboard
 from core.services.money import to_float
 
 from .models import PartnerApplicationRequest
@@ -74,38 +76,25 @@ async def _verify_partner_access(db: Any, user_id: str) -> None:
 
 
 async def _get_referrals_with_purchases(db: Any, referrer_id: str) -> list[dict[str, Any]]:
-    """Get direct referrals with their purchase data."""
+    """Get direct referrals with their purchase data (single RPC, no per-referral queries)."""
     try:
-        referrals_result = (
-            await db.client.from_("users")
-            .select("id, telegram_id, username, first_name, created_at")
-            .eq("referrer_id", referrer_id)
-            .order("created_at", desc=True)
-            .limit(50)
-            .execute()
-        )
+        result = await db.client.rpc(
+            "get_referrals_with_purchases",
+            {"p_referrer_id": referrer_id, "p_limit": 50},
+        ).execute()
 
         referrals = []
-        for ref in referrals_result.data or []:
-            orders_result = (
-                await db.client.table("orders")
-                .select("amount, status, created_at")
-                .eq("user_id", ref["id"])
-                .eq("status", "delivered")
-                .execute()
-            )
-            orders = orders_result.data or []
-            total_spent = sum(to_float(o.get("amount", 0)) for o in orders)
-
+        for ref in result.data or []:
+            orders_count = int(ref.get("orders_count") or 0)
             referrals.append(
                 {
                     "telegram_id": ref.get("telegram_id"),
                     "username": ref.get("username"),
                     "first_name": ref.get("first_name"),
                     "joined_at": ref.get("created_at"),
-                    "orders_count": len(orders),
-                    "total_spent": total_spent,
-                    "is_paying": len(orders) > 0,
+                    "orders_count": orders_count,
+                    "total_spent": to_float(ref.get("total_spent", 0)),
+                    "is_paying": orders_count > 0,
                 },
             )
         return referrals
@@ -210,11 +199,29 @@ async def get_partner_dashboard(user=Depends(verify_telegram_auth)):
 
     await _verify_partner_access(db, db_user.id)
 
-    # Fetch all data
-    analytics = await _get_partner_analytics(db, db_user.id)
-    referrals = await _get_referrals_with_purchases(db, db_user.id)
-    earnings_history = await _get_earnings_history(db, db_user.id)
-    top_products = await _get_top_products(db, db_user.id)
+    # Referral data is cached per partner (invalidated on referral bonus events)
+    cached = await get_cached_partner_dashboard(db_user.id)
+    if cached is None:
+        analytics, referrals, earnings_history, top_products = await asyncio.gather(
+            _get_partner_analytics(db, db_user.id),
+            _get_referrals_with_purchases(db, db_user.id),
+            _get_earnings_history(db, db_user.id),
+            _get_top_products(db, db_user.id),
+        )
+        await cache_partner_dashboard(
+            db_user.id,
+            {
+                "analytics": analytics,
+                "referrals": referrals,
+                "earnings_history": earnings_history,
+                "top_products": top_products,
+            },
+        )
+    else:
+        analytics = cached.get("analytics") or {}
+        referrals = cached.get("referrals") or []
+        earnings_history = cached.get("earnings_history") or []
+        top_products = cached.get("top_products") or []
 
     summary = _build_dashboard_summary(db_user, referrals, analytics)
 
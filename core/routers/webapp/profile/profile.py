@@ -300,65 +300,12 @@ def _build_profile_response(
 async def _fetch_level_referrals(
     db: Any, user_id: str, level: int, offset: int, limit: int
 ) -> tuple[list[dict[str, Any]], None]:
-    """Fetch referrals for a specific level. Returns (referrals_data, direct_ref_ids_for_level2)."""
-    if level == 1:
-        result = (
-            await db.client.table("users")
-            .select(
-                "id, telegram_id, username, first_name, created_at, referral_program_unlocked, photo_url",
-            )
-            .eq("referrer_id", user_id)
-            .order("created_at", desc=True)
-            .range(offset, offset + limit - 1)
-            .execute()
-        )
-        return result.data or [], None
-
-    if level == 2:
-        direct_refs = (
-            await db.client.table("users").select("id").eq("referrer_id", user_id).execute()
-        )
-        direct_ref_ids = [r["id"] for r in (direct_refs.data or [])]
+    """Fetch referrals for a specific level. Returns (referrals_data, None).
 
-        if not direct_ref_ids:
-            return [], None
-
-        result = (
-            await db.client.table("users")
-            .select(
-                "id, telegram_id, username, first_name, created_at, referral_program_unlocked, referrer_id, photo_url",
-            )
-            .in_("referrer_id", direct_ref_ids)
-            .order("created_at", desc=True)
-            .range(offset, offset + limit - 1)
-            .execute()
-        )
-        return result.data or [], None
-
-    # level == 3
-    l1_refs = await db.client.table("users").select("id").eq("referrer_id", user_id).execute()
-    l1_ids = [r["id"] for r in (l1_refs.data or [])]
-
-    if not l1_ids:
-        return [], None
-
-    l2_refs = await db.client.table("users").select("id").in_("referrer_id", l1_ids).execute()
-    l2_ids = [r["id"] for r in (l2_refs.data or [])]
-
-    if not l2_ids:
-        return [], None
-
-    result = (
-        await db.client.table("users")
-        .select(
-            "id, telegram_id, username, first_name, created_at, referral_program_unlocked, referrer_id, photo_url",
-        )
-        .in_("referrer_id", l2_ids)
-        .order("created_at", desc=True)
-        .range(offset, offset + limit - 1)
-        .execute()
-    )
-    return result.data or [], None
+    Single indexed lookup in referral_closure for any level.
+    """
+    referrals = await db.get_referral_descendants(user_id, level, limit, offset)
+    return referrals, None
 
 
 async def _batch_fetch_orders_count(
@@ -5,15 +5,20 @@ All prices include both USD and display values for unified currency handling.
 Supports anchor pricing (fixed prices per currency).
 """
 
+import os
 from typing import Annotated, Any, cast
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, HTTPException, Query
+from starlette.responses import Response
 
 from core.db import get_redis
 from core.logging import get_logger
+from core.services.catalog_version import get_catalog_version
 from core.services.currency import CurrencyService, get_currency_service
 from core.services.currency_response import CurrencyFormatter
 from core.services.database import Database, get_database
+from core.utils.fast_json import FastJSONResponse
+from core.utils.http_cache import etag_matches, not_modified, public_cache_control
 
 logger = get_logger(__name__)
 
@@ -22,12 +27,39 @@ router = APIRouter(tags=["webapp-public"])
 # Type alias for dict type hints
 DictStrAny = dict[str, Any]
 
+# Edge caching of the public catalog (same data for every user)
+CATALOG_S_MAXAGE = 30
+CATALOG_STALE_WHILE_REVALIDATE = 300
+
+# Part of the ETag: a deploy may change the response shape for the same data
+_ETAG_BUILD = os.environ.get("VERCEL_GIT_COMMIT_SHA", "dev")[:12]
+
 
 # =============================================================================
 # Helper functions to reduce cognitive complexity
 # =============================================================================
 
 
+async def _catalog_cache_headers(db: Database) -> dict[str, str]:
+    """ETag (from the catalog version) and Cache-Control for catalog responses.
+
+    Empty if the version is unknown: the response is then sent without
+    validators and is not cached by the edge.
+    """
+    version = await get_catalog_version(db)
+    if version is None:
+        return {}
+    return {
+        "ETag": f'"catalog-{_ETAG_BUILD}-{version}"',
+        "Cache-Control": public_cache_control(CATALOG_S_MAXAGE, CATALOG_STALE_WHILE_REVALIDATE),
+    }
+
+
+def _is_not_modified(headers: dict[str, str], if_none_match: str | None) -> bool:
+    etag = headers.get("ETag")
+    return bool(etag) and etag_matches(if_none_match, etag)
+
+
 def _compute_msrp(msrp_rub: float | None) -> float | None:
     """Get MSRP in RUB (simplified after RUB-only migration)."""
     if msrp_rub is None:
@@ -54,82 +86,28 @@ async def _fetch_single_product(db: Database, product_id: str) -> DictStrAny:
     return cast(DictStrAny, product_raw)
 
 
-async def _fetch_social_proof_single(db: Database, product_id: str) -> DictStrAny:
-    """Fetch social proof for a single product."""
+async def _fetch_recent_reviews(db: Database, product_id: str) -> list[DictStrAny]:
+    """Fetch the latest reviews of a product (product_social_proof.recent_reviews)."""
     try:
         result = (
             await db.client.table("product_social_proof")
-            .select("*")
+            .select("recent_reviews")
             .eq("product_id", product_id)
-            .single()
-            .execute()
-        )
-        return cast(DictStrAny, result.data) if result.data else {}
-    except Exception as e:
-        logger.warning("Failed to get social proof: %s", type(e).__name__)
-        return {}
-
-
-async def _batch_fetch_social_proof(
-    db: Database,
-    product_ids: list[str],
-) -> dict[str, dict[str, Any]]:
-    """Batch fetch social proof data for multiple products."""
-    if not product_ids:
-        return {}
-
-    social_proof_map: dict[str, DictStrAny] = {}
-    try:
-        result = (
-            await db.client.table("product_social_proof")
-            .select("product_id,sales_count")
-            .in_("product_id", product_ids)
             .execute()
         )
-        for sp_raw in result.data or []:
-            if isinstance(sp_raw, dict):
-                sp = cast(DictStrAny, sp_raw)
-                pid = sp.get("product_id")
-                if pid:
-                    social_proof_map[pid] = sp
+        rows = cast("list[DictStrAny]", result.data or [])
+        return rows[0].get("recent_reviews") or [] if rows else []
     except Exception as e:
-        logger.warning("Failed to batch fetch social proof: %s", type(e).__name__)
+        logger.warning("Failed to get recent reviews: %s", type(e).__name__)
+        return []
 
-    return social_proof_map
 
-
-async def _batch_fetch_ratings(db: Database, product_ids: list[str]) -> dict[str, DictStrAny]:
-    """Batch fetch and aggregate ratings for multiple products."""
-    if not product_ids:
-        return {}
-
-    ratings_map: dict[str, list[float]] = {}
-    try:
-        result = (
-            await db.client.table("reviews")
-            .select("product_id,rating")
-            .in_("product_id", product_ids)
-            .execute()
-        )
-        for r in cast("list[DictStrAny]", result.data or []):
-            pid = str(r["product_id"])
-            if pid not in ratings_map:
-                ratings_map[pid] = []
-            rating = r.get("rating")
-            if rating is not None:
-                ratings_map[pid].append(float(rating))
-    except Exception as e:
-        logger.warning("Failed to batch fetch ratings: %s", type(e).__name__)
-
-    # Compute aggregates
-    result_map: dict[str, dict[str, Any]] = {}
-    for pid, ratings_list in ratings_map.items():
-        result_map[pid] = {
-            "average": round(sum(ratings_list) / len(ratings_list), 1) if ratings_list else 0,
-            "count": len(ratings_list),
-        }
-
-    return result_map
+def _rating_info(product: DictStrAny) -> DictStrAny:
+    """Rating aggregates precomputed in product_stats (products_with_stock_summary row)."""
+    return {
+        "average": float(product.get("rating_avg") or 0),
+        "count": int(product.get("rating_count") or 0),
+    }
 
 
 def _compute_price_info(
@@ -180,7 +158,6 @@ def _build_product_response(
     discount_percent: float,
     sales_count: int = 0,
     include_full_details: bool = False,
-    social_proof_data: dict[str, Any] | None = None,
 ) -> dict[str, Any]:
     """Build product response object with all computed fields."""
     stock_count = product.get("stock_count", 0) or 0
@@ -231,10 +208,6 @@ def _build_product_response(
                 "instruction_files": product.get("instruction_files") or [],
             },
         )
-        # Override sales_count from social_proof_data if provided
-        if social_proof_data:
-            base_response["sales_count"] = social_proof_data.get("sales_count", 0)
-
     else:
         base_response["duration_days"] = product.get("duration_days")
 
@@ -255,14 +228,21 @@ async def get_webapp_product(
     currency: Annotated[
         str | None, Query(description="User preferred currency (USD, RUB, EUR, etc.)")
     ] = None,
-) -> dict[str, Any]:
+    *,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
     """Get product with discount and social proof for Mini App.
 
     Uses products_with_stock_summary VIEW for aggregated data.
     Uses anchor pricing: if product has fixed price in user's currency, uses that.
     Otherwise falls back to dynamic conversion from USD.
+    Conditional requests for an unchanged catalog get 304 without DB queries.
     """
     db = get_database()
+    cache_headers = await _catalog_cache_headers(db)
+    if _is_not_modified(cache_headers, if_none_match):
+        return not_modified(cache_headers)
+
     redis = get_redis()
 
     # Fetch product
@@ -271,9 +251,10 @@ async def get_webapp_product(
     # Discount from VIEW
     discount_percent = product.get("max_discount_percent", 0) or 0
 
-    # Rating and social proof
-    rating_info = await db.get_product_rating(product_id)
-    social_proof_data = await _fetch_social_proof_single(db, product_id)
+    # Rating and sales from precomputed counters (same row), latest reviews from the view
+    rating_info = _rating_info(product)
+    sales_count = product.get("sales_count", 0) or 0
+    recent_reviews = await _fetch_recent_reviews(db, product_id)
 
     # Currency services
     formatter = CurrencyFormatter.create(
@@ -295,23 +276,26 @@ async def get_webapp_product(
         rating_info=rating_info,
         formatter=formatter,
         discount_percent=discount_percent,
+        sales_count=sales_count,
         include_full_details=True,
-        social_proof_data=social_proof_data,
     )
 
     social_proof = {
         "rating": rating_info.get("average", 0),
         "review_count": rating_info.get("count", 0),
-        "sales_count": social_proof_data.get("sales_count", 0),
-        "recent_reviews": social_proof_data.get("recent_reviews", []),
+        "sales_count": sales_count,
+        "recent_reviews": recent_reviews,
     }
 
-    return {
-        "product": product_response,
-        "social_proof": social_proof,
-        "currency": formatter.currency,
-        "exchange_rate": formatter.exchange_rate,
-    }
+    return FastJSONResponse(
+        {
+            "product": product_response,
+            "social_proof": social_proof,
+            "currency": formatter.currency,
+            "exchange_rate": formatter.exchange_rate,
+        },
+        headers=cache_headers,
+    )
 
 
 @router.get("/products")
@@ -322,19 +306,26 @@ async def get_webapp_products(
     currency: Annotated[
         str | None, Query(description="User preferred currency (USD, RUB, EUR, etc.)")
     ] = None,
-) -> dict[str, Any]:
+    *,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
     """Get all active products for Mini App catalog.
 
     Uses products_with_stock_summary VIEW to eliminate N+1 queries.
     Uses anchor pricing: if product has fixed price in user's currency, uses that.
     Otherwise falls back to dynamic conversion from USD.
+    Conditional requests for an unchanged catalog get 304 without DB queries.
     """
     from core.logging import get_logger
 
     logger = get_logger(__name__)
 
+    db = get_database()
+    cache_headers = await _catalog_cache_headers(db)
+    if _is_not_modified(cache_headers, if_none_match):
+        return not_modified(cache_headers)
+
     try:
-        db = get_database()
         redis = get_redis()
 
         # Fetch all active products
@@ -360,19 +351,14 @@ async def get_webapp_products(
         )
         currency_service = get_currency_service(redis)
 
-        # Batch fetch data
-        product_ids = [p["id"] for p in products]
-        social_proof_map = await _batch_fetch_social_proof(db, product_ids)
-        ratings_map = await _batch_fetch_ratings(db, product_ids)
-
         # Build result list
         result = []
         for p in products:
             try:
                 discount_percent = p.get("max_discount_percent", 0) or 0
-                rating_info = ratings_map.get(p["id"], {"average": 0, "count": 0})
-                sp_data = social_proof_map.get(p["id"], {})
-                sales_count = sp_data.get("sales_count", 0)
+                # Rating and sales come precomputed with the row (no extra queries)
+                rating_info = _rating_info(p)
+                sales_count = p.get("sales_count", 0) or 0
 
                 price_info = _compute_price_info(p, currency_service, formatter, discount_percent)
 
@@ -393,11 +379,14 @@ async def get_webapp_products(
                 # Skip this product and continue with others
                 continue
 
-        return {
-            "products": result,
-            "currency": formatter.currency,
-            "exchange_rate": formatter.exchange_rate,
-        }
+        return FastJSONResponse(
+            {
+                "products": result,
+                "currency": formatter.currency,
+                "exchange_rate": formatter.exchange_rate,
+            },
+            headers=cache_headers,
+        )
     except Exception as e:
         logger.error(f"Failed to fetch products: {type(e).__name__}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to fetch products")
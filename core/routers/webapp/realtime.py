@@ -6,6 +6,7 @@ Uses Redis Streams to read events and stream them to clients.
 
 import asyncio
 import json
+import re
 from typing import Any
 
 from fastapi import APIRouter, Request
@@ -29,6 +30,17 @@ MAX_EVENTS_PER_POLL = 10
 # Maximum number of events to send on initial connection (to avoid overwhelming client)
 MAX_INITIAL_EVENTS = 20
 
+# Cursor for streams that have no entries yet (XRANGE "(0-0" reads from the beginning)
+EMPTY_STREAM_ID = "0-0"
+
+# SSE event id is a composite cursor: last entry ID per stream, in stream_keys order
+CURSOR_SEPARATOR = ","
+
+_STREAM_ID_RE = re.compile(r"^\d+-\d+$")
+
+# Largest sequence part of a stream entry ID (64-bit unsigned)
+_MAX_STREAM_SEQ = 2**64 - 1
+
 # Redis Stream key prefixes (constants to avoid duplication)
 STREAM_PREFIX_PROFILE = "stream:realtime:profile:"
 STREAM_PREFIX_ORDERS = "stream:realtime:orders:"
@@ -37,32 +49,92 @@ STREAM_PREFIX_ADMIN_ORDERS = "stream:realtime:admin:orders"
 STREAM_PREFIX_ADMIN_ACCOUNTING = "stream:realtime:admin:accounting"
 STREAM_PREFIX_LEADERBOARD = "stream:realtime:leaderboard"
 
+StreamEntry = tuple[str, dict[str, Any]]
 
-def _build_streams_dict(stream_keys: list[str], last_ids: dict[str, str]) -> dict[str, str]:
-    """Build streams dict for xread (reduces cognitive complexity)."""
-    return {key: last_ids.get(key, "$") for key in stream_keys}
 
+def _normalize_entries(raw: Any) -> list[StreamEntry]:
+    """Normalize XRANGE/XREVRANGE results to (entry_id, fields) tuples.
 
-def _process_stream_results(
-    results: list[tuple[str, list[tuple[str, dict[str, str]]]]],
-    last_ids: dict[str, str],
-) -> Any:
-    """Process stream results and yield SSE events (reduces cognitive complexity)."""
-    for stream_key, entries in results:
-        for entry_id, fields in entries:
-            # Update last_id for this stream
-            last_ids[str(stream_key)] = entry_id
-
-            # Extract and format data
-            data = fields.get("data", "{}")
-            if isinstance(data, str):
-                try:
-                    parsed = json.loads(data)
-                    yield f"data: {json.dumps(parsed)}\n\n"
-                except json.JSONDecodeError:
-                    logger.warning(f"Invalid JSON in stream {stream_key}: {data}")
-            else:
-                yield f"data: {json.dumps(data)}\n\n"
+    upstash-redis returns raw [id, [field, value, ...]] lists, while the REST
+    fallback client already returns (id, {field: value}) tuples.
+    """
+    entries: list[StreamEntry] = []
+    if not isinstance(raw, list):
+        return entries
+    for entry in raw:
+        if not isinstance(entry, (list, tuple)) or len(entry) < 2:
+            continue
+        entry_id, fields = str(entry[0]), entry[1]
+        if isinstance(fields, list):
+            fields = {str(fields[i]): fields[i + 1] for i in range(0, len(fields) - 1, 2)}
+        if isinstance(fields, dict):
+            entries.append((entry_id, fields))
+    return entries
+
+
+def _parse_last_event_id(
+    last_event_id: str | None, stream_keys: list[str]
+) -> dict[str, str] | None:
+    """Parse client-supplied Last-Event-ID into per-stream resume positions.
+
+    Returns None (tail replay) when the cursor is missing or does not match
+    the current set of streams (e.g. channels changed between reconnects).
+    """
+    if not last_event_id:
+        return None
+    ids = last_event_id.strip().split(CURSOR_SEPARATOR)
+    if len(ids) != len(stream_keys) or not all(_STREAM_ID_RE.match(i) for i in ids):
+        return None
+    return dict(zip(stream_keys, ids, strict=True))
+
+
+def _encode_cursor(stream_keys: list[str], last_ids: dict[str, str]) -> str:
+    """Encode per-stream positions as SSE event id (browser echoes it as Last-Event-ID)."""
+    return CURSOR_SEPARATOR.join(last_ids.get(key, EMPTY_STREAM_ID) for key in stream_keys)
+
+
+def _stream_id_before(entry_id: str) -> str:
+    """ID immediately preceding entry_id (XRANGE "(<id>" then starts at entry_id)."""
+    ms, seq = (int(part) for part in entry_id.split("-"))
+    if seq > 0:
+        return f"{ms}-{seq - 1}"
+    if ms > 0:
+        return f"{ms - 1}-{_MAX_STREAM_SEQ}"
+    return EMPTY_STREAM_ID
+
+
+def _format_sse_event(stream_key: str, fields: dict[str, Any], cursor: str) -> str | None:
+    """Format stream entry as SSE event, or None if the payload is invalid."""
+    data = fields.get("data", "{}")
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except json.JSONDecodeError:
+            logger.warning(f"Invalid JSON in stream {stream_key}: {data}")
+            return None
+    return f"id: {cursor}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _read_tail(redis: Any, stream_key: str) -> list[StreamEntry]:
+    """Read the newest MAX_INITIAL_EVENTS entries (oldest first) with one XREVRANGE."""
+    try:
+        raw = await redis.xrevrange(stream_key, "+", "-", count=MAX_INITIAL_EVENTS)
+    except Exception as stream_err:
+        logger.warning(f"Error reading initial events from {stream_key}: {stream_err}")
+        return []
+    return list(reversed(_normalize_entries(raw)))
+
+
+async def _read_after(redis: Any, stream_key: str, last_id: str) -> list[StreamEntry]:
+    """Read up to MAX_EVENTS_PER_POLL entries strictly after last_id."""
+    try:
+        raw = await redis.xrange(
+            stream_key, start=f"({last_id}", end="+", count=MAX_EVENTS_PER_POLL
+        )
+    except Exception as stream_err:
+        logger.warning(f"Error reading stream {stream_key}: {stream_err}")
+        return []
+    return _normalize_entries(raw)
 
 
 async def _stream_events_generator(
@@ -70,94 +142,52 @@ async def _stream_events_generator(
 ) -> Any:
     """Generate SSE events from Redis Streams.
 
+    On a fresh connection the newest MAX_INITIAL_EVENTS entries of each stream
+    are replayed (one XREVRANGE per stream). When last_ids is given (parsed
+    from Last-Event-ID), reading resumes right after those positions instead.
+
     Args:
         stream_keys: List of stream keys to read from
         last_ids: Dictionary mapping stream keys to last read entry IDs (for resume)
     """
     redis = get_redis()
-    if last_ids is None:
-        last_ids = dict.fromkeys(stream_keys, "$")  # Start from latest
 
-    # Track if this is the first poll (initial connection)
-    is_first_poll = True
-    initial_events_sent = 0
+    if last_ids is None:
+        tails = await asyncio.gather(*(_read_tail(redis, key) for key in stream_keys))
+        # Streams not replayed yet resume at the start of their tail, so a
+        # client disconnecting mid-replay gets the events it has not seen
+        last_ids = {
+            key: (_stream_id_before(entries[0][0]) if entries else EMPTY_STREAM_ID)
+            for key, entries in zip(stream_keys, tails, strict=True)
+        }
+        initial_events_sent = 0
+        for key, entries in zip(stream_keys, tails, strict=True):
+            for entry_id, fields in entries:
+                last_ids[key] = entry_id
+                event = _format_sse_event(key, fields, _encode_cursor(stream_keys, last_ids))
+                if event:
+                    initial_events_sent += 1
+                    yield event
+        if initial_events_sent > 0:
+            logger.debug(f"Sent {initial_events_sent} initial events on connection")
 
     while True:
         try:
             # Read from all streams (non-blocking, upstash REST doesn't support block)
-            # We read entries after last_ids for each stream
+            results = await asyncio.gather(
+                *(
+                    _read_after(redis, key, last_ids.get(key, EMPTY_STREAM_ID))
+                    for key in stream_keys
+                )
+            )
             has_events = False
-            for stream_key in stream_keys:
-                last_id = last_ids.get(stream_key, "$")
-
-                # On first poll, read only recent events to avoid overwhelming client
-                if is_first_poll and last_id == "$":
-                    # Read all events (limited by MAX_INITIAL_EVENTS * 2 to get enough for last N)
-                    # Then take only the last MAX_INITIAL_EVENTS to send newest events
-                    try:
-                        # Read more than needed to ensure we get the latest
-                        all_entries = await redis.xrange(
-                            stream_key, start="-", end="+", count=MAX_INITIAL_EVENTS * 2
-                        )
-                        if all_entries:
-                            # Take only the last MAX_INITIAL_EVENTS (newest events)
-                            entries = all_entries[-MAX_INITIAL_EVENTS:]
-                            has_events = True
-                            for entry_id, fields in entries:
-                                last_ids[stream_key] = entry_id
-                                data = fields.get("data", "{}")
-                                if isinstance(data, str):
-                                    try:
-                                        parsed = json.loads(data)
-                                        yield f"data: {json.dumps(parsed)}\n\n"
-                                        initial_events_sent += 1
-                                    except json.JSONDecodeError:
-                                        logger.warning(f"Invalid JSON in stream {stream_key}: {data}")
-                                else:
-                                    yield f"data: {json.dumps(data)}\n\n"
-                                    initial_events_sent += 1
-                        else:
-                            # No events, set to "0" to start reading new events
-                            last_ids[stream_key] = "0"
-                    except Exception as stream_err:
-                        logger.warning(f"Error reading initial events from {stream_key}: {stream_err}")
-                        last_ids[stream_key] = "0"
-                    continue
-
-                # For subsequent polls, read new events after last_id
-                if last_id in {"$", "0"}:
-                    # Skip if no last_id yet (will be set on next poll)
-                    if last_id == "$":
-                        last_ids[stream_key] = "0"
-                    continue
-
-                try:
-                    # Read entries after last_id using xrange
-                    # Format: XRANGE stream_key (last_id +inf COUNT MAX_EVENTS_PER_POLL
-                    entries = await redis.xrange(
-                        stream_key, start=f"({last_id}", end="+", count=MAX_EVENTS_PER_POLL
-                    )
-                    if entries:
+            for key, entries in zip(stream_keys, results, strict=True):
+                for entry_id, fields in entries:
+                    last_ids[key] = entry_id
+                    event = _format_sse_event(key, fields, _encode_cursor(stream_keys, last_ids))
+                    if event:
                         has_events = True
-                        for entry_id, fields in entries:
-                            last_ids[stream_key] = entry_id
-                            data = fields.get("data", "{}")
-                            if isinstance(data, str):
-                                try:
-                                    parsed = json.loads(data)
-                                    yield f"data: {json.dumps(parsed)}\n\n"
-                                except json.JSONDecodeError:
-                                    logger.warning(f"Invalid JSON in stream {stream_key}: {data}")
-                            else:
-                                yield f"data: {json.dumps(data)}\n\n"
-                except Exception as stream_err:
-                    logger.warning(f"Error reading stream {stream_key}: {stream_err}")
-
-            # Mark first poll as complete
-            if is_first_poll:
-                is_first_poll = False
-                if initial_events_sent > 0:
-                    logger.debug(f"Sent {initial_events_sent} initial events on connection")
+                        yield event
 
             # Send keep-alive if no new entries
             if not has_events:
@@ -233,6 +263,11 @@ async def realtime_stream(
     Query params:
         - user_id: User UUID (for user-specific streams) - optional, can be auto-detected from auth
         - channels: Comma-separated list of channels (profile, orders, admin, leaderboard)
+        - last_event_id: Resume cursor (fallback for clients that cannot send
+          the Last-Event-ID header)
+
+    Every event carries an `id:` cursor; on reconnect the browser sends it back
+    as Last-Event-ID and only entries after it are streamed (no tail replay).
     """
     # Get query parameters
     user_id = request.query_params.get("user_id")
@@ -255,10 +290,15 @@ async def realtime_stream(
     # Determine stream keys based on channels
     stream_keys = _determine_stream_keys(channels_param, user_id)
 
-    logger.debug(f"Realtime SSE connection: streams={stream_keys}")
+    last_ids = _parse_last_event_id(
+        request.headers.get("last-event-id") or request.query_params.get("last_event_id"),
+        stream_keys,
+    )
+
+    logger.debug(f"Realtime SSE connection: streams={stream_keys}, resume={last_ids is not None}")
 
     async def event_generator():
-        async for event in _stream_events_generator(stream_keys):
+        async for event in _stream_events_generator(stream_keys, last_ids):
             yield event
             # Check if client disconnected
             if await request.is_disconnected():
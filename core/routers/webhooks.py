@@ -15,6 +15,7 @@ from fastapi import APIRouter, Request
 from fastapi.responses import JSONResponse
 
 from core.logging import get_logger
+from core.orders.list_cache import invalidate_orders_lists_for
 from core.routers.deps import get_notification_service, get_payment_service, get_queue_publisher
 
 if TYPE_CHECKING:
@@ -138,7 +139,7 @@ async def _create_refund_ticket(
             )
             .execute()
         )
-        await (
+        order_result = await (
             db.client.table("orders")
             .update(
                 {
@@ -150,6 +151,7 @@ async def _create_refund_ticket(
             .eq("id", real_order_id)
             .execute()
         )
+        await invalidate_orders_lists_for(order_result.data)
     except Exception as e:
         logger.error("CrystalPay webhook: Failed to create refund ticket: %s", e, exc_info=True)
 
@@ -166,12 +168,13 @@ async def _handle_cancelled_order_recovery(
 
     if can_fulfill:
         logger.info("CrystalPay webhook: Restoring order %s - stock available", real_order_id)
-        await (
+        order_result = await (
             db.client.table("orders")
             .update({"status": "pending", "notes": "Restored after late payment"})
             .eq("id", real_order_id)
             .execute()
         )
+        await invalidate_orders_lists_for(order_result.data)
         return None
 
     logger.warning("CrystalPay webhook: Order %s - no stock, creating refund ticket", real_order_id)
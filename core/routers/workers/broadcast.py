@@ -17,12 +17,13 @@ from aiogram.types import BufferedInputFile, InlineKeyboardButton, InlineKeyboar
 from fastapi import APIRouter, Request
 
 from core.logging import get_logger
+from core.queue import QStashRoute
 from core.routers.deps import verify_qstash
 from core.services.database import get_database
 
 logger = get_logger(__name__)
 
-broadcast_router = APIRouter()
+broadcast_router = APIRouter(route_class=QStashRoute)
 
 
 # =============================================================================
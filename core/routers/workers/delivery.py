@@ -6,15 +6,23 @@ All methods use async/await with supabase-py v2 (no asyncio.to_thread).
 
 from typing import Any
 
-from fastapi import APIRouter, Request
-
+from fastapi import APIRouter, HTTPException, Request
+
+from core.idempotency import (
+    WORKER_DELIVER_GOODS,
+    IdempotencyInProgressError,
+    delivery_is_final,
+    get_idempotency_ledger,
+    run_idempotent,
+)
 from core.logging import get_logger
+from core.queue import QStashRoute
 from core.routers.deps import get_notification_service, verify_qstash
 from core.services.database import get_database
 
 logger = get_logger(__name__)
 
-delivery_router = APIRouter()
+delivery_router = APIRouter(route_class=QStashRoute)
 
 
 @delivery_router.post("/deliver-goods")
@@ -34,8 +42,24 @@ async def worker_deliver_goods(request: Request) -> dict[str, Any]:
     # Import from router module to get the shared function
     from .router import _deliver_items_for_order
 
-    result = await _deliver_items_for_order(db, notification_service, order_id, only_instant=True)
-    return {"success": True, "order_id": order_id, **result}
+    async def deliver() -> dict[str, Any]:
+        result = await _deliver_items_for_order(
+            db, notification_service, order_id, only_instant=True
+        )
+        return {"success": True, "order_id": order_id, **result}
+
+    # Redeliveries of an already delivered order return the recorded outcome
+    # instead of re-validating the order (non-final outcomes are not cached)
+    try:
+        return await run_idempotent(
+            get_idempotency_ledger(db),
+            WORKER_DELIVER_GOODS,
+            str(order_id),
+            deliver,
+            is_final=delivery_is_final,
+        )
+    except IdempotencyInProgressError:
+        raise HTTPException(status_code=409, detail="Delivery already in progress")
 
 
 @delivery_router.post("/deliver-batch")
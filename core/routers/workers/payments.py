@@ -1,14 +1,22 @@
 """Payment Workers.
 
-QStash workers for payment-related operations (refund, cashback).
+QStash workers for payment-related operations (refund, cashback, outbox drain).
 """
 
 from datetime import UTC, datetime
 from typing import TYPE_CHECKING, Any
 
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, HTTPException, Request
 
+from core.idempotency import (
+    WORKER_REVIEW_CASHBACK,
+    IdempotencyInProgressError,
+    get_idempotency_ledger,
+    run_idempotent,
+    success_is_final,
+)
 from core.logging import get_logger
+from core.queue import QStashRoute
 from core.routers.deps import get_notification_service, verify_qstash
 from core.services.database import get_database
 from core.services.money import to_float
@@ -253,7 +261,7 @@ async def _send_cashback_notification_safe(
 # =============================================================================
 
 
-payments_router = APIRouter()
+payments_router = APIRouter(route_class=QStashRoute)
 
 
 @payments_router.post("/process-refund")
@@ -357,6 +365,10 @@ async def worker_process_refund(request: Request) -> dict[str, Any]:
         .execute()
     )
 
+    from core.orders.list_cache import invalidate_orders_list
+
+    await invalidate_orders_list(str(user_id))
+
     # 4. Notify user
     telegram_id_val = order_data.get("user_telegram_id")
     telegram_id = (
@@ -397,7 +409,25 @@ async def worker_process_review_cashback(request: Request) -> dict[str, Any]:
         return {"error": "order_id required"}
 
     db = get_database()
+    try:
+        return await run_idempotent(
+            get_idempotency_ledger(db),
+            WORKER_REVIEW_CASHBACK,
+            str(order_id),
+            lambda: _process_review_cashback(db, order_id, user_telegram_id, order_amount),
+            is_final=success_is_final,
+        )
+    except IdempotencyInProgressError:
+        raise HTTPException(status_code=409, detail="Cashback already in progress")
+
 
+async def _process_review_cashback(
+    db: Any,
+    order_id: str,
+    user_telegram_id: Any,
+    order_amount: Any,
+) -> dict[str, Any]:
+    """Credit 5% review cashback for an order (once)."""
     # Find review by order_id
     review_result = (
         await db.client.table("reviews")
@@ -478,3 +508,14 @@ async def worker_process_review_cashback(request: Request) -> dict[str, Any]:
     )
 
     return {"success": True, "cashback": cashback_amount, "new_balance": new_balance}
+
+
+@payments_router.post("/drain-outbox")
+async def worker_drain_outbox(request: Request) -> dict[str, Any]:
+    """QStash Worker: Run pending outbox side effects (payment notifications, expenses)."""
+    await verify_qstash(request)
+
+    from core.orders.outbox import drain_outbox
+
+    db = get_database()
+    return {"success": True, **await drain_outbox(db)}
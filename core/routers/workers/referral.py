@@ -7,16 +7,25 @@ All methods use async/await with supabase-py v2 (no asyncio.to_thread).
 from datetime import UTC, datetime, timedelta
 from typing import Any
 
-from fastapi import APIRouter, Request
-
+from fastapi import APIRouter, HTTPException, Request
+
+from core.idempotency import (
+    WORKER_CALCULATE_REFERRAL,
+    IdempotencyInProgressError,
+    get_idempotency_ledger,
+    run_idempotent,
+    success_is_final,
+)
 from core.logging import get_logger, sanitize_id_for_logging
+from core.queue import QStashRoute
 from core.routers.deps import get_notification_service, verify_qstash
 from core.services.database import get_database
+from core.services.domains.referral import invalidate_partner_dashboards
 from core.services.money import to_float
 
 logger = get_logger(__name__)
 
-referral_router = APIRouter()
+referral_router = APIRouter(route_class=QStashRoute)
 
 
 # =============================================================================
@@ -523,6 +532,9 @@ async def worker_calculate_referral(request: Request) -> dict[str, Any]:
     1. Update buyer's turnover (in USD) - recalculates as own orders + referral orders (may unlock new levels)
     2. Check if referral program should be unlocked (first purchase)
     3. Process referral bonuses - ONLY for levels that referrer has unlocked
+
+    Turnover is additive, so the run is guarded by the idempotency ledger:
+    redeliveries of the same order return the recorded outcome.
     """
     data = await verify_qstash(request)
     order_id = data.get("order_id")
@@ -532,6 +544,32 @@ async def worker_calculate_referral(request: Request) -> dict[str, Any]:
         return {"error": "order_id required"}
 
     db = get_database()
+    try:
+        return await run_idempotent(
+            get_idempotency_ledger(db),
+            WORKER_CALCULATE_REFERRAL,
+            str(order_id),
+            lambda: _calculate_referral(db, str(order_id), usd_rate),
+            is_final=success_is_final,
+        )
+    except IdempotencyInProgressError:
+        # 409 -> QStash retries after the running attempt finishes
+        raise HTTPException(status_code=409, detail="Referral calculation already in progress")
+
+
+# Helper to resolve the referrer chain (reduces cognitive complexity)
+async def _get_referral_chain(db: Any, user_id: str, referrer_id: str) -> list[str]:
+    """Referrer chain of the buyer (index 0 = direct referrer), up to 3 levels."""
+    try:
+        ancestors = await db.get_referral_ancestors(user_id)
+    except Exception as e:
+        logger.warning(f"Failed to resolve referral chain of {user_id}: {e}")
+        return [referrer_id]
+    return ancestors or [referrer_id]
+
+
+async def _calculate_referral(db: Any, order_id: str, usd_rate: Any) -> dict[str, Any]:
+    """Apply turnover, unlock and referral bonuses for a paid order."""
     notification_service = get_notification_service()
 
     order = (
@@ -617,6 +655,12 @@ async def worker_calculate_referral(request: Request) -> dict[str, Any]:
         ).execute()
         bonuses = bonus_result.data if isinstance(bonus_result.data, dict) else {}
 
+        # Partner dashboards of the whole chain show referral purchases and earnings.
+        # process_referral_bonus returns only per-level amounts, so resolve the chain
+        # (index 0 = direct referrer) to know whose dashboards to drop.
+        ancestors = await _get_referral_chain(db, user_id, referrer_id)
+        await invalidate_partner_dashboards(ancestors)
+
         # Send notifications to referrers about earned bonuses
         await _send_referral_bonus_notifications(db, notification_service, bonuses, user_id, amount)
 
@@ -629,12 +673,9 @@ async def worker_calculate_referral(request: Request) -> dict[str, Any]:
                 await emit_profile_update(user_id, {"turnover_updated": True, "level_up": True})
 
             # Update referrers' profiles (bonuses credited)
-            bonuses_data = bonuses.get("bonuses", []) if isinstance(bonuses, dict) else []
-            for bonus in bonuses_data:
-                if isinstance(bonus, dict):
-                    referrer_id = bonus.get("user_id")
-                    if referrer_id:
-                        await emit_profile_update(str(referrer_id), {"bonus_received": True})
+            for level, ancestor_id in enumerate(ancestors, start=1):
+                if to_float(bonuses.get(f"level{level}") or 0) > 0:
+                    await emit_profile_update(ancestor_id, {"bonus_received": True})
 
             # Leaderboard update (turnover changed)
             await emit_leaderboard_update(user_id)
@@ -0,0 +1,63 @@
+"""Catalog version (ETag source for public catalog endpoints).
+
+The version lives in Postgres (catalog_version counter, bumped at commit
+by triggers on products, stock_items, reviews and order status, plus the
+latest passed stock expiry, see migration 20260127_catalog_version.sql).
+Each instance memoizes it for VERSION_TTL_SECS, so conditional requests
+are answered without any network round-trip while the memo is fresh.
+
+Read the version BEFORE building a response: data committed in between is
+then tagged with the older version, which only costs a full response later.
+"""
+
+import asyncio
+import time
+from typing import TYPE_CHECKING
+
+from core.logging import get_logger
+
+if TYPE_CHECKING:
+    from core.services.database import Database
+
+logger = get_logger(__name__)
+
+# How long a fetched version is trusted by this instance
+VERSION_TTL_SECS = 5
+
+_version: str | None = None
+_fetched_at = 0.0
+_lock: asyncio.Lock | None = None  # Lazy: created inside the running loop
+
+
+def _get_lock() -> asyncio.Lock:
+    global _lock
+    if _lock is None:
+        _lock = asyncio.Lock()
+    return _lock
+
+
+def _fresh() -> bool:
+    return _version is not None and time.monotonic() - _fetched_at < VERSION_TTL_SECS
+
+
+async def get_catalog_version(db: "Database") -> str | None:
+    """Current catalog version, or None if it cannot be determined.
+
+    Concurrent callers share one fetch. If the fetch fails, the previous
+    version is not reused (it may be stale), so callers skip validators.
+    """
+    global _version, _fetched_at
+    if _fresh():
+        return _version
+
+    async with _get_lock():
+        if _fresh():
+            return _version
+        try:
+            result = await db.client.rpc("get_catalog_version", {}).execute()
+            _version = str(result.data)
+            _fetched_at = time.monotonic()
+        except Exception as e:
+            logger.warning(f"Failed to fetch catalog version: {type(e).__name__}: {e}")
+            _version = None
+        return _version
@@ -52,6 +52,7 @@ from core.services.repositories import (
     OrderRepository,
     ProductRepository,
     StockRepository,
+    UserAnalyticsRepository,
     UserRepository,
 )
 
@@ -78,6 +79,7 @@ class Database:
         self._orders_repo = OrderRepository(self.client)
         self._stock_repo = StockRepository(self.client)
         self._chat_repo = ChatRepository(self.client)
+        self._analytics_repo = UserAnalyticsRepository(self.client)
 
         # Domains
         self.users_domain = UsersDomain(self._users_repo)
@@ -154,6 +156,16 @@ class Database:
     async def add_warning(self, telegram_id: int) -> int:
         return await self.users_domain.add_warning(telegram_id)
 
+    async def get_referral_descendants(
+        self, user_id: str, depth: int, limit: int = 50, offset: int = 0
+    ) -> list[dict[str, Any]]:
+        """Referrals exactly `depth` levels below user (referral_closure, one indexed query)."""
+        return await self.users_domain.get_referral_descendants(user_id, depth, limit, offset)
+
+    async def get_referral_ancestors(self, user_id: str, max_depth: int = 3) -> list[str]:
+        """Referrer chain of user, direct referrer first (referral_closure)."""
+        return await self.users_domain.get_referral_ancestors(user_id, max_depth)
+
     # ==================== PRODUCT OPERATIONS (delegated) ====================
 
     async def get_products(self, status: str = "active") -> list[Product]:
@@ -168,6 +180,9 @@ class Database:
     async def get_product_rating(self, product_id: str) -> dict[str, Any]:
         return await self.products_domain.get_rating(product_id)
 
+    async def reconcile_product_stats(self) -> int:
+        return await self._products_repo.reconcile_stats()
+
     # ==================== STOCK OPERATIONS (delegated) ====================
 
     async def get_available_stock_item(self, product_id: str) -> StockItem | None:
@@ -352,7 +367,7 @@ class Database:
                 if isinstance(products_data, Mapping):
                     p = dict(products_data)
                     p["stock_count"] = 0
-                    products.append(Product(**p))
+                    products.append(Product.from_row(p))
         return products
 
     async def remove_from_wishlist(self, user_id: str, product_id: str) -> None:
@@ -390,6 +405,11 @@ class Database:
             .execute()
         )
 
+        # The WebApp orders list marks reviewed items
+        from core.orders.list_cache import invalidate_orders_list
+
+        await invalidate_orders_list(str(user_id))
+
     async def get_product_reviews(self, product_id: str, limit: int = 5) -> list[dict[str, Any]]:
         """Get recent reviews for product."""
         result = (
@@ -493,6 +513,23 @@ class Database:
             .execute()
         )
 
+    # ==================== USER ANALYTICS (delegated) ====================
+
+    def user_analytics_query(self, columns: str = "*", count: str | None = None) -> Any:
+        """Query builder over users_extended_analytics (pre-aggregated, index-backed)."""
+        return self._analytics_repo.query(columns, count)
+
+    async def get_user_analytics(self, user_id: str) -> dict[str, Any] | None:
+        return await self._analytics_repo.get_by_user_id(user_id)
+
+    async def refresh_user_analytics(self, user_ids: list[str]) -> int:
+        return await self._analytics_repo.refresh(user_ids)
+
+    async def reconcile_user_analytics_batch(
+        self, after_user_id: str | None = None, batch_size: int = 1000
+    ) -> tuple[int, str | None]:
+        return await self._analytics_repo.reconcile_batch(after_user_id, batch_size)
+
     # ==================== REFERRAL ====================
 
     # NOTE: These are fallback values. Actual percentages loaded from referral_settings table.
@@ -505,33 +542,17 @@ class Database:
 
     async def process_referral_bonus(self, order: Order) -> None:
         """Process 3-level referral bonus for completed order."""
-        current_user_id = order.user_id
         bonuses_awarded = []
         bonuses_to_insert = []  # Batch insert для избежания Chatty Logic
 
-        for level_config in self.REFERRAL_LEVELS:
+        # Вся цепочка рефереров одним индексированным запросом (referral_closure)
+        ancestors = await self.get_referral_ancestors(str(order.user_id), len(self.REFERRAL_LEVELS))
+
+        for level_config, referrer_id in zip(self.REFERRAL_LEVELS, ancestors, strict=False):
             level = level_config["level"]
             percent = level_config["percent"]
 
-            user_result = (
-                await self.client.table("users")
-                .select("referrer_id")
-                .eq("id", current_user_id)
-                .execute()
-            )
-            if not user_result.data:
-                break
-            user_data = user_result.data[0]
-            if not isinstance(user_data, Mapping):
-                break
-            referrer_id_raw = user_data.get("referrer_id")
-            if not referrer_id_raw:
-                break
-
-            referrer_id = str(referrer_id_raw) if referrer_id_raw else None
-            if not referrer_id:
-                break
-            if referrer_id == order.user_id:
+            if referrer_id == str(order.user_id):
                 logger.warning(f"Self-referral loop detected at L{level}")
                 break
 
@@ -559,8 +580,6 @@ class Database:
             bonuses_awarded.append({"level": level, "referrer_id": referrer_id, "bonus": bonus})
             logger.info(f"Referral L{level}: {percent}% = {bonus}₽ to user {referrer_id}")
 
-            current_user_id = referrer_id
-
         # Batch insert всех бонусов сразу (вместо 3 отдельных запросов)
         if bonuses_to_insert:
             await self.client.table("referral_bonuses").insert(bonuses_to_insert).execute()
@@ -4,20 +4,25 @@ Handles product search, discovery, and availability checking.
 Combines RAG (semantic search) with traditional database queries.
 """
 
+import asyncio
+import re
 from dataclasses import dataclass
-from typing import Any, TYPE_CHECKING
+from typing import Any
 
 from core.logging import get_logger
 from core.services.models import Product
 
-if TYPE_CHECKING:
-    from core.rag import ProductSearch
-
 logger = get_logger(__name__)
 
 # Error message constants
 ERR_PRODUCT_NOT_FOUND = "Product not found"
 
+# Past this, search answers with lexical results instead of waiting for the embedding
+EMBEDDING_TIMEOUT_SECS = 3.0
+
+# Shorter names ("AI", "VPN") are too generic to skip semantic ranking
+MIN_EXACT_NAME_LEN = 3
+
 
 @dataclass
 class ProductAvailability:
@@ -82,11 +87,22 @@ class PurchaseIntent:
     reason: str | None = None
 
 
+def _to_search_result(product: Product, similarity: float = 0.0) -> SearchResult:
+    return SearchResult(
+        id=product.id,
+        name=product.name,
+        price=product.price,
+        in_stock=product.stock_count > 0,
+        stock_count=product.stock_count,
+        similarity_score=similarity,
+    )
+
+
 class CatalogService:
     """Catalog domain service.
 
     Provides clean interface for:
-    - Product search (RAG + text fallback)
+    - Product search (hybrid: semantic + full-text, RRF)
     - Availability checking
     - Purchase intent creation
     - Waitlist management
@@ -94,22 +110,6 @@ class CatalogService:
 
     def __init__(self, db: Any) -> None:
         self.db = db
-        self._rag_search: ProductSearch | bool | None = None
-
-    def _get_rag_search(self) -> Any:
-        """Lazy load RAG search to avoid import errors."""
-        if self._rag_search is None:
-            try:
-                from core.rag import VECS_AVAILABLE, ProductSearch
-
-                if VECS_AVAILABLE:
-                    self._rag_search = ProductSearch()
-                    if not self._rag_search.is_available:
-                        self._rag_search = False  # Mark as unavailable
-            except Exception as e:
-                logger.warning("RAG search unavailable: %s", type(e).__name__)
-                self._rag_search = False
-        return self._rag_search if self._rag_search else None
 
     async def check_availability(self, product_name: str) -> ProductAvailability:
         """Check if a product is available.
@@ -163,8 +163,6 @@ class CatalogService:
         if not product:
             return ProductDetails(found=False)
 
-        rating = await self.db.get_product_rating(product.id)
-
         return ProductDetails(
             found=True,
             id=product.id,
@@ -176,105 +174,149 @@ class CatalogService:
             stock_count=product.stock_count,
             warranty_hours=product.warranty_hours,
             instructions=product.instructions,
-            rating=rating.get("average", 0.0),
-            reviews_count=rating.get("count", 0),
+            rating=product.rating_avg,
+            reviews_count=product.rating_count,
         )
 
     def _build_category_filters(self, category: str) -> dict[str, Any]:
-        """Build category filters for RAG search (reduces cognitive complexity)."""
-        filters = {"status": {"$eq": "active"}}
+        """Build hybrid search filter params (reduces cognitive complexity).
+
+        Legacy vendor names map to a product type; anything else filters
+        by products.categories.
+        """
         if category == "all":
-            return filters
+            return {}
 
-        category_map = {
+        type_map = {
             "chatgpt": "shared",
             "claude": "shared",
             "midjourney": "shared",
-            "image": "shared",
-            "code": "key",
             "writing": "shared",
         }
-        if category in category_map:
-            filters["type"] = {"$eq": category_map[category]}
-        return filters
+        if category in type_map:
+            return {"p_type": type_map[category]}
+        return {"p_category": category}
+
+    @staticmethod
+    def _matches_filters(product: Product, filters: dict[str, Any], in_stock_only: bool) -> bool:
+        """Apply hybrid search filters to a lexical pre-query hit."""
+        if "p_type" in filters and product.type != filters["p_type"]:
+            return False
+        if "p_category" in filters and filters["p_category"] not in product.categories:
+            return False
+        return not in_stock_only or product.stock_count > 0
+
+    @staticmethod
+    def _is_exact_hit(query: str, products: list[Product]) -> bool:
+        """Query names the top lexical hit (e.g. "ChatGPT Plus на месяц").
+
+        The name must equal the query or appear in it as whole words
+        ("GPT" is not a hit for "chatgpt"); very short names only on equality.
+        """
+        if not products:
+            return False
+        name = " ".join(products[0].name.casefold().split())
+        text = " ".join(query.casefold().split())
+        if name == text:
+            return True
+        if len(name) < MIN_EXACT_NAME_LEN:
+            return False
+        return re.search(rf"(?<!\w){re.escape(name)}(?!\w)", text) is not None
+
+    @staticmethod
+    async def _embed(query: str) -> list[float]:
+        """Query embedding, or [] if semantic search is unavailable."""
+        try:
+            from core.rag import VECS_AVAILABLE, get_embedding
 
-    async def _perform_rag_search(
-        self,
-        query: str,
-        category: str,
-        limit: int,
-    ) -> list[SearchResult]:
-        """Perform RAG search and return results (reduces cognitive complexity)."""
-        results: list[SearchResult] = []
-        rag_search = self._get_rag_search()
-        if not rag_search:
-            return results
+            if not VECS_AVAILABLE:
+                return []
+            return await get_embedding(query)
+        except Exception as e:
+            logger.warning("Query embedding failed: %s", type(e).__name__)
+            return []
 
+    async def _lexical_prequery(
+        self, query: str, filters: dict[str, Any], in_stock_only: bool
+    ) -> list[Product]:
+        """Cheap full-text pre-query (runs while the embedding is computed)."""
         try:
-            filters = self._build_category_filters(category)
-            rag_results = await rag_search.search(query, limit=limit, filters=filters)
-
-            for result in rag_results:
-                product = await self.db.get_product_by_id(result["product_id"])
-                if product:
-                    results.append(
-                        SearchResult(
-                            id=product.id,
-                            name=product.name,
-                            price=product.price,
-                            in_stock=product.stock_count > 0,
-                            stock_count=product.stock_count,
-                            similarity_score=result.get("score", 0.0),
-                        ),
-                    )
+            products = await self.db.search_products(query)
         except Exception as e:
-            logger.warning("RAG search failed: %s", type(e).__name__)
-
-        return results
+            logger.warning("Lexical pre-query failed: %s", type(e).__name__)
+            return []
+        return [p for p in products if self._matches_filters(p, filters, in_stock_only)]
 
-    async def _supplement_with_text_search(
+    async def _hybrid_search(
         self,
         query: str,
-        results: list[SearchResult],
+        embedding: list[float],
+        filters: dict[str, Any],
+        in_stock_only: bool,
         limit: int,
     ) -> list[SearchResult]:
-        """Supplement results with text search (reduces cognitive complexity)."""
-        if len(results) >= 3:
-            return results
-
-        text_products = await self.db.search_products(query)
-        existing_ids = {r.id for r in results}
-
-        for p in text_products:
-            if p.id not in existing_ids and len(results) < limit:
-                results.append(
-                    SearchResult(
-                        id=p.id,
-                        name=p.name,
-                        price=p.price,
-                        in_stock=p.stock_count > 0,
-                        stock_count=p.stock_count,
-                        similarity_score=0.0,
-                    ),
-                )
-
-        return results
+        """One hybrid_search_products call: vector + full-text fused with RRF."""
+        result = await self.db.client.rpc(
+            "hybrid_search_products",
+            {
+                "p_query": query,
+                "p_query_embedding": f"[{','.join(map(str, embedding))}]",
+                "p_match_count": limit,
+                "p_in_stock_only": in_stock_only,
+                **filters,
+            },
+        ).execute()
+
+        return [
+            _to_search_result(Product.from_row(row["product"]), row.get("similarity") or 0.0)
+            for row in result.data or []
+        ]
+
+    async def search(
+        self,
+        query: str,
+        category: str = "all",
+        limit: int = 5,
+        in_stock_only: bool = False,
+    ) -> list[SearchResult]:
+        """Search products: semantic + full-text, fused server-side.
 
-    async def search(self, query: str, category: str = "all", limit: int = 5) -> list[SearchResult]:
-        """Search products using RAG (semantic) or text fallback.
+        The query embedding (HTTP call) runs concurrently with a lexical
+        pre-query. If the query names a product, or no embedding is
+        available, the pre-query answers; otherwise one
+        hybrid_search_products call ranks both legs with RRF.
 
         Args:
             query: Search query
             category: Category filter
             limit: Max results
+            in_stock_only: Only products with available stock
 
         Returns:
             List of SearchResult
 
         """
-        results = await self._perform_rag_search(query, category, limit)
-        results = await self._supplement_with_text_search(query, results, limit)
-        return results[:limit]
+        filters = self._build_category_filters(category)
+        embedding_task = asyncio.create_task(self._embed(query))
+        lexical = await self._lexical_prequery(query, filters, in_stock_only)
+
+        if self._is_exact_hit(query, lexical):
+            embedding_task.cancel()
+            return [_to_search_result(p) for p in lexical[:limit]]
+
+        try:
+            embedding = await asyncio.wait_for(embedding_task, EMBEDDING_TIMEOUT_SECS)
+        except TimeoutError:
+            logger.warning("Query embedding timed out, using lexical results")
+            embedding = []
+
+        if embedding:
+            try:
+                return await self._hybrid_search(query, embedding, filters, in_stock_only, limit)
+            except Exception as e:
+                logger.warning("Hybrid search failed: %s", type(e).__name__)
+
+        return [_to_search_result(p) for p in lexical[:limit]]
 
     async def get_catalog(self, status: str = "active") -> list[Product]:
         """Get full product catalog.
@@ -303,7 +345,6 @@ class CatalogService:
             products = await self.db.search_products(name)
             if products:
                 p = products[0]
-                rating = await self.db.get_product_rating(p.id)
                 results.append(
                     {
                         "name": p.name,
@@ -311,7 +352,7 @@ class CatalogService:
                         "type": p.type,
                         "description": p.description,
                         "in_stock": p.stock_count > 0,
-                        "rating": rating.get("average", 0.0),
+                        "rating": p.rating_avg,
                     },
                 )
         return results
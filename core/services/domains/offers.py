@@ -4,7 +4,6 @@ Handles automated offer generation and sending.
 All methods use async/await with supabase-py v2 (no asyncio.to_thread).
 """
 
-import asyncio
 import os
 from datetime import UTC, datetime, timedelta
 from typing import Any
@@ -62,37 +61,6 @@ def _parse_order_date(date_str: str | None) -> datetime | None:
         return None
 
 
-def _is_date_in_range(date: datetime | None, min_date: datetime, max_date: datetime) -> bool:
-    """Check if date is within the given range."""
-    if not date:
-        return False
-    return min_date <= date <= max_date
-
-
-async def _check_existing_promo(
-    promo_service: PromoCodeService,
-    user_id: str,
-    trigger: str,
-) -> bool:
-    """Check if user already has a promo for this trigger. Returns True if exists."""
-    existing = await promo_service.get_promo_by_trigger(user_id, trigger)
-    return existing is not None
-
-
-async def _get_user_orders(client: Any, user_id: str) -> list[dict[str, Any]]:
-    """Get user's delivered discount orders sorted by date."""
-    orders_result = (
-        await client.table("orders")
-        .select("id, delivered_at")
-        .eq("user_id", user_id)
-        .eq("source_channel", "discount")
-        .eq("status", "delivered")
-        .order("delivered_at", desc=False)
-        .execute()
-    )
-    return orders_result.data or []
-
-
 def _build_loyal_message(candidate: OfferCandidate, promo_code: str, lang: str) -> str:
     """Build loyal customer offer message."""
     if lang == "ru":
@@ -155,252 +123,158 @@ def _build_inactive_message(promo_code: str, lang: str) -> str:
 
 
 class OffersService:
-    """Automated offers for discount to PVNDORA migration."""
+    """Automated offers for discount to PVNDORA migration.
+
+    Pipeline: one aggregate RPC finds both cohorts, promo codes are generated
+    locally and inserted in one statement, messages go out concurrently under
+    the bot's shared rate limit.
+    """
 
     # Thresholds
     LOYAL_PURCHASE_COUNT = 3
     INACTIVE_DAYS = 7
+    INACTIVE_PROMO_COOLDOWN_DAYS = 30
 
     # Timing: Wait 2-3 days after 3rd purchase before sending loyal offer
     LOYAL_OFFER_DELAY_DAYS_MIN = 2
     LOYAL_OFFER_DELAY_DAYS_MAX = 5
 
+    # Discount per trigger
+    OFFER_DISCOUNTS = {
+        PromoTriggers.LOYAL_3_PURCHASES: 50,
+        PromoTriggers.INACTIVE_7_DAYS: 30,
+    }
+
     def __init__(self, db_client) -> None:
         self.client = db_client
         self.promo_service = PromoCodeService(db_client)
 
-    async def send_telegram_message(
-        self,
-        chat_id: int,
-        text: str,
-        use_discount_bot: bool = True,
-    ) -> bool:
-        """Send a message via Telegram Bot API."""
-        from core.services.telegram_messaging import send_telegram_message as _send_msg
-
-        token = DISCOUNT_BOT_TOKEN if use_discount_bot else TELEGRAM_TOKEN
-        return await _send_msg(chat_id=chat_id, text=text, parse_mode="HTML", bot_token=token)
-
-    async def _find_loyal_via_rpc(
-        self,
-        limit: int,
-        min_date: datetime,
-        max_date: datetime,
-    ) -> list[OfferCandidate]:
-        """Find loyal customers via RPC."""
-        result = await self.client.rpc(
-            "find_loyal_discount_customers",
-            {"min_orders": self.LOYAL_PURCHASE_COUNT, "limit_count": limit},
-        ).execute()
-
-        if not result.data:
-            return []
-
-        candidates = []
-        for row in result.data:
-            last_date = _parse_order_date(row.get("last_order_date"))
-            if not _is_date_in_range(last_date, min_date, max_date):
-                continue
-
-            candidates.append(
-                OfferCandidate(
-                    user_id=row["user_id"],
-                    telegram_id=row["telegram_id"],
-                    language_code=row.get("language_code", "en"),
-                    trigger=PromoTriggers.LOYAL_3_PURCHASES,
-                    order_count=row.get("order_count", 3),
-                ),
-            )
-        return candidates
-
-    async def _find_loyal_via_fallback(
-        self,
-        limit: int,
-        min_date: datetime,
-        max_date: datetime,
-    ) -> list[OfferCandidate]:
-        """Find loyal customers via direct query fallback."""
-        result = (
-            await self.client.table("users")
-            .select("id, telegram_id, language_code")
-            .eq("discount_tier_source", True)
-            .execute()
-        )
-
-        candidates = []
-        for user in result.data or []:
-            orders = await _get_user_orders(self.client, user["id"])
-            order_count = len(orders)
-
-            if order_count < self.LOYAL_PURCHASE_COUNT:
-                continue
-
-            third_order = orders[self.LOYAL_PURCHASE_COUNT - 1]
-            third_order_date = _parse_order_date(third_order.get("delivered_at"))
-
-            if not _is_date_in_range(third_order_date, min_date, max_date):
-                continue
-
-            if await _check_existing_promo(
-                self.promo_service,
-                user["id"],
-                PromoTriggers.LOYAL_3_PURCHASES,
-            ):
-                continue
-
-            candidates.append(
-                OfferCandidate(
-                    user_id=user["id"],
-                    telegram_id=user["telegram_id"],
-                    language_code=user.get("language_code", "en"),
-                    trigger=PromoTriggers.LOYAL_3_PURCHASES,
-                    order_count=order_count,
-                    last_order_date=third_order_date,
-                ),
-            )
-
-            if len(candidates) >= limit:
-                break
+    # ==================== Candidates ====================
 
-        return candidates
-
-    async def find_loyal_customers(self, limit: int = 50) -> list[OfferCandidate]:
-        """Find discount users with 3+ orders who haven't received loyal offer."""
+    async def find_candidates(self, limit: int = 50) -> list[OfferCandidate]:
+        """Find loyal and inactive candidates (up to `limit` each) in one RPC."""
         try:
             now = datetime.now(UTC)
-            min_date = now - timedelta(days=self.LOYAL_OFFER_DELAY_DAYS_MAX)
-            max_date = now - timedelta(days=self.LOYAL_OFFER_DELAY_DAYS_MIN)
-
-            # Try RPC first
-            candidates = await self._find_loyal_via_rpc(limit, min_date, max_date)
-            if candidates:
-                return candidates
-
-            # Fallback to direct query
-            return await self._find_loyal_via_fallback(limit, min_date, max_date)
-
+            result = await self.client.rpc(
+                "find_offer_candidates",
+                {
+                    "p_min_orders": self.LOYAL_PURCHASE_COUNT,
+                    "p_loyal_from": (
+                        now - timedelta(days=self.LOYAL_OFFER_DELAY_DAYS_MAX)
+                    ).isoformat(),
+                    "p_loyal_to": (
+                        now - timedelta(days=self.LOYAL_OFFER_DELAY_DAYS_MIN)
+                    ).isoformat(),
+                    "p_inactive_before": (now - timedelta(days=self.INACTIVE_DAYS)).isoformat(),
+                    "p_cooldown_days": self.INACTIVE_PROMO_COOLDOWN_DAYS,
+                    "p_limit": limit,
+                },
+            ).execute()
         except Exception:
-            logger.exception("Failed to find loyal customers")
+            logger.exception("Failed to find offer candidates")
             return []
 
-    async def send_loyal_offer(self, candidate: OfferCandidate) -> OfferResult:
-        """Send loyal customer offer."""
-        promo_code = await self.promo_service.generate_personal_promo(
-            user_id=candidate.user_id,
-            telegram_id=candidate.telegram_id,
-            trigger=PromoTriggers.LOYAL_3_PURCHASES,
-            discount_percent=50,
-        )
-
-        if not promo_code:
-            return OfferResult(
-                success=False,
-                telegram_id=candidate.telegram_id,
-                trigger=candidate.trigger,
-                error="Failed to generate promo code",
+        return [
+            OfferCandidate(
+                user_id=row["user_id"],
+                telegram_id=row["telegram_id"],
+                language_code=row.get("language_code") or "en",
+                trigger=row["trigger"],
+                order_count=row.get("order_count") or 0,
+                last_order_date=_parse_order_date(row.get("last_order_date")),
             )
+            for row in result.data or []
+        ]
 
-        text = _build_loyal_message(candidate, promo_code, candidate.language_code)
-        success = await self.send_telegram_message(candidate.telegram_id, text)
-
-        return OfferResult(
-            success=success,
-            telegram_id=candidate.telegram_id,
-            trigger=candidate.trigger,
-            promo_code=promo_code,
-        )
+    async def find_loyal_customers(self, limit: int = 50) -> list[OfferCandidate]:
+        """Find discount users with 3+ orders who haven't received loyal offer."""
+        candidates = await self.find_candidates(limit)
+        return [c for c in candidates if c.trigger == PromoTriggers.LOYAL_3_PURCHASES]
 
     async def find_inactive_users(self, limit: int = 50) -> list[OfferCandidate]:
         """Find discount users inactive for 7+ days."""
-        try:
-            cutoff = datetime.now(UTC) - timedelta(days=self.INACTIVE_DAYS)
-
-            result = (
-                await self.client.table("users")
-                .select("id, telegram_id, language_code, last_activity_at")
-                .eq("discount_tier_source", True)
-                .lt("last_activity_at", cutoff.isoformat())
-                .limit(limit)
-                .execute()
-            )
+        candidates = await self.find_candidates(limit)
+        return [c for c in candidates if c.trigger == PromoTriggers.INACTIVE_7_DAYS]
 
-            candidates = []
-            for user in result.data or []:
-                existing = await self.promo_service.get_promo_by_trigger(
-                    user["id"],
-                    PromoTriggers.INACTIVE_7_DAYS,
-                )
+    # ==================== Sending ====================
 
-                # Only send if no recent promo (within 30 days)
-                if existing and existing.created_at:
-                    promo_age = datetime.now(UTC) - existing.created_at
-                    if promo_age < timedelta(days=30):
-                        continue
-
-                candidates.append(
-                    OfferCandidate(
-                        user_id=user["id"],
-                        telegram_id=user["telegram_id"],
-                        language_code=user.get("language_code", "en"),
-                        trigger=PromoTriggers.INACTIVE_7_DAYS,
-                    ),
-                )
+    def _build_message(self, candidate: OfferCandidate, promo_code: str) -> str:
+        """Offer text for a candidate's trigger."""
+        if candidate.trigger == PromoTriggers.LOYAL_3_PURCHASES:
+            return _build_loyal_message(candidate, promo_code, candidate.language_code)
+        return _build_inactive_message(promo_code, candidate.language_code)
 
-            return candidates
+    async def send_offers(self, candidates: list[OfferCandidate]) -> list[OfferResult]:
+        """Create promo codes for all candidates in one insert and send the offers.
 
-        except Exception:
-            logger.exception("Failed to find inactive users")
+        Results are in candidate order.
+        """
+        if not candidates:
             return []
 
-    async def send_inactive_offer(self, candidate: OfferCandidate) -> OfferResult:
-        """Send offer to inactive user."""
-        promo_code = await self.promo_service.generate_personal_promo(
-            user_id=candidate.user_id,
-            telegram_id=candidate.telegram_id,
-            trigger=PromoTriggers.INACTIVE_7_DAYS,
-            discount_percent=30,
-        )
+        from core.services.telegram_messaging import TelegramBulkSender
 
-        if not promo_code:
-            return OfferResult(
-                success=False,
-                telegram_id=candidate.telegram_id,
-                trigger=candidate.trigger,
-                error="Failed to generate promo code",
+        now = datetime.now(UTC)
+        rows = [
+            self.promo_service.build_personal_promo(
+                user_id=c.user_id,
+                telegram_id=c.telegram_id,
+                trigger=c.trigger,
+                discount_percent=self.OFFER_DISCOUNTS.get(c.trigger, 30),
+                now=now,
+            )
+            for c in candidates
+        ]
+        created = await self.promo_service.create_personal_promos(rows)
+
+        # Кандидаты без промокода не получают сообщение
+        ready = [i for i, row in enumerate(rows) if row["code"] in created]
+        async with TelegramBulkSender(bot_token=DISCOUNT_BOT_TOKEN or TELEGRAM_TOKEN) as sender:
+            sent = await sender.send_many(
+                [
+                    (candidates[i].telegram_id, self._build_message(candidates[i], rows[i]["code"]))
+                    for i in ready
+                ]
             )
+        delivered = dict(zip(ready, sent, strict=True))
+
+        results = []
+        for i, candidate in enumerate(candidates):
+            code = rows[i]["code"] if i in delivered else None
+            results.append(
+                OfferResult(
+                    success=delivered.get(i, False),
+                    telegram_id=candidate.telegram_id,
+                    trigger=candidate.trigger,
+                    promo_code=code,
+                    error=None if code else "Failed to generate promo code",
+                )
+            )
+        return results
 
-        text = _build_inactive_message(promo_code, candidate.language_code)
-        success = await self.send_telegram_message(candidate.telegram_id, text)
+    async def send_loyal_offer(self, candidate: OfferCandidate) -> OfferResult:
+        """Send loyal customer offer."""
+        return (await self.send_offers([candidate]))[0]
 
-        return OfferResult(
-            success=success,
-            telegram_id=candidate.telegram_id,
-            trigger=candidate.trigger,
-            promo_code=promo_code,
-        )
+    async def send_inactive_offer(self, candidate: OfferCandidate) -> OfferResult:
+        """Send offer to inactive user."""
+        return (await self.send_offers([candidate]))[0]
 
     async def process_all_offers(self) -> dict[str, Any]:
         """Process all offer types and return results."""
         results = {"loyal": {"sent": 0, "failed": 0}, "inactive": {"sent": 0, "failed": 0}}
-
-        # Loyal customers
-        loyal_candidates = await self.find_loyal_customers(limit=20)
-        for candidate in loyal_candidates:
-            result = await self.send_loyal_offer(candidate)
-            if result.success:
-                results["loyal"]["sent"] += 1
-            else:
-                results["loyal"]["failed"] += 1
-            await asyncio.sleep(0.5)
-
-        # Inactive users
-        inactive_candidates = await self.find_inactive_users(limit=20)
-        for candidate in inactive_candidates:
-            result = await self.send_inactive_offer(candidate)
-            if result.success:
-                results["inactive"]["sent"] += 1
-            else:
-                results["inactive"]["failed"] += 1
-            await asyncio.sleep(0.5)
-
+        buckets = {
+            PromoTriggers.LOYAL_3_PURCHASES: results["loyal"],
+            PromoTriggers.INACTIVE_7_DAYS: results["inactive"],
+        }
+
+        candidates = await self.find_candidates(limit=20)
+        for result in await self.send_offers(candidates):
+            buckets[result.trigger]["sent" if result.success else "failed"] += 1
+
+        logger.info(
+            f"Offers: loyal sent={results['loyal']['sent']} failed={results['loyal']['failed']}, "
+            f"inactive sent={results['inactive']['sent']} "
+            f"failed={results['inactive']['failed']}"
+        )
         return results
@@ -86,11 +86,13 @@ class OrdersDomain:
     async def get_expiring(self, days_before: int = 3) -> list[Order]:
         return await self.repo.get_expiring(days_before)
 
-    async def get_pending_expired(self) -> list[Order]:
-        return await self.repo.get_pending_expired()
-
-    async def get_pending_stale(self, minutes: int = 60) -> list[Order]:
-        return await self.repo.get_pending_stale(minutes)
+    async def expire_pending(
+        self,
+        now: datetime | None = None,
+        stale_minutes: int = 15,
+        limit: int = 5000,
+    ) -> list[dict[str, Any]]:
+        return await self.repo.expire_pending(now, stale_minutes, limit)
 
     async def count_by_status(self, status: str) -> int:
         return await self.repo.count_by_status(status)
@@ -70,6 +70,18 @@ class PromoTriggers:
     REFERRAL_BONUS = "referral_bonus"
 
 
+# Code prefix per trigger
+_TRIGGER_PREFIXES = {
+    PromoTriggers.ISSUE_NO_INSURANCE: "REPLACE",
+    PromoTriggers.INSURANCE_EXPIRED: "EXPIRED",
+    PromoTriggers.REPLACEMENT_LIMIT: "LIMIT",
+    PromoTriggers.LOYAL_3_PURCHASES: "LOYAL",
+    PromoTriggers.INACTIVE_7_DAYS: "COMEBACK",
+    PromoTriggers.FIRST_PVNDORA_PURCHASE: "WELCOME",
+    PromoTriggers.REFERRAL_BONUS: "REFBONUS",
+}
+
+
 # ============================================
 # Service
 # ============================================
@@ -99,6 +111,36 @@ class PromoCodeService:
         user_short = user_identifier[:10] if len(user_identifier) > 10 else user_identifier
         return f"{prefix}_{user_short}_{random_suffix}"
 
+    def _prefix_for(self, trigger: str) -> str:
+        """Code prefix for a trigger type."""
+        return _TRIGGER_PREFIXES.get(trigger, "PROMO")
+
+    def build_personal_promo(
+        self,
+        user_id: str,
+        telegram_id: int,
+        trigger: str,
+        discount_percent: int = 50,
+        *,
+        expiration_days: int | None = None,
+        now: datetime | None = None,
+    ) -> dict[str, Any]:
+        """Build a personal promo_codes row with a freshly generated code (no DB access)."""
+        now = now or datetime.now(UTC)
+        days = expiration_days or self.DEFAULT_EXPIRATION_DAYS
+        return {
+            "code": self._generate_code(self._prefix_for(trigger), str(telegram_id)),
+            "discount_percent": discount_percent,
+            "max_uses": 1,
+            "current_uses": 0,
+            "valid_from": now.isoformat(),
+            "valid_until": (now + timedelta(days=days)).isoformat(),
+            "is_active": True,
+            "target_user_id": user_id,
+            "is_personal": True,
+            "source_trigger": trigger,
+        }
+
     async def generate_personal_promo(
         self,
         user_id: str,
@@ -120,61 +162,60 @@ class PromoCodeService:
             Generated promo code string or None on failure
 
         """
-        try:
-            # Determine prefix based on trigger
-            prefix_map = {
-                PromoTriggers.ISSUE_NO_INSURANCE: "REPLACE",
-                PromoTriggers.INSURANCE_EXPIRED: "EXPIRED",
-                PromoTriggers.REPLACEMENT_LIMIT: "LIMIT",
-                PromoTriggers.LOYAL_3_PURCHASES: "LOYAL",
-                PromoTriggers.INACTIVE_7_DAYS: "COMEBACK",
-                PromoTriggers.FIRST_PVNDORA_PURCHASE: "WELCOME",
-                PromoTriggers.REFERRAL_BONUS: "REFBONUS",
-            }
-            prefix = prefix_map.get(trigger, "PROMO")
-
-            # Generate unique code
-            code = self._generate_code(prefix, str(telegram_id))
-
-            # Check if code already exists (unlikely but possible)
-            existing = (
-                await self.client.table("promo_codes").select("id").eq("code", code).execute()
+        rows = [
+            self.build_personal_promo(
+                user_id, telegram_id, trigger, discount_percent, expiration_days=expiration_days
             )
+        ]
+        created = await self.create_personal_promos(rows)
+        if not created:
+            logger.error(f"Failed to create promo code for user {user_id}")
+            return None
 
-            if existing.data:
-                # Regenerate with different random suffix
-                code = self._generate_code(prefix, str(telegram_id))
-
-            # Calculate expiration
-            days = expiration_days or self.DEFAULT_EXPIRATION_DAYS
-            valid_until = datetime.now(UTC) + timedelta(days=days)
-
-            # Create promo code
-            promo_data = {
-                "code": code,
-                "discount_percent": discount_percent,
-                "max_uses": 1,
-                "current_uses": 0,
-                "valid_from": datetime.now(UTC).isoformat(),
-                "valid_until": valid_until.isoformat(),
-                "is_active": True,
-                "target_user_id": user_id,
-                "is_personal": True,
-                "source_trigger": trigger,
-            }
-
-            result = await self.client.table("promo_codes").insert(promo_data).execute()
+        code = rows[0]["code"]
+        logger.info(f"Created personal promo {code} for user {telegram_id} (trigger={trigger})")
+        return code
 
-            if not result.data:
-                logger.error(f"Failed to create promo code for user {user_id}")
-                return None
+    async def _insert_new_codes(self, rows: list[dict[str, Any]]) -> set[str]:
+        """Insert rows, skipping codes that already exist. Returns inserted codes."""
+        result = (
+            await self.client.table("promo_codes")
+            .upsert(rows, on_conflict="code", ignore_duplicates=True)
+            .execute()
+        )
+        return {row["code"] for row in result.data or []}
+
+    async def create_personal_promos(self, rows: list[dict[str, Any]]) -> set[str]:
+        """Insert personal promo rows (see build_personal_promo) in one statement.
 
-            logger.info(f"Created personal promo {code} for user {telegram_id} (trigger={trigger})")
-            return code
+        Rows whose code collides with an existing one get a new random suffix
+        and are inserted once more; rows are updated in place so callers can
+        read the final code from row["code"].
+
+        Returns:
+            Codes that were created (missing codes failed)
+
+        """
+        if not rows:
+            return set()
+        try:
+            created = await self._insert_new_codes(rows)
+
+            collided = [row for row in rows if row["code"] not in created]
+            if collided:
+                # Suffix collision (unlikely) - retry once with a new code
+                for row in collided:
+                    telegram_part = row["code"].split("_")[1]
+                    row["code"] = self._generate_code(
+                        self._prefix_for(row["source_trigger"]), telegram_part
+                    )
+                created |= await self._insert_new_codes(collided)
+
+            return created
 
         except Exception:
             logger.exception("Failed to generate personal promo")
-            return None
+            return set()
 
     # ==================== Validation ====================
 
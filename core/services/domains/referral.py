@@ -4,6 +4,7 @@ Handles referral system operations.
 All methods use async/await with supabase-py v2 (no asyncio.to_thread).
 """
 
+import json
 from dataclasses import dataclass
 from typing import Any
 
@@ -169,3 +170,63 @@ class ReferralService:
         except Exception as e:
             logger.error(f"Failed to get referral earnings: {e}", exc_info=True)
             return {"success": False, "total_earned": 0, "transactions": []}
+
+
+# =============================================================================
+# Partner dashboard cache
+# =============================================================================
+
+
+async def get_cached_partner_dashboard(user_id: str) -> dict[str, Any] | None:
+    """Get cached partner dashboard data (None on miss or Redis error)."""
+    try:
+        from core.db import RedisKeys, get_redis
+
+        raw = await get_redis().get(f"{RedisKeys.PARTNER_DASHBOARD}{user_id}")
+        return json.loads(raw) if raw else None
+    except Exception as e:
+        logger.debug(f"Partner dashboard cache read failed: {e}")
+        return None
+
+
+async def cache_partner_dashboard(user_id: str, data: dict[str, Any]) -> None:
+    """Cache partner dashboard data (best-effort)."""
+    try:
+        from core.db import TTL, RedisKeys, get_redis
+
+        await get_redis().set(
+            f"{RedisKeys.PARTNER_DASHBOARD}{user_id}",
+            json.dumps(data, default=str),
+            ex=TTL.PARTNER_DASHBOARD,
+        )
+    except Exception as e:
+        logger.debug(f"Partner dashboard cache write failed: {e}")
+
+
+async def invalidate_partner_dashboards(user_ids: list[str]) -> None:
+    """Drop cached dashboards of partners whose referral data changed."""
+    keys = list(dict.fromkeys(uid for uid in user_ids if uid))
+    if not keys:
+        return
+    try:
+        import asyncio
+
+        from core.db import RedisKeys, get_redis
+
+        redis = get_redis()
+        await asyncio.gather(*(redis.delete(f"{RedisKeys.PARTNER_DASHBOARD}{uid}") for uid in keys))
+    except Exception as e:
+        logger.warning(f"Failed to invalidate partner dashboards: {e}")
+
+
+async def invalidate_referral_chain_dashboards(db: Any, user_id: str) -> None:
+    """Drop cached dashboards of every partner above user_id (levels 1-3).
+
+    db: anything with get_referral_ancestors (Database, UsersDomain).
+    """
+    try:
+        ancestors = await db.get_referral_ancestors(user_id)
+    except Exception as e:
+        logger.warning(f"Failed to resolve referral chain of {user_id}: {e}")
+        return
+    await invalidate_partner_dashboards(ancestors)
@@ -1,5 +1,7 @@
 """User domain service wrapping UserRepository."""
 
+from typing import Any
+
 from core.logging import get_logger
 from core.services.models import User
 from core.services.repositories import UserRepository
@@ -39,6 +41,12 @@ class UsersDomain:
             referrer_id,
         )
 
+        # New referral shows up in the dashboards of the whole referrer chain
+        if referrer_id:
+            from core.services.domains.referral import invalidate_referral_chain_dashboards
+
+            await invalidate_referral_chain_dashboards(self, str(new_user.id))
+
         # Notify referrer about new referral (best-effort)
         if referrer and referrer.telegram_id:
             try:
@@ -74,6 +82,14 @@ class UsersDomain:
     async def add_warning(self, telegram_id: int) -> int:
         return await self.repo.add_warning(telegram_id)
 
+    async def get_referral_descendants(
+        self, user_id: str, depth: int, limit: int = 50, offset: int = 0
+    ) -> list[dict[str, Any]]:
+        return await self.repo.get_referral_descendants(user_id, depth, limit, offset)
+
+    async def get_referral_ancestors(self, user_id: str, max_depth: int = 3) -> list[str]:
+        return await self.repo.get_referral_ancestors(user_id, max_depth)
+
     async def update_preferences(
         self,
         telegram_id: int,
@@ -1,5 +1,7 @@
-"""Database Models - Pydantic models for all entities."""
+"""Database Models - Pydantic models for all entities (Product: slotted dataclass)."""
 
+from collections.abc import Mapping
+from dataclasses import dataclass, field, fields
 from datetime import datetime
 from decimal import Decimal
 from typing import Any
@@ -60,15 +62,21 @@ class User(BaseModel):
         return _to_decimal(v)
 
 
-class Product(BaseModel):
-    """Product model."""
+@dataclass(slots=True)
+class Product:
+    """Product model.
+
+    Slotted dataclass rather than a pydantic model: catalog lists build one
+    per row and validation dominated their CPU time. Build from DB rows
+    with Product.from_row.
+    """
 
     id: str
     name: str
-    description: str | None = None
     price: Decimal  # Price in RUB
-    prices: dict[str, Any] | None = None  # DEPRECATED: No longer used
     type: str  # student, trial, shared, key
+    description: str | None = None
+    prices: dict[str, Any] | None = None  # DEPRECATED: No longer used
     status: str = "active"
     warranty_hours: int = 24
     instructions: str | None = None
@@ -78,18 +86,34 @@ class Product(BaseModel):
     fulfillment_time_hours: int = 48
     requires_prepayment: bool = False
     prepayment_percent: int = 100
-    categories: list[str] = []  # text, video, image, code, audio
+    categories: list[str] = field(default_factory=list)  # text, video, image, code, audio
     msrp: Decimal | None = None  # MSRP in RUB
     duration_days: int | None = None
     instruction_files: list[str] | None = None
     image_url: str | None = None
     video_url: str | None = None
     logo_svg_url: str | None = None
+    # Counters from product_stats (products_with_stock_summary only)
+    rating_count: int = 0
+    rating_avg: float = 0.0
+    sales_count: int = 0
 
-    @field_validator("price", mode="before")
     @classmethod
-    def convert_price_to_decimal(cls, v: Any) -> Decimal:
-        return _to_decimal(v)
+    def from_row(cls, row: Mapping[str, Any]) -> "Product":
+        """Build from a products / products_with_stock_summary row.
+
+        Unknown columns are ignored; NULL columns take the field default.
+        """
+        data = {name: row[name] for name in _PRODUCT_FIELDS if row.get(name) is not None}
+        data["price"] = _to_decimal(data.get("price"))
+        if "msrp" in data:
+            data["msrp"] = _to_decimal(data["msrp"])
+        if "rating_avg" in data:
+            data["rating_avg"] = float(data["rating_avg"])
+        return cls(**data)
+
+
+_PRODUCT_FIELDS = tuple(f.name for f in fields(Product))
 
 
 class StockItem(BaseModel):
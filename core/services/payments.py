@@ -73,12 +73,16 @@ class PaymentService:
             from core.services.database import get_database
 
             db = get_database()
-            await (
+            result = await (
                 db.client.table("orders")
                 .update({"payment_id": pid_value})
                 .eq("id", order_id)
                 .execute()
             )
+
+            from core.orders.list_cache import invalidate_orders_lists_for
+
+            await invalidate_orders_lists_for(result.data)
         except Exception as e:
             logger.warning("Failed to save payment reference for order %s: %s", order_id, e)
 
@@ -651,13 +655,17 @@ class PaymentService:
                 .execute()
             )
 
-            await (
+            order_result = await (
                 db.client.table("orders")
                 .update({"refund_requested": True, "status": "refund_pending"})
                 .eq("id", order_id)
                 .execute()
             )
 
+            from core.orders.list_cache import invalidate_orders_lists_for
+
+            await invalidate_orders_lists_for(order_result.data)
+
             return {
                 "success": True,
                 "method": "manual",
@@ -0,0 +1,168 @@
+"""In-memory product autocomplete index.
+
+Inline queries fire on every keystroke, so the bot answers them from a
+per-instance index over the active catalog instead of the database. The
+index is rebuilt at most once per INDEX_TTL_SECS (single-flight), like the
+discount catalog snapshot.
+
+Matching per query word (all words must match):
+- prefix of a name/category word: sorted word list + bisect, O(log n)
+- otherwise typo tolerance: trigram postings -> candidate words, scored
+  with the pg_trgm similarity formula (shared / union of trigrams)
+"""
+
+import asyncio
+import re
+import time
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from core.logging import get_logger
+
+if TYPE_CHECKING:
+    from core.services.database import Database
+    from core.services.models import Product
+
+logger = get_logger(__name__)
+
+# How long an index is served before the next access rebuilds it
+INDEX_TTL_SECS = 60
+
+# Minimum trigram similarity for a typo match (pg_trgm's default is 0.3)
+MIN_SIMILARITY = 0.35
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _words(text: str) -> list[str]:
+    return _WORD_RE.findall(text.lower().replace("ё", "е"))
+
+
+def _trigrams(word: str) -> set[str]:
+    """Trigrams of a word, padded the way pg_trgm does ("  w" ... "d ")."""
+    padded = f"  {word} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass(slots=True)
+class ProductIndex:
+    """Prefix + trigram index over product names and categories."""
+
+    loaded_at: float
+    products: list["Product"]
+    words: list[str]  # Sorted unique words
+    word_products: dict[str, set[int]]  # word -> product positions
+    word_trigrams: dict[str, set[str]]
+    trigram_words: dict[str, list[str]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, products: list["Product"]) -> "ProductIndex":
+        word_products: dict[str, set[int]] = {}
+        for pos, product in enumerate(products):
+            for word in _words(" ".join([product.name, *product.categories])):
+                word_products.setdefault(word, set()).add(pos)
+
+        word_trigrams = {word: _trigrams(word) for word in word_products}
+        trigram_words: dict[str, list[str]] = {}
+        for word, trigrams in word_trigrams.items():
+            for trigram in trigrams:
+                trigram_words.setdefault(trigram, []).append(word)
+
+        return cls(
+            loaded_at=time.monotonic(),
+            products=products,
+            words=sorted(word_products),
+            word_products=word_products,
+            word_trigrams=word_trigrams,
+            trigram_words=trigram_words,
+        )
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() - self.loaded_at > INDEX_TTL_SECS
+
+    def _prefix_matches(self, prefix: str) -> dict[int, float]:
+        matches: dict[int, float] = {}
+        pos = bisect_left(self.words, prefix)
+        while pos < len(self.words) and self.words[pos].startswith(prefix):
+            word = self.words[pos]
+            score = 2.0 if word == prefix else 1.0 + len(prefix) / len(word)
+            for product_pos in self.word_products[word]:
+                matches[product_pos] = max(matches.get(product_pos, 0.0), score)
+            pos += 1
+        return matches
+
+    def _fuzzy_matches(self, query_word: str) -> dict[int, float]:
+        query_trigrams = _trigrams(query_word)
+        shared: dict[str, int] = {}
+        for trigram in query_trigrams:
+            for word in self.trigram_words.get(trigram, ()):
+                shared[word] = shared.get(word, 0) + 1
+
+        matches: dict[int, float] = {}
+        for word, count in shared.items():
+            similarity = count / (len(query_trigrams) + len(self.word_trigrams[word]) - count)
+            if similarity < MIN_SIMILARITY:
+                continue
+            for product_pos in self.word_products[word]:
+                matches[product_pos] = max(matches.get(product_pos, 0.0), similarity)
+        return matches
+
+    def search(self, query: str, limit: int = 20) -> list["Product"]:
+        """Best matching products (all query words must match), best first."""
+        scores: dict[int, float] | None = None
+        for query_word in _words(query):
+            matches = self._prefix_matches(query_word) or self._fuzzy_matches(query_word)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {pos: scores[pos] + s for pos, s in matches.items() if pos in scores}
+            if not scores:
+                return []
+        if not scores:
+            return []
+
+        def rank(pos: int) -> tuple[float, bool, int, str]:
+            product = self.products[pos]
+            return (-scores[pos], product.stock_count <= 0, -product.sales_count, product.name)
+
+        return [self.products[pos] for pos in sorted(scores, key=rank)[:limit]]
+
+
+_index: ProductIndex | None = None
+_lock: asyncio.Lock | None = None  # Lazy: created inside the running loop
+
+
+def _get_lock() -> asyncio.Lock:
+    global _lock
+    if _lock is None:
+        _lock = asyncio.Lock()
+    return _lock
+
+
+async def get_product_index(db: "Database") -> ProductIndex:
+    """Return the current index, rebuilding it if missing or expired.
+
+    Concurrent callers share one rebuild. If a rebuild fails, the previous
+    index keeps being served (and retried on the next access).
+    """
+    global _index
+    index = _index
+    if index is not None and not index.expired:
+        return index
+
+    async with _get_lock():
+        index = _index
+        if index is not None and not index.expired:
+            return index
+        try:
+            products = await db.get_products(status="active")
+        except Exception:
+            logger.exception("Failed to load products for autocomplete index")
+            if index is not None:
+                return index
+            return ProductIndex.build([])
+        _index = ProductIndex.build(products)
+        logger.debug(f"Product autocomplete index: {len(products)} products")
+        return _index
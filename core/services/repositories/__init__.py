@@ -6,8 +6,10 @@ Provides clean separation of concerns:
 - OrderRepository: Orders, payments
 - StockRepository: Stock items, availability
 - ChatRepository: Chat history, support tickets
+- UserAnalyticsRepository: Pre-aggregated CRM user metrics
 """
 
+from .analytics_repo import UserAnalyticsRepository
 from .chat_repo import ChatRepository
 from .order_repo import OrderRepository
 from .product_repo import ProductRepository
@@ -19,5 +21,6 @@ __all__ = [
     "OrderRepository",
     "ProductRepository",
     "StockRepository",
+    "UserAnalyticsRepository",
     "UserRepository",
 ]
@@ -0,0 +1,57 @@
+"""User Analytics Repository - CRM metrics from user_analytics_summary.
+
+Metrics are maintained incrementally by triggers (see migration
+20260120_user_analytics_summary.sql); reads never aggregate base tables.
+"""
+
+from collections.abc import Awaitable
+from typing import Any, cast
+
+from .base import BaseRepository
+
+ANALYTICS_VIEW = "users_extended_analytics"
+
+
+class UserAnalyticsRepository(BaseRepository):
+    """Read and refresh pre-aggregated user analytics."""
+
+    def query(self, columns: str = "*", count: str | None = None) -> Any:
+        """Start a query on the analytics view (caller adds filters/ordering)."""
+        return self.client.table(ANALYTICS_VIEW).select(columns, count=count)
+
+    async def get_by_user_id(self, user_id: str) -> dict[str, Any] | None:
+        """Get analytics row for one user."""
+        result = await cast(
+            Awaitable[Any],
+            self.client.table(ANALYTICS_VIEW).select("*").eq("user_id", user_id).limit(1).execute(),
+        )
+        return result.data[0] if result.data else None
+
+    async def refresh(self, user_ids: list[str]) -> int:
+        """Recompute summary rows for the given users. Returns rows written."""
+        if not user_ids:
+            return 0
+        result = await cast(
+            Awaitable[Any],
+            self.client.rpc("refresh_user_analytics_summary", {"p_user_ids": user_ids}).execute(),
+        )
+        return int(result.data or 0)
+
+    async def reconcile_batch(
+        self, after_user_id: str | None = None, batch_size: int = 1000
+    ) -> tuple[int, str | None]:
+        """Recompute one batch of summary rows ordered by user id (drift repair).
+
+        Returns:
+            (processed, last_user_id) - pass last_user_id back to continue;
+            processed == 0 means the pass is complete.
+        """
+        result = await cast(
+            Awaitable[Any],
+            self.client.rpc(
+                "reconcile_user_analytics_summary",
+                {"p_after_user_id": after_user_id, "p_batch_size": batch_size},
+            ).execute(),
+        )
+        row = result.data[0] if result.data else {}
+        return int(row.get("processed") or 0), row.get("last_user_id")
@@ -4,6 +4,7 @@ All methods use async/await with supabase-py v2.
 """
 
 from datetime import UTC, datetime, timedelta
+from typing import Any
 
 from core.services.models import Order
 
@@ -103,7 +104,11 @@ class OrderRepository(BaseRepository):
         if status == "delivered":
             data["delivered_at"] = datetime.now(UTC).isoformat()
 
-        await self.client.table("orders").update(data).eq("id", order_id).execute()
+        result = await self.client.table("orders").update(data).eq("id", order_id).execute()
+
+        from core.orders.list_cache import invalidate_orders_lists_for
+
+        await invalidate_orders_lists_for(result.data)
 
     async def get_by_user(
         self,
@@ -157,32 +162,29 @@ class OrderRepository(BaseRepository):
 
         return [Order(**o) for o in result.data]
 
-    async def get_pending_expired(self) -> list[Order]:
-        """Get pending orders that have expired (expires_at < now)."""
-        now = datetime.now(UTC).isoformat()
-        # Get orders where expires_at is set and has passed
-        result = (
-            await self.client.table("orders")
-            .select("*")
-            .eq("status", "pending")
-            .not_.is_("expires_at", "null")
-            .lt("expires_at", now)
-            .execute()
-        )
-        return [Order(**o) for o in result.data]
+    async def expire_pending(
+        self,
+        now: datetime | None = None,
+        stale_minutes: int = 15,
+        limit: int = 5000,
+    ) -> list[dict[str, Any]]:
+        """Cancel expired/stale pending orders and release their reserved stock.
 
-    async def get_pending_stale(self, minutes: int = 60) -> list[Order]:
-        """Get pending orders older than N minutes (fallback for orders without expires_at)."""
-        cutoff = (datetime.now(UTC) - timedelta(minutes=minutes)).isoformat()
-        result = (
-            await self.client.table("orders")
-            .select("*")
-            .eq("status", "pending")
-            .is_("expires_at", "null")
-            .lt("created_at", cutoff)
-            .execute()
-        )
-        return [Order(**o) for o in result.data]
+        One set-based RPC (expire_pending_orders). Expired: expires_at < now.
+        Stale: no expires_at and older than stale_minutes.
+
+        Returns:
+            Cancelled orders: order_id, user_id, reason (expired/stale), stock_released
+        """
+        result = await self.client.rpc(
+            "expire_pending_orders",
+            {
+                "p_now": (now or datetime.now(UTC)).isoformat(),
+                "p_stale_minutes": stale_minutes,
+                "p_limit": limit,
+            },
+        ).execute()
+        return [row for row in result.data or [] if isinstance(row, dict)]
 
     async def count_by_status(self, status: str) -> int:
         """Count orders by status."""
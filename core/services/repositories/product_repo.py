@@ -25,7 +25,7 @@ class ProductRepository(BaseRepository):
         """
         result = await self.client.table(self.VIEW_NAME).select("*").eq("status", status).execute()
 
-        return [Product(**p) for p in result.data]
+        return [Product.from_row(p) for p in result.data]
 
     async def get_by_id(self, product_id: str) -> Product | None:
         """Get product by ID with stock count using VIEW (no N+1)."""
@@ -34,25 +34,28 @@ class ProductRepository(BaseRepository):
         if not result.data:
             return None
 
-        return Product(**result.data[0])
+        return Product.from_row(result.data[0])
 
-    async def search(self, query: str) -> list[Product]:
-        """Search products by name or description using VIEW (no N+1)."""
-        result = (
-            await self.client.table(self.VIEW_NAME)
-            .select("*")
-            .or_(f"name.ilike.%{query}%,description.ilike.%{query}%")
-            .eq("status", "active")
-            .execute()
-        )
+    async def search(self, query: str, limit: int = 20) -> list[Product]:
+        """Search products by name or description, best matches first.
+
+        search_products RPC: ru/en full-text plus trigram (typo-tolerant)
+        matching on indexed columns.
+        """
+        if not query.strip():
+            return []
 
-        return [Product(**p) for p in result.data]
+        result = await self.client.rpc(
+            "search_products", {"p_query": query, "p_limit": limit}
+        ).execute()
+
+        return [Product.from_row(p) for p in result.data or []]
 
     async def get_rating(self, product_id: str) -> dict[str, Any]:
-        """Get product rating and review count."""
+        """Get product rating and review count (precomputed in product_stats)."""
         result = (
-            await self.client.table("reviews")
-            .select("rating")
+            await self.client.table("product_stats")
+            .select("rating_count, rating_sum")
             .eq("product_id", product_id)
             .execute()
         )
@@ -60,12 +63,21 @@ class ProductRepository(BaseRepository):
         if not result.data:
             return {"average": 0, "count": 0}
 
-        ratings = [r["rating"] for r in result.data if r.get("rating")]
+        row = result.data[0]
+        count = row.get("rating_count") or 0
         return {
-            "average": round(sum(ratings) / len(ratings), 1) if ratings else 0,
-            "count": len(ratings),
+            "average": round((row.get("rating_sum") or 0) / count, 1) if count else 0,
+            "count": count,
         }
 
+    async def reconcile_stats(self) -> int:
+        """Recompute product_stats from reviews and sale orders (drift repair).
+
+        Returns the number of rows that were out of date.
+        """
+        result = await self.client.rpc("reconcile_product_stats", {}).execute()
+        return int(result.data or 0)
+
     async def create(self, data: dict[str, Any]) -> Product:
         """Create new product."""
         result = await self.client.table("products").insert(data).execute()
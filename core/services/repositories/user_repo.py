@@ -164,3 +164,24 @@ class UserRepository(BaseRepository):
         """Get all admin users."""
         result = await self.client.table("users").select("*").eq("is_admin", True).execute()
         return [User(**u) for u in result.data]
+
+    # ==================== Referral tree (referral_closure) ====================
+
+    async def get_referral_descendants(
+        self, user_id: str, depth: int, limit: int = 50, offset: int = 0
+    ) -> list[dict[str, Any]]:
+        """Get referrals at exactly `depth` levels below the user (newest first)."""
+        result = await self.client.rpc(
+            "get_referral_descendants",
+            {"p_user_id": user_id, "p_depth": depth, "p_limit": limit, "p_offset": offset},
+        ).execute()
+        return result.data or []
+
+    async def get_referral_ancestors(self, user_id: str, max_depth: int = 3) -> list[str]:
+        """Get the user's referrer chain (index 0 = direct referrer), up to max_depth."""
+        result = await self.client.rpc(
+            "get_referral_ancestors",
+            {"p_user_id": user_id, "p_max_depth": max_depth},
+        ).execute()
+        rows = sorted(result.data or [], key=lambda r: r.get("depth", 0))
+        return [str(r["ancestor_id"]) for r in rows if r.get("ancestor_id")]
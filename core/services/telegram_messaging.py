@@ -6,7 +6,8 @@ Replaces 8+ duplicate implementations with unified retry logic, error handling,
 
 import asyncio
 import os
-from typing import Any
+import time
+from typing import Any, Self
 
 import httpx
 
@@ -316,3 +317,153 @@ async def send_via_discount_bot(chat_id: int, text: str, parse_mode: str = "HTML
         parse_mode=parse_mode,
         bot_token=DISCOUNT_BOT_TOKEN or TELEGRAM_TOKEN,
     )
+
+
+# =============================================================================
+# Bulk sending (crons, offers): shared rate limit, concurrent sends
+# =============================================================================
+
+# Telegram allows ~30 messages/sec per bot; stay below it
+BULK_RATE_PER_SEC = 25.0
+BULK_CONCURRENCY = 10
+
+
+class AsyncRateLimiter:
+    """Token bucket: at most `rate` acquisitions per second (bursts up to `rate`)."""
+
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    async def pause(self, seconds: float) -> None:
+        """Hold all senders (Telegram 429 retry_after applies to the whole bot)."""
+        async with self._lock:
+            await asyncio.sleep(seconds)
+            self._tokens = 0
+            self._updated = time.monotonic()
+
+
+# One limiter per bot token, shared by every bulk sender in the process
+_rate_limiters: dict[str, AsyncRateLimiter] = {}
+
+
+def get_bot_rate_limiter(bot_token: str) -> AsyncRateLimiter:
+    limiter = _rate_limiters.get(bot_token)
+    if limiter is None:
+        limiter = _rate_limiters[bot_token] = AsyncRateLimiter(BULK_RATE_PER_SEC)
+    return limiter
+
+
+class TelegramBulkSender:
+    """Concurrent sendMessage over one pooled client under the bot's shared rate limit.
+
+    Usage:
+        async with TelegramBulkSender() as sender:
+            results = await sender.send_many([(chat_id, text), ...])
+
+    Chats that answered 403 (bot blocked, user deactivated) are collected in
+    `blocked` so callers can stop targeting them.
+    """
+
+    def __init__(
+        self,
+        bot_token: str | None = None,
+        concurrency: int = BULK_CONCURRENCY,
+        timeout_seconds: float = DEFAULT_TIMEOUT,
+    ) -> None:
+        self.token = bot_token or TELEGRAM_TOKEN
+        self.limiter = get_bot_rate_limiter(self.token)
+        self.blocked: set[int | str] = set()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._client = httpx.AsyncClient(
+            timeout=timeout_seconds,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        )
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, *exc: object) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def send(
+        self,
+        chat_id: int | str,
+        text: str,
+        reply_markup: Any = None,
+        parse_mode: str | None = "HTML",
+    ) -> bool:
+        """Send one message. Retries once after a 429; permanent errors are not retried."""
+        if not self.token:
+            logger.warning(f"No bot token configured for sending message to {chat_id}")
+            return False
+
+        payload: dict[str, Any] = {"chat_id": chat_id, "text": _truncate_message(text)}
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+        if reply_markup is not None:
+            keyboard = _convert_keyboard_to_dict(reply_markup)
+            if keyboard is None:
+                return False
+            payload["reply_markup"] = keyboard
+
+        url = f"https://api.telegram.org/bot{self.token}/sendMessage"
+        async with self._semaphore:
+            for attempt in range(2):
+                await self.limiter.acquire()
+                try:
+                    response = await self._client.post(url, json=payload)
+                except Exception as e:
+                    logger.warning(f"Bulk send to {chat_id} failed: {e}")
+                    return False
+                if response.status_code == 200:
+                    return True
+                if response.status_code == 429 and attempt == 0:
+                    retry_after = _retry_after(response)
+                    logger.warning(f"Telegram 429, pausing bulk sends for {retry_after}s")
+                    await self.limiter.pause(retry_after)
+                    continue
+                if response.status_code == 403:
+                    self.blocked.add(chat_id)
+                if not _is_permanent_error(response.status_code):
+                    logger.warning(
+                        f"Bulk send to {chat_id}: status={response.status_code}, "
+                        f"response={_parse_error_response(response)[:200]}"
+                    )
+                return False
+        return False
+
+    async def send_many(
+        self,
+        messages: list[tuple[int | str, str]],
+        parse_mode: str | None = "HTML",
+    ) -> list[bool]:
+        """Send (chat_id, text) pairs concurrently. Results are in input order."""
+        return list(
+            await asyncio.gather(
+                *(self.send(chat_id, text, parse_mode=parse_mode) for chat_id, text in messages)
+            )
+        )
+
+
+def _retry_after(response: httpx.Response) -> float:
+    try:
+        return float(response.json().get("parameters", {}).get("retry_after", 1))
+    except Exception:
+        return 1.0
@@ -0,0 +1,75 @@
+"""Fast JSON encoding for hot API responses.
+
+List endpoints (catalog, cart, orders) return plain dicts/lists. Returning
+them through FastAPI's default path runs jsonable_encoder over every value
+and then stdlib json.dumps. FastJSONResponse encodes the content directly:
+orjson (pinned in requirements.txt), stdlib json if it is unavailable.
+Values are encoded the way jsonable_encoder would: Decimal -> int/float,
+datetime/date/UUID -> string, sets -> lists.
+"""
+
+import json
+from dataclasses import asdict, is_dataclass
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any
+from uuid import UUID
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None  # type: ignore[assignment]
+
+__all__ = ["FastJSONResponse", "dumps", "loads"]
+
+
+def _default(value: Any) -> Any:
+    """Encode types the JSON backends do not handle natively."""
+    if isinstance(value, Decimal):
+        # Same rule as FastAPI's decimal_encoder
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)  # type: ignore[operator]
+    if isinstance(value, datetime | date | time):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, set | frozenset):
+        return list(value)
+    if is_dataclass(value) and not isinstance(value, type):
+        return asdict(value)
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    msg = f"Object of type {type(value).__name__} is not JSON serializable"
+    raise TypeError(msg)
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def dumps(value: Any) -> bytes:
+        """Encode to compact UTF-8 JSON."""
+        return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS)
+
+    def loads(data: bytes | str) -> Any:
+        """Decode JSON."""
+        return orjson.loads(data)
+
+else:
+
+    def dumps(value: Any) -> bytes:
+        """Encode to compact UTF-8 JSON."""
+        return json.dumps(
+            value, default=_default, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+
+    def loads(data: bytes | str) -> Any:
+        """Decode JSON."""
+        return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with dumps (skips jsonable_encoder)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,28 @@
+"""HTTP cache validators (ETag / If-None-Match / Cache-Control)."""
+
+from starlette.responses import Response
+
+__all__ = ["etag_matches", "not_modified", "public_cache_control"]
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match check (weak comparison, lists and * supported)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def public_cache_control(s_maxage: int, stale_while_revalidate: int) -> str:
+    """Shared-cache policy: clients revalidate, the CDN edge serves for s_maxage."""
+    return (
+        f"public, max-age=0, s-maxage={s_maxage}, stale-while-revalidate={stale_while_revalidate}"
+    )
+
+
+def not_modified(headers: dict[str, str]) -> Response:
+    """304 response carrying the validators (no body)."""
+    return Response(status_code=304, headers=headers)
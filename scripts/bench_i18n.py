@@ -0,0 +1,67 @@
+"""Micro-benchmark for core.i18n.get_text.
+
+    python scripts/bench_i18n.py [renders]
+
+Measures a "render": the get_text calls behind one bot message with its
+keyboard (plain keys, nested keys, formatted strings, a missing key with a
+default), plus cold catalog load from JSON and from the compiled artifact.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.i18n import translations
+from core.i18n.translations import SUPPORTED_LANGUAGES, get_text, reload_translations
+
+
+def _sample_calls(lang: str) -> list[tuple[str, dict]]:
+    """~30 lookups shaped like a typical message + keyboard."""
+    catalog = translations._get_catalog(lang)
+    plain = [k for k, v in catalog.items() if "{" not in v][:20]
+    formatted = [k for k, v in catalog.items() if "{" in v][:8]
+    calls: list[tuple[str, dict]] = [(k, {}) for k in plain]
+    calls += [(k, {"name": "Alex", "amount": 12.5, "count": 3}) for k in formatted]
+    calls.append(("missing.key.for.bench", {}))
+    return calls
+
+
+def _bench_renders(lang: str, renders: int) -> float:
+    calls = _sample_calls(lang)
+    start = time.perf_counter()
+    for _ in range(renders):
+        for key, kwargs in calls:
+            get_text(key, lang, "fallback", **kwargs)
+    return (time.perf_counter() - start) / renders * 1e6
+
+
+def _bench_cold_load() -> tuple[float, float]:
+    reload_translations()
+    translations._artifact_checked = True  # Force compile from JSON
+    start = time.perf_counter()
+    for lang in SUPPORTED_LANGUAGES:
+        translations._get_catalog(lang)
+    from_json = (time.perf_counter() - start) * 1000
+
+    translations.write_compiled_catalogs()
+    reload_translations()
+    start = time.perf_counter()
+    for lang in SUPPORTED_LANGUAGES:
+        translations._get_catalog(lang)
+    from_artifact = (time.perf_counter() - start) * 1000
+    return from_json, from_artifact
+
+
+def main() -> None:
+    renders = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    from_json, from_artifact = _bench_cold_load()
+    print(f"cold load, all languages: json={from_json:.2f} ms, artifact={from_artifact:.2f} ms")
+    for lang in ("en", "ru"):
+        per_render = _bench_renders(lang, renders)
+        print(f"{lang}: {per_render:.1f} us per render ({len(_sample_calls(lang))} lookups)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Micro-benchmark for hot read-model construction and response encoding.
+
+    python scripts/bench_serialization.py [iterations]
+
+Cases (synthetic rows shaped like the real tables):
+- catalog list: 100 products_with_stock_summary rows -> Product
+  (Product.from_row vs the previous pydantic model), then response encoding
+- cart view: cart hash fields -> Cart -> summary dict, then encoding
+- orders list: 20 orders with items -> API dicts (_process_order_row),
+  then encoding
+
+"encode" compares FastAPI's default path (jsonable_encoder + json.dumps)
+with core.utils.fast_json.dumps.
+"""
+
+import json
+import sys
+import time
+from collections.abc import Callable
+from decimal import Decimal
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, field_validator
+
+from core.cart.models import Cart, CartItem
+from core.cart.storage import cart_from_fields, cart_to_fields
+from core.routers.webapp.orders.crud import _process_order_row
+from core.services.models import Product
+from core.services.money import to_decimal
+from core.utils.fast_json import dumps
+
+
+class PydanticProduct(BaseModel):
+    """Previous pydantic Product model (reference)."""
+
+    id: str
+    name: str
+    description: str | None = None
+    price: Decimal
+    prices: dict[str, Any] | None = None
+    type: str
+    status: str = "active"
+    warranty_hours: int = 24
+    instructions: str | None = None
+    terms: str | None = None
+    supplier_id: str | None = None
+    stock_count: int = 0
+    fulfillment_time_hours: int = 48
+    requires_prepayment: bool = False
+    prepayment_percent: int = 100
+    categories: list[str] = []
+    msrp: Decimal | None = None
+    duration_days: int | None = None
+    instruction_files: list[str] | None = None
+    image_url: str | None = None
+    video_url: str | None = None
+    logo_svg_url: str | None = None
+
+    @field_validator("price", mode="before")
+    @classmethod
+    def convert_price_to_decimal(cls, v: Any) -> Decimal:
+        return to_decimal(v)
+
+
+def _product_rows(count: int) -> list[dict[str, Any]]:
+    return [
+        {
+            "id": f"00000000-0000-0000-0000-{i:012d}",
+            "name": f"Product {i}",
+            "description": "Shared account with full access. " * 4,
+            "price": f"{100 + i}.50",
+            "prices": None,
+            "type": "shared",
+            "status": "active",
+            "warranty_hours": 720,
+            "instructions": "Log in with the credentials below. " * 6,
+            "terms": None,
+            "supplier_id": None,
+            "stock_count": i % 7,
+            "fulfillment_time_hours": 24,
+            "requires_prepayment": False,
+            "prepayment_percent": 100,
+            "categories": ["text", "code"],
+            "msrp": f"{200 + i}.00",
+            "duration_days": 30,
+            "instruction_files": None,
+            "image_url": f"https://cdn.example.com/{i}.png",
+            "video_url": None,
+            "logo_svg_url": None,
+            "max_discount_percent": 10,
+            "sold_count": i * 3,
+        }
+        for i in range(count)
+    ]
+
+
+def _cart_fields(items: int) -> dict[str, str]:
+    cart = Cart(
+        user_telegram_id=1,
+        items=[
+            CartItem(
+                product_id=f"p{i}",
+                product_name=f"Product {i}",
+                quantity=2,
+                instant_quantity=1,
+                prepaid_quantity=1,
+                unit_price=Decimal("12.50"),
+                discount_percent=Decimal(10),
+            )
+            for i in range(items)
+        ],
+        promo_code="SPRING",
+        promo_discount_percent=Decimal(5),
+    )
+    return cart_to_fields(cart)
+
+
+def _order_rows(count: int) -> list[dict[str, Any]]:
+    return [
+        {
+            "id": f"order-{i}",
+            "amount": "1250.00",
+            "original_price": "1500.00",
+            "discount_percent": 15,
+            "status": "delivered",
+            "order_type": "instant",
+            "created_at": "2026-01-10T12:00:00+00:00",
+            "expires_at": None,
+            "fulfillment_deadline": None,
+            "delivered_at": "2026-01-10T12:05:00+00:00",
+            "warranty_until": "2026-02-10T12:05:00+00:00",
+            "payment_url": None,
+            "payment_id": f"pay-{i}",
+            "payment_gateway": "crystalpay",
+            "order_items": [
+                {
+                    "id": f"item-{i}-{j}",
+                    "product_id": f"p{j}",
+                    "product": {"id": f"p{j}", "name": f"Product {j}"},
+                    "quantity": 1,
+                    "price": "625.00",
+                    "status": "delivered",
+                    "fulfillment_type": "instant",
+                    "delivery_content": "login: user / password: secret",
+                    "delivery_instructions": "Change the password after login.",
+                    "created_at": "2026-01-10T12:00:00+00:00",
+                    "delivered_at": "2026-01-10T12:05:00+00:00",
+                }
+                for j in range(2)
+            ],
+        }
+        for i in range(count)
+    ]
+
+
+def _time(fn: Callable[[], Any], iterations: int) -> float:
+    """Mean microseconds per call."""
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def _default_encode(payload: Any) -> bytes:
+    return json.dumps(jsonable_encoder(payload), ensure_ascii=False).encode("utf-8")
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    rows = _product_rows(100)
+    build_pydantic = _time(lambda: [PydanticProduct(**r) for r in rows], iterations)
+    build_fast = _time(lambda: [Product.from_row(r) for r in rows], iterations)
+    print(
+        f"catalog list, 100 products: pydantic={build_pydantic:.0f} us, "
+        f"from_row={build_fast:.0f} us"
+    )
+    catalog = {"products": rows, "currency": "RUB", "exchange_rate": 1.0}
+    print(
+        f"  encode: default={_time(lambda: _default_encode(catalog), iterations):.0f} us, "
+        f"fast={_time(lambda: dumps(catalog), iterations):.0f} us"
+    )
+
+    fields = _cart_fields(5)
+
+    def cart_view() -> dict[str, Any]:
+        cart = cart_from_fields(1, fields)
+        assert cart is not None
+        return {
+            "items": [item.to_dict() for item in cart.items],
+            "subtotal": cart.subtotal,
+            "total": cart.total,
+            "promo_code": cart.promo_code,
+            "promo_discount_percent": cart.promo_discount_percent,
+        }
+
+    view = cart_view()
+    print(f"cart view, 5 items: build={_time(cart_view, iterations * 10):.1f} us")
+    print(
+        f"  encode: default={_time(lambda: _default_encode(view), iterations * 10):.1f} us, "
+        f"fast={_time(lambda: dumps(view), iterations * 10):.1f} us"
+    )
+
+    order_rows = _order_rows(20)
+    orders = [_process_order_row(row, {}) for row in order_rows]
+    payload = {"orders": orders, "count": len(orders), "currency": "RUB"}
+    build_orders = _time(lambda: [_process_order_row(r, {}) for r in order_rows], iterations)
+    print(f"orders list, 20 orders: build={build_orders:.0f} us")
+    print(
+        f"  encode: default={_time(lambda: _default_encode(payload), iterations):.0f} us, "
+        f"fast={_time(lambda: dumps(payload), iterations):.0f} us"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""Compile locale JSON files into locales/compiled.marshal.
+
+Run at deploy time (or whenever locales/*.json change):
+
+    python scripts/compile_locales.py
+
+The artifact stores flat per-language catalogs with the English fallback
+merged in, plus a fingerprint of the source files. core.i18n loads it on
+first use and ignores it when the JSON files have changed since.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.i18n.translations import compile_catalogs, write_compiled_catalogs
+
+
+def main() -> None:
+    start = time.perf_counter()
+    path = write_compiled_catalogs()
+    elapsed = (time.perf_counter() - start) * 1000
+    catalogs = compile_catalogs()
+    keys = sum(len(c) for c in catalogs.values())
+    print(f"Wrote {path} ({len(catalogs)} languages, {keys} strings) in {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
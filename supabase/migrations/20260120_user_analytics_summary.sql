@@ -0,0 +1,578 @@
+-- ============================================================
+-- Migration: Maintained user analytics summary
+-- ============================================================
+-- users_extended_analytics re-aggregated orders, tickets, reviews,
+-- referrals, withdrawals and chat history for EVERY user on every query,
+-- so sorting the CRM by total_orders/total_spent had to aggregate the
+-- whole user base before applying LIMIT.
+--
+-- Now:
+-- 1. user_analytics_summary holds one pre-aggregated row per user
+-- 2. Statement-level triggers recompute only the affected users
+--    (chat history and referrers' active_referrals are maintained
+--    incrementally)
+-- 3. reconcile_user_analytics_summary() fixes drift in batches (daily cron)
+-- 4. users_extended_analytics becomes a plain users ⋈ summary join,
+--    so ORDER BY <metric> LIMIT n walks an index
+-- ============================================================
+
+-- ============================================================
+-- 1. Summary table
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS user_analytics_summary (
+    user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    -- Orders
+    total_orders INTEGER NOT NULL DEFAULT 0,
+    delivered_orders INTEGER NOT NULL DEFAULT 0,
+    pending_orders INTEGER NOT NULL DEFAULT 0,
+    paid_orders INTEGER NOT NULL DEFAULT 0,
+    refunded_orders INTEGER NOT NULL DEFAULT 0,
+    refund_requests INTEGER NOT NULL DEFAULT 0,
+    total_spent NUMERIC(12,2) NOT NULL DEFAULT 0,
+    total_refunded NUMERIC(12,2) NOT NULL DEFAULT 0,
+    -- Tickets
+    total_tickets INTEGER NOT NULL DEFAULT 0,
+    open_tickets INTEGER NOT NULL DEFAULT 0,
+    approved_tickets INTEGER NOT NULL DEFAULT 0,
+    rejected_tickets INTEGER NOT NULL DEFAULT 0,
+    closed_tickets INTEGER NOT NULL DEFAULT 0,
+    -- Reviews
+    total_reviews INTEGER NOT NULL DEFAULT 0,
+    avg_rating NUMERIC(3,2) NOT NULL DEFAULT 0,
+    -- Referrals (direct)
+    total_referrals INTEGER NOT NULL DEFAULT 0,
+    active_referrals INTEGER NOT NULL DEFAULT 0,
+    -- Withdrawals
+    total_withdrawals INTEGER NOT NULL DEFAULT 0,
+    pending_withdrawals INTEGER NOT NULL DEFAULT 0,
+    total_withdrawn NUMERIC(12,2) NOT NULL DEFAULT 0,
+    -- Chat
+    total_chat_messages INTEGER NOT NULL DEFAULT 0,
+    last_chat_message_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Sort indexes for CRM (user_id = keyset tie-breaker)
+CREATE INDEX IF NOT EXISTS idx_uas_total_orders ON user_analytics_summary(total_orders DESC, user_id DESC);
+CREATE INDEX IF NOT EXISTS idx_uas_delivered_orders ON user_analytics_summary(delivered_orders DESC, user_id DESC);
+CREATE INDEX IF NOT EXISTS idx_uas_refunded_orders ON user_analytics_summary(refunded_orders DESC, user_id DESC);
+CREATE INDEX IF NOT EXISTS idx_uas_total_spent ON user_analytics_summary(total_spent DESC, user_id DESC);
+CREATE INDEX IF NOT EXISTS idx_uas_total_tickets ON user_analytics_summary(total_tickets DESC, user_id DESC);
+CREATE INDEX IF NOT EXISTS idx_uas_open_tickets ON user_analytics_summary(open_tickets DESC, user_id DESC);
+CREATE INDEX IF NOT EXISTS idx_uas_total_reviews ON user_analytics_summary(total_reviews DESC, user_id DESC);
+CREATE INDEX IF NOT EXISTS idx_uas_avg_rating ON user_analytics_summary(avg_rating DESC, user_id DESC);
+CREATE INDEX IF NOT EXISTS idx_uas_total_referrals ON user_analytics_summary(total_referrals DESC, user_id DESC);
+CREATE INDEX IF NOT EXISTS idx_uas_total_withdrawals ON user_analytics_summary(total_withdrawals DESC, user_id DESC);
+
+-- Supporting indexes for per-user recomputation
+CREATE INDEX IF NOT EXISTS idx_orders_user_status ON orders(user_id, status);
+CREATE INDEX IF NOT EXISTS idx_tickets_user ON tickets(user_id);
+CREATE INDEX IF NOT EXISTS idx_users_referrer ON users(referrer_id) WHERE referrer_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_chat_history_user ON chat_history(user_id, "timestamp" DESC);
+
+-- ============================================================
+-- 2. Recompute summary rows for a set of users
+-- ============================================================
+
+-- p_include_referrals = FALSE keeps the stored total/active_referrals:
+-- counting them probes every direct referral, which triggers on the
+-- buyer's own rows (orders, reviews, ...) should not pay for.
+CREATE OR REPLACE FUNCTION refresh_user_analytics_summary(
+    p_user_ids UUID[],
+    p_include_referrals BOOLEAN DEFAULT TRUE
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    IF p_user_ids IS NULL OR cardinality(p_user_ids) = 0 THEN
+        RETURN 0;
+    END IF;
+
+    INSERT INTO user_analytics_summary AS s (
+        user_id,
+        total_orders, delivered_orders, pending_orders, paid_orders, refunded_orders,
+        refund_requests, total_spent, total_refunded,
+        total_tickets, open_tickets, approved_tickets, rejected_tickets, closed_tickets,
+        total_reviews, avg_rating,
+        total_referrals, active_referrals,
+        total_withdrawals, pending_withdrawals, total_withdrawn,
+        total_chat_messages, last_chat_message_at,
+        updated_at
+    )
+    SELECT
+        u.id,
+        COALESCE(o.total_orders, 0),
+        COALESCE(o.delivered_orders, 0),
+        COALESCE(o.pending_orders, 0),
+        COALESCE(o.paid_orders, 0),
+        COALESCE(o.refunded_orders, 0),
+        COALESCE(o.refund_requests, 0),
+        COALESCE(o.total_spent, 0),
+        COALESCE(o.total_refunded, 0),
+        COALESCE(t.total_tickets, 0),
+        COALESCE(t.open_tickets, 0),
+        COALESCE(t.approved_tickets, 0),
+        COALESCE(t.rejected_tickets, 0),
+        COALESCE(t.closed_tickets, 0),
+        COALESCE(r.total_reviews, 0),
+        COALESCE(r.avg_rating, 0),
+        COALESCE(rf.total_referrals, 0),
+        COALESCE(rf.active_referrals, 0),
+        COALESCE(w.total_withdrawals, 0),
+        COALESCE(w.pending_withdrawals, 0),
+        COALESCE(w.total_withdrawn, 0),
+        COALESCE(c.total_chat_messages, 0),
+        c.last_chat_message_at,
+        NOW()
+    FROM users u
+    LEFT JOIN LATERAL (
+        SELECT
+            COUNT(*) AS total_orders,
+            COUNT(*) FILTER (WHERE status = 'delivered') AS delivered_orders,
+            COUNT(*) FILTER (WHERE status = 'pending') AS pending_orders,
+            COUNT(*) FILTER (WHERE status IN ('paid', 'prepaid')) AS paid_orders,
+            COUNT(*) FILTER (WHERE status = 'refunded') AS refunded_orders,
+            COUNT(*) FILTER (WHERE refund_requested) AS refund_requests,
+            SUM(amount) FILTER (WHERE status = 'delivered') AS total_spent,
+            SUM(amount) FILTER (WHERE status = 'refunded') AS total_refunded
+        FROM orders
+        WHERE user_id = u.id
+    ) o ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT
+            COUNT(*) AS total_tickets,
+            COUNT(*) FILTER (WHERE status = 'open') AS open_tickets,
+            COUNT(*) FILTER (WHERE status = 'approved') AS approved_tickets,
+            COUNT(*) FILTER (WHERE status = 'rejected') AS rejected_tickets,
+            COUNT(*) FILTER (WHERE status = 'closed') AS closed_tickets
+        FROM tickets
+        WHERE user_id = u.id
+    ) t ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT COUNT(*) AS total_reviews, ROUND(AVG(rating), 2) AS avg_rating
+        FROM reviews
+        WHERE user_id = u.id
+    ) r ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT
+            COUNT(*) AS total_referrals,
+            COUNT(*) FILTER (
+                WHERE EXISTS (
+                    SELECT 1 FROM orders ro WHERE ro.user_id = ref.id AND ro.status = 'delivered'
+                )
+            ) AS active_referrals
+        FROM users ref
+        WHERE p_include_referrals AND ref.referrer_id = u.id
+    ) rf ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT
+            COUNT(*) AS total_withdrawals,
+            COUNT(*) FILTER (WHERE status IN ('pending', 'processing')) AS pending_withdrawals,
+            SUM(amount) FILTER (WHERE status = 'completed') AS total_withdrawn
+        FROM withdrawal_requests
+        WHERE user_id = u.id
+    ) w ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT COUNT(*) AS total_chat_messages, MAX("timestamp") AS last_chat_message_at
+        FROM chat_history
+        WHERE user_id = u.id
+    ) c ON TRUE
+    WHERE u.id = ANY(p_user_ids)
+    ON CONFLICT (user_id) DO UPDATE SET
+        total_orders = EXCLUDED.total_orders,
+        delivered_orders = EXCLUDED.delivered_orders,
+        pending_orders = EXCLUDED.pending_orders,
+        paid_orders = EXCLUDED.paid_orders,
+        refunded_orders = EXCLUDED.refunded_orders,
+        refund_requests = EXCLUDED.refund_requests,
+        total_spent = EXCLUDED.total_spent,
+        total_refunded = EXCLUDED.total_refunded,
+        total_tickets = EXCLUDED.total_tickets,
+        open_tickets = EXCLUDED.open_tickets,
+        approved_tickets = EXCLUDED.approved_tickets,
+        rejected_tickets = EXCLUDED.rejected_tickets,
+        closed_tickets = EXCLUDED.closed_tickets,
+        total_reviews = EXCLUDED.total_reviews,
+        avg_rating = EXCLUDED.avg_rating,
+        total_referrals = CASE
+            WHEN p_include_referrals THEN EXCLUDED.total_referrals ELSE s.total_referrals
+        END,
+        active_referrals = CASE
+            WHEN p_include_referrals THEN EXCLUDED.active_referrals ELSE s.active_referrals
+        END,
+        total_withdrawals = EXCLUDED.total_withdrawals,
+        pending_withdrawals = EXCLUDED.pending_withdrawals,
+        total_withdrawn = EXCLUDED.total_withdrawn,
+        total_chat_messages = EXCLUDED.total_chat_messages,
+        last_chat_message_at = EXCLUDED.last_chat_message_at,
+        updated_at = NOW();
+
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$;
+
+COMMENT ON FUNCTION refresh_user_analytics_summary(UUID[], BOOLEAN) IS
+'Recompute user_analytics_summary rows for the given users from base tables.';
+
+-- ============================================================
+-- 3. Triggers (statement-level, transition tables)
+-- ============================================================
+-- Each trigger collects DISTINCT user ids touched by the statement and
+-- recomputes just those rows (without their referral counters).
+-- TG_ARGV[0] = user column in the source table. For new users, the
+-- referrer's total_referrals changes and the new user gets an empty
+-- summary row.
+--
+-- Orders never recompute the referrer: its active_referrals only moves
+-- by ±1 when a referral's first delivered order appears or its last one
+-- disappears, so order writes (payment confirmation, expiry batches) stay
+-- O(rows changed) regardless of the referrer's network size.
+
+CREATE OR REPLACE FUNCTION trg_refresh_user_analytics_summary()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_col TEXT := TG_ARGV[0];
+    v_ids UUID[] := '{}';
+    v_part UUID[];
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        EXECUTE format('SELECT array_agg(DISTINCT %I) FROM new_rows WHERE %I IS NOT NULL', v_col, v_col)
+            INTO v_part;
+        v_ids := v_ids || COALESCE(v_part, '{}');
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        EXECUTE format('SELECT array_agg(DISTINCT %I) FROM old_rows WHERE %I IS NOT NULL', v_col, v_col)
+            INTO v_part;
+        v_ids := v_ids || COALESCE(v_part, '{}');
+    END IF;
+
+    IF TG_TABLE_NAME = 'users' AND TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT id) INTO v_part FROM new_rows;
+        v_ids := v_ids || COALESCE(v_part, '{}');
+    END IF;
+
+    PERFORM refresh_user_analytics_summary(
+        ARRAY(SELECT DISTINCT unnest(v_ids)),
+        TG_TABLE_NAME = 'users'
+    );
+    RETURN NULL;
+END;
+$$;
+
+-- Row-level variant for UPDATE triggers restricted to the summary's input
+-- columns: PostgreSQL does not allow transition tables on UPDATE OF <cols>
+-- triggers, and reviews are updated more often for unrelated columns
+-- (cashback flags, moderation).
+CREATE OR REPLACE FUNCTION trg_refresh_user_analytics_summary_row()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_col TEXT := TG_ARGV[0];
+    v_ids UUID[];
+BEGIN
+    v_ids := array_remove(
+        ARRAY[(to_jsonb(OLD) ->> v_col)::UUID, (to_jsonb(NEW) ->> v_col)::UUID],
+        NULL
+    );
+
+    PERFORM refresh_user_analytics_summary(ARRAY(SELECT DISTINCT unnest(v_ids)), FALSE);
+    RETURN NULL;
+END;
+$$;
+
+-- orders: one statement-level function for INSERT/UPDATE/DELETE.
+-- UPDATE only recomputes buyers whose orders changed in a summary input
+-- column (payment_url, delivery timestamps, ... cost one transition join).
+CREATE OR REPLACE FUNCTION trg_user_analytics_orders()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_ids UUID[];
+    v_new_order_ids UUID[] := '{}';
+    v_old_delivered UUID[] := '{}';
+    v_new_delivered UUID[] := '{}';
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT user_id) INTO v_ids FROM new_rows WHERE user_id IS NOT NULL;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT user_id) INTO v_ids FROM old_rows WHERE user_id IS NOT NULL;
+    ELSE
+        SELECT array_agg(DISTINCT x.user_id) INTO v_ids
+        FROM old_rows o
+        JOIN new_rows n ON n.id = o.id
+        CROSS JOIN LATERAL unnest(ARRAY[o.user_id, n.user_id]) AS x(user_id)
+        WHERE x.user_id IS NOT NULL
+          AND (o.status, o.amount, o.refund_requested, o.user_id)
+              IS DISTINCT FROM (n.status, n.amount, n.refund_requested, n.user_id);
+    END IF;
+
+    IF v_ids IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    PERFORM refresh_user_analytics_summary(v_ids, FALSE);
+
+    -- Referrers' active_referrals: compare "has a delivered order" before
+    -- and after the statement for buyers with a delivered row on either side
+    -- (before = current orders minus new_rows plus old_rows).
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        SELECT COALESCE(array_agg(id), '{}') INTO v_new_order_ids FROM new_rows;
+        SELECT COALESCE(array_agg(DISTINCT user_id), '{}') INTO v_new_delivered
+        FROM new_rows WHERE status = 'delivered' AND user_id IS NOT NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        SELECT COALESCE(array_agg(DISTINCT user_id), '{}') INTO v_old_delivered
+        FROM old_rows WHERE status = 'delivered' AND user_id IS NOT NULL;
+    END IF;
+
+    UPDATE user_analytics_summary s
+    SET active_referrals = GREATEST(0, s.active_referrals + d.delta),
+        updated_at = NOW()
+    FROM (
+        SELECT u.referrer_id, SUM(c.delta) AS delta
+        FROM (
+            SELECT
+                b.user_id,
+                EXISTS (
+                    SELECT 1 FROM orders o WHERE o.user_id = b.user_id AND o.status = 'delivered'
+                )::INTEGER
+                - (
+                    b.user_id = ANY (v_old_delivered)
+                    OR EXISTS (
+                        SELECT 1
+                        FROM orders o
+                        WHERE o.user_id = b.user_id
+                          AND o.status = 'delivered'
+                          AND NOT (o.id = ANY (v_new_order_ids))
+                    )
+                )::INTEGER AS delta
+            FROM (SELECT DISTINCT unnest(v_old_delivered || v_new_delivered) AS user_id) b
+        ) c
+        JOIN users u ON u.id = c.user_id
+        WHERE c.delta <> 0 AND u.referrer_id IS NOT NULL
+        GROUP BY u.referrer_id
+    ) d
+    WHERE s.user_id = d.referrer_id;
+
+    RETURN NULL;
+END;
+$$;
+
+-- orders
+DROP TRIGGER IF EXISTS trg_uas_orders_insert ON orders;
+CREATE TRIGGER trg_uas_orders_insert AFTER INSERT ON orders
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_user_analytics_orders();
+DROP TRIGGER IF EXISTS trg_uas_orders_update ON orders;
+CREATE TRIGGER trg_uas_orders_update AFTER UPDATE ON orders
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_user_analytics_orders();
+DROP TRIGGER IF EXISTS trg_uas_orders_delete ON orders;
+CREATE TRIGGER trg_uas_orders_delete AFTER DELETE ON orders
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_user_analytics_orders();
+
+-- tickets
+DROP TRIGGER IF EXISTS trg_uas_tickets_insert ON tickets;
+CREATE TRIGGER trg_uas_tickets_insert AFTER INSERT ON tickets
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_refresh_user_analytics_summary('user_id');
+DROP TRIGGER IF EXISTS trg_uas_tickets_update ON tickets;
+CREATE TRIGGER trg_uas_tickets_update AFTER UPDATE ON tickets
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_refresh_user_analytics_summary('user_id');
+DROP TRIGGER IF EXISTS trg_uas_tickets_delete ON tickets;
+CREATE TRIGGER trg_uas_tickets_delete AFTER DELETE ON tickets
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_refresh_user_analytics_summary('user_id');
+
+-- reviews
+DROP TRIGGER IF EXISTS trg_uas_reviews_insert ON reviews;
+CREATE TRIGGER trg_uas_reviews_insert AFTER INSERT ON reviews
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_refresh_user_analytics_summary('user_id');
+DROP TRIGGER IF EXISTS trg_uas_reviews_update ON reviews;
+CREATE TRIGGER trg_uas_reviews_update
+    AFTER UPDATE OF rating, user_id ON reviews
+    FOR EACH ROW
+    WHEN (OLD.rating IS DISTINCT FROM NEW.rating OR OLD.user_id IS DISTINCT FROM NEW.user_id)
+    EXECUTE FUNCTION trg_refresh_user_analytics_summary_row('user_id');
+DROP TRIGGER IF EXISTS trg_uas_reviews_delete ON reviews;
+CREATE TRIGGER trg_uas_reviews_delete AFTER DELETE ON reviews
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_refresh_user_analytics_summary('user_id');
+
+-- withdrawal_requests
+DROP TRIGGER IF EXISTS trg_uas_withdrawals_insert ON withdrawal_requests;
+CREATE TRIGGER trg_uas_withdrawals_insert AFTER INSERT ON withdrawal_requests
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_refresh_user_analytics_summary('user_id');
+DROP TRIGGER IF EXISTS trg_uas_withdrawals_update ON withdrawal_requests;
+CREATE TRIGGER trg_uas_withdrawals_update AFTER UPDATE ON withdrawal_requests
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_refresh_user_analytics_summary('user_id');
+DROP TRIGGER IF EXISTS trg_uas_withdrawals_delete ON withdrawal_requests;
+CREATE TRIGGER trg_uas_withdrawals_delete AFTER DELETE ON withdrawal_requests
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_refresh_user_analytics_summary('user_id');
+
+-- users: only INSERT (UPDATE fires on every activity ping - not worth it)
+DROP TRIGGER IF EXISTS trg_uas_users_insert ON users;
+CREATE TRIGGER trg_uas_users_insert AFTER INSERT ON users
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_refresh_user_analytics_summary('referrer_id');
+
+-- chat_history: high volume -> incremental counters instead of recompute
+CREATE OR REPLACE FUNCTION trg_user_analytics_chat_insert()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO user_analytics_summary AS s (user_id, total_chat_messages, last_chat_message_at)
+    SELECT user_id, COUNT(*), MAX("timestamp")
+    FROM new_rows
+    WHERE user_id IS NOT NULL
+    GROUP BY user_id
+    ON CONFLICT (user_id) DO UPDATE SET
+        total_chat_messages = s.total_chat_messages + EXCLUDED.total_chat_messages,
+        last_chat_message_at = GREATEST(s.last_chat_message_at, EXCLUDED.last_chat_message_at),
+        updated_at = NOW();
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION trg_user_analytics_chat_delete()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE user_analytics_summary s
+    SET total_chat_messages = GREATEST(0, s.total_chat_messages - d.cnt),
+        updated_at = NOW()
+    FROM (
+        SELECT user_id, COUNT(*) AS cnt FROM old_rows WHERE user_id IS NOT NULL GROUP BY user_id
+    ) d
+    WHERE s.user_id = d.user_id;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_uas_chat_insert ON chat_history;
+CREATE TRIGGER trg_uas_chat_insert AFTER INSERT ON chat_history
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_user_analytics_chat_insert();
+DROP TRIGGER IF EXISTS trg_uas_chat_delete ON chat_history;
+CREATE TRIGGER trg_uas_chat_delete AFTER DELETE ON chat_history
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_user_analytics_chat_delete();
+
+-- ============================================================
+-- 4. Drift reconciliation (batched, resumable by user id)
+-- ============================================================
+
+CREATE OR REPLACE FUNCTION reconcile_user_analytics_summary(
+    p_after_user_id UUID DEFAULT NULL,
+    p_batch_size INTEGER DEFAULT 1000
+)
+RETURNS TABLE(processed INTEGER, last_user_id UUID)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_ids UUID[];
+BEGIN
+    SELECT array_agg(id ORDER BY id) INTO v_ids
+    FROM (
+        SELECT id FROM users
+        WHERE p_after_user_id IS NULL OR id > p_after_user_id
+        ORDER BY id
+        LIMIT p_batch_size
+    ) batch;
+
+    IF v_ids IS NULL THEN
+        RETURN QUERY SELECT 0, NULL::UUID;
+        RETURN;
+    END IF;
+
+    PERFORM refresh_user_analytics_summary(v_ids);
+    RETURN QUERY SELECT cardinality(v_ids), v_ids[cardinality(v_ids)];
+END;
+$$;
+
+COMMENT ON FUNCTION reconcile_user_analytics_summary(UUID, INTEGER) IS
+'Recompute a batch of summary rows ordered by user id. Call repeatedly with the returned last_user_id until processed = 0.';
+
+-- ============================================================
+-- 5. Backfill
+-- ============================================================
+
+SELECT refresh_user_analytics_summary(ARRAY(SELECT id FROM users));
+
+-- ============================================================
+-- 6. users_extended_analytics: plain join (no aggregation)
+-- ============================================================
+
+DROP VIEW IF EXISTS users_extended_analytics;
+
+CREATE VIEW users_extended_analytics AS
+SELECT
+    u.id,
+    u.id AS user_id,
+    u.telegram_id,
+    u.username,
+    u.first_name,
+    u.language_code,
+    u.created_at,
+    u.created_at AS joined_at,
+    u.is_admin,
+    u.is_banned,
+    u.is_partner,
+    u.partner_mode,
+    u.balance,
+    u.balance_currency,
+    u.total_referral_earnings,
+    u.total_saved,
+    u.warnings_count,
+    u.do_not_disturb,
+    u.last_activity_at,
+    u.referral_program_unlocked,
+    u.turnover_usd,
+    u.total_purchases_amount,
+    s.total_orders,
+    s.total_orders AS orders_count,
+    s.delivered_orders,
+    s.pending_orders,
+    s.paid_orders,
+    s.refunded_orders,
+    s.refund_requests,
+    s.total_spent,
+    s.total_refunded,
+    s.total_tickets,
+    s.open_tickets,
+    s.approved_tickets,
+    s.rejected_tickets,
+    s.closed_tickets,
+    s.total_reviews,
+    s.avg_rating,
+    s.total_referrals,
+    s.active_referrals,
+    s.total_withdrawals,
+    s.pending_withdrawals,
+    s.total_withdrawn,
+    s.total_chat_messages,
+    s.last_chat_message_at
+FROM users u
+JOIN user_analytics_summary s ON s.user_id = u.id;
+
+COMMENT ON VIEW users_extended_analytics IS 'CRM user analytics: users joined with incrementally maintained user_analytics_summary (no per-query aggregation).';
+
+GRANT SELECT ON user_analytics_summary TO service_role;
+GRANT SELECT ON users_extended_analytics TO service_role;
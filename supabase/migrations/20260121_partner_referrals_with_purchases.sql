@@ -0,0 +1,48 @@
+-- ============================================================
+-- Migration: Referrals with purchases in one round-trip
+-- ============================================================
+-- The partner dashboard loaded up to 50 direct referrals and then ran one
+-- orders query per referral (N+1). Purchase counts and spend are already
+-- maintained per user in user_analytics_summary (20260120), so a single
+-- join returns everything.
+-- ============================================================
+
+CREATE INDEX IF NOT EXISTS idx_users_referrer_created
+    ON users(referrer_id, created_at DESC)
+    WHERE referrer_id IS NOT NULL;
+
+CREATE OR REPLACE FUNCTION get_referrals_with_purchases(
+    p_referrer_id UUID,
+    p_limit INTEGER DEFAULT 50
+)
+RETURNS TABLE(
+    user_id UUID,
+    telegram_id BIGINT,
+    username TEXT,
+    first_name TEXT,
+    created_at TIMESTAMPTZ,
+    orders_count INTEGER,
+    total_spent NUMERIC
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        u.id,
+        u.telegram_id::BIGINT,
+        u.username::TEXT,
+        u.first_name::TEXT,
+        u.created_at,
+        COALESCE(s.delivered_orders, 0),
+        COALESCE(s.total_spent, 0)
+    FROM users u
+    LEFT JOIN user_analytics_summary s ON s.user_id = u.id
+    WHERE u.referrer_id = p_referrer_id
+    ORDER BY u.created_at DESC
+    LIMIT p_limit;
+$$;
+
+COMMENT ON FUNCTION get_referrals_with_purchases(UUID, INTEGER) IS
+'Direct referrals (newest first) with delivered order count and spend from user_analytics_summary.';
+
+GRANT EXECUTE ON FUNCTION get_referrals_with_purchases(UUID, INTEGER) TO service_role;
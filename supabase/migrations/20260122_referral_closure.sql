@@ -0,0 +1,188 @@
+-- ============================================================
+-- Migration: Referral closure table
+-- ============================================================
+-- Level 2/3 referrals were resolved by walking users.referrer_id level by
+-- level (up to 3 sequential queries with growing IN lists), and the bonus
+-- chain was walked one query per level.
+--
+-- referral_closure stores every (ancestor, descendant, depth) pair up to
+-- depth 3 (the referral program has 3 levels), maintained by a trigger on
+-- users. Both directions become single indexed lookups:
+-- - descendants of X at depth N, newest first, paginated
+-- - ancestors of X up to depth 3
+-- ============================================================
+
+-- ============================================================
+-- 1. Table
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS referral_closure (
+    ancestor_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    descendant_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    depth SMALLINT NOT NULL CHECK (depth BETWEEN 1 AND 3),
+    -- Denormalized users.created_at of the descendant (page ordering)
+    descendant_created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (ancestor_id, depth, descendant_id)
+);
+
+-- "Descendants at depth N, newest first"
+CREATE INDEX IF NOT EXISTS idx_referral_closure_descendants
+    ON referral_closure(ancestor_id, depth, descendant_created_at DESC, descendant_id);
+
+-- "Ancestors of X"
+CREATE INDEX IF NOT EXISTS idx_referral_closure_ancestors
+    ON referral_closure(descendant_id, depth);
+
+COMMENT ON TABLE referral_closure IS 'Referral ancestry up to depth 3 (closure table), maintained by trg_referral_closure on users.';
+
+-- ============================================================
+-- 2. Maintenance
+-- ============================================================
+-- Rebuild ancestry rows for a user and everything below it that can see
+-- the user's ancestors within 3 levels (its depth 1-2 descendants).
+
+CREATE OR REPLACE FUNCTION rebuild_referral_closure(p_user_id UUID)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_subtree UUID[];
+BEGIN
+    SELECT ARRAY[p_user_id] || COALESCE(array_agg(descendant_id), '{}')
+    INTO v_subtree
+    FROM referral_closure
+    WHERE ancestor_id = p_user_id AND depth <= 2;
+
+    DELETE FROM referral_closure WHERE descendant_id = ANY(v_subtree);
+
+    INSERT INTO referral_closure (ancestor_id, descendant_id, depth, descendant_created_at)
+    WITH RECURSIVE chain(descendant_id, ancestor_id, depth) AS (
+        SELECT u.id, u.referrer_id, 1
+        FROM users u
+        WHERE u.id = ANY(v_subtree) AND u.referrer_id IS NOT NULL
+        UNION ALL
+        SELECT c.descendant_id, u.referrer_id, c.depth + 1
+        FROM chain c
+        JOIN users u ON u.id = c.ancestor_id
+        WHERE c.depth < 3
+          AND u.referrer_id IS NOT NULL
+          AND u.referrer_id <> c.descendant_id  -- loop guard
+    )
+    SELECT c.ancestor_id, c.descendant_id, c.depth, COALESCE(d.created_at, NOW())
+    FROM chain c
+    JOIN users d ON d.id = c.descendant_id
+    WHERE c.ancestor_id <> c.descendant_id
+    ON CONFLICT (ancestor_id, depth, descendant_id) DO NOTHING;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION trg_referral_closure()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'INSERT' AND NEW.referrer_id IS NULL THEN
+        RETURN NULL;
+    END IF;
+    PERFORM rebuild_referral_closure(NEW.id);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_referral_closure_insert ON users;
+CREATE TRIGGER trg_referral_closure_insert
+    AFTER INSERT ON users
+    FOR EACH ROW EXECUTE FUNCTION trg_referral_closure();
+
+DROP TRIGGER IF EXISTS trg_referral_closure_update ON users;
+CREATE TRIGGER trg_referral_closure_update
+    AFTER UPDATE OF referrer_id ON users
+    FOR EACH ROW
+    WHEN (OLD.referrer_id IS DISTINCT FROM NEW.referrer_id)
+    EXECUTE FUNCTION trg_referral_closure();
+
+-- ============================================================
+-- 3. Backfill
+-- ============================================================
+
+INSERT INTO referral_closure (ancestor_id, descendant_id, depth, descendant_created_at)
+WITH RECURSIVE chain(descendant_id, ancestor_id, depth) AS (
+    SELECT id, referrer_id, 1 FROM users WHERE referrer_id IS NOT NULL
+    UNION ALL
+    SELECT c.descendant_id, u.referrer_id, c.depth + 1
+    FROM chain c
+    JOIN users u ON u.id = c.ancestor_id
+    WHERE c.depth < 3
+      AND u.referrer_id IS NOT NULL
+      AND u.referrer_id <> c.descendant_id
+)
+SELECT c.ancestor_id, c.descendant_id, c.depth, COALESCE(d.created_at, NOW())
+FROM chain c
+JOIN users d ON d.id = c.descendant_id
+WHERE c.ancestor_id <> c.descendant_id
+ON CONFLICT (ancestor_id, depth, descendant_id) DO NOTHING;
+
+-- ============================================================
+-- 4. Lookup API
+-- ============================================================
+
+CREATE OR REPLACE FUNCTION get_referral_descendants(
+    p_user_id UUID,
+    p_depth INTEGER,
+    p_limit INTEGER DEFAULT 50,
+    p_offset INTEGER DEFAULT 0
+)
+RETURNS TABLE(
+    id UUID,
+    telegram_id BIGINT,
+    username TEXT,
+    first_name TEXT,
+    created_at TIMESTAMPTZ,
+    referral_program_unlocked BOOLEAN,
+    referrer_id UUID,
+    photo_url TEXT
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        u.id,
+        u.telegram_id::BIGINT,
+        u.username::TEXT,
+        u.first_name::TEXT,
+        u.created_at,
+        u.referral_program_unlocked,
+        u.referrer_id,
+        u.photo_url::TEXT
+    FROM referral_closure rc
+    JOIN users u ON u.id = rc.descendant_id
+    WHERE rc.ancestor_id = p_user_id
+      AND rc.depth = p_depth
+    ORDER BY rc.descendant_created_at DESC, rc.descendant_id
+    LIMIT p_limit OFFSET p_offset;
+$$;
+
+COMMENT ON FUNCTION get_referral_descendants(UUID, INTEGER, INTEGER, INTEGER) IS
+'Referrals of a user at exactly depth N (1-3), newest first, paginated.';
+
+CREATE OR REPLACE FUNCTION get_referral_ancestors(
+    p_user_id UUID,
+    p_max_depth INTEGER DEFAULT 3
+)
+RETURNS TABLE(ancestor_id UUID, depth SMALLINT)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT rc.ancestor_id, rc.depth
+    FROM referral_closure rc
+    WHERE rc.descendant_id = p_user_id
+      AND rc.depth <= p_max_depth
+    ORDER BY rc.depth;
+$$;
+
+COMMENT ON FUNCTION get_referral_ancestors(UUID, INTEGER) IS
+'Referrer chain of a user (depth 1 = direct referrer), up to p_max_depth levels.';
+
+GRANT SELECT ON referral_closure TO service_role;
+GRANT EXECUTE ON FUNCTION get_referral_descendants(UUID, INTEGER, INTEGER, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION get_referral_ancestors(UUID, INTEGER) TO service_role;
@@ -0,0 +1,84 @@
+-- ============================================================
+-- Migration: Idempotency ledger (DB fallback)
+-- ============================================================
+-- Workers and crons claim (worker, key) before doing work and store the
+-- final outcome for duplicates (see core/idempotency.py). Redis is the
+-- primary store; this table is used when Redis is unavailable.
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS idempotency_ledger (
+    worker TEXT NOT NULL,
+    key TEXT NOT NULL,
+    status TEXT NOT NULL CHECK (status IN ('running', 'done')),
+    token TEXT NOT NULL,
+    result JSONB,
+    expires_at TIMESTAMPTZ NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (worker, key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_ledger_expires ON idempotency_ledger(expires_at);
+
+COMMENT ON TABLE idempotency_ledger IS 'Worker idempotency claims/results (fallback for Redis idem:* keys). Expired rows are reclaimable.';
+
+-- ============================================================
+-- Claim: insert, or take over an expired row. Returns
+--   status = 'acquired' | 'running' | 'done' (+ cached result)
+-- ============================================================
+
+CREATE OR REPLACE FUNCTION claim_idempotency_key(
+    p_worker TEXT,
+    p_key TEXT,
+    p_token TEXT,
+    p_lease_secs INTEGER DEFAULT 120
+)
+RETURNS TABLE(status TEXT, result JSONB)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+DECLARE
+    v_row idempotency_ledger%ROWTYPE;
+BEGIN
+    INSERT INTO idempotency_ledger AS l (worker, key, status, token, expires_at)
+    VALUES (p_worker, p_key, 'running', p_token, NOW() + make_interval(secs => p_lease_secs))
+    ON CONFLICT (worker, key) DO UPDATE
+        SET status = 'running',
+            token = EXCLUDED.token,
+            result = NULL,
+            expires_at = EXCLUDED.expires_at,
+            updated_at = NOW()
+        WHERE l.expires_at < NOW()
+    RETURNING l.* INTO v_row;
+
+    IF FOUND THEN
+        RETURN QUERY SELECT 'acquired'::TEXT, NULL::JSONB;
+        RETURN;
+    END IF;
+
+    SELECT * INTO v_row FROM idempotency_ledger l WHERE l.worker = p_worker AND l.key = p_key;
+    RETURN QUERY SELECT v_row.status, v_row.result;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION complete_idempotency_key(
+    p_worker TEXT,
+    p_key TEXT,
+    p_token TEXT,
+    p_result JSONB,
+    p_ttl_secs INTEGER DEFAULT 86400
+)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    UPDATE idempotency_ledger
+    SET status = 'done',
+        result = p_result,
+        expires_at = NOW() + make_interval(secs => p_ttl_secs),
+        updated_at = NOW()
+    WHERE worker = p_worker AND key = p_key AND token = p_token;
+$$;
+
+GRANT ALL ON idempotency_ledger TO service_role;
+GRANT EXECUTE ON FUNCTION claim_idempotency_key(TEXT, TEXT, TEXT, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION complete_idempotency_key(TEXT, TEXT, TEXT, JSONB, INTEGER) TO service_role;
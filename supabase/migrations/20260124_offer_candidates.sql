@@ -0,0 +1,104 @@
+-- ============================================================
+-- Migration: Offer candidates (single aggregate query)
+-- ============================================================
+-- The discount offers cron found loyal customers by loading every discount
+-- user's delivered orders one user at a time, and checked the promo history
+-- of every inactive user one query at a time.
+--
+-- find_offer_candidates returns both cohorts in one call:
+-- - loyal: the N-th delivered discount order falls inside the delay window
+--   and the user has no active loyal promo yet
+-- - inactive: no activity since the cutoff and no promo for this trigger
+--   created within the cooldown
+-- ============================================================
+
+-- "Promo of trigger X for user Y" (candidate exclusion)
+CREATE INDEX IF NOT EXISTS idx_promo_codes_target_trigger
+    ON promo_codes(target_user_id, source_trigger, created_at DESC)
+    WHERE target_user_id IS NOT NULL;
+
+-- "Delivered discount orders of user Y in delivery order"
+CREATE INDEX IF NOT EXISTS idx_orders_discount_delivered
+    ON orders(user_id, delivered_at)
+    WHERE source_channel = 'discount' AND status = 'delivered';
+
+CREATE OR REPLACE FUNCTION find_offer_candidates(
+    p_min_orders INTEGER,
+    p_loyal_from TIMESTAMPTZ,
+    p_loyal_to TIMESTAMPTZ,
+    p_inactive_before TIMESTAMPTZ,
+    p_cooldown_days INTEGER DEFAULT 30,
+    p_limit INTEGER DEFAULT 50
+)
+RETURNS TABLE(
+    trigger TEXT,
+    user_id UUID,
+    telegram_id BIGINT,
+    language_code TEXT,
+    order_count INTEGER,
+    last_order_date TIMESTAMPTZ
+)
+LANGUAGE sql
+STABLE
+AS $$
+    (
+        WITH ranked AS (
+            SELECT
+                o.user_id,
+                o.delivered_at,
+                ROW_NUMBER() OVER (PARTITION BY o.user_id ORDER BY o.delivered_at) AS rn,
+                COUNT(*) OVER (PARTITION BY o.user_id) AS total
+            FROM orders o
+            JOIN users u ON u.id = o.user_id
+            WHERE u.discount_tier_source = TRUE
+              AND o.source_channel = 'discount'
+              AND o.status = 'delivered'
+        )
+        SELECT
+            'loyal_3_purchases'::TEXT,
+            u.id,
+            u.telegram_id::BIGINT,
+            COALESCE(u.language_code, 'en')::TEXT,
+            r.total::INTEGER,
+            r.delivered_at
+        FROM ranked r
+        JOIN users u ON u.id = r.user_id
+        WHERE r.rn = p_min_orders
+          AND r.delivered_at BETWEEN p_loyal_from AND p_loyal_to
+          AND NOT EXISTS (
+              SELECT 1 FROM promo_codes p
+              WHERE p.target_user_id = u.id
+                AND p.source_trigger = 'loyal_3_purchases'
+                AND p.is_active = TRUE
+          )
+        ORDER BY r.delivered_at
+        LIMIT p_limit
+    )
+    UNION ALL
+    (
+        SELECT
+            'inactive_7_days'::TEXT,
+            u.id,
+            u.telegram_id::BIGINT,
+            COALESCE(u.language_code, 'en')::TEXT,
+            0,
+            NULL::TIMESTAMPTZ
+        FROM users u
+        WHERE u.discount_tier_source = TRUE
+          AND u.last_activity_at < p_inactive_before
+          AND NOT EXISTS (
+              SELECT 1 FROM promo_codes p
+              WHERE p.target_user_id = u.id
+                AND p.source_trigger = 'inactive_7_days'
+                AND p.is_active = TRUE
+                AND p.created_at > NOW() - make_interval(days => p_cooldown_days)
+          )
+        ORDER BY u.last_activity_at
+        LIMIT p_limit
+    );
+$$;
+
+COMMENT ON FUNCTION find_offer_candidates(INTEGER, TIMESTAMPTZ, TIMESTAMPTZ, TIMESTAMPTZ, INTEGER, INTEGER) IS
+'Loyal (N-th delivered discount order in window, no loyal promo) and inactive (no activity since cutoff, no recent comeback promo) offer candidates, up to p_limit each.';
+
+GRANT EXECUTE ON FUNCTION find_offer_candidates(INTEGER, TIMESTAMPTZ, TIMESTAMPTZ, TIMESTAMPTZ, INTEGER, INTEGER) TO service_role;
@@ -0,0 +1,239 @@
+-- ============================================================
+-- Migration: Single-transaction payment confirmation + outbox
+-- ============================================================
+-- OrderStatusService.mark_payment_confirmed ran 10+ sequential queries on
+-- the payment webhook path (read order, stock check, payment_id, status,
+-- items, balance, purchase transaction, deadline, expenses, ...), and a
+-- failure halfway left the order partially confirmed.
+--
+-- confirm_order_payment does all state changes in one transaction and
+-- records the side effects (user notification, admin alert, order
+-- expenses, realtime events) as outbox_events rows in the same
+-- transaction. core/orders/outbox.py drains them asynchronously.
+-- ============================================================
+
+-- ============================================================
+-- 1. Outbox
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS outbox_events (
+    id BIGSERIAL PRIMARY KEY,
+    topic TEXT NOT NULL,
+    aggregate_id TEXT,
+    payload JSONB NOT NULL DEFAULT '{}'::JSONB,
+    status TEXT NOT NULL DEFAULT 'pending'
+        CHECK (status IN ('pending', 'processing', 'done', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    locked_until TIMESTAMPTZ,
+    last_error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    processed_at TIMESTAMPTZ
+);
+
+-- Drainer scan: only unfinished rows are indexed
+CREATE INDEX IF NOT EXISTS idx_outbox_events_ready
+    ON outbox_events(available_at, id)
+    WHERE status IN ('pending', 'processing');
+
+CREATE INDEX IF NOT EXISTS idx_outbox_events_processed
+    ON outbox_events(processed_at)
+    WHERE status = 'done';
+
+COMMENT ON TABLE outbox_events IS 'Transactional outbox: side effects recorded with the state change, executed by core/orders/outbox.py.';
+
+-- Claim a batch (pending and due, or processing with an expired lease)
+CREATE OR REPLACE FUNCTION claim_outbox_events(
+    p_limit INTEGER DEFAULT 100,
+    p_lease_secs INTEGER DEFAULT 60
+)
+RETURNS SETOF outbox_events
+LANGUAGE sql
+AS $$
+    UPDATE outbox_events e
+    SET status = 'processing',
+        attempts = e.attempts + 1,
+        locked_until = NOW() + make_interval(secs => p_lease_secs)
+    WHERE e.id IN (
+        SELECT id
+        FROM outbox_events
+        WHERE (status = 'pending' AND available_at <= NOW())
+           OR (status = 'processing' AND locked_until < NOW())
+        ORDER BY id
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING e.*;
+$$;
+
+-- ============================================================
+-- 2. Payment confirmation
+-- ============================================================
+-- Returns the order's status after the call and whether this call changed
+-- it (FALSE for duplicates: already paid/prepaid/delivered/partial).
+
+-- Return type gained user_id (buyer's cached orders list is dropped right away)
+DROP FUNCTION IF EXISTS confirm_order_payment(UUID, TEXT, BOOLEAN);
+
+CREATE OR REPLACE FUNCTION confirm_order_payment(
+    p_order_id UUID,
+    p_payment_id TEXT DEFAULT NULL,
+    p_check_stock BOOLEAN DEFAULT TRUE
+)
+RETURNS TABLE(status TEXT, changed BOOLEAN, user_id UUID)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+DECLARE
+    v_order orders%ROWTYPE;
+    v_status TEXT;
+    v_final TEXT;
+    v_balance NUMERIC;
+    v_item_count INTEGER;
+    v_preorder_count INTEGER;
+    v_username TEXT;
+    v_products JSONB;
+    v_quantity INTEGER;
+BEGIN
+    SELECT * INTO v_order FROM orders o WHERE o.id = p_order_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Order % not found', p_order_id USING ERRCODE = 'no_data_found';
+    END IF;
+
+    v_status := LOWER(COALESCE(v_order.status, ''));
+    IF v_status IN ('paid', 'prepaid', 'delivered', 'partial') THEN
+        RETURN QUERY SELECT v_status, FALSE, v_order.user_id;
+        RETURN;
+    END IF;
+
+    -- Paid if at least one ordered product has available stock
+    IF p_check_stock AND EXISTS (
+        SELECT 1
+        FROM order_items oi
+        JOIN stock_items si ON si.product_id = oi.product_id AND si.status = 'available'
+        WHERE oi.order_id = p_order_id
+    ) THEN
+        v_final := 'paid';
+    ELSE
+        v_final := 'prepaid';
+    END IF;
+
+    UPDATE orders o
+    SET status = v_final,
+        payment_id = COALESCE(p_payment_id, o.payment_id),
+        updated_at = NOW()
+    WHERE o.id = p_order_id;
+
+    -- Purchase record for external payments only: balance payments get theirs from
+    -- add_to_user_balance, orders without a payment method are not external payments
+    IF v_order.payment_method IS NOT NULL
+       AND v_order.payment_method <> ''
+       AND LOWER(v_order.payment_method) <> 'balance'
+       AND v_order.user_id IS NOT NULL
+       AND COALESCE(v_order.amount, 0) <> 0
+       AND NOT EXISTS (
+           SELECT 1 FROM balance_transactions bt
+           WHERE bt.user_id = v_order.user_id
+             AND bt.type = 'purchase'
+             AND bt.description = 'Purchase: Order ' || p_order_id::TEXT
+       )
+    THEN
+        SELECT COALESCE(u.balance, 0) INTO v_balance FROM users u WHERE u.id = v_order.user_id;
+        INSERT INTO balance_transactions (
+            user_id, type, amount, currency, balance_before, balance_after,
+            status, description, metadata
+        ) VALUES (
+            v_order.user_id,
+            'purchase',
+            COALESCE(v_order.fiat_amount, v_order.amount),
+            CASE WHEN v_order.fiat_amount IS NOT NULL AND v_order.fiat_currency IS NOT NULL
+                 THEN v_order.fiat_currency ELSE 'USD' END,
+            COALESCE(v_balance, 0),
+            COALESCE(v_balance, 0),
+            'completed',
+            'Purchase: Order ' || p_order_id::TEXT,
+            jsonb_build_object(
+                'order_id', p_order_id::TEXT,
+                'payment_method', v_order.payment_method,
+                'payment_id', p_payment_id
+            )
+        );
+    END IF;
+
+    SELECT
+        COUNT(*),
+        COUNT(*) FILTER (WHERE oi.fulfillment_type = 'preorder'),
+        COALESCE(SUM(oi.quantity), 0)
+    INTO v_item_count, v_preorder_count, v_quantity
+    FROM order_items oi
+    WHERE oi.order_id = p_order_id;
+
+    IF v_preorder_count > 0 THEN
+        PERFORM set_fulfillment_deadline_for_prepaid_order(p_order_id, 24);
+    END IF;
+
+    -- Data the side effects need, so the drainer does not re-read it
+    SELECT u.username INTO v_username FROM users u WHERE u.id = v_order.user_id;
+    SELECT COALESCE(jsonb_agg(n.name), '[]'::JSONB) INTO v_products
+    FROM (
+        SELECT p.name
+        FROM order_items oi
+        JOIN products p ON p.id = oi.product_id
+        WHERE oi.order_id = p_order_id
+        LIMIT 3
+    ) n;
+
+    INSERT INTO outbox_events (topic, aggregate_id, payload) VALUES
+    (
+        'payment.user_notification',
+        p_order_id::TEXT,
+        jsonb_build_object(
+            'order_id', p_order_id::TEXT,
+            'telegram_id', v_order.user_telegram_id,
+            'amount', COALESCE(NULLIF(v_order.fiat_amount, 0), v_order.amount),
+            'currency', COALESCE(v_order.fiat_currency, 'RUB'),
+            'status', v_final,
+            'has_instant', v_item_count > v_preorder_count,
+            'preorder_count', v_preorder_count
+        )
+    ),
+    (
+        'payment.admin_alert',
+        p_order_id::TEXT,
+        jsonb_build_object(
+            'order_id', p_order_id::TEXT,
+            'amount', v_order.amount,
+            'fiat_amount', v_order.fiat_amount,
+            'currency', COALESCE(v_order.fiat_currency, 'RUB'),
+            'telegram_id', v_order.user_telegram_id,
+            'username', v_username,
+            'products', v_products,
+            'quantity', v_quantity
+        )
+    ),
+    (
+        'order.expenses',
+        p_order_id::TEXT,
+        jsonb_build_object('order_id', p_order_id::TEXT)
+    ),
+    (
+        'realtime.order_status',
+        p_order_id::TEXT,
+        jsonb_build_object(
+            'order_id', p_order_id::TEXT,
+            'user_id', v_order.user_id::TEXT,
+            'status', v_final
+        )
+    );
+
+    RETURN QUERY SELECT v_final, TRUE, v_order.user_id;
+END;
+$$;
+
+COMMENT ON FUNCTION confirm_order_payment(UUID, TEXT, BOOLEAN) IS
+'Confirm payment in one transaction: final status from stock, payment_id, purchase transaction, fulfillment deadline, outbox rows for side effects. Idempotent.';
+
+GRANT ALL ON outbox_events TO service_role;
+GRANT USAGE, SELECT ON SEQUENCE outbox_events_id_seq TO service_role;
+GRANT EXECUTE ON FUNCTION claim_outbox_events(INTEGER, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION confirm_order_payment(UUID, TEXT, BOOLEAN) TO service_role;
@@ -0,0 +1,85 @@
+-- ============================================================
+-- Migration: Set-based expiry of pending orders
+-- ============================================================
+-- The expire crons loaded expired/stale pending orders and cancelled them
+-- one by one (stock_items release + orders update per order). After a
+-- payment gateway outage thousands of orders pile up and the 5-minute cron
+-- cannot catch up.
+--
+-- expire_pending_orders cancels a batch of due orders and releases their
+-- reserved stock in one statement (data-modifying CTEs), returning the
+-- affected rows so the caller can emit realtime events in a batch.
+--
+-- Due orders:
+-- - expired: expires_at is set and has passed
+-- - stale:   no expires_at and created more than p_stale_minutes ago
+-- ============================================================
+
+-- Only pending orders are scanned by the cron
+CREATE INDEX IF NOT EXISTS idx_orders_pending_expires_at
+    ON orders(expires_at)
+    WHERE status = 'pending' AND expires_at IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_orders_pending_stale
+    ON orders(created_at)
+    WHERE status = 'pending' AND expires_at IS NULL;
+
+CREATE OR REPLACE FUNCTION expire_pending_orders(
+    p_now TIMESTAMPTZ DEFAULT NOW(),
+    p_stale_minutes INTEGER DEFAULT 15,
+    p_limit INTEGER DEFAULT 5000
+)
+RETURNS TABLE(
+    order_id UUID,
+    user_id UUID,
+    reason TEXT,
+    stock_released BOOLEAN
+)
+LANGUAGE sql
+AS $$
+    WITH due AS (
+        SELECT
+            o.id,
+            CASE WHEN o.expires_at IS NOT NULL THEN 'expired' ELSE 'stale' END AS reason
+        FROM orders o
+        WHERE o.status = 'pending'
+          AND (
+              (o.expires_at IS NOT NULL AND o.expires_at < p_now)
+              OR (o.expires_at IS NULL
+                  AND o.created_at < p_now - make_interval(mins => p_stale_minutes))
+          )
+        ORDER BY o.created_at
+        LIMIT p_limit
+        -- Concurrent runs (cron + fallback) split the backlog instead of blocking
+        FOR UPDATE SKIP LOCKED
+    ),
+    cancelled AS (
+        UPDATE orders o
+        SET status = 'cancelled',
+            updated_at = p_now
+        FROM due
+        WHERE o.id = due.id
+          AND o.status = 'pending'
+        RETURNING o.id, o.user_id, o.stock_item_id, due.reason
+    ),
+    released AS (
+        UPDATE stock_items si
+        SET status = 'available',
+            reserved_at = NULL
+        FROM cancelled c
+        WHERE si.id = c.stock_item_id
+          AND si.status = 'reserved'
+        RETURNING si.id
+    )
+    SELECT
+        c.id,
+        c.user_id,
+        c.reason,
+        EXISTS (SELECT 1 FROM released r WHERE r.id = c.stock_item_id)
+    FROM cancelled c;
+$$;
+
+COMMENT ON FUNCTION expire_pending_orders(TIMESTAMPTZ, INTEGER, INTEGER) IS
+'Cancel up to p_limit expired/stale pending orders and release their reserved stock in one statement. Returns the cancelled orders.';
+
+GRANT EXECUTE ON FUNCTION expire_pending_orders(TIMESTAMPTZ, INTEGER, INTEGER) TO service_role;
@@ -0,0 +1,14 @@
+-- ============================================================
+-- Migration: Keyset pagination index for the WebApp orders list
+-- ============================================================
+-- GET /api/webapp/orders pages a user's orders newest first with a
+-- (created_at, id) cursor instead of OFFSET. This index serves both the
+-- first page and every "created_at < x OR (created_at = x AND id < y)"
+-- continuation without sorting.
+-- ============================================================
+
+CREATE INDEX IF NOT EXISTS idx_orders_user_created_id
+    ON orders(user_id, created_at DESC, id DESC);
+
+-- Embedded reviews(product_id) per order use the existing
+-- UNIQUE(order_id, product_id) index on reviews.
@@ -0,0 +1,102 @@
+-- ============================================================
+-- Migration: Catalog version for HTTP caching
+-- ============================================================
+-- GET /webapp/products and /webapp/products/{id} send a strong ETag
+-- derived from this version (core/services/catalog_version.py), so
+-- conditional requests are answered with 304 and the edge can cache the
+-- public catalog.
+--
+-- The version has two parts:
+-- - a counter row bumped by deferred (commit-time) triggers on every
+--   table the catalog responses are built from. The new value becomes
+--   visible together with the data it describes, so a response built
+--   from pre-commit data can never carry the post-commit version.
+--   Deferred triggers run once per transaction (see the flag below), so
+--   hot writers (stock reservation, order status) hold the counter row
+--   lock only between their last trigger and COMMIT;
+-- - the latest expires_at of available stock that has already passed:
+--   stock_count drops when stock expires, without any write.
+-- ============================================================
+
+DROP TRIGGER IF EXISTS trg_products_catalog_version ON products;
+DROP TRIGGER IF EXISTS trg_stock_items_catalog_version ON stock_items;
+DROP TRIGGER IF EXISTS trg_reviews_catalog_version ON reviews;
+DROP TRIGGER IF EXISTS trg_orders_catalog_version ON orders;
+DROP FUNCTION IF EXISTS get_catalog_version();
+DROP SEQUENCE IF EXISTS catalog_version_seq;
+
+CREATE TABLE IF NOT EXISTS catalog_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),  -- Single row
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO catalog_version DEFAULT VALUES ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_catalog_version()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- Constraint triggers are row-level: bump once per transaction
+    IF current_setting('app.catalog_version_bumped', TRUE) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    PERFORM set_config('app.catalog_version_bumped', 'on', TRUE);
+
+    UPDATE catalog_version SET version = version + 1;
+    RETURN NULL;
+END;
+$$;
+
+-- Products: name, prices, status, media
+CREATE CONSTRAINT TRIGGER trg_products_catalog_version
+    AFTER INSERT OR UPDATE OR DELETE ON products
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION bump_catalog_version();
+
+-- Stock: stock_count / max_discount_percent in products_with_stock_summary
+CREATE CONSTRAINT TRIGGER trg_stock_items_catalog_version
+    AFTER INSERT OR UPDATE OR DELETE ON stock_items
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION bump_catalog_version();
+
+-- Reviews: rating / reviews_count / recent_reviews
+CREATE CONSTRAINT TRIGGER trg_reviews_catalog_version
+    AFTER INSERT OR UPDATE OR DELETE ON reviews
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION bump_catalog_version();
+
+-- Orders: sales_count in product_social_proof depends on order status only
+CREATE CONSTRAINT TRIGGER trg_orders_catalog_version
+    AFTER UPDATE OF status ON orders
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW
+    WHEN (OLD.status IS DISTINCT FROM NEW.status)
+    EXECUTE FUNCTION bump_catalog_version();
+
+-- Latest passed expiry of available stock (backward scan from NOW())
+CREATE INDEX IF NOT EXISTS idx_stock_items_available_expires_at
+    ON stock_items(expires_at)
+    WHERE status = 'available' AND expires_at IS NOT NULL;
+
+CREATE OR REPLACE FUNCTION get_catalog_version()
+RETURNS TEXT
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT v.version || '-' || COALESCE(
+        (
+            SELECT floor(extract(epoch FROM MAX(si.expires_at)))::BIGINT
+            FROM stock_items si
+            WHERE si.status = 'available'
+              AND si.expires_at IS NOT NULL
+              AND si.expires_at <= NOW()
+        ),
+        0
+    )
+    FROM catalog_version v;
+$$;
+
+GRANT EXECUTE ON FUNCTION get_catalog_version() TO service_role;
+
+COMMENT ON FUNCTION get_catalog_version() IS 'Current catalog version (ETag source for public catalog endpoints): commit-time counter + latest passed stock expiry.';
@@ -0,0 +1,107 @@
+-- ============================================================
+-- Migration: Indexed product search (full-text + trigram)
+-- ============================================================
+-- ProductRepository.search filtered products_with_stock_summary with
+-- name/description ILIKE '%q%' (sequential scan + full stock aggregate),
+-- and the waitlist lookups used the same pattern on product_name.
+--
+-- search_products ranks matches from three indexed predicates:
+-- - full-text (russian + english stemming) on name (A) and description (B)
+-- - trigram word similarity on name (typo tolerance: "chatgtp", "мидджорни")
+-- - substring on name (partial words while typing)
+-- ============================================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- ============================================================
+-- 1. Products
+-- ============================================================
+
+ALTER TABLE products
+    ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', COALESCE(name, '')), 'A')
+        || setweight(to_tsvector('english', COALESCE(name, '')), 'A')
+        || setweight(to_tsvector('russian', COALESCE(description, '')), 'B')
+        || setweight(to_tsvector('english', COALESCE(description, '')), 'B')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_products_search_vector
+    ON products USING gin (search_vector);
+
+-- Trigram index serves both ILIKE '%q%' and the word-similarity operator
+CREATE INDEX IF NOT EXISTS idx_products_name_trgm
+    ON products USING gin (name gin_trgm_ops);
+
+-- ============================================================
+-- 2. Waitlist (ILIKE '%name%' in add_to_waitlist / waitlist notifications)
+-- ============================================================
+
+CREATE INDEX IF NOT EXISTS idx_waitlist_product_name_trgm
+    ON waitlist USING gin (product_name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_waitlist_user_id
+    ON waitlist(user_id);
+
+-- ============================================================
+-- 3. Search RPC
+-- ============================================================
+
+CREATE OR REPLACE FUNCTION search_products(
+    p_query TEXT,
+    p_limit INTEGER DEFAULT 20,
+    p_status TEXT DEFAULT 'active'
+)
+RETURNS SETOF products_with_stock_summary
+LANGUAGE plpgsql
+STABLE
+-- Default 0.6 rejects most one-letter typos in short product names
+SET pg_trgm.word_similarity_threshold = 0.4
+AS $$
+DECLARE
+    v_raw TEXT := btrim(COALESCE(p_query, ''));
+    v_like TEXT;
+    v_ts TSQUERY;
+    v_ids UUID[];
+BEGIN
+    IF v_raw = '' THEN
+        RETURN;
+    END IF;
+
+    v_like := '%' || replace(replace(replace(v_raw, '\', '\\'), '%', '\%'), '_', '\_') || '%';
+    v_ts := websearch_to_tsquery('russian', v_raw) || websearch_to_tsquery('english', v_raw);
+
+    SELECT array_agg(m.id ORDER BY m.rank DESC, m.name)
+    INTO v_ids
+    FROM (
+        SELECT
+            p.id,
+            p.name,
+            ts_rank_cd(p.search_vector, v_ts) + word_similarity(v_raw, p.name) AS rank
+        FROM products p
+        WHERE p.status = p_status
+          AND (
+              p.search_vector @@ v_ts
+              OR v_raw <% p.name
+              OR p.name ILIKE v_like
+          )
+        ORDER BY rank DESC, p.name
+        LIMIT p_limit
+    ) m;
+
+    IF v_ids IS NULL THEN
+        RETURN;
+    END IF;
+
+    -- Constant id list: the filter is pushed into the view's per-product aggregate
+    RETURN QUERY
+    SELECT v.*
+    FROM products_with_stock_summary v
+    WHERE v.id = ANY (v_ids)
+    ORDER BY array_position(v_ids, v.id);
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION search_products(TEXT, INTEGER, TEXT) TO service_role;
+
+COMMENT ON FUNCTION search_products(TEXT, INTEGER, TEXT) IS 'Ranked product search: ru/en full-text, trigram typo tolerance and substring on name.';
@@ -0,0 +1,328 @@
+-- ============================================================
+-- Migration: Precomputed product rating and sales counters
+-- ============================================================
+-- Catalog endpoints averaged every review row in Python on each request
+-- and product_social_proof re-aggregated all orders/reviews per query,
+-- so catalog latency grew with review and order volume.
+--
+-- product_stats keeps the counters per product, maintained incrementally
+-- by triggers:
+-- - reviews insert/delete/rating change -> rating_count, rating_sum
+-- - order status entering/leaving a sale status, deleted sale orders and
+--   items added to/removed from a sale order -> sales_count
+--   (same status set the old product_social_proof view counted)
+-- products_with_stock_summary exposes them (rating_count, rating_avg,
+-- sales_count), so catalog reads need no extra queries.
+-- reconcile_product_stats() recomputes everything from base tables
+-- (daily cron repairs drift from manual SQL or missed triggers).
+-- ============================================================
+
+-- ============================================================
+-- 1. Counters
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS product_stats (
+    product_id UUID PRIMARY KEY REFERENCES products(id) ON DELETE CASCADE,
+    rating_count INTEGER NOT NULL DEFAULT 0,
+    rating_sum INTEGER NOT NULL DEFAULT 0,
+    sales_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+COMMENT ON TABLE product_stats IS 'Per-product rating and sales counters, maintained by triggers on reviews and orders.';
+
+CREATE OR REPLACE FUNCTION is_sale_status(p_status TEXT)
+RETURNS BOOLEAN
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT p_status IN ('paid', 'delivered', 'completed', 'partial');
+$$;
+
+CREATE OR REPLACE FUNCTION bump_product_stats(
+    p_product_id UUID,
+    p_rating_count INTEGER,
+    p_rating_sum INTEGER,
+    p_sales_count INTEGER
+)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO product_stats (product_id, rating_count, rating_sum, sales_count)
+    VALUES (
+        p_product_id,
+        GREATEST(p_rating_count, 0),
+        GREATEST(p_rating_sum, 0),
+        GREATEST(p_sales_count, 0)
+    )
+    ON CONFLICT (product_id) DO UPDATE SET
+        rating_count = GREATEST(product_stats.rating_count + p_rating_count, 0),
+        rating_sum = GREATEST(product_stats.rating_sum + p_rating_sum, 0),
+        sales_count = GREATEST(product_stats.sales_count + p_sales_count, 0),
+        updated_at = NOW();
+$$;
+
+-- ============================================================
+-- 2. Triggers
+-- ============================================================
+
+CREATE OR REPLACE FUNCTION product_stats_on_review()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM bump_product_stats(OLD.product_id, -1, -OLD.rating, 0);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM bump_product_stats(NEW.product_id, 1, NEW.rating, 0);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_reviews_product_stats ON reviews;
+CREATE TRIGGER trg_reviews_product_stats
+    AFTER INSERT OR DELETE OR UPDATE OF rating, product_id ON reviews
+    FOR EACH ROW EXECUTE FUNCTION product_stats_on_review();
+
+CREATE OR REPLACE FUNCTION product_stats_on_order_status()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_delta INTEGER;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        -- BEFORE DELETE: the items are still there (FK cascade runs afterwards)
+        IF NOT is_sale_status(OLD.status) THEN
+            RETURN OLD;
+        END IF;
+        v_delta := -1;
+    ELSIF is_sale_status(OLD.status) = is_sale_status(NEW.status) THEN
+        RETURN NULL;
+    ELSE
+        v_delta := CASE WHEN is_sale_status(NEW.status) THEN 1 ELSE -1 END;
+    END IF;
+
+    -- One sale per order per product (the view counted DISTINCT orders)
+    PERFORM bump_product_stats(oi.product_id, 0, 0, v_delta)
+    FROM (
+        SELECT DISTINCT product_id
+        FROM order_items
+        WHERE order_id = CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END
+        ORDER BY product_id  -- Stable lock order across concurrent confirmations
+    ) oi;
+
+    IF TG_OP = 'DELETE' THEN
+        RETURN OLD;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_orders_product_stats ON orders;
+CREATE TRIGGER trg_orders_product_stats
+    AFTER UPDATE OF status ON orders
+    FOR EACH ROW
+    WHEN (OLD.status IS DISTINCT FROM NEW.status)
+    EXECUTE FUNCTION product_stats_on_order_status();
+
+DROP TRIGGER IF EXISTS trg_orders_product_stats_delete ON orders;
+CREATE TRIGGER trg_orders_product_stats_delete
+    BEFORE DELETE ON orders
+    FOR EACH ROW
+    EXECUTE FUNCTION product_stats_on_order_status();
+
+-- Orders inserted with a sale status (discount/balance flows) have no items
+-- yet when the order row is inserted, so they are counted as their items
+-- arrive. A product counts once per order: only its first item adds a sale
+-- and only its last removed item takes it back. Items removed by the orders
+-- FK cascade find no parent row and were already handled above.
+CREATE OR REPLACE FUNCTION product_stats_on_order_item()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_item order_items%ROWTYPE;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        v_item := NEW;
+    ELSE
+        v_item := OLD;
+    END IF;
+
+    IF v_item.product_id IS NULL OR NOT EXISTS (
+        SELECT 1 FROM orders o WHERE o.id = v_item.order_id AND is_sale_status(o.status)
+    ) THEN
+        RETURN NULL;
+    END IF;
+
+    IF EXISTS (
+        SELECT 1
+        FROM order_items oi
+        WHERE oi.order_id = v_item.order_id
+          AND oi.product_id = v_item.product_id
+          AND oi.id <> v_item.id
+    ) THEN
+        RETURN NULL;
+    END IF;
+
+    PERFORM bump_product_stats(
+        v_item.product_id, 0, 0, CASE WHEN TG_OP = 'INSERT' THEN 1 ELSE -1 END
+    );
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_order_items_product_stats ON order_items;
+CREATE TRIGGER trg_order_items_product_stats
+    AFTER INSERT OR DELETE ON order_items
+    FOR EACH ROW EXECUTE FUNCTION product_stats_on_order_item();
+
+-- ============================================================
+-- 3. Reconcile + backfill
+-- ============================================================
+
+CREATE OR REPLACE FUNCTION reconcile_product_stats()
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    INSERT INTO product_stats AS ps (product_id, rating_count, rating_sum, sales_count)
+    SELECT
+        p.id,
+        COALESCE(r.rating_count, 0),
+        COALESCE(r.rating_sum, 0),
+        COALESCE(s.sales_count, 0)
+    FROM products p
+    LEFT JOIN (
+        SELECT product_id, COUNT(*) AS rating_count, SUM(rating) AS rating_sum
+        FROM reviews
+        GROUP BY product_id
+    ) r ON r.product_id = p.id
+    LEFT JOIN (
+        SELECT oi.product_id, COUNT(DISTINCT oi.order_id) AS sales_count
+        FROM order_items oi
+        JOIN orders o ON o.id = oi.order_id
+        WHERE is_sale_status(o.status)
+        GROUP BY oi.product_id
+    ) s ON s.product_id = p.id
+    ON CONFLICT (product_id) DO UPDATE SET
+        rating_count = EXCLUDED.rating_count,
+        rating_sum = EXCLUDED.rating_sum,
+        sales_count = EXCLUDED.sales_count,
+        updated_at = NOW()
+    -- Only rows that drifted are rewritten
+    WHERE (ps.rating_count, ps.rating_sum, ps.sales_count)
+        IS DISTINCT FROM (EXCLUDED.rating_count, EXCLUDED.rating_sum, EXCLUDED.sales_count);
+
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$;
+
+COMMENT ON FUNCTION reconcile_product_stats() IS
+'Recompute product_stats from reviews and sale orders. Returns the number of rows fixed.';
+
+GRANT EXECUTE ON FUNCTION reconcile_product_stats() TO service_role;
+
+SELECT reconcile_product_stats();
+
+-- ============================================================
+-- 4. Views
+-- ============================================================
+
+-- Same columns as 20260111_products_with_stock_summary.sql, counters appended
+CREATE OR REPLACE VIEW products_with_stock_summary AS
+SELECT
+    p.id,
+    p.name,
+    p.description,
+    p.price,
+    p.prices,
+    p.type,
+    p.status,
+    p.warranty_hours,
+    p.instructions,
+    p.terms,
+    p.supplier_id,
+    p.fulfillment_time_hours,
+    p.requires_prepayment,
+    p.prepayment_percent,
+    p.categories,
+    p.msrp,
+    p.msrp_prices,
+    p.duration_days,
+    p.instruction_files,
+    p.image_url,
+    p.logo_svg_url,
+    p.discount_price,
+    p.created_at,
+    COUNT(si.id) FILTER (
+        WHERE si.status = 'available'
+        AND (si.expires_at IS NULL OR si.expires_at > NOW())
+    ) AS stock_count,
+    COUNT(si.id) FILTER (WHERE si.status = 'sold') AS sold_count,
+    COUNT(si.id) FILTER (WHERE si.status = 'reserved') AS reserved_count,
+    COALESCE(MAX(si.discount_percent) FILTER (
+        WHERE si.status = 'available'
+        AND (si.expires_at IS NULL OR si.expires_at > NOW())
+    ), 0) AS max_discount_percent,
+    COALESCE(ps.rating_count, 0) AS rating_count,
+    COALESCE(ROUND(ps.rating_sum::NUMERIC / NULLIF(ps.rating_count, 0), 1), 0) AS rating_avg,
+    COALESCE(ps.sales_count, 0) AS sales_count
+FROM products p
+LEFT JOIN stock_items si ON p.id = si.product_id
+LEFT JOIN product_stats ps ON ps.product_id = p.id
+GROUP BY p.id, ps.product_id;
+
+-- Social proof from the counters; only the latest reviews are aggregated.
+-- review_count/avg_rating now follow reviews.product_id (as the API did),
+-- not every review left on an order containing the product.
+DROP VIEW IF EXISTS product_social_proof;
+
+CREATE VIEW product_social_proof AS
+SELECT
+    p.id AS product_id,
+    COALESCE(ps.rating_count, 0) AS review_count,
+    COALESCE(ps.rating_sum::NUMERIC / NULLIF(ps.rating_count, 0), 0) AS avg_rating,
+    COALESCE(ps.sales_count, 0) AS order_count,
+    COALESCE(ps.sales_count, 0) AS sales_count, -- Alias for frontend compatibility
+    COALESCE(rr.recent_reviews, '[]'::JSONB) AS recent_reviews
+FROM products p
+LEFT JOIN product_stats ps ON ps.product_id = p.id
+LEFT JOIN LATERAL (
+    SELECT jsonb_agg(
+        jsonb_build_object(
+            'user_name', recent.user_name,
+            'rating', recent.rating,
+            'text', recent.text,
+            'created_at', recent.created_at
+        )
+        ORDER BY recent.created_at DESC
+    ) AS recent_reviews
+    FROM (
+        SELECT
+            COALESCE(u.first_name, u.username, 'Anonymous') AS user_name,
+            rev.rating,
+            COALESCE(rev.text, '') AS text,
+            rev.created_at
+        FROM reviews rev
+        LEFT JOIN users u ON u.id = rev.user_id
+        WHERE rev.product_id = p.id
+        ORDER BY rev.created_at DESC
+        LIMIT 10
+    ) recent
+) rr ON TRUE;
+
+-- Latest reviews per product (LATERAL above)
+CREATE INDEX IF NOT EXISTS idx_reviews_product_created
+    ON reviews(product_id, created_at DESC);
+
+GRANT SELECT ON product_social_proof TO authenticated;
+GRANT SELECT ON product_social_proof TO service_role;
+
+COMMENT ON VIEW product_social_proof IS 'Product social proof from product_stats counters plus the 10 latest reviews';
@@ -0,0 +1,135 @@
+-- ============================================================
+-- Migration: Hybrid product search (vector + full-text, RRF)
+-- ============================================================
+-- CatalogService.search ran the semantic RPC, then one product lookup per
+-- hit, then a separate text search when results were thin, merging in
+-- Python. hybrid_search_products does both legs in one call and fuses
+-- them with reciprocal-rank fusion:
+--   score = 1 / (k + semantic_rank) + 1 / (k + lexical_rank)
+-- The semantic leg takes its nearest neighbours straight from
+-- product_embeddings (ORDER BY distance LIMIT, served by the vector index),
+-- oversampled so category/type/stock filters still leave enough candidates,
+-- and ranks them afterwards. Without an embedding only the lexical leg runs.
+--
+-- Lexical leg uses the indexes from 20260127_product_search.sql.
+-- ============================================================
+
+CREATE OR REPLACE FUNCTION hybrid_search_products(
+    p_query TEXT,
+    p_query_embedding vector DEFAULT NULL,
+    p_match_count INTEGER DEFAULT 5,
+    p_type TEXT DEFAULT NULL,
+    p_category TEXT DEFAULT NULL,
+    p_in_stock_only BOOLEAN DEFAULT FALSE,
+    p_min_similarity FLOAT DEFAULT 0.3,
+    p_candidates INTEGER DEFAULT 30,
+    p_rrf_k INTEGER DEFAULT 60
+)
+RETURNS TABLE(product JSONB, score FLOAT, similarity FLOAT)
+LANGUAGE plpgsql
+STABLE
+SET pg_trgm.word_similarity_threshold = 0.4
+AS $$
+DECLARE
+    v_raw TEXT := btrim(COALESCE(p_query, ''));
+    v_like TEXT;
+    v_ts TSQUERY;
+    v_ids UUID[];
+    v_scores FLOAT[];
+    v_similarities FLOAT[];
+    -- Nearest neighbours fetched before filters (10x oversampling)
+    v_ann_limit INTEGER := GREATEST(p_candidates, p_match_count * 10);
+BEGIN
+    IF v_raw <> '' THEN
+        v_like := '%' || replace(replace(replace(v_raw, '\', '\\'), '%', '\%'), '_', '\_') || '%';
+        v_ts := websearch_to_tsquery('russian', v_raw) || websearch_to_tsquery('english', v_raw);
+    END IF;
+
+    WITH eligible AS (
+        SELECT p.id, p.name, p.search_vector
+        FROM products p
+        WHERE p.status = 'active'
+          AND (p_type IS NULL OR p.type = p_type)
+          AND (p_category IS NULL OR p_category = ANY (p.categories))
+          AND (
+              NOT p_in_stock_only
+              OR EXISTS (
+                  SELECT 1
+                  FROM stock_items si
+                  WHERE si.product_id = p.id
+                    AND si.status = 'available'
+                    AND (si.expires_at IS NULL OR si.expires_at > NOW())
+              )
+          )
+    ),
+    nearest AS (
+        -- Plain ORDER BY distance LIMIT so the vector index serves it
+        SELECT pe.product_id, pe.embedding <=> p_query_embedding AS distance
+        FROM product_embeddings pe
+        WHERE p_query_embedding IS NOT NULL
+        ORDER BY pe.embedding <=> p_query_embedding
+        LIMIT v_ann_limit
+    ),
+    semantic AS (
+        SELECT
+            e.id,
+            1 - n.distance AS sim,
+            row_number() OVER (ORDER BY n.distance) AS rnk
+        FROM nearest n
+        JOIN eligible e ON e.id = n.product_id
+        WHERE 1 - n.distance >= p_min_similarity
+        ORDER BY rnk
+        LIMIT p_candidates
+    ),
+    lexical AS (
+        SELECT
+            e.id,
+            row_number() OVER (
+                ORDER BY ts_rank_cd(e.search_vector, v_ts) + word_similarity(v_raw, e.name) DESC
+            ) AS rnk
+        FROM eligible e
+        WHERE v_raw <> ''
+          AND (e.search_vector @@ v_ts OR v_raw <% e.name OR e.name ILIKE v_like)
+        ORDER BY rnk
+        LIMIT p_candidates
+    ),
+    fused AS (
+        SELECT
+            COALESCE(s.id, l.id) AS id,
+            COALESCE(1.0 / (p_rrf_k + s.rnk), 0) + COALESCE(1.0 / (p_rrf_k + l.rnk), 0) AS rrf,
+            s.sim
+        FROM semantic s
+        FULL OUTER JOIN lexical l ON l.id = s.id
+        ORDER BY rrf DESC
+        LIMIT p_match_count
+    )
+    SELECT
+        array_agg(f.id ORDER BY f.rrf DESC),
+        array_agg(f.rrf::FLOAT ORDER BY f.rrf DESC),
+        array_agg(f.sim::FLOAT ORDER BY f.rrf DESC)
+    INTO v_ids, v_scores, v_similarities
+    FROM fused f;
+
+    IF v_ids IS NULL THEN
+        RETURN;
+    END IF;
+
+    -- Constant id list: the filter is pushed into the view's per-product aggregate
+    RETURN QUERY
+    SELECT
+        to_jsonb(v),
+        v_scores[array_position(v_ids, v.id)],
+        v_similarities[array_position(v_ids, v.id)]
+    FROM products_with_stock_summary v
+    WHERE v.id = ANY (v_ids)
+    ORDER BY array_position(v_ids, v.id);
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION hybrid_search_products(
+    TEXT, vector, INTEGER, TEXT, TEXT, BOOLEAN, FLOAT, INTEGER, INTEGER
+) TO service_role;
+
+COMMENT ON FUNCTION hybrid_search_products(
+    TEXT, vector, INTEGER, TEXT, TEXT, BOOLEAN, FLOAT, INTEGER, INTEGER
+) IS 'Hybrid product search: pgvector similarity + full-text/trigram rank fused with RRF.';